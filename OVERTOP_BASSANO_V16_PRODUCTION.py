@@ -105,6 +105,8 @@ class _DBConnWrapper:
             self._release()
 from datetime import datetime
 from collections import deque, defaultdict
+from itertools import islice
+from bisect import bisect_left
 import logging
 import sys
 
@@ -183,6 +185,182 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# ═══════════════════════════════════════════════════════════════════════════
+# SCRITTORE DB (agosto2026) — le scritture di log (crash_log, primi_secondi,
+# firme, curva_nascita, telemetria) non aprono piu' una connessione a testa
+# sul thread del tick: si accodano al thread db_scrittore, che le scrive a
+# transazioni. Letture occasionali (bridge, firme) da un pool read-only.
+# Senza scrittore_db.py, o con DB_SCRITTORE_OFF=true: _safe_connect come prima.
+# ENV: DB_SCRITTORE_FLUSH_MS (def 200), DB_SCRITTORE_BATCH (def 500),
+#      DB_SCRITTORE_MAX_CODA (def 100000, 0 = senza tetto: piena, chi scrive aspetta)
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from scrittore_db import ScrittoreDB, LettoriDB
+    _SCRITTORE_DB_AVAILABLE = True
+except ImportError:
+    _SCRITTORE_DB_AVAILABLE = False
+    log.warning("[DB_SCRITTORE] ⚠️ scrittore_db.py non trovato — scritture con _safe_connect")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SCHEMA DB (agosto2026) — tutte le tabelle del bot in schema_db.py, create
+# e migrate una volta al boot (tabella schema_version). Chi scrive a runtime
+# fa solo INSERT: niente CREATE TABLE / PRAGMA table_info sul tick.
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    import schema_db as _schema_db
+    _SCHEMA_DB_AVAILABLE = True
+except ImportError:
+    _SCHEMA_DB_AVAILABLE = False
+    log.error("[SCHEMA] ⚠️ schema_db.py non trovato — tabelle NON create/migrate")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# POTATORE DB (agosto2026) — la ritenzione delle tabelle di log esce dal
+# thread del tick: thread db_potatore, taglio per rowid (niente COUNT,
+# niente NOT IN), DELETE a pezzi corti, poi incremental_vacuum.
+# Senza potatore_db.py: AUTO-PULITORE sul tick come prima.
+# ENV: POTATORE_TABELLE ("phantom_forensic:5000,telemetry:3d"),
+#      POTATORE_OGNI_S (def 600), POTATORE_CHUNK (def 500),
+#      POTATORE_CONVERTI=true (VACUUM una tantum -> auto_vacuum incrementale)
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from potatore_db import PotatoreDB, parse_regole as _potatore_regole, REGOLE_DEFAULT as _POTATORE_DEFAULT
+    _POTATORE_DB_AVAILABLE = True
+except ImportError:
+    _POTATORE_DB_AVAILABLE = False
+    log.warning("[POTATORE] ⚠️ potatore_db.py non trovato — AUTO-PULITORE sul tick")
+
+def _schema_pronto(db_path, gruppo="bot"):
+    """Schema del gruppo su db_path (una volta per processo). None = non disponibile."""
+    if not _SCHEMA_DB_AVAILABLE:
+        return None
+    try:
+        return _schema_db.pronto(db_path, gruppo, connetti=_safe_connect)
+    except Exception as e:
+        log.error(f"[SCHEMA] {db_path}: {e}")
+        return None
+
+# ═══════════════════════════════════════════════════════════════════════════
+# DIARIO DB (agosto2026) — le tabelle di osservazione (schema_db.DIARIO:
+# phantom_forensic, telemetry, primi_secondi, *_tagli, ...) escono da
+# trading_data.db: un file per giorno in DIARIO_DIR, il suo scrittore, la
+# ritenzione e' cancellare file. Letture su piu' giorni: diario.leggi(ts0).
+# Senza diario_db.py o con DIARIO_OFF=true: tutto in DB_PATH come prima.
+# ENV: DIARIO_DIR (def <dir di DB_PATH>/logs), DIARIO_PER_ORA=true,
+#      DIARIO_KEEP_GIORNI (def 14)
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from diario_db import DiarioDB
+    _DIARIO_DB_AVAILABLE = True
+except ImportError:
+    _DIARIO_DB_AVAILABLE = False
+    log.warning("[DIARIO] ⚠️ diario_db.py non trovato — osservazioni in DB_PATH")
+
+_DB_SCRITTORI = {}
+_DB_LETTORI = {}
+_DIARIO = []          # [DiarioDB] dopo il primo uso; [None] = spento
+
+def _db_scrittore(db_path):
+    """Lo scrittore condiviso di db_path (creato al primo uso). None = scrivi da te."""
+    if not _SCRITTORE_DB_AVAILABLE or os.environ.get("DB_SCRITTORE_OFF", "false").lower() == "true":
+        return None
+    chiave = os.path.abspath(db_path)
+    w = _DB_SCRITTORI.get(chiave)
+    if w is None:
+        with _DB_GLOBAL_LOCK:
+            w = _DB_SCRITTORI.get(chiave)
+            if w is None:
+                _schema_pronto(db_path)
+                w = _DB_SCRITTORI[chiave] = ScrittoreDB(
+                    db_path, lock=_DB_GLOBAL_LOCK,
+                    flush_ms=float(os.environ.get("DB_SCRITTORE_FLUSH_MS", "200")),
+                    batch=int(os.environ.get("DB_SCRITTORE_BATCH", "500")),
+                    max_coda=int(os.environ.get("DB_SCRITTORE_MAX_CODA", "100000")))
+    return w
+
+def _db_inserisci(db_path, sql, params=()):
+    """Una riga di log: allo scrittore DB se c'e', altrimenti subito con _safe_connect."""
+    w = _db_scrittore(db_path)
+    if w is not None:
+        w.esegui(sql, params)
+        return
+    c = _safe_connect(db_path, timeout=15)
+    try:
+        c.execute(sql, params)
+        c.commit()
+    finally:
+        c.close()
+
+def _diario():
+    """Il diario delle osservazioni (creato al primo uso). None = tutto in DB_PATH."""
+    if _DIARIO:
+        return _DIARIO[0]
+    with _DB_GLOBAL_LOCK:
+        if not _DIARIO:
+            d = None
+            if (_DIARIO_DB_AVAILABLE and _SCRITTORE_DB_AVAILABLE and _SCHEMA_DB_AVAILABLE
+                    and os.environ.get("DIARIO_OFF", "false").lower() != "true"):
+                try:
+                    d = DiarioDB(
+                        os.environ.get("DIARIO_DIR",
+                                       os.path.join(os.path.dirname(DB_PATH) or ".", "logs")),
+                        per_ora=os.environ.get("DIARIO_PER_ORA", "false").lower() == "true",
+                        keep_giorni=float(os.environ.get("DIARIO_KEEP_GIORNI", "14")),
+                        flush_ms=float(os.environ.get("DB_SCRITTORE_FLUSH_MS", "200")),
+                        batch=int(os.environ.get("DB_SCRITTORE_BATCH", "500")),
+                        # le righe di prima del diario restano in DB_PATH: le viste le includono
+                        storico=(None if os.environ.get("DIARIO_STORICO_OFF", "false").lower() == "true"
+                                 else DB_PATH))
+                    log.info(f"[DIARIO] osservazioni in {d.base_dir}")
+                except Exception as e:
+                    log.warning(f"[DIARIO] init fallita, osservazioni in DB_PATH: {e}")
+                    d = None
+            _DIARIO.append(d)
+    return _DIARIO[0]
+
+def _diario_per(db_path, tabella):
+    """Il diario se tabella ci vive e db_path e' il DB del bot, altrimenti None."""
+    if not _SCHEMA_DB_AVAILABLE or tabella not in _schema_db.DIARIO:
+        return None
+    if os.path.abspath(db_path) != os.path.abspath(DB_PATH):
+        return None
+    return _diario()
+
+def _diario_inserisci(db_path, tabella, sql, params=()):
+    """Una riga di osservazione: nel file del giorno, o in db_path senza diario."""
+    d = _diario_per(db_path, tabella)
+    if d is not None:
+        d.esegui(sql, params)
+    else:
+        _db_inserisci(db_path, sql, params)
+
+def _diario_inserisci_molti(db_path, tabella, sql, righe):
+    d = _diario_per(db_path, tabella)
+    if d is not None:
+        d.esegui_molti(sql, righe)
+        return
+    w = _db_scrittore(db_path)
+    if w is not None:
+        w.esegui_molti(sql, righe)
+        return
+    c = _safe_connect(db_path, timeout=15)
+    try:
+        c.executemany(sql, righe)
+        c.commit()
+    finally:
+        c.close()
+
+def _db_lettori(db_path):
+    """Pool read-only di db_path. None = leggi con _safe_connect."""
+    if not _SCRITTORE_DB_AVAILABLE or os.environ.get("DB_SCRITTORE_OFF", "false").lower() == "true":
+        return None
+    if not os.path.exists(db_path):
+        return None
+    chiave = os.path.abspath(db_path)
+    r = _DB_LETTORI.get(chiave)
+    if r is None:
+        r = _DB_LETTORI.setdefault(chiave, LettoriDB(db_path))
+    return r
+
 # ===========================================================================
 # OPERATORS FOR CAPSULE RUNTIME
 # ===========================================================================
@@ -232,6 +410,14 @@ OPS = {
 # ===========================================================================
 import math as _wsig_math
 
+# INDICE FIRME (luglio2026): firme vive in memoria per esito, similarita'
+# vettoriale. Senza indice_firme.py: SELECT + json.loads a ogni entry.
+try:
+    from indice_firme import IndiceFirme
+    _INDICE_FIRME_AVAILABLE = True
+except ImportError:
+    _INDICE_FIRME_AVAILABLE = False
+
 
 class WinningSignatureLogger:
     """Osservatore puro: registra firme di trade vincenti e calcola similarità.
@@ -268,50 +454,64 @@ class WinningSignatureLogger:
     def __init__(self, db_path):
         self.db_path = db_path
         self._ensure_table()
-    
-    def _ensure_table(self):
-        """Crea la tabella se non esiste. Idempotente."""
+        # Firme vive in memoria, tenute in pari da save_signature: il match
+        # all'entry non tocca SQLite. Kill switch: WINSIG_INDICE_OFF=true
+        self._indice = None
+        if _INDICE_FIRME_AVAILABLE and os.environ.get("WINSIG_INDICE_OFF", "false").lower() != "true":
+            self._indice = IndiceFirme(self.NUMERIC_FIELDS, self.CATEGORICAL_FIELDS,
+                                       self.NUMERIC_RANGES)
+            self._carica_indice()
+
+    def _carica_indice(self):
+        """Al boot: firme ancora vive (TTL) dal DB all'indice, dalla piu' vecchia."""
         try:
-            import sqlite3
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS winning_signatures (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ts REAL NOT NULL,
-                    trade_outcome TEXT NOT NULL,  -- WIN_NET / LOSS_FEE / LOSS_REAL
-                    pnl_netto REAL,
-                    pnl_lordo REAL,
-                    signature_json TEXT NOT NULL,
-                    match_at_entry REAL  -- similarità all'ultima firma WIN viva, calcolata al momento dell'entry
-                )
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_winsig_ts ON winning_signatures(ts)
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_winsig_outcome ON winning_signatures(trade_outcome)
-            """)
-            conn.commit()
-            conn.close()
+            import json
+            import time
+            _q = """
+                SELECT ts, trade_outcome, signature_json FROM winning_signatures
+                WHERE ts >= ? ORDER BY ts, id
+            """
+            _lett = _db_lettori(self.db_path)
+            if _lett is not None:
+                with _lett.leggi() as conn:
+                    rows = conn.execute(_q, (time.time() - self.SIGNATURE_TTL_SEC,)).fetchall()
+            else:
+                conn = _safe_connect(self.db_path, timeout=30)
+                rows = conn.execute(_q, (time.time() - self.SIGNATURE_TTL_SEC,)).fetchall()
+                conn.close()
+            for ts, outcome, sj in rows:
+                self._indice.aggiungi(outcome, json.loads(sj), ts)
         except Exception:
-            # Non blocca il bot se il DB ha problemi
             pass
     
+    def _ensure_table(self):
+        """Tabella winning_signatures: la crea schema_db al boot (idempotente)."""
+        _schema_pronto(self.db_path)
+    
     def save_signature(self, trade_outcome, signature, pnl_netto, pnl_lordo, match_at_entry):
         """Salva una firma chiusa (post-trade). Non blocca mai."""
         try:
             import sqlite3
             import json
             import time
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("""
+            ts = time.time()
+            if self._indice is not None:
+                self._indice.aggiungi(trade_outcome, signature, ts)
+            _sql = """
                 INSERT INTO winning_signatures (ts, trade_outcome, pnl_netto, pnl_lordo, signature_json, match_at_entry)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (time.time(), trade_outcome,
-                  float(pnl_netto) if pnl_netto is not None else None,
-                  float(pnl_lordo) if pnl_lordo is not None else None,
-                  json.dumps(signature),
-                  float(match_at_entry) if match_at_entry is not None else None))
+            """
+            _riga = (ts, trade_outcome,
+                     float(pnl_netto) if pnl_netto is not None else None,
+                     float(pnl_lordo) if pnl_lordo is not None else None,
+                     json.dumps(signature),
+                     float(match_at_entry) if match_at_entry is not None else None)
+            _w = _db_scrittore(self.db_path)
+            if _w is not None:
+                _w.esegui(_sql, _riga)
+                return
+            conn = _safe_connect(self.db_path, timeout=30)
+            conn.execute(_sql, _riga)
             conn.commit()
             conn.close()
         except Exception:
@@ -321,27 +521,37 @@ class WinningSignatureLogger:
         """Ritorna le firme recenti per un dato outcome. None = tutte."""
         if max_age_sec is None:
             max_age_sec = self.SIGNATURE_TTL_SEC
+        if self._indice is not None and outcome_filter:
+            import time
+            return self._indice.recenti(outcome_filter, time.time() - max_age_sec, limite=20)
         try:
             import sqlite3
             import json
             import time
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.row_factory = sqlite3.Row
             cutoff = time.time() - max_age_sec
             if outcome_filter:
-                rows = conn.execute("""
+                _q, _p = ("""
                     SELECT signature_json FROM winning_signatures
                     WHERE trade_outcome = ? AND ts >= ?
                     ORDER BY ts DESC LIMIT 20
-                """, (outcome_filter, cutoff)).fetchall()
+                """, (outcome_filter, cutoff))
             else:
-                rows = conn.execute("""
+                _q, _p = ("""
                     SELECT signature_json, trade_outcome FROM winning_signatures
                     WHERE ts >= ?
                     ORDER BY ts DESC LIMIT 50
-                """, (cutoff,)).fetchall()
-            conn.close()
-            return [json.loads(r['signature_json']) for r in rows]
+                """, (cutoff,))
+            _lett = _db_lettori(self.db_path)
+            if _lett is not None:
+                with _lett.leggi() as conn:
+                    rows = conn.execute(_q, _p).fetchall()
+            else:
+                conn = _safe_connect(self.db_path, timeout=30)
+                rows = conn.execute(_q, _p).fetchall()
+                conn.close()
+            # righe come tuple: row_factory assegnato al wrapper di _safe_connect
+            # non arrivava alla connessione e r['signature_json'] falliva sempre
+            return [json.loads(r[0]) for r in rows]
         except Exception:
             return []
     
@@ -392,12 +602,32 @@ class WinningSignatureLogger:
         
         Ritorna float 0.0-1.0 o None se non c'è alcuna firma WIN recente.
         """
+        if self._indice is not None:
+            import time
+            sim = self._indice.similarita(current_signature, 'WIN_NET',
+                                          time.time() - self.SIGNATURE_TTL_SEC, limite=1)
+            return float(sim[0]) if len(sim) else None
         wins = self.get_recent_signatures('WIN_NET')
         if not wins:
             return None
         # Prendi la più recente (è la prima nella lista per ORDER BY ts DESC)
         last_win = wins[0]
         return self.similarity(current_signature, last_win)
+
+    def nearest_match(self, current_signature):
+        """Similarità con la firma viva PIÙ SIMILE di ogni esito ({esito: 0-1 o None})."""
+        out = {}
+        import time
+        cutoff = time.time() - self.SIGNATURE_TTL_SEC
+        for esito in ('WIN_NET', 'LOSS_FEE', 'LOSS_REAL'):
+            if self._indice is not None:
+                sim = self._indice.similarita(current_signature, esito, cutoff)
+                out[esito] = round(float(sim.max()), 3) if len(sim) else None
+            else:
+                sims = [self.similarity(current_signature, s)
+                        for s in self.get_recent_signatures(esito)]
+                out[esito] = round(max(sims), 3) if sims else None
+        return out
     
     @staticmethod
     def build_signature_from_context(momentum, volatility, trend, direction,
@@ -497,11 +727,57 @@ class StabilityTelemetry:
     1. Ogni evento ha SEMPRE: ts, event_type, regime, direction, open_position
     2. flip/param_change/trade_close/regime_change hanno anche snapshot:
        active_threshold, drift, macd, trend, volatility, bridge_reason
+
+    TELEMETRIA A COLONNE (agosto2026): prima ogni evento era un dict in una
+    deque da 10.000, salvato come json.dumps uno per uno; generate_report()
+    rifaceva ad ogni chiamata (heartbeat, persist) una decina di list
+    comprehension su tutti gli eventi, e persist_to_db potava con una
+    subquery. Ora:
+      - log_*: la riga gia' tipizzata va nell'anello della sua tabella
+        (telemetry_decisioni, telemetry_trade, telemetry per il resto) e i
+        contatori del report si aggiornano li': conteggi, somme pnl/durate,
+        primo/ultimo ts dei cambi parametro, per regime.
+      - generate_report(): legge i contatori, O(1) sugli eventi.
+      - persist_to_db(): svuota gli anelli, un executemany per tabella.
+        La ritenzione la fa il POTATORE DB (o il DIARIO, per file).
+    Il report conta dall'avvio (uptime), non piu' dall'ultimo persist.
     """
 
+    # ordine delle colonne = ordine delle tuple negli anelli (schema_db)
+    _COL_DECISIONI = ("ts", "tipo", "regime", "direction", "open_position",
+                      "chiave", "da", "a", "n", "motivo",
+                      "active_threshold", "drift", "macd", "trend", "volatility",
+                      "bridge_reason")
+    _COL_TRADE = ("ts", "tipo", "regime", "direction", "open_position",
+                  "trade_direction", "pnl", "is_win", "exit_reason", "duration",
+                  "score", "soglia", "matrimonio",
+                  "active_threshold", "drift", "macd", "trend", "volatility")
+    _INS = {
+        "telemetry_decisioni": "INSERT INTO telemetry_decisioni ({}) VALUES ({})".format(
+            ", ".join(_COL_DECISIONI), ", ".join("?" * len(_COL_DECISIONI))),
+        "telemetry_trade": "INSERT INTO telemetry_trade ({}) VALUES ({})".format(
+            ", ".join(_COL_TRADE), ", ".join("?" * len(_COL_TRADE))),
+        "telemetry": "INSERT INTO telemetry (event_type, data_json) VALUES (?, ?)",
+    }
+    _PRESI     = ('DIRECTION_FLIP', 'PARAM_CHANGE', 'TRADE_CLOSE', 'TRADE_ENTRY')
+    _NON_PRESI = ('DIRECTION_HOLD', 'PARAM_REJECTED')
+
     def __init__(self):
         self._start_time = time.time()
-        self._events = deque(maxlen=10000)    # FIX V16: cap RAM (era list illimitata)
+        # anelli da salvare, per tabella (cap RAM come la vecchia deque)
+        self._code = {t: deque(maxlen=10000) for t in self._INS}
+        # report incrementale
+        self._ultimi       = deque(maxlen=50)     # raw_events_last_50
+        self._ultimi_param = deque(maxlen=10)
+        self._ultimi_flip  = deque(maxlen=20)
+        self._n_eventi     = 0
+        self._n_tipo       = {}                   # event_type -> n
+        self._param_counts = {}
+        self._param_ts     = [None, None]         # primo, ultimo PARAM_CHANGE
+        self._flips_l2s    = 0
+        self._flips_s2l    = 0
+        self._trade        = {k: [0, 0, 0.0, 0.0] for k in ('total', 'LONG', 'SHORT')}  # n, win, pnl, durata
+        self._regimi       = {}                   # regime -> [trade, win, pnl, flip, param]
 
     def _base(self, event_type, regime, direction, open_position):
         """Campi minimi obbligatori su OGNI evento."""
@@ -524,6 +800,47 @@ class StabilityTelemetry:
             'bridge_reason': bridge_reason,
         }
 
+    # -- REGISTRAZIONE -----------------------------------------------------
+
+    def _registra(self, e, tabella, riga):
+        self._ultimi.append(e)
+        self._code[tabella].append(riga)
+        self._n_eventi += 1
+        t = e['event_type']
+        self._n_tipo[t] = self._n_tipo.get(t, 0) + 1
+
+    def _regime(self, regime):
+        r = self._regimi.get(regime)
+        if r is None:
+            r = self._regimi[regime] = [0, 0, 0.0, 0, 0]
+        return r
+
+    @staticmethod
+    def _scalare(v):
+        """da/a sono colonne senza tipo: numeri e testo passano, il resto in json."""
+        if v is None or isinstance(v, (int, float, str)):
+            return v
+        return json.dumps(v, default=str)
+
+    def _decisione(self, e, chiave=None, da=None, a=None, n=None, motivo=None):
+        self._registra(e, "telemetry_decisioni", (
+            e['ts'], e['event_type'], e['regime'], e['direction'],
+            1 if e['open_position'] else 0,
+            chiave, self._scalare(da), self._scalare(a), n, motivo,
+            e.get('active_threshold'), e.get('drift'), e.get('macd'),
+            e.get('trend'), e.get('volatility'), e.get('bridge_reason')))
+
+    def _trade_riga(self, e):
+        self._registra(e, "telemetry_trade", (
+            e['ts'], e['event_type'], e['regime'], e['direction'],
+            1 if e['open_position'] else 0,
+            e.get('trade_direction'), e.get('pnl'),
+            (1 if e['is_win'] else 0) if 'is_win' in e else None,
+            e.get('exit_reason'), e.get('duration'),
+            e.get('score'), e.get('soglia'), e.get('matrimonio'),
+            e.get('active_threshold'), e.get('drift'), e.get('macd'),
+            e.get('trend'), e.get('volatility')))
+
     # -- EVENTI CON SNAPSHOT -----------------------------------------------
 
     def log_direction_flip(self, old_dir, new_dir, regime, direction, open_position,
@@ -532,14 +849,20 @@ class StabilityTelemetry:
         e['old_direction'] = old_dir
         e['new_direction'] = new_dir
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility, bridge_reason))
-        self._events.append(e)
+        self._decisione(e, da=old_dir, a=new_dir)
+        if old_dir == 'LONG' and new_dir == 'SHORT':
+            self._flips_l2s += 1
+        elif old_dir == 'SHORT' and new_dir == 'LONG':
+            self._flips_s2l += 1
+        self._regime(regime)[3] += 1
+        self._ultimi_flip.append(e)
 
     def log_direction_hold(self, bearish_signals, regime, direction, open_position,
                            active_threshold, drift, macd, trend, volatility):
         e = self._base("DIRECTION_HOLD", regime, direction, open_position)
         e['bearish_signals'] = bearish_signals
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility))
-        self._events.append(e)
+        self._decisione(e, n=bearish_signals)
 
     def log_param_change(self, param, old_val, new_val, regime, direction, open_position,
                          active_threshold, drift, macd, trend, volatility, bridge_reason=None):
@@ -548,7 +871,13 @@ class StabilityTelemetry:
         e['old_value'] = old_val
         e['new_value'] = new_val
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility, bridge_reason))
-        self._events.append(e)
+        self._decisione(e, chiave=param, da=old_val, a=new_val)
+        self._param_counts[param] = self._param_counts.get(param, 0) + 1
+        if self._param_ts[0] is None:
+            self._param_ts[0] = e['ts']
+        self._param_ts[1] = e['ts']
+        self._regime(regime)[4] += 1
+        self._ultimi_param.append(e)
 
     def log_param_rejected(self, param, value, reason, regime, direction, open_position,
                            active_threshold, drift, macd, trend, volatility):
@@ -557,7 +886,7 @@ class StabilityTelemetry:
         e['rejected_value'] = value
         e['reject_reason'] = reason
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility))
-        self._events.append(e)
+        self._decisione(e, chiave=param, a=value, motivo=reason)
 
     def log_trade_close(self, trade_direction, pnl, is_win, exit_reason, duration,
                         regime, direction, open_position,
@@ -569,7 +898,18 @@ class StabilityTelemetry:
         e['exit_reason'] = exit_reason
         e['duration'] = round(duration, 1)
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility))
-        self._events.append(e)
+        self._trade_riga(e)
+        for k in ('total', trade_direction):
+            s = self._trade.get(k)
+            if s is not None:
+                s[0] += 1
+                s[1] += 1 if is_win else 0
+                s[2] += e['pnl']
+                s[3] += e['duration']
+        r = self._regime(regime)
+        r[0] += 1
+        r[1] += 1 if is_win else 0
+        r[2] += e['pnl']
 
     def log_regime_change(self, old_regime, new_regime, direction, open_position,
                           active_threshold, drift, macd, trend, volatility):
@@ -577,7 +917,7 @@ class StabilityTelemetry:
         e['old_regime'] = old_regime
         e['new_regime'] = new_regime
         e.update(self._snapshot(active_threshold, drift, macd, trend, volatility))
-        self._events.append(e)
+        self._decisione(e, da=old_regime, a=new_regime)
 
     # -- EVENTI SENZA SNAPSHOT (decisioni leggere) -------------------------
 
@@ -588,7 +928,7 @@ class StabilityTelemetry:
         e['score'] = round(score, 1)
         e['soglia'] = round(soglia, 1)
         e['matrimonio'] = matrimonio
-        self._events.append(e)
+        self._trade_riga(e)
 
     def log_state_change(self, old_state, new_state, loss_streak,
                          regime, direction, open_position):
@@ -596,171 +936,162 @@ class StabilityTelemetry:
         e['old_state'] = old_state
         e['new_state'] = new_state
         e['loss_streak'] = loss_streak
-        self._events.append(e)
+        self._decisione(e, da=old_state, a=new_state, n=loss_streak)
 
-    # B5: eventi telemetrici coesi
+    # B5: eventi telemetrici coesi (payload libero: tabella telemetry, json)
     def log_capsule_load(self, capsule_ids: list):
         e = self._base("CAPSULE_LOAD", "", "", False)
         e['capsule_ids'] = capsule_ids
         e['count'] = len(capsule_ids)
-        self._events.append(e)
+        self._registra(e, "telemetry", e)
 
     def log_bridge_trigger(self, trigger_type: str, event_name: str = ""):
         e = self._base("BRIDGE_TRIGGER_" + trigger_type.upper(), "", "", False)
         e['event_name'] = event_name
-        self._events.append(e)
+        self._registra(e, "telemetry", e)
 
     def log_heartbeat_enriched(self):
         e = self._base("HEARTBEAT_ENRICHED", "", "", False)
-        self._events.append(e)
+        self._registra(e, "telemetry", e)
 
     def log_event_signal(self, signal_type: str, payload: dict):
         e = self._base("EVENT_SIGNAL_" + signal_type.upper(), "", "", False)
         e.update(payload)
-        self._events.append(e)
+        self._registra(e, "telemetry", e)
 
     # -- REPORT ------------------------------------------------------------
 
     def generate_report(self) -> dict:
         """Genera il report completo. Solo numeri, zero interpretazione."""
         uptime_hours = max((time.time() - self._start_time) / 3600, 0.001)
-        events = self._events
+        n_tipo = dict(self._n_tipo)
 
         # -- A. Bridge / parametri --
-        param_events = [e for e in events if e['event_type'] == 'PARAM_CHANGE']
-        param_counts = {}
-        param_times = []
-        for pc in param_events:
-            p = pc['param']
-            param_counts[p] = param_counts.get(p, 0) + 1
-            param_times.append(pc['ts'])
-        param_times.sort()
-        avg_param_interval = 0
-        if len(param_times) > 1:
-            intervals = [param_times[i+1] - param_times[i] for i in range(len(param_times)-1)]
-            avg_param_interval = sum(intervals) / len(intervals)
+        n_param = n_tipo.get('PARAM_CHANGE', 0)
+        primo, ultimo = self._param_ts
+        # media degli intervalli tra cambi consecutivi = (ultimo - primo) / (n - 1)
+        avg_param_interval = (ultimo - primo) / (n_param - 1) if n_param > 1 else 0
 
         # -- B. Direzione --
-        flips = [e for e in events if e['event_type'] == 'DIRECTION_FLIP']
-        holds = [e for e in events if e['event_type'] == 'DIRECTION_HOLD']
-        flips_l2s = sum(1 for f in flips if f['old_direction'] == 'LONG' and f['new_direction'] == 'SHORT')
-        flips_s2l = sum(1 for f in flips if f['old_direction'] == 'SHORT' and f['new_direction'] == 'LONG')
+        n_flip = n_tipo.get('DIRECTION_FLIP', 0)
 
         # -- C. Stabilita --
-        decisions_taken = [e for e in events if e['event_type'] in
-                          ('DIRECTION_FLIP', 'PARAM_CHANGE', 'TRADE_CLOSE', 'TRADE_ENTRY')]
-        decisions_not_taken = [e for e in events if e['event_type'] in
-                              ('DIRECTION_HOLD', 'PARAM_REJECTED')]
-        decision_cost = len(param_events) + len(flips) * 3
+        decision_cost = n_param + n_flip * 3
 
         # -- D. Performance per direzione --
-        trades = [e for e in events if e['event_type'] == 'TRADE_CLOSE']
-        trades_long = [t for t in trades if t['trade_direction'] == 'LONG']
-        trades_short = [t for t in trades if t['trade_direction'] == 'SHORT']
-        def _stats(tlist):
-            if not tlist:
+        def _stats(s):
+            n, wins, pnl, dur = s
+            if not n:
                 return {'n': 0, 'pnl': 0, 'wr': 0, 'avg_duration': 0}
-            wins = sum(1 for t in tlist if t['is_win'])
             return {
-                'n': len(tlist),
-                'pnl': round(sum(t['pnl'] for t in tlist), 4),
-                'wr': round(wins / len(tlist) * 100, 1),
-                'avg_duration': round(sum(t['duration'] for t in tlist) / len(tlist), 1)
+                'n': n,
+                'pnl': round(pnl, 4),
+                'wr': round(wins / n * 100, 1),
+                'avg_duration': round(dur / n, 1)
             }
 
-        # -- E. Per regime --
-        regimes = set(t['regime'] for t in trades) if trades else set()
+        # -- E. Per regime (solo regimi con trade, come prima) --
         regime_stats = {}
-        for r in regimes:
-            r_trades = [t for t in trades if t['regime'] == r]
-            r_flips = sum(1 for f in flips if f['regime'] == r)
-            r_params = sum(1 for p in param_events if p['regime'] == r)
-            wins = sum(1 for t in r_trades if t['is_win'])
+        for r, (n, wins, pnl, r_flips, r_params) in list(self._regimi.items()):
+            if not n:
+                continue
             regime_stats[r] = {
-                'trades': len(r_trades),
-                'wr': round(wins / len(r_trades) * 100, 1) if r_trades else 0,
-                'pnl': round(sum(t['pnl'] for t in r_trades), 4),
+                'trades': n,
+                'wr': round(wins / n * 100, 1),
+                'pnl': round(pnl, 4),
                 'flips': r_flips,
                 'param_changes': r_params
             }
 
         return {
             'uptime_hours': round(uptime_hours, 2),
-            'total_events': len(events),
+            'total_events': self._n_eventi,
             'A_bridge': {
-                'total_param_changes': len(param_events),
-                'total_param_rejected': len([e for e in events if e['event_type'] == 'PARAM_REJECTED']),
-                'params_changed': param_counts,
+                'total_param_changes': n_param,
+                'total_param_rejected': n_tipo.get('PARAM_REJECTED', 0),
+                'params_changed': dict(self._param_counts),
                 'avg_interval_seconds': round(avg_param_interval, 1),
-                'recent_changes': param_events[-10:]
+                'recent_changes': list(self._ultimi_param)
             },
             'B_direction': {
-                'flips_LONG_to_SHORT': flips_l2s,
-                'flips_SHORT_to_LONG': flips_s2l,
-                'total_flips': flips_l2s + flips_s2l,
-                'flips_per_hour': round((flips_l2s + flips_s2l) / uptime_hours, 2),
-                'total_holds': len(holds),
-                'recent_flips': flips[-20:],
+                'flips_LONG_to_SHORT': self._flips_l2s,
+                'flips_SHORT_to_LONG': self._flips_s2l,
+                'total_flips': self._flips_l2s + self._flips_s2l,
+                'flips_per_hour': round((self._flips_l2s + self._flips_s2l) / uptime_hours, 2),
+                'total_holds': n_tipo.get('DIRECTION_HOLD', 0),
+                'recent_flips': list(self._ultimi_flip),
             },
             'C_stability': {
-                'decisions_taken': len(decisions_taken),
-                'decisions_not_taken': len(decisions_not_taken),
+                'decisions_taken': sum(n_tipo.get(t, 0) for t in self._PRESI),
+                'decisions_not_taken': sum(n_tipo.get(t, 0) for t in self._NON_PRESI),
                 'decision_cost': decision_cost,
                 'decision_cost_per_hour': round(decision_cost / uptime_hours, 2)
             },
             'D_performance': {
-                'total': _stats(trades),
-                'LONG': _stats(trades_long),
-                'SHORT': _stats(trades_short)
+                'total': _stats(self._trade['total']),
+                'LONG': _stats(self._trade['LONG']),
+                'SHORT': _stats(self._trade['SHORT'])
             },
             'E_by_regime': regime_stats,
-            'raw_events_last_50': events[-50:]
+            'raw_events_last_50': list(self._ultimi)
         }
 
     def persist_to_db(self, db_path):
-        """Salva telemetria su SQLite - eventi singoli + report.
+        """Salva telemetria su SQLite - un executemany per tabella + report.
 
         FIX V16:
-        - Drena self._events dopo il commit (era N²: riscriveva tutto ad ogni chiamata)
-        - Auto-pruning a 50.000 righe (era unbounded: 6.4M righe = 3.8 GB)
+        - Drena gli anelli dopo la copia (era N²: riscriveva tutto ad ogni chiamata)
+        - Ritenzione: POTATORE DB (telemetry*: 50.000 righe) o file del DIARIO
 
         INTERRUTTORE 6giu: TELEMETRY_OFF=true spegne questa scrittura ad alta
         frequenza (martellava il DB ogni tick -> lock). Reversibile via env var.
         """
         if os.environ.get("TELEMETRY_OFF", "false").lower() == "true":
             try:
-                self._events.clear()
+                for q in self._code.values():
+                    q.clear()
             except Exception:
                 pass
             return
+        conn = None
         try:
-            # Drena eventi accumulati: copia + svuota subito,
+            # Drena gli anelli: copia + svuota subito,
             # cosi' le append concorrenti non perdono dati.
-            events_to_save = list(self._events)
-            self._events.clear()
+            righe = {}
+            for tab, q in self._code.items():
+                righe[tab] = list(q)
+                q.clear()
+            righe["telemetry"] = [(e['event_type'], json.dumps(e, default=str))
+                                  for e in righe["telemetry"]]
+            righe["telemetry"].append(("STABILITY_REPORT",
+                                       json.dumps(self.generate_report(), default=str)))
+
+            # DIARIO DB (file del giorno) o SCRITTORE DB: accodate, finiscono
+            # nella stessa transazione del thread scrittore
+            _d = _diario_per(db_path, "telemetry")
+            _w = _d if _d is not None else _db_scrittore(db_path)
+            if _w is not None:
+                for tab, r in righe.items():
+                    if r:
+                        _w.esegui_molti(self._INS[tab], r)
+                return
 
             conn = _safe_connect(db_path, timeout=15)
             conn.execute("PRAGMA busy_timeout=15000;")
-            conn.execute("""CREATE TABLE IF NOT EXISTS telemetry (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                event_type TEXT, data_json TEXT
-            )""")
-            # Salva eventi drenati (lista locale, immutabile)
-            for e in events_to_save:
-                conn.execute("INSERT INTO telemetry (event_type, data_json) VALUES (?, ?)",
-                            (e['event_type'], json.dumps(e)))
-            # Salva report aggregato
-            report = self.generate_report()
-            conn.execute("INSERT INTO telemetry (event_type, data_json) VALUES (?, ?)",
-                        ("STABILITY_REPORT", json.dumps(report)))
-            # AUTO-PRUNING: tieni solo ultime 50.000 righe (cap ~30 MB)
-            conn.execute("""DELETE FROM telemetry
-                            WHERE id < (SELECT MAX(id) - 50000 FROM telemetry)""")
+            for tab, r in righe.items():
+                if r:
+                    conn.executemany(self._INS[tab], r)
             conn.commit()
-            conn.close()
         except Exception as e:
             logging.error(f"[TELEMETRY] DB error: {e}")
+        finally:
+            # chiusa SEMPRE: se il report fallisce dopo gli INSERT la
+            # transazione aperta bloccava il DB per tutti gli altri
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
 
 
 # ===========================================================================
@@ -855,6 +1186,18 @@ except ImportError:
     _CAP_REGIME_EDGE_AVAILABLE = False
     log.warning("[CE] capsule_executor.py non trovato")
 
+# ═══════════════════════════════════════════════════════════════════════════
+# CAPSULE COMPILATE — trigger di capsule_attive.json tradotti in predicati al
+# load/reload, con indice param → capsule: si provano solo le candidate.
+# Kill switch: env CAPSULE_COMPILATE_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from capsule_compilate import InsiemeCapsule
+    _COMPILATE_AVAILABLE = True
+except ImportError:
+    _COMPILATE_AVAILABLE = False
+    log.warning("[CAPSULE] ⚠️ capsule_compilate.py non trovato — trigger interpretati a ogni valutazione")
+
 try:
     from capsule_manager import CapsuleManager
     _CM_AVAILABLE = True
@@ -876,6 +1219,158 @@ except ImportError:
     _TSUNAMI_AVAILABLE = False
     log.warning("[TSUNAMI] ⚠️ tsunami_detector.py non trovato — modulo disabilitato")
 
+# ═══════════════════════════════════════════════════════════════════════════
+# TICK FEED — il thread WS riceve e basta, un consumatore dedicato elabora.
+# Kill switch: env WS_RING_OFF=true → elaborazione inline come prima.
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from tick_feed import FrameRing, start_consumer, EventClock, aggtrade_event_ts, KlinePrefetcher
+    _TICK_FEED_AVAILABLE = True
+except ImportError:
+    _TICK_FEED_AVAILABLE = False
+    log.warning("[TICK_FEED] ⚠️ tick_feed.py non trovato — elaborazione sul thread WS")
+
+    class EventClock:
+        """Ripiego senza tick_feed.py: orologio di sistema, come prima."""
+        virtual = False
+        def __init__(self, virtual=False):
+            pass
+        def advance(self, event_ts, recv_ts=None):
+            pass
+        def now(self):
+            return time.time()
+        def mark_decision(self):
+            pass
+        def stats(self):
+            return {"attivo": False}
+
+    def aggtrade_event_ts(data):
+        return None
+
+# ═══════════════════════════════════════════════════════════════════════════
+# TICK JOURNAL — ogni aggTrade su file binario orario (replay esatto).
+# Kill switch: env TICK_JOURNAL_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from tick_journal import TickJournal
+    _TICK_JOURNAL_AVAILABLE = True
+except ImportError:
+    _TICK_JOURNAL_AVAILABLE = False
+    log.warning("[TICK_JOURNAL] ⚠️ tick_journal.py non trovato — tick non registrati")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# TICK RING — un anello prezzo/qty/ts condiviso, scritto una volta per tick.
+# Senza tick_ring.py ogni organo torna alla sua deque.
+# Kill switch: env TICK_RING_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from tick_ring import TickRing, RingWindow, Escursione
+    _TICK_RING_AVAILABLE = True
+except ImportError:
+    _TICK_RING_AVAILABLE = False
+    log.warning("[TICK_RING] ⚠️ tick_ring.py non trovato — deque separate per organo")
+
+    class Escursione:
+        """Ripiego senza tick_ring.py: max/min solo dai prezzi passati a mano."""
+        def __init__(self, ring, ts0, price, completo=True):
+            self.hi = self.lo = price
+            self.t, self.completo = ts0, completo
+        def tick(self, price):
+            self.hi, self.lo = max(self.hi, price), min(self.lo, price)
+        def fino_a(self, now, price):
+            self.tick(price)
+            self.t = now
+        def mfe_mae(self, entry, direction):
+            if direction == 'LONG':
+                return round(self.hi - entry, 2), round(self.lo - entry, 2)
+            return round(entry - self.lo, 2), round(entry - self.hi, 2)
+
+# ═══════════════════════════════════════════════════════════════════════════
+# TIMING WHEEL — scadenze "fra N secondi" dei tracker sul tempo evento.
+# Senza timing_wheel.py ogni tracker torna a scorrere i suoi aperti ogni tick.
+# Kill switch: env TIMING_WHEEL_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from timing_wheel import TimingWheel
+    _TIMING_WHEEL_AVAILABLE = True
+except ImportError:
+    _TIMING_WHEEL_AVAILABLE = False
+    log.warning("[TIMING_WHEEL] ⚠️ timing_wheel.py non trovato — tracker a scansione per tick")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# INDICE CONTESTO — storia dei trade dell'Oracolo in colonne NumPy per il
+# context-matching (k-NN vettoriale, fino a ORACOLO_STORIA_MAX trade,
+# persistita in oracolo_storia). Senza: scansione della deque da 200.
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from indice_contesto import IndiceContesto
+    _INDICE_CONTESTO_AVAILABLE = True
+except ImportError:
+    _INDICE_CONTESTO_AVAILABLE = False
+    log.warning("[INDICE_CONTESTO] ⚠️ indice_contesto.py non trovato — context-matching su 200 trade")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# PHANTOM BOOK — fantasmi aperti in colonne NumPy, regole d'uscita a maschere.
+# Senza phantom_book.py si torna alla lista di dict scorsa tick per tick.
+# Kill switch: env PHANTOM_BOOK_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from phantom_book import PhantomBook
+    _PHANTOM_BOOK_AVAILABLE = True
+except ImportError:
+    _PHANTOM_BOOK_AVAILABLE = False
+    log.warning("[PHANTOM_BOOK] ⚠️ phantom_book.py non trovato — fantasmi in lista")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# UNIVERSI PARALLELI — N tarature del Campo (W, SOGLIA_BASE, REG_F,
+# SCORE_FLOOR) sugli stessi tick, ognuna con la sua posizione di carta.
+# Pura osservazione: non decide nulla. Tabella: heartbeat "universi" e
+# tabella sqlite universi_paralleli. Kill switch: env UNIVERSI_OFF=true
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from universi_paralleli import UniversiParalleli, griglia as _universi_griglia
+    _UNIVERSI_AVAILABLE = True
+except ImportError:
+    _UNIVERSI_AVAILABLE = False
+    log.warning("[UNIVERSI] ⚠️ universi_paralleli.py non trovato — una sola taratura")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CONFIG SNAPSHOT — le manopole env del tick lette da uno snapshot tipizzato,
+# ricaricato dal tick ogni CONFIG_REFRESH_S o con SIGHUP.
+# Override a caldo: CONFIG_OVERRIDE_FILE (default config_override.json
+# accanto al DB). Vista: /config/effective
+# ═══════════════════════════════════════════════════════════════════════════
+try:
+    from config_snapshot import ConfigStore
+    _CONFIG = ConfigStore(
+        override_path=os.environ.get("CONFIG_OVERRIDE_FILE",
+                                     os.path.join(os.path.dirname(DB_PATH) or ".", "config_override.json")),
+        refresh_s=float(os.environ.get("CONFIG_REFRESH_S", "30")),
+    )
+    _CONFIG.install_sighup()
+except ImportError:
+    log.warning("[CONFIG] ⚠️ config_snapshot.py non trovato — env letto ad ogni accesso")
+
+    class _EnvDiretto:
+        """Ripiego senza config_snapshot.py: legge os.environ ogni volta, come prima."""
+        def bool(self, nome, default=False, vero=("true",)):
+            return os.environ.get(nome, "true" if default else "false").lower() in vero
+        def float(self, nome, default=0.0):
+            return float(os.environ.get(nome, default))
+        def int(self, nome, default=0):
+            return int(os.environ.get(nome, default))
+        def str(self, nome, default=""):
+            return os.environ.get(nome, default)
+
+    class _ConfigDiretto:
+        snap = _EnvDiretto()
+        def maybe_refresh(self, now):
+            return False
+        def effective(self):
+            return {"attivo": False}
+
+    _CONFIG = _ConfigDiretto()
+
 class CapsuleRuntime:
     """Valuta e applica capsule da capsule_attive.json - hot reload senza restart."""
 
@@ -883,6 +1378,7 @@ class CapsuleRuntime:
         self.capsule_file = capsule_file
         self.capsules = []
         self.hash = ""
+        self._insieme = None    # capsules compilate, gia' in ordine di priority
         self._load()
 
     def _load(self):
@@ -897,6 +1393,25 @@ class CapsuleRuntime:
         except Exception as e:
             self.capsules = []
             log.error(f"[CAPSULE] Errore caricamento: {e}")
+        self._compila()
+
+    def _compila(self):
+        self._insieme = None
+        if not _COMPILATE_AVAILABLE or os.environ.get("CAPSULE_COMPILATE_OFF","false").lower() == "true":
+            return
+        try:
+            self._insieme = InsiemeCapsule(self.capsules, 'runtime',
+                                           ordine=lambda c: c.get('priority', 5))
+        except Exception as e:
+            log.error(f"[CAPSULE] Errore compilazione trigger: {e}")
+
+    def _corrispondenti(self, contesto: dict):
+        """Capsule i cui trigger passano, per priority (compilate se possibile)."""
+        ins = self._insieme
+        if ins is not None and ins.aggiornato(self.capsules):
+            return ins.corrispondenti(contesto)
+        return (c for c in sorted(self.capsules, key=lambda c: c.get('priority', 5))
+                if not c.get('trigger', []) or all(self._check_trigger(t, contesto) for t in c.get('trigger', [])))
 
     def reload(self) -> bool:
         try:
@@ -912,15 +1427,12 @@ class CapsuleRuntime:
         """Valuta tutte le capsule attive. Ritorna: {blocca, size_mult, soglia_boost, reason}"""
         ora = time.time()
         risultato = {'blocca': False, 'size_mult': 1.0, 'soglia_boost': 0.0, 'reason': ''}
-        for capsule in sorted(self.capsules, key=lambda c: c.get('priority', 5)):
+        for capsule in self._corrispondenti(contesto):
             if not capsule.get('enabled', True):
                 continue
             # Capsule scadute: salta (verranno pulite da IntelligenzaAutonoma)
             if capsule.get('scade_ts') and capsule['scade_ts'] < ora:
                 continue
-            triggers = capsule.get('trigger', [])
-            if triggers and not all(self._check_trigger(t, contesto) for t in triggers):
-                continue
             azione = capsule.get('azione', {})
             if azione.get('type') == 'blocca_entry':
                 risultato['blocca'] = True
@@ -2320,21 +2832,7 @@ class AIExplainer:
             os.makedirs(d, exist_ok=True)
 
     def _init_db(self):
-        try:
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS narrative_log (
-                    id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp  TEXT,
-                    event_type TEXT,
-                    narrative  TEXT,
-                    trade_data TEXT
-                )
-            """)
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            log.error(f"[AIExplainer] DB init: {e}")
+        _schema_pronto(self.db_path, "narrative")
 
     def log_decision(self, event_type: str, narrative: str, trade_data: dict = None):
         try:
@@ -2356,6 +2854,44 @@ class AIExplainer:
 #   Soglia: SEED_ENTRY_THRESHOLD (default 0.45)
 # ===========================================================================
 
+class _MinMaxFinestra:
+    """Min e max degli ultimi n valori: deque monotone, O(1) ammortizzato."""
+
+    __slots__ = ('n', '_i', '_min', '_max')
+
+    def __init__(self, n: int):
+        self.n    = n
+        self._i   = 0
+        self._min = deque()   # (indice, valore) crescenti
+        self._max = deque()   # (indice, valore) decrescenti
+
+    def push(self, x: float):
+        i = self._i
+        self._i += 1
+        vecchio = i - self.n
+        mn = self._min
+        while mn and mn[-1][1] >= x:
+            mn.pop()
+        mn.append((i, x))
+        if mn[0][0] <= vecchio:
+            mn.popleft()
+        mx = self._max
+        while mx and mx[-1][1] <= x:
+            mx.pop()
+        mx.append((i, x))
+        if mx[0][0] <= vecchio:
+            mx.popleft()
+
+    def min(self) -> float:
+        return self._min[0][1]
+
+    def max(self) -> float:
+        return self._max[0][1]
+
+    def range(self) -> float:
+        return self._max[0][1] - self._min[0][1]
+
+
 class SeedScorer:
     """
     Scoring dell'impulso a 4 componenti:
@@ -2364,6 +2900,15 @@ class SeedScorer:
       3. Directional Consist 20% - coerenza direzionale delle ultime variazioni
       4. Breakout Score      15% - rottura del range precedente
     Ritorna score [0.0 – 1.0] e dettaglio di ogni componente.
+
+    FIX luglio2026: score() veniva chiamato piu' volte per tick e ogni
+    volta copiava le deque in liste e ricostruiva tutte le variazioni.
+    Ora le feature si aggiornano in add_tick() (min/max monotoni, code
+    corte di volumi e variazioni, contatori) e score() legge solo lo
+    stato: stessi numeri. Le medie 5/15 sommano le code corte nello
+    stesso ordine di sum(v[-5:]): una somma scorrevole +/- derivava e
+    vol_pressure cambiava alla quarta cifra su qualche tick.
+    Equivalenza e benchmark: test_seed_scorer.py.
     """
 
     W_RANGE_POS   = 0.40
@@ -2375,9 +2920,57 @@ class SeedScorer:
         self.prices  = deque(maxlen=window)
         self.volumes = deque(maxlen=window)   # aggTrade include qty
 
+        self._mm5  = _MinMaxFinestra(5)
+        self._mm10 = _MinMaxFinestra(10)
+        self._mm20 = _MinMaxFinestra(20)
+        self._mm6  = _MinMaxFinestra(6)       # finestra della compression duration
+        self._r6   = deque(maxlen=19)         # range a 6 tick delle ultime 19 posizioni
+        self._diff = deque(maxlen=20)         # ultime 20 variazioni di prezzo
+        self._flip = deque(maxlen=19)         # 1 se la variazione ha invertito il segno
+        self._pos10   = 0                     # variazioni > 0 tra le ultime 10
+        self._flips   = 0                     # somma di _flip
+        self._v5   = deque(maxlen=5)          # ultimi volumi / variazioni:
+        self._v15  = deque(maxlen=15)         # sommati in score(), esatti
+        self._d5   = deque(maxlen=5)
+        self._d15  = deque(maxlen=15)
+        self._ultimo  = None                  # score() del tick corrente
+
     def add_tick(self, price: float, volume: float = 1.0):
-        self.prices.append(price)
-        self.volumes.append(volume)
+        prices, volumes = self.prices, self.volumes
+        self._ultimo = None
+
+        # ── volumi: code 5/15 ──────────────────────────────────────────
+        self._v5.append(volume)
+        self._v15.append(volume)
+
+        # ── variazioni: persistenza 10, drift 5/15, sign flip 20 ───────
+        if prices:
+            d = price - prices[-1]
+            diff = self._diff
+            nd = len(diff)
+            if nd >= 10 and diff[-10] > 0:
+                self._pos10 -= 1
+            if nd:
+                if len(self._flip) == self._flip.maxlen:
+                    self._flips -= self._flip[0]
+                f = 1 if d * diff[-1] < 0 else 0
+                self._flip.append(f)
+                self._flips += f
+            diff.append(d)
+            if d > 0:
+                self._pos10 += 1
+            self._d5.append(d)
+            self._d15.append(d)
+
+        prices.append(price)
+        volumes.append(volume)
+
+        # ── range scorrevoli 5/10/20 e range a 6 tick ──────────────────
+        self._mm5.push(price)
+        self._mm10.push(price)
+        self._mm20.push(price)
+        self._mm6.push(price)
+        self._r6.append(self._mm6.range())
 
     def score(self) -> dict:
         """
@@ -2385,62 +2978,68 @@ class SeedScorer:
         Non misura uno snapshot — misura la TRAIETTORIA degli ultimi tick.
         Simulazione: WR 77.8% su mercato con rumori e fakeout reali.
         """
-        if len(self.prices) < 20:
+        # Chiamato piu' volte nello stesso tick: calcolo una volta sola,
+        # copia a ogni chiamata (il chiamante puo' modificare il dict)
+        if self._ultimo is None:
+            self._ultimo = self._calcola()
+        return dict(self._ultimo)
+
+    def _calcola(self) -> dict:
+        n = len(self.prices)
+        if n < 20:
             return {'score': 0.0, 'pass': False, 'reason': 'insufficient_data'}
 
-        prices  = list(self.prices)
-        volumes = list(self.volumes)
+        last = self.prices[-1]
 
         # ── FEATURE 1: Range Position ──────────────────────────────────
         # Prezzo verso bordo superiore del range (serve >= 0.80)
-        low20  = min(prices[-20:])
-        high20 = max(prices[-20:])
-        r20    = high20 - low20
-        range_pos = (prices[-1] - low20) / (r20 + 0.01)
+        low20  = self._mm20.min()
+        r20    = self._mm20.max() - low20
+        range_pos = (last - low20) / (r20 + 0.01)
 
         # ── FEATURE 2: Compression Ratio ───────────────────────────────
         # Range si stringe: r5/r10 < 0.80 = molla che si carica
-        r5  = max(prices[-5:])  - min(prices[-5:])
-        r10 = max(prices[-10:]) - min(prices[-10:])
+        r5  = self._mm5.range()
+        r10 = self._mm10.range()
         compression_ratio = r5 / (r10 + 0.01)
         # Score: più compresso = meglio (inverso)
         comp_score = max(0.0, min(1.0, 1.0 - compression_ratio))
 
         # ── FEATURE 3: Drift Persistence ───────────────────────────────
         # % tick con variazione positiva negli ultimi 10 (serve >= 0.55)
-        changes = [prices[i+1]-prices[i] for i in range(len(prices)-11, len(prices)-1)]
-        positive_ticks = sum(1 for c in changes if c > 0)
-        drift_persist  = positive_ticks / len(changes) if changes else 0.5
+        drift_persist = self._pos10 / 10
 
         # ── FEATURE 4: Sign Flips ──────────────────────────────────────
         # Pochi cambi di direzione = drift coerente (serve <= 5 su 20)
-        all_changes = [prices[i+1]-prices[i] for i in range(len(prices)-21, len(prices)-1)]
-        sign_flips  = sum(1 for i in range(1,len(all_changes))
-                         if all_changes[i]*all_changes[i-1] < 0)
+        sign_flips = self._flips
+        if n == 20:
+            # con 20 prezzi la vecchia finestra partiva da prices[-1]-...:
+            # la prima "variazione" era prices[0]-prices[19]. Stesso conto.
+            p = self.prices
+            if (p[1] - p[0]) * (p[0] - p[19]) < 0:
+                sign_flips += 1
         flip_score  = max(0.0, min(1.0, 1.0 - sign_flips/10.0))
 
         # ── FEATURE 5: Volume Pressure ─────────────────────────────────
         # Volume ultimi 5 tick vs media 15 tick (serve >= 1.1)
-        vm5  = sum(volumes[-5:])  / 5
-        vm15 = sum(volumes[-15:]) / 15 if len(volumes) >= 15 else vm5
+        vm5  = sum(self._v5)  / 5
+        vm15 = sum(self._v15) / 15
         vol_pressure = vm5 / (vm15 + 0.01)
         vol_score    = min(1.0, vol_pressure / 2.0)
 
         # ── FEATURE 6: Drift Slope ─────────────────────────────────────
         # Drift sta accelerando: media_5 > media_15 (serve > 0)
-        drift5  = [prices[i+1]-prices[i] for i in range(len(prices)-6, len(prices)-1)]
-        drift15 = [prices[i+1]-prices[i] for i in range(len(prices)-16, len(prices)-1)]
-        dm5  = sum(drift5)  / len(drift5)  if drift5  else 0
-        dm15 = sum(drift15) / len(drift15) if drift15 else 0
+        dm5  = sum(self._d5)  / 5
+        dm15 = sum(self._d15) / 15
         drift_slope = dm5 - dm15
         slope_score = min(1.0, max(0.0, 0.5 + drift_slope / 0.001))
 
         # ── FEATURE 7: Compression Duration ───────────────────────────
         # Quanti tick il range è rimasto stretto consecutivamente
+        soglia_comp = r20 * 0.65
         comp_dur = 0
-        for i in range(len(prices)-1, max(0,len(prices)-20), -1):
-            window = prices[max(0,i-5):i+1]
-            if (max(window)-min(window)) < r20*0.65:
+        for r6 in reversed(self._r6):
+            if r6 < soglia_comp:
                 comp_dur += 1
             else:
                 break
@@ -2497,7 +3096,7 @@ class OracoloDinamico:
     MIN_PNL_EDGE          = 2.50    # profitto lordo minimo — lordo $2.50 = netto $0.50 dopo fee $2
     MIN_REAL_SAMPLES      = 5
 
-    def __init__(self):
+    def __init__(self, wheel=None, ring=None):
         self._memory: dict = {}
         # Trade completi per context-matching (ultimi 200)
         self._trade_history = deque(maxlen=200)
@@ -2505,6 +3104,11 @@ class OracoloDinamico:
         self._auto_capsules = []
         # Post-trade tracking
         self._post_trade_queue = deque(maxlen=20)
+        # TIMING WHEEL: valutazione a +60s come scadenza; timer paralleli
+        # alla coda (la deque piena scarta il piu' vecchio → timer spento)
+        self._wheel = wheel
+        self._post_trade_timer = deque(maxlen=20)
+        self._ring = ring   # TICK RING: MFE/MAE dopo l'exit letti dall'anello
         
         # -- INTELLIGENZA REALE - dati da trade veri 23 marzo 2026 ------
         self._memory = {
@@ -2626,6 +3230,21 @@ class OracoloDinamico:
              'pnl': -5.70, 'duration': 20, 'is_win': False, 'hour': 16, 'ts': 1774283200},
         ], maxlen=200)
 
+        # CERVELLO A RIGHE: fingerprint cambiati dall'ultimo save_brain
+        # (record, post-trade). Al primo avvio anche i seed vanno salvati.
+        self._sporchi = set(self._memory)
+
+        # INDICE CONTESTO (luglio2026): la stessa storia codificata in colonne
+        # per il context-matching. La deque resta la vista degli ultimi 200.
+        # Se oracolo_storia ha righe, load_brain sostituisce questi 6 trade.
+        self._indice = None
+        self._indice_salvati = 0    # seq fino a cui oracolo_storia e' aggiornata
+        if _INDICE_CONTESTO_AVAILABLE:
+            self._indice = IndiceContesto(int(os.environ.get("ORACOLO_STORIA_MAX", "50000")))
+            for t in self._trade_history:
+                self._indice.aggiungi(t['regime'], t['direction'], t['momentum'], t['volatility'],
+                                      t['rsi'], t['drift'], t['range_position'], t['pnl'])
+
     def _fp(self, momentum: str, volatility: str, trend: str, direction: str = "LONG") -> str:
         return f"{direction}|{momentum}|{volatility}|{trend}"
 
@@ -2689,6 +3308,13 @@ class OracoloDinamico:
         Cerca i 5 trade passati più simili a questa situazione.
         Ritorna il PnL medio dei vicini e la predizione.
         """
+        if self._indice is not None:
+            if len(self._indice) < 10:
+                return {'pnl_predicted': 0, 'confidence': 0, 'neighbors': 0, 'verdict': 'DATI_INSUFFICIENTI'}
+            _d, _p = self._indice.vicini(regime, momentum, volatility, direction,
+                                         rsi, drift, range_position, k=5)
+            return self._verdetto_vicini(_d.tolist(), _p.tolist())
+
         if len(self._trade_history) < 10:
             return {'pnl_predicted': 0, 'confidence': 0, 'neighbors': 0, 'verdict': 'DATI_INSUFFICIENTI'}
 
@@ -2718,14 +3344,16 @@ class OracoloDinamico:
         # I 5 più vicini
         scored.sort(key=lambda x: x[0])
         neighbors = scored[:5]
-        
-        if not neighbors:
+        return self._verdetto_vicini([d for d, _ in neighbors], [t['pnl'] for _, t in neighbors])
+
+    def _verdetto_vicini(self, dists: list, pnls: list) -> dict:
+        """PnL medio, confidenza e verdetto dai vicini (distanze e pnl, dal piu' vicino)."""
+        if not pnls:
             return {'pnl_predicted': 0, 'confidence': 0, 'neighbors': 0, 'verdict': 'NO_NEIGHBORS'}
 
-        pnls = [t['pnl'] for _, t in neighbors]
         pnl_avg = sum(pnls) / len(pnls)
         wins = sum(1 for p in pnls if p > 0)
-        avg_dist = sum(d for d, _ in neighbors) / len(neighbors)
+        avg_dist = sum(dists) / len(dists)
         confidence = max(0, min(1, 1.0 - avg_dist / 10.0))
 
         verdict = 'ENTRA' if pnl_avg > self.MIN_PNL_EDGE and wins >= 3 else 'BLOCCA'
@@ -2733,7 +3361,7 @@ class OracoloDinamico:
         return {
             'pnl_predicted': round(pnl_avg, 2),
             'confidence': round(confidence, 2),
-            'neighbors': len(neighbors),
+            'neighbors': len(pnls),
             'wins': wins,
             'avg_distance': round(avg_dist, 2),
             'verdict': verdict,
@@ -2773,7 +3401,7 @@ class OracoloDinamico:
         # OC5 - LOSS_STREAK: dopo 5 loss, fermati
         # LOSS_STREAK_OFF (18giu, Roberto): freno a conteggio spento se richiesto.
         if (loss_streak >= 5
-                and os.environ.get("LOSS_STREAK_OFF", "false").lower() != "true"):
+                and not _CONFIG.snap.bool("LOSS_STREAK_OFF", False)):
             return True, f"OC5_LOSS_STREAK_{loss_streak}"
 
         # OC6 - RSI ESTREMO IN RANGING = rumore, non segnale
@@ -2895,7 +3523,8 @@ class OracoloDinamico:
         if fp not in self._memory:
             self._memory[fp] = self._new_memory_entry()
         m = self._memory[fp]
-        
+        self._sporchi.add(fp)
+
         # Decay
         m['wins']    *= self.DECAY_FACTOR
         m['samples'] *= self.DECAY_FACTOR
@@ -2927,6 +3556,9 @@ class OracoloDinamico:
             'pnl': pnl, 'duration': duration, 'is_win': is_win,
             'hour': hour or datetime.utcnow().hour, 'ts': time.time(),
         })
+        if self._indice is not None:
+            self._indice.aggiungi(regime, direction, momentum, volatility,
+                                  rsi, drift, range_position, pnl)
 
         # Prova a generare capsule
         self.maybe_generate_capsule(fp)
@@ -2938,42 +3570,77 @@ class OracoloDinamico:
 
     def start_post_trade(self, fp: str, exit_price: float, direction: str):
         """Inizia il monitoraggio post-trade per 60 secondi."""
-        self._post_trade_queue.append({
+        pt = {
             'fp': fp, 'exit_price': exit_price, 'direction': direction,
-            'start_time': time.time(), 'prices_after': [],
-        })
+            'start_time': time.time(),
+        }
+        # tempo evento della ruota: in live coincide col wall clock a meno del lag WS
+        t0 = (self._wheel.now if self._wheel is not None and self._wheel.now is not None
+              else pt['start_time'])
+        pt['esc'] = Escursione(self._ring, t0, exit_price,
+                               completo=self._ring is not None or self._wheel is None)
+        if self._wheel is not None:
+            if len(self._post_trade_timer) == self._post_trade_timer.maxlen:
+                self._post_trade_timer[0].cancel()   # sta per uscire dalla coda
+            self._post_trade_timer.append(self._wheel.schedule(t0 + 60, self._post_trade_scadenza, pt))
+        self._post_trade_queue.append(pt)
+
+    def _post_trade_scadenza(self, now: float, current_price: float, pt: dict):
+        """Callback della ruota: 60 secondi dall'exit."""
+        if self._post_trade_queue and self._post_trade_queue[0] is pt:
+            self._post_trade_queue.popleft()
+            self._post_trade_timer.popleft()
+        else:
+            i = next(i for i, v in enumerate(self._post_trade_queue) if v is pt)
+            del self._post_trade_queue[i]
+            del self._post_trade_timer[i]
+        self._valuta_post_trade(pt, current_price, now)
+
+    def _valuta_post_trade(self, pt: dict, current_price: float, now: float):
+        """Il prezzo ha continuato nella direzione dell'exit?"""
+        esc = pt.pop('esc')
+        esc.fino_a(now, current_price)
+        pt['prezzo_60'] = round(current_price, 2)
+        pt['mfe'], pt['mae'] = esc.mfe_mae(pt['exit_price'], pt['direction'])
+        if pt['direction'] == 'LONG':
+            continued = current_price > pt['exit_price']
+            delta_after = current_price - pt['exit_price']
+        else:
+            continued = current_price < pt['exit_price']
+            delta_after = pt['exit_price'] - current_price
+        
+        # Registra nell'Oracolo
+        mem = self._memory.get(pt['fp'])
+        if mem:
+            mem.setdefault('post_continued', deque(maxlen=50)).append(continued)
+            mem.setdefault('post_delta', deque(maxlen=50)).append(delta_after)
+            self._sporchi.add(pt['fp'])
+        
+        if continued:
+            log.info(f"[POST-TRADE] ⚠️ {pt['fp']}: prezzo ha CONTINUATO +${delta_after:.0f} "
+                     f"(mfe ${pt['mfe']:.0f}) → exit era PRESTO")
+        else:
+            log.info(f"[POST-TRADE] [OK] {pt['fp']}: prezzo ha INVERTITO ${delta_after:.0f} "
+                     f"(mae ${pt['mae']:.0f}) → exit era CORRETTA")
 
     def update_post_trade(self, current_price: float):
-        """Chiamato ogni tick - aggiorna i post-trade attivi."""
-        to_close = []
-        for i, pt in enumerate(self._post_trade_queue):
-            elapsed = time.time() - pt['start_time']
-            pt['prices_after'].append(current_price)
+        """Chiamato ogni tick - aggiorna i post-trade attivi (solo senza ruota)."""
+        if self._wheel is not None:
+            return
+        n_scaduti = 0
+        now = time.time()
+        for pt in self._post_trade_queue:
+            elapsed = now - pt['start_time']
+            pt['esc'].tick(current_price)
             
             if elapsed >= 60:
-                # Valuta se il prezzo ha continuato nella direzione
-                if pt['direction'] == 'LONG':
-                    continued = current_price > pt['exit_price']
-                    delta_after = current_price - pt['exit_price']
-                else:
-                    continued = current_price < pt['exit_price']
-                    delta_after = pt['exit_price'] - current_price
-                
-                # Registra nell'Oracolo
-                mem = self._memory.get(pt['fp'])
-                if mem:
-                    mem.setdefault('post_continued', deque(maxlen=50)).append(continued)
-                    mem.setdefault('post_delta', deque(maxlen=50)).append(delta_after)
-                
-                if continued:
-                    log.info(f"[POST-TRADE] ⚠️ {pt['fp']}: prezzo ha CONTINUATO +${delta_after:.0f} → exit era PRESTO")
-                else:
-                    log.info(f"[POST-TRADE] [OK] {pt['fp']}: prezzo ha INVERTITO ${delta_after:.0f} → exit era CORRETTA")
-                
-                to_close.append(i)
+                self._valuta_post_trade(pt, current_price, now)
+                n_scaduti += 1
         
-        for i in reversed(to_close):
-            self._post_trade_queue.popleft() if i == 0 else None
+        # Finestra costante: gli scaduti sono in testa. Prima si toglieva solo
+        # il primo e gli altri venivano registrati di nuovo al tick dopo.
+        for _ in range(n_scaduti):
+            self._post_trade_queue.popleft()
 
     def get_exit_too_early_rate(self, fp: str) -> float:
         """% di volte che l'exit era troppo presto per questo fingerprint."""
@@ -3009,6 +3676,8 @@ class OracoloDinamico:
         
         result['_auto_capsules'] = len(self._auto_capsules)
         result['_trade_history'] = len(self._trade_history)
+        if self._indice is not None:
+            result['_indice_contesto'] = self._indice.stats()
         return result
 
 # ===========================================================================
@@ -3041,10 +3710,21 @@ class PreTradeSignalTracker:
     """
 
     WINDOWS = [30, 60, 120]  # secondi di osservazione post-segnale
-    MAX_OPEN  = 20            # max segnali aperti simultanei
+    MAX_OPEN  = 20            # max segnali aperti simultanei (giro per-tick)
+    MAX_OPEN_RUOTA = 200      # con la timing wheel il tick non scorre gli aperti
     MAX_CLOSED = 500          # ultimi N segnali chiusi in memoria
 
-    def __init__(self):
+    def __init__(self, clock=None, wheel=None, ring=None):
+        # EVENT CLOCK: ts dei segnali e finestre 30/60/120s su tempo exchange
+        self.clock = clock if clock is not None else EventClock()
+        # TIMING WHEEL: le finestre scattano come scadenze, update() non scorre piu'
+        self._wheel   = wheel
+        self.max_open = self.MAX_OPEN_RUOTA if wheel is not None else self.MAX_OPEN
+        # TICK RING: MFE/MAE e percorso letti dall'anello alle scadenze,
+        # niente lista di prezzi per segnale. Percorso ogni SIGNAL_PATH_STEP_S
+        # secondi (0 = spento).
+        self._ring     = ring
+        self.path_step = float(os.environ.get("SIGNAL_PATH_STEP_S", "10"))
         self._open:   list         = []                    # segnali aperti
         self._closed: deque        = deque(maxlen=self.MAX_CLOSED)
         self._stats:  dict         = defaultdict(lambda: {
@@ -3053,6 +3733,7 @@ class PreTradeSignalTracker:
             'hit_30':    [], 'hit_60':    [], 'hit_120':   [],  # True = prezzo andato nella dir giusta
             'pnl_sim':   [],  # PnL simulato con fee
         })
+        self._sporchi: set         = set()                 # contesti da salvare
 
     def record_signal(self, price: float, direction: str, score: float,
                       soglia: float, regime: str, momentum: str,
@@ -3064,7 +3745,7 @@ class PreTradeSignalTracker:
         """
         if score < 25:
             return  # sotto 25 è rumore puro
-        if len(self._open) >= self.MAX_OPEN:
+        if len(self._open) >= self.max_open:
             return  # non sovraccaricare
 
         # Score band: categorizza lo score per analisi statistica
@@ -3090,45 +3771,74 @@ class PreTradeSignalTracker:
             'rsi':        rsi,
             'macd_hist':  macd_hist,
             'drift':      drift,
-            'ts':         time.time(),
-            'prices':     [],           # prezzi raccolti
+            'ts':         self.clock.now(),
             'closed':     False,
-            'results':    {},           # delta_30, delta_60, delta_120
+            'results':    {},           # delta/pnl/hit/prezzo_30/60/120, mfe, mae
+            'path':       [],           # prezzo ogni path_step secondi (solo con l'anello)
         }
+        # max/min dal segnale in poi: memoria costante, qualunque tick rate
+        signal['esc'] = Escursione(self._ring, signal['ts'], price,
+                                   completo=self._ring is not None or self._wheel is None)
         self._open.append(signal)
+        if self._wheel is not None:
+            for w in self.WINDOWS:
+                self._wheel.schedule(signal['ts'] + w, self._scadenza, signal, w)
+
+    def _risultato(self, sig: dict, w: int, current_price: float):
+        """Delta/PnL/hit del segnale alla finestra w."""
+        if sig['direction'] == 'LONG':
+            delta = current_price - sig['price']
+        else:
+            delta = sig['price'] - current_price
+        # PnL LORDO: fee esclusa dal monitoring
+        pnl_sim = delta * (5000.0 / sig['price'])
+        sig['results'][f'delta_{w}']  = round(delta, 2)
+        sig['results'][f'pnl_{w}']    = round(pnl_sim, 2)
+        sig['results'][f'hit_{w}']    = delta > 0
+        sig['results'][f'prezzo_{w}'] = round(current_price, 2)
+        esc = sig['esc']
+        esc.fino_a(self.clock.now(), current_price)
+        sig['results']['mfe'], sig['results']['mae'] = esc.mfe_mae(sig['price'], sig['direction'])
+
+    def _chiudi(self, sig: dict):
+        esc = sig.pop('esc')
+        sig['results']['esc_completa'] = esc.completo
+        if self._ring is not None and self.path_step > 0:
+            sig['path'] = self._ring.campiona(sig['ts'], self.path_step,
+                                              int(self.WINDOWS[-1] // self.path_step))
+        sig['closed'] = True
+        self._closed.append(sig)
+        self._update_stats(sig)
+
+    def _scadenza(self, now: float, current_price: float, sig: dict, w: int):
+        """Callback della ruota: finestra w raggiunta per questo segnale."""
+        self._risultato(sig, w, current_price)
+        if w == self.WINDOWS[-1]:
+            self._open.remove(sig)   # FIFO: quasi sempre il primo
+            self._chiudi(sig)
 
     def update(self, current_price: float):
-        """Chiamato ogni tick. Aggiorna i segnali aperti."""
-        now     = time.time()
+        """Chiamato ogni tick. Aggiorna i segnali aperti (solo senza ruota)."""
+        if self._wheel is not None:
+            return
+        now     = self.clock.now()
         to_close = []
 
         for i, sig in enumerate(self._open):
             elapsed = now - sig['ts']
-            sig['prices'].append(current_price)
+            sig['esc'].tick(current_price)
 
             # Calcola risultati alle finestre temporali
             for w in self.WINDOWS:
-                key = f'delta_{w}'
-                if key not in sig['results'] and elapsed >= w:
-                    if sig['direction'] == 'LONG':
-                        delta = current_price - sig['price']
-                    else:
-                        delta = sig['price'] - current_price
-                    # PnL LORDO: fee esclusa dal monitoring
-                    pnl_sim = delta * (5000.0 / sig['price'])
-                    sig['results'][key]        = round(delta, 2)
-                    sig['results'][f'pnl_{w}'] = round(pnl_sim, 2)
-                    sig['results'][f'hit_{w}']    = delta > 0
+                if f'delta_{w}' not in sig['results'] and elapsed >= w:
+                    self._risultato(sig, w, current_price)
 
             # Chiudi dopo la finestra massima
             if elapsed >= max(self.WINDOWS):
                 to_close.append(i)
 
         for i in reversed(to_close):
-            sig = self._open.pop(i)
-            sig['closed'] = True
-            self._closed.append(sig)
-            self._update_stats(sig)
+            self._chiudi(self._open.pop(i))
 
     def _update_stats(self, sig: dict):
         """Aggiorna la distribuzione statistica dopo ogni segnale chiuso."""
@@ -3136,6 +3846,7 @@ class PreTradeSignalTracker:
         key = f"{sig['regime']}|{sig['direction']}|{sig['score_band']}"
         s   = self._stats[key]
         s['n'] += 1
+        self._sporchi.add(key)
 
         for w in self.WINDOWS:
             d   = sig['results'].get(f'delta_{w}')
@@ -3422,12 +4133,14 @@ class MemoriaMatrimoni:
         self.wr_history = defaultdict(list)
         self.wins       = defaultdict(int)
         self.losses     = defaultdict(int)
+        self._sporca    = False     # cambiata dall'ultimo save_brain
 
     def get_status(self, name: str) -> tuple:
         if name in self.divorzio:
             return False, "DIVORZIO_PERMANENTE"
         if self.blacklist[name] > 0:
             self.blacklist[name] -= 1
+            self._sporca = True
             return False, f"SEPARAZIONE_ATTIVA ({self.blacklist[name]} rimasti)"
         if self.trust[name] < 30:
             return False, f"TRUST_BASSO ({self.trust[name]})"
@@ -3441,6 +4154,7 @@ class MemoriaMatrimoni:
         return self.trust.get(name, 50) / 100.0
 
     def record_trade(self, name: str, is_win: bool, wr_expected: float):
+        self._sporca = True
         if is_win:
             self.wins[name]  += 1
             self.trust[name] = min(100, self.trust[name] + 5)
@@ -3471,12 +4185,16 @@ class MemoriaMatrimoni:
 class ContestoAnalyzer:
     """Momentum, volatility, trend dai prezzi recenti."""
 
-    def __init__(self, window: int = 50):
-        self.prices    = deque(maxlen=window)
+    def __init__(self, window: int = 50, ring=None):
+        # con l'anello condiviso la finestra e' una vista: niente append
+        self._ring     = ring
+        self.prices    = (RingWindow(ring, window, storia=False) if ring is not None
+                          else deque(maxlen=window))
         self.tick_count= 0
 
     def add_price(self, price: float):
-        self.prices.append(price)
+        if self._ring is None:
+            self.prices.append(price)
         self.tick_count += 1
 
     def analyze(self, regime=None, drift=None):
@@ -3605,6 +4323,12 @@ class PersistenzaStato:
 
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        self._blob_oracolo    = False   # riga JSON 'oracolo' da cancellare
+        self._blob_signal     = False   # riga JSON 'signal_tracker' da cancellare
+        self._calibra_salvati = None    # json dei params scritti l'ultima volta
+        # (oggetto, chiavi, memoria) di salvataggi NON arrivati su disco: li
+        # rimette lo scrittore DB, li riapplica il prossimo save sul suo thread
+        self._da_rimettere    = deque()
         self._ensure_dir()
         self._init_db()
 
@@ -3614,96 +4338,9 @@ class PersistenzaStato:
             os.makedirs(d, exist_ok=True)
 
     def _init_db(self):
-        try:
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS bot_state (
-                    key   TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS capsule_permanenti (
-                    id                 TEXT PRIMARY KEY,
-                    azione             TEXT,
-                    params_json        TEXT,
-                    motivo             TEXT,
-                    forza              REAL,
-                    contesto           TEXT,
-                    creata_ts          TEXT,
-                    analisi_causale    TEXT,
-                    prompt_contestuale TEXT,
-                    n_attivazioni      INTEGER DEFAULT 0
-                )
-            """)
-            # ════════════════════════════════════════════════════════════
-            # FIX #21 (12mag2026): TABELLA FORENSE PHANTOM_NO_ENTRY
-            # ════════════════════════════════════════════════════════════
-            # Cattura il "fingerprint fisico" di ogni phantom bloccato dal
-            # TsunamiGate per analizzare a posteriori cosa distingue gli
-            # 11 WIN dai 115 LOSS (caso 12mag pomeriggio: ratio 8.4%).
-            # Roberto: "Sono gli unici soldi che possiamo prendere".
-            # ════════════════════════════════════════════════════════════
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS phantom_forensic (
-                    id              INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ts_entry        REAL,
-                    ts_close        REAL,
-                    block_reason    TEXT,
-                    direction       TEXT,
-                    price_entry     REAL,
-                    price_close     REAL,
-                    pnl_netto       REAL,
-                    is_win          INTEGER,
-                    duration_sec    REAL,
-                    -- Tsunami snapshot al momento del blocco
-                    ts_30s_strength    REAL,
-                    ts_30s_direction   TEXT,
-                    ts_30s_coerenza    REAL,
-                    ts_2min_strength   REAL,
-                    ts_2min_direction  TEXT,
-                    ts_2min_coerenza   REAL,
-                    ts_10min_strength  REAL,
-                    ts_10min_direction TEXT,
-                    ts_10min_coerenza  REAL,
-                    ts_confidenza      INTEGER,
-                    -- Altri organi al momento del blocco
-                    seed_score      REAL,
-                    oi_carica       REAL,
-                    rsi             REAL,
-                    macd            REAL,
-                    momentum        TEXT,
-                    volatility      TEXT,
-                    trend           TEXT,
-                    regime          TEXT,
-                    matrimonio      TEXT,
-                    score           REAL,
-                    soglia          REAL
-                )
-            """)
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_phf_block_reason
-                ON phantom_forensic(block_reason, is_win)
-            """)
-            # ════════════════════════════════════════════════════════════════
-            # FIX MFE/MAE (28mag, Roberto): aggiungo 4 colonne forensiche per
-            # registrare la TRAIETTORIA del prezzo, non solo il punto di chiusura.
-            # max_price = prezzo MASSIMO raggiunto durante la vita del fantasma
-            # min_price = prezzo MINIMO raggiunto durante la vita del fantasma
-            # mfe_usd = movimento favorevole massimo in dollari (direzionale)
-            # mae_usd = movimento avverso massimo in dollari (direzionale)
-            # ALTER è idempotente: se la colonna esiste già, ignora silenziosamente.
-            # ════════════════════════════════════════════════════════════════
-            for _col, _typ in [("max_price","REAL"),("min_price","REAL"),
-                               ("mfe_usd","REAL"),("mae_usd","REAL")]:
-                try:
-                    conn.execute(f"ALTER TABLE phantom_forensic ADD COLUMN {_col} {_typ}")
-                except Exception:
-                    pass  # colonna già esistente
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            log.error(f"[PERSIST] Init DB: {e}")
+        # bot_state, oracolo_storia, capsule_permanenti, phantom_forensic
+        # (FIX #21 + colonne MFE/MAE): tutte in schema_db.py
+        _schema_pronto(self.db_path)
 
     def load(self) -> tuple:
         """Ritorna (capital, total_trades)."""
@@ -3719,50 +4356,152 @@ class PersistenzaStato:
             log.error(f"[PERSIST] Load: {e} - uso defaults")
             return self.DEFAULT_CAPITAL, self.DEFAULT_TRADES
 
-    def save_brain(self, oracolo, memoria, calibratore):
+    # -- CERVELLO A RIGHE (agosto2026) -------------------------------------
+    # Prima save_brain riscriveva TUTTO l'Oracolo a ogni trade chiuso e ogni
+    # 5 minuti: deque → list per ogni fingerprint, json.dumps di tutto, una
+    # riga gigante in bot_state, connessione e commit sul thread del tick.
+    # Ora una riga per fingerprint (oracolo_fp) e per contesto del Signal
+    # Tracker (signal_tracker_ctx): si riscrivono solo quelli segnati sporchi
+    # da chi li modifica. La tabella e' lo snapshot, ogni save il delta:
+    # 10 o 10.000 fingerprint in memoria, costa quelli toccati nel frattempo.
+    # Le scritture vanno allo SCRITTORE DB (senza: _safe_connect come prima).
+    # Le vecchie righe JSON 'oracolo'/'signal_tracker' di bot_state (DB
+    # vecchi, inject_brain.py) si leggono al boot e si cancellano al save.
+    # Un save = UNA transazione, tutta o niente (la DELETE del blob non passa
+    # senza le righe nuove). Sporchi, blob e indice si azzerano solo quando
+    # il commit e' avvenuto; se fallisce, le chiavi tornano sporche.
+    _SQL_FP      = "INSERT OR REPLACE INTO oracolo_fp VALUES (?,?,?,?,?,?,?)"
+    _SQL_CTX     = "INSERT OR REPLACE INTO signal_tracker_ctx VALUES (?,?,?,?)"
+    _SQL_STATO   = "INSERT OR REPLACE INTO bot_state VALUES (?, ?)"
+    _SQL_VIA     = "DELETE FROM bot_state WHERE key = ?"
+    _SCALARI_FP  = ('wins', 'samples', 'pnl_sum', 'real_samples')
+    _CODE_FP     = ('durations_win', 'durations_loss', 'rsi_win', 'rsi_loss',
+                    'drift_win', 'drift_loss', 'range_pos_win', 'range_pos_loss',
+                    'post_continued', 'post_delta')
+    _CAMPI_CTX   = ('delta_30', 'delta_60', 'delta_120',
+                    'hit_30', 'hit_60', 'hit_120', 'pnl_sim')
+
+    def _scrivi(self, passi, esito=None):
         """
-        Serializza l'intelligenza accumulata su SQLite.
-        OracoloDinamico + MemoriaMatrimoni + AutoCalibratore params.
-        Chiamato ad ogni trade chiuso e ogni 5 minuti.
+        passi: [(sql, righe)], in UNA transazione: tutti o nessuno. Allo
+        scrittore DB, o subito. esito(ok) quando si sa se sono su disco (con
+        lo scrittore: dopo il suo COMMIT, sul suo thread).
         """
+        passi = [(sql, righe) for sql, righe in passi if righe]
+        if not passi:
+            if esito is not None:
+                esito(True)
+            return
+        w = _db_scrittore(self.db_path)
+        if w is not None:
+            def _tutti(conn):
+                for sql, righe in passi:
+                    conn.executemany(sql, righe)
+            w.transazione(_tutti, esito)
+            return
+        conn = _safe_connect(self.db_path, timeout=30)
         try:
-            import json
-            conn = _safe_connect(self.db_path, timeout=30)
+            for sql, righe in passi:
+                conn.executemany(sql, righe)
+            conn.commit()
+        except Exception:
+            # close senza commit = rollback: niente su disco
+            if esito is not None:
+                esito(False)
+            raise
+        finally:
+            conn.close()
+        if esito is not None:
+            esito(True)
+
+    def _rimetti(self):
+        """Riapplica gli sporchi dei save falliti (sul thread di chi salva)."""
+        while self._da_rimettere:
+            ogg, chiavi, memoria = self._da_rimettere.popleft()
+            ogg._sporchi |= chiavi
+            if memoria is not None:
+                memoria._sporca = True
+
+    def _riga_fp(self, fp, m, ts):
+        code = {k: list(v) for k, v in m.items()
+                if k not in self._SCALARI_FP and isinstance(v, (deque, list))}
+        return (fp, float(m.get('wins', 0)), float(m.get('samples', 0)),
+                float(m.get('pnl_sum', 0)), int(m.get('real_samples', 0)),
+                json.dumps(code), ts)
 
-            # -- OracoloDinamico 2.0 --------------------------------------
-            # Serializza _memory con deque → list per JSON
-            oracolo_data = {}
-            for fp, m in oracolo._memory.items():
-                entry = {}
-                for k, v in m.items():
-                    if isinstance(v, deque):
-                        entry[k] = list(v)
-                    else:
-                        entry[k] = v
-                oracolo_data[fp] = entry
-            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('oracolo', ?)",
-                        (json.dumps(oracolo_data),))
+    def save_brain(self, oracolo, memoria, calibratore):
+        """
+        Salva l'intelligenza accumulata: solo cio' che e' cambiato.
+        OracoloDinamico: i fingerprint sporchi → oracolo_fp (+ oracolo_storia).
+        MemoriaMatrimoni / AutoCalibratore params: la loro riga di bot_state,
+        se cambiata. Chiamato ad ogni trade chiuso e ogni 5 minuti.
+        """
+        self._rimetti()
+        sporchi = set()
+        seq = None
+        memoria_presa = False
+        affidato = False
+        try:
+            ts = time.time()
+            passi = []
+
+            # -- Indice contesto: solo i trade nuovi dall'ultimo salvataggio
+            _idx = getattr(oracolo, '_indice', None)
+            if _idx is not None and _idx.seq > oracolo._indice_salvati:
+                seq = _idx.seq
+                passi.append(("INSERT OR REPLACE INTO oracolo_storia VALUES (?,?,?,?,?,?,?,?,?)",
+                              list(_idx.righe_da(oracolo._indice_salvati))))
+
+            # -- OracoloDinamico 2.0: fingerprint sporchi ------------------
+            sporchi, oracolo._sporchi = oracolo._sporchi, set()
+            passi.append((self._SQL_FP, [self._riga_fp(fp, oracolo._memory[fp], ts)
+                                         for fp in sporchi if fp in oracolo._memory]))
+            blob = self._blob_oracolo
+            if blob:
+                passi.append((self._SQL_VIA, [('oracolo',)]))
 
             # -- MemoriaMatrimoni ----------------------------------------
-            memoria_data = {
-                'trust':      {},  # V16: non persistito — riparte da default 50
-                'separazione':dict(memoria.separazione),
-                'blacklist':  dict(memoria.blacklist),
-                'divorzio':   [],  # V16: non persistito — solo RAM di sessione
-                'wins':       dict(memoria.wins),
-                'losses':     dict(memoria.losses),
-                'wr_history': {k: list(v) for k, v in memoria.wr_history.items()},
-            }
-            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('memoria', ?)",
-                        (json.dumps(memoria_data),))
-
-            # -- AutoCalibratore params -----------------------------------
-            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('calibra_params', ?)",
-                        (json.dumps(calibratore.params),))
+            # self.memoria del bot puo' essere la CapsulaMemoria (PATCH 17):
+            # senza blacklist & co. faceva fallire TUTTO il salvataggio
+            if isinstance(memoria, MemoriaMatrimoni) and memoria._sporca:
+                memoria._sporca, memoria_presa = False, True
+                memoria_data = {
+                    'trust':      {},  # V16: non persistito — riparte da default 50
+                    'separazione':dict(memoria.separazione),
+                    'blacklist':  dict(memoria.blacklist),
+                    'divorzio':   [],  # V16: non persistito — solo RAM di sessione
+                    'wins':       dict(memoria.wins),
+                    'losses':     dict(memoria.losses),
+                    'wr_history': {k: list(v) for k, v in memoria.wr_history.items()},
+                }
+                passi.append((self._SQL_STATO, [('memoria', json.dumps(memoria_data))]))
+
+            # -- AutoCalibratore params: pochi numeri, confronto col salvato
+            calibra = json.dumps(calibratore.params)
+            if calibra != self._calibra_salvati:
+                passi.append((self._SQL_STATO, [('calibra_params', calibra)]))
+
+            def _esito(ok):
+                if ok:
+                    if seq is not None:
+                        oracolo._indice_salvati = seq
+                    self._calibra_salvati = calibra
+                    if blob:
+                        self._blob_oracolo = False
+                else:
+                    # non su disco: tornano sporchi al prossimo giro
+                    self._da_rimettere.append((oracolo, sporchi,
+                                               memoria if memoria_presa else None))
+                    log.warning(f"[BRAIN_SAVE] transazione fallita: {len(sporchi)} fp di nuovo sporchi")
 
-            conn.commit()
-            conn.close()
+            affidato = True
+            self._scrivi(passi, _esito)
         except Exception as e:
+            # non salvati: restano sporchi per il prossimo giro
+            if not affidato:
+                oracolo._sporchi |= sporchi
+                if memoria_presa:
+                    memoria._sporca = True
             log.error(f"[BRAIN_SAVE] {e}")
 
     def save_runtime_state(self, bot):
@@ -3844,11 +4583,9 @@ class PersistenzaStato:
                 # ════════════════════════════════════════════════════════════
                 'tsunami_state': bot.tsunami.to_persist() if (hasattr(bot, 'tsunami') and bot.tsunami is not None) else None,
             }
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('runtime_state', ?)",
-                        (json.dumps(data, default=str),))
-            conn.commit()
-            conn.close()
+            # buffer a dimensione fissa: il json resta qui (i dict sono vivi),
+            # connessione e commit allo SCRITTORE DB
+            self._scrivi([(self._SQL_STATO, [('runtime_state', json.dumps(data, default=str))])])
         except Exception as e:
             log.error(f"[RUNTIME_SAVE] {e}")
 
@@ -3937,12 +4674,18 @@ class PersistenzaStato:
             # ════════════════════════════════════════════════════════════
             if hasattr(bot, 'campo'):
                 try:
-                    if 'prices_long' in data and data['prices_long']:
+                    if getattr(bot, 'tick_ring', None) is not None:
+                        # anello condiviso: i 100 prezzi lunghi contengono gia'
+                        # i 50 corti, entrano una volta sola come storia
+                        if data.get('prices_long'):
+                            bot.tick_ring.seed(data['prices_long'])
+                            restored.append(f"prices_long:{len(data['prices_long'])}")
+                    elif 'prices_long' in data and data['prices_long']:
                         for p in data['prices_long']:
                             bot.campo._prices_long.append(float(p))
                         restored.append(f"prices_long:{len(data['prices_long'])}")
-                    
-                    if 'prices_short' in data and data['prices_short']:
+
+                    if getattr(bot, 'tick_ring', None) is None and 'prices_short' in data and data['prices_short']:
                         for p in data['prices_short']:
                             bot.campo._prices_short.append(float(p))
                         restored.append(f"prices_short:{len(data['prices_short'])}")
@@ -3996,44 +4739,60 @@ class PersistenzaStato:
             log.error(f"[RUNTIME_LOAD] {e}")
 
     def save_signal_tracker(self, tracker):
-        """Persiste le stats del PreTradeSignalTracker su DB — sopravvive ai restart."""
+        """Persiste i contesti del PreTradeSignalTracker cambiati — sopravvivono ai restart."""
+        self._rimetti()
+        sporchi = set()
+        affidato = False
         try:
-            import json
-            # Serializza solo _stats (le distribuzioni) — non i segnali aperti
-            stats_data = {}
-            for key, s in tracker._stats.items():
-                stats_data[key] = {
-                    'n':        s['n'],
-                    'delta_30': list(s.get('delta_30', [])),
-                    'delta_60': list(s.get('delta_60', [])),
-                    'delta_120':list(s.get('delta_120',[])),
-                    'hit_30':   list(s.get('hit_30',   [])),
-                    'hit_60':   list(s.get('hit_60',   [])),
-                    'hit_120':  list(s.get('hit_120',  [])),
-                    'pnl_sim':  list(s.get('pnl_sim',  [])),
-                }
-            conn = _safe_connect(self.db_path, timeout=30)
-            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('signal_tracker', ?)",
-                        (json.dumps({
-                            'stats':        stats_data,
-                            'total_closed': len(tracker._closed),
-                        }),))
-            conn.commit()
-            conn.close()
+            ts = time.time()
+            # Solo _stats (le distribuzioni) — non i segnali aperti
+            sporchi, tracker._sporchi = tracker._sporchi, set()
+            righe = []
+            for key in sporchi:
+                s = tracker._stats.get(key)
+                if s is None:
+                    continue
+                righe.append((key, s['n'], json.dumps(
+                    {f: list(s.get(f, [])) for f in self._CAMPI_CTX}), ts))
+            passi = [(self._SQL_CTX, righe)]
+            blob = self._blob_signal
+            if blob:
+                passi.append((self._SQL_VIA, [('signal_tracker',)]))
+
+            def _esito(ok):
+                if ok:
+                    if blob:
+                        self._blob_signal = False
+                else:
+                    self._da_rimettere.append((tracker, sporchi, None))
+                    log.warning(f"[SIGNAL_SAVE] transazione fallita: {len(sporchi)} contesti di nuovo sporchi")
+
+            affidato = True
+            self._scrivi(passi, _esito)
         except Exception as e:
+            if not affidato:
+                tracker._sporchi |= sporchi
             log.error(f"[SIGNAL_SAVE] {e}")
 
     def load_signal_tracker(self, tracker):
         """Ripristina le stats del PreTradeSignalTracker dal DB."""
         try:
-            import json
             conn = _safe_connect(self.db_path, timeout=30)
-            rows = dict(conn.execute("SELECT key, value FROM bot_state WHERE key='signal_tracker'").fetchall())
-            conn.close()
-            if 'signal_tracker' not in rows:
+            try:
+                stats = {ctx: dict(json.loads(dati), n=n) for ctx, n, dati in conn.execute(
+                    "SELECT ctx, n, dati_json FROM signal_tracker_ctx")}
+                vecchio = conn.execute(
+                    "SELECT value FROM bot_state WHERE key='signal_tracker'").fetchone()
+            finally:
+                conn.close()
+            # riga JSON di prima: piu' recente della tabella, si riscrive a righe
+            if vecchio:
+                blob = json.loads(vecchio[0]).get('stats', {})
+                stats.update(blob)
+                tracker._sporchi |= set(blob)
+                self._blob_signal = True
+            if not stats:
                 return
-            data = json.loads(rows['signal_tracker'])
-            stats = data.get('stats', {})
             for key, s in stats.items():
                 tracker._stats[key] = {
                     'n':        s.get('n', 0),
@@ -4045,9 +4804,8 @@ class PersistenzaStato:
                     'hit_120':  s.get('hit_120',  []),
                     'pnl_sim':  s.get('pnl_sim',  []),
                 }
-            total = data.get('total_closed', 0)
             log.info(f"[SIGNAL_LOAD] 📡 SignalTracker ripristinato: "
-                     f"{len(stats)} contesti, {total} segnali storici")
+                     f"{len(stats)} contesti, {sum(s.get('n', 0) for s in stats.values())} segnali storici")
         except Exception as e:
             log.error(f"[SIGNAL_LOAD] {e}")
 
@@ -4057,7 +4815,6 @@ class PersistenzaStato:
         Il bot riprende esattamente da dove aveva lasciato.
         """
         try:
-            import json
             conn  = _safe_connect(self.db_path, timeout=30)
             rows  = dict(conn.execute("SELECT key, value FROM bot_state").fetchall())
             conn.close()
@@ -4065,11 +4822,32 @@ class PersistenzaStato:
             restored = []
 
             # -- OracoloDinamico 2.0 --------------------------------------
+            conn = _safe_connect(self.db_path, timeout=30)
+            try:
+                righe_fp = conn.execute(
+                    "SELECT fp, wins, samples, pnl_sum, real_samples, code_json FROM oracolo_fp").fetchall()
+            finally:
+                conn.close()
+            raw = {fp: dict(json.loads(code or '{}'), wins=w, samples=n, pnl_sum=p, real_samples=r)
+                   for fp, w, n, p, r, code in righe_fp}
+            # riga JSON di prima (DB vecchio o inject_brain.py vecchio): si
+            # riscrive a righe al primo save_brain. Sui fingerprint con dati
+            # veri in tabella NON vince: un seed iniettato (real_samples=0) si
+            # SOMMA, come faceva inject_brain; un JSON con dati veri e' una
+            # copia piu' vecchia della tabella e resta fuori.
+            blob = {}
             if 'oracolo' in rows:
-                raw = json.loads(rows['oracolo'])
-                deque_fields = ['durations_win', 'durations_loss', 'rsi_win', 'rsi_loss',
-                               'drift_win', 'drift_loss', 'range_pos_win', 'range_pos_loss',
-                               'post_continued', 'post_delta']
+                blob = json.loads(rows['oracolo'])
+                for fp, b in blob.items():
+                    t = raw.get(fp)
+                    if t is None or int(t.get('real_samples') or 0) <= 0:
+                        raw[fp] = b
+                    elif int(b.get('real_samples', 0) or 0) <= 0:
+                        raw[fp] = dict(t, wins=float(t['wins'] or 0) + float(b.get('wins', 0)),
+                                       samples=float(t['samples'] or 0) + float(b.get('samples', 0)),
+                                       pnl_sum=float(t['pnl_sum'] or 0) + float(b.get('pnl_sum', 0)))
+                self._blob_oracolo = True
+            if raw:
                 for fp, data in raw.items():
                     entry = {
                         'wins':    float(data.get('wins', 0)),
@@ -4077,17 +4855,36 @@ class PersistenzaStato:
                         'pnl_sum': float(data.get('pnl_sum', 0)),
                         'real_samples': int(data.get('real_samples', 0)),
                     }
-                    for df in deque_fields:
+                    for df in self._CODE_FP:
                         if df in data and isinstance(data[df], list):
                             entry[df] = deque(data[df], maxlen=50)
                         else:
                             entry[df] = deque(maxlen=50)
                     oracolo._memory[fp] = entry
+                # sporchi: i seed mai salvati e cio' che viene dalla riga JSON
+                oracolo._sporchi = (set(oracolo._memory) - set(raw)) | set(blob)
                 restored.append(f"Oracolo 2.0: {len(oracolo._memory)} fingerprint, "
                                f"{sum(m.get('real_samples',0) for m in oracolo._memory.values())} real")
 
-            # -- MemoriaMatrimoni ----------------------------------------
-            if 'memoria' in rows:
+            # -- Indice contesto: ultimi ORACOLO_STORIA_MAX trade ---------
+            _idx = getattr(oracolo, '_indice', None)
+            if _idx is not None:
+                conn = _safe_connect(self.db_path, timeout=30)
+                try:
+                    storia = conn.execute(
+                        "SELECT * FROM (SELECT * FROM oracolo_storia ORDER BY seq DESC LIMIT ?) "
+                        "ORDER BY seq", (_idx.capacita,)).fetchall()
+                finally:
+                    conn.close()
+                if storia:
+                    _idx.clear()
+                    for r in storia:
+                        _idx.aggiungi(r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], seq=r[0])
+                    oracolo._indice_salvati = _idx.seq
+                    restored.append(f"Storia contesto: {len(_idx)} trade")
+
+            # -- MemoriaMatrimoni (non la CapsulaMemoria, vedi save_brain)
+            if 'memoria' in rows and isinstance(memoria, MemoriaMatrimoni):
                 md = json.loads(rows['memoria'])
                 # V16: trust non caricato dal DB — riparte da default 50
                 for k, v in md.get('separazione', {}).items():
@@ -4108,6 +4905,7 @@ class PersistenzaStato:
             if 'calibra_params' in rows:
                 saved = json.loads(rows['calibra_params'])
                 calibratore.params.update(saved)
+                self._calibra_salvati = json.dumps(calibratore.params)
                 restored.append(f"Calibra: seed={saved.get('seed_threshold', '?')}")
 
             if restored:
@@ -4190,44 +4988,79 @@ class RegimeDetector:
         self._pending_count  = 0
         self.CHANGE_TICKS    = 30  # ~30s di conferma per switchare regime
 
+        # FIX luglio2026: detect() rifaceva liste, variazioni e medie sui
+        # 200 tick a ogni chiamata, e l'AUTOCORRETTORE riaffettava tutto per
+        # le sue finestre 50/200. Ora add_tick tiene le |variazioni| in una
+        # deque e i conteggi al rialzo (interi: esatti) su tutta la finestra
+        # e sugli ultimi 50 prezzi. Le somme di prezzi, |variazioni| e volumi
+        # NON sono scorrevoli: una somma float che entra ed esce deriva
+        # (confidence diversa all'ultima cifra, regime diverso su una soglia).
+        # detect() le rifa' con sum() sugli stessi valori nello stesso ordine
+        # di prima: stesso risultato bit per bit (test_regime_detector.py).
+        self._abs     = deque(maxlen=self.WINDOW - 1)   # |p[i+1]-p[i]|
+        self._up      = deque(maxlen=self.WINDOW - 1)   # 1 se p[i+1] > p[i]
+        self._up_n    = 0     # variazioni al rialzo su tutta la finestra
+        self._up50    = 0     # variazioni al rialzo negli ultimi 50 prezzi
+
     def add_tick(self, price: float, volume: float = 1.0):
-        self.prices.append(price)
+        P = self.prices
+        if P:
+            d  = price - P[-1]
+            up = 1 if d > 0 else 0
+            U  = self._up
+            if len(U) >= 49:
+                self._up50 -= U[-49]
+            self._up50 += up
+            if len(U) == U.maxlen:
+                self._up_n -= U[0]
+            U.append(up)
+            self._abs.append(abs(d))
+            self._up_n += up
+        P.append(price)
         self.volumes.append(volume)
 
+    def finestre_autocorrettore(self) -> tuple:
+        """
+        (move50, dir50, move200, dir200) per l'AUTOCORRETTORE REGIME:
+        movimento % e quota di variazioni al rialzo sugli ultimi 50 prezzi
+        e sull'intera finestra (fino a 200). Servono almeno 50 prezzi.
+        """
+        P = self.prices
+        n = len(P)
+        move50  = (P[-1] - P[-50]) / P[-50] * 100
+        dir50   = self._up50 / 49
+        move200 = (P[-1] - P[0]) / P[0] * 100
+        dir200  = self._up_n / max(n - 1, 1)
+        return move50, dir50, move200, dir200
+
     def detect(self) -> tuple:
         """
         Ritorna (regime: str, confidence: float, dettaglio: dict)
         """
-        if len(self.prices) < 50:
+        n = len(self.prices)
+        if n < 50:
             return 'RANGING', 0.0, {}
 
-        prices  = list(self.prices)
-        volumes = list(self.volumes)
-        n       = len(prices)
-
         # -- Trend strutturale ---------------------------------------------
         # Regressione lineare semplificata: confronta meta iniziale vs finale
+        P, A, V    = self.prices, self._abs, self.volumes
         mid        = n // 2
-        avg_first  = sum(prices[:mid]) / mid
-        avg_second = sum(prices[mid:]) / (n - mid)
+        avg_first  = sum(islice(P, 0, mid)) / mid
+        avg_second = sum(islice(P, mid, None)) / (n - mid)
         trend_pct  = (avg_second - avg_first) / avg_first * 100
 
         # -- Directional Consistency su finestra larga ---------------------
-        changes    = [prices[i+1] - prices[i] for i in range(n-1)]
-        up_count   = sum(1 for c in changes if c > 0)
-        dir_ratio  = up_count / len(changes)   # 0=tutto giù, 1=tutto su
+        dir_ratio  = self._up_n / (n - 1)   # 0=tutto giù, 1=tutto su
 
         # -- Volatilita strutturale -----------------------------------------
-        abs_changes = [abs(c) for c in changes]
-        avg_change  = sum(abs_changes) / len(abs_changes)
         # Confronta volatilita prima vs seconda meta
-        vol_first   = sum(abs_changes[:mid]) / mid
-        vol_second  = sum(abs_changes[mid:]) / (n - mid)
+        vol_first   = sum(islice(A, 0, mid)) / mid
+        vol_second  = sum(islice(A, mid, None)) / (n - mid)
         vol_ratio   = vol_second / max(vol_first, 0.001)
 
         # -- Volume acceleration --------------------------------------------
-        vol_recent  = sum(volumes[-50:]) / 50
-        vol_base    = sum(volumes[:50])  / 50
+        vol_recent  = sum(islice(V, n - 50, None)) / 50
+        vol_base    = sum(islice(V, 0, 50))  / 50
         vol_accel   = vol_recent / max(vol_base, 0.001)
 
         # -- Classificazione -----------------------------------------------
@@ -4354,11 +5187,14 @@ class MomentumDecelerometer:
     WINDOW_SLOW = 15   # tick per momentum lento
     DECEL_THRESHOLD = 0.65   # oltre questa soglia → esci
 
-    def __init__(self):
-        self.prices = deque(maxlen=50)
+    def __init__(self, ring=None):
+        self._ring  = ring
+        self.prices = (RingWindow(ring, 50, storia=False) if ring is not None
+                       else deque(maxlen=50))
 
     def add_price(self, price: float):
-        self.prices.append(price)
+        if self._ring is None:
+            self.prices.append(price)
 
     def analyze(self) -> dict:
         if len(self.prices) < self.WINDOW_SLOW + 5:
@@ -4782,7 +5618,7 @@ class CampoGravitazionale:
     # -- WARMUP ---------------------------------------------------------
     WARMUP_TICKS = 50    # tick minimi prima di operare (era 200)
 
-    def __init__(self):
+    def __init__(self, ring=None):
         self._recent_results = deque(maxlen=20)
         self._tick_count = 0   # conta tick dal boot
         self._direction = "LONG"  # LONG o SHORT - il bridge decide
@@ -4793,11 +5629,20 @@ class CampoGravitazionale:
         # Non dipende da RSI (cadavere, fisso 50) né da pred (mai qualificata).
         self._drift_neg_streak = 0            # tick consecutivi drift < soglia short
         # -- PRE-BREAKOUT DETECTOR -----------------------------------------
-        self._prices_short = deque(maxlen=50)     # ultimi 50 prezzi per compressione
+        # Con l'anello condiviso (luglio2026) short/long/volumi sono viste
+        # sugli stessi tick di tutti gli altri organi, aggiornate in
+        # _ingest_tick: feed_tick non le riempie piu'.
+        self._ring = ring
+        if ring is not None:
+            self._prices_short  = RingWindow(ring, 50)
+            self._volumes_short = RingWindow(ring, 50, 'qty', storia=False)
+            self._prices_long   = RingWindow(ring, 100)
+        else:
+            self._prices_short = deque(maxlen=50)     # ultimi 50 prezzi per compressione
+            self._volumes_short = deque(maxlen=50)    # ultimi 50 volumi per accelerazione
+            # -- DRIFT DETECTOR --------------------------------------------
+            self._prices_long = deque(maxlen=100)     # ultimi 100 prezzi per drift
         self._seed_history = deque(maxlen=10)     # ultimi 10 seed per derivata
-        self._volumes_short = deque(maxlen=50)    # ultimi 50 volumi per accelerazione
-        # -- DRIFT DETECTOR ------------------------------------------------
-        self._prices_long = deque(maxlen=100)     # ultimi 100 prezzi per drift
         # -- RSI + MACD CONSIGLIERI ----------------------------------------
         self._prices_ta = deque(maxlen=50)        # buffer prezzi CAMPIONATI per indicatori tecnici
         self._ta_tick_counter = 0                  # conta tick per campionamento
@@ -4817,10 +5662,11 @@ class CampoGravitazionale:
 
     def feed_tick(self, price: float, volume: float, seed_score: float):
         """Alimenta tutti i detector con dati tick-by-tick."""
-        self._prices_short.append(price)
-        self._volumes_short.append(volume)
+        if self._ring is None:
+            self._prices_short.append(price)
+            self._volumes_short.append(volume)
+            self._prices_long.append(price)
         self._seed_history.append(seed_score)
-        self._prices_long.append(price)
         self._tick_count += 1
 
         # -- CAMPIONA per RSI/MACD ogni 50 tick ------------------------
@@ -4896,8 +5742,8 @@ class CampoGravitazionale:
         # SOGLIA_PIATTA (20giu, Roberto): anche qui (score_now alimenta il
         # display e _last_soglia via riga ~8864). Se attiva, soglia FISSA al
         # valore SCORE_FLOOR: niente giudizio adattivo, decide il cancello.
-        if os.environ.get("SOGLIA_PIATTA", "false").lower() == "true":
-            soglia = float(int(os.environ.get("SCORE_FLOOR", "34")))
+        if _CONFIG.snap.bool("SOGLIA_PIATTA", False):
+            soglia = float(_CONFIG.snap.int("SCORE_FLOOR", 34))
 
         return {
             'score':  round(score,1),
@@ -4944,15 +5790,15 @@ class CampoGravitazionale:
                 'breath_energia':getattr(getattr(getattr(self,'_bot_ref',None),'_breath',None),'_energia',0.0),
             }
             _cm_result = _cm.valuta(_veto_ctx)
-            if _cm_result.get('blocca') and os.environ.get("ATTRITO_OFF","false").lower() != "true":
+            if _cm_result.get('blocca') and not _CONFIG.snap.bool("ATTRITO_OFF", False):
                 return self._veto(_cm_result.get('reason', f"CM_TOSSICO_{self._direction}_{momentum}_{volatility}_{trend}"))
         else:
             # Fallback hardcodato
             veti = self.VETI_SHORT if self._direction == "SHORT" else self.VETI_LONG
-            if combo in veti and os.environ.get("ATTRITO_OFF","false").lower() != "true":
+            if combo in veti and not _CONFIG.snap.bool("ATTRITO_OFF", False):
                 return self._veto(f"TOSSICO_{self._direction}_{momentum}_{volatility}_{trend}")
 
-        if matrimonio_name in divorzio_set and os.environ.get("ATTRITO_OFF","false").lower() != "true":
+        if matrimonio_name in divorzio_set and not _CONFIG.snap.bool("ATTRITO_OFF", False):
             return self._veto("DIVORZIO_PERMANENTE")
 
         is_fantasma, fantasma_reason = fantasma_info
@@ -4995,7 +5841,7 @@ class CampoGravitazionale:
             _drift = (_avg_new - _avg_old) / _avg_old * 100
             _drift_thr = {"RANGING":-0.30,"TRENDING_BULL":-0.10,
                           "TRENDING_BEAR":-0.10,"EXPLOSIVE":-0.18}.get(regime,-0.20)
-            _attrito_off = os.environ.get("ATTRITO_OFF","false").lower() == "true"
+            _attrito_off = _CONFIG.snap.bool("ATTRITO_OFF", False)
             if self._direction == "LONG" and _drift < _drift_thr and not _attrito_off:
                 return self._veto(f"DRIFT_VETO_LONG_{_drift:+.3f}%(thr={_drift_thr})")
             elif self._direction == "SHORT" and _drift > abs(_drift_thr) and not _attrito_off:
@@ -5055,7 +5901,7 @@ class CampoGravitazionale:
         # perse, -1286$) non deve zavorrare la soglia del cancello nuovo. Con
         # ATTRITO_OFF=true, history_f=1.0 (nessuna paura ereditata). La soglia
         # resta adattiva su regime/volatilita/drift, ma non sul passato sporco.
-        if os.environ.get("ATTRITO_OFF", "false").lower() == "true":
+        if _CONFIG.snap.bool("ATTRITO_OFF", False):
             history_f = 1.0
         else:
             history_f = self._history_factor()
@@ -5069,7 +5915,7 @@ class CampoGravitazionale:
         # LOSS_STREAK_OFF=true il freno e' spento: loss_f resta 1.0 sempre,
         # decide solo il piattello (sale/scende), trade per trade, senza memoria
         # di quante perdite di fila. Default false = vecchio comportamento.
-        if os.environ.get("LOSS_STREAK_OFF", "false").lower() == "true":
+        if _CONFIG.snap.bool("LOSS_STREAK_OFF", False):
             loss_f = 1.0
         elif loss_consecutivi >= self.MAX_LOSS_CONSECUTIVI:
             extra = loss_consecutivi - self.MAX_LOSS_CONSECUTIVI + 1
@@ -5125,7 +5971,9 @@ class CampoGravitazionale:
         # SCORE_FLOOR=40 (o meno) lascia entrare lo score piu' basso, cosi'
         # i candidati arrivano al cancello che decide sul movimento.
         # Default 48 (comportamento invariato). REVERSIBILE.
-        _floor_base = int(os.environ.get("SCORE_FLOOR", "48"))
+        # Letto da _CONFIG.snap (come SOGLIA_PIATTA/ATTRITO_OFF/LOSS_STREAK_OFF
+        # qui sotto): vale anche CONFIG_OVERRIDE_FILE, che os.environ non vede.
+        _floor_base = _CONFIG.snap.int("SCORE_FLOOR", 48)
         if _pred_score_floor >= 85:
             _floor_dyn = _floor_base
         elif _pred_score_floor >= 70:
@@ -5153,8 +6001,8 @@ class CampoGravitazionale:
         # calcolo adattivo e mette la soglia FISSA al valore SCORE_FLOOR. E' solo
         # un filtro anti-rumore: sopra -> candidato -> il cancello decide sul
         # movimento. REVERSIBILE: SOGLIA_PIATTA=false (o tolto) -> adattivo.
-        if os.environ.get("SOGLIA_PIATTA", "false").lower() == "true":
-            soglia = float(int(os.environ.get("SCORE_FLOOR", "34")))
+        if _CONFIG.snap.bool("SOGLIA_PIATTA", False):
+            soglia = float(_CONFIG.snap.int("SCORE_FLOOR", 34))
 
         # -- BOOST SOGLIA DA CAPSULE L3 (Narratore/IntelligenzaAutonoma) ----
         # Le capsule generate da DeepSeek possono alzare la soglia in base
@@ -5167,8 +6015,8 @@ class CampoGravitazionale:
 
         # SOGLIA_PIATTA ha l'ULTIMA parola: ne' boost ne' floor la rialzano.
         # Filtro anti-rumore fisso, il cancello decide il resto.
-        if os.environ.get("SOGLIA_PIATTA", "false").lower() == "true":
-            soglia = float(int(os.environ.get("SCORE_FLOOR", "34")))
+        if _CONFIG.snap.bool("SOGLIA_PIATTA", False):
+            soglia = float(_CONFIG.snap.int("SCORE_FLOOR", 34))
 
         # -- DECISIONE -----------------------------------------------------
         # Salva score e soglia per heartbeat/grafico
@@ -5539,10 +6387,11 @@ class VeritatisTracker:
     Dopo 50 segnali sa chi aveva ragione e di quanto.
     """
     
-    def __init__(self, sc_ref=None):
+    def __init__(self, sc_ref=None, wheel=None):
         self._open   = []   # segnali aperti in attesa di conferma
         self._closed = []   # segnali chiusi con verità nota
         self._sc_ref = sc_ref  # SuperCervello per calibrazione automatica
+        self._wheel  = wheel   # TIMING WHEEL: chiusura a ts+60 come scadenza
         self._stats  = {    # statistiche per combinazione
             # chiave: f"{oi_stato}|{sc_decisione}"
             # es: "FUOCO|BLOCCA" o "FUOCO|ENTRA" o "CARICA|BLOCCA"
@@ -5552,7 +6401,7 @@ class VeritatisTracker:
                  sc_decisione: str, sc_confidenza: float,
                  regime: str, ts: float):
         """Registra un segnale al momento della decisione."""
-        self._open.append({
+        sig = {
             'price':        price,
             'oi_stato':     oi_stato,
             'oi_carica':    round(oi_carica, 3),
@@ -5561,34 +6410,45 @@ class VeritatisTracker:
             'regime':       regime,
             'ts':           ts,
             'chiave':       f"{oi_stato}|{sc_decisione}",
-        })
-    
+        }
+        self._open.append(sig)
+        if self._wheel is not None:
+            self._wheel.schedule(ts + 60, self._scadenza, sig)
+
+    def _chiudi(self, sig: dict, price_now: float, ts_now: float):
+        """Chiude il segnale con la verità a 60 secondi."""
+        elapsed = ts_now - sig['ts']
+        delta   = price_now - sig['price']
+        # Hit vero: il delta deve coprire le fee reali
+        # $1000 margine × 5x leva = $5000 esposti
+        # Fee: $5000 × 0.02% × 2 lati = $2.00
+        pnl_sim = delta * (5000.0 / sig['price'])  # lordo — fee al close
+        sig['delta_60'] = round(delta, 2)
+        sig['hit_60']   = delta > 0  # direzione corretta
+        sig['pnl_60']   = round(pnl_sim, 2)
+        sig['elapsed']  = round(elapsed, 1)
+        self._closed.append(sig)
+        if len(self._closed) > 500:
+            self._closed.pop(0)
+        # Aggiorna statistiche
+        self._aggiorna_stats(sig)
+
+    def _scadenza(self, now: float, price: float, sig: dict):
+        """Callback della ruota: 60 secondi passati per questo segnale."""
+        self._open.remove(sig)   # FIFO: quasi sempre il primo
+        self._chiudi(sig, price, now)
+
     def aggiorna(self, price_now: float, ts_now: float):
         """
         Ogni tick aggiorna i segnali aperti.
-        Chiude quelli con 30/60/120 secondi trascorsi.
+        Chiude quelli con 60 secondi trascorsi. Con la ruota non fa nulla.
         """
+        if self._wheel is not None:
+            return
         ancora_aperti = []
         for sig in self._open:
-            elapsed = ts_now - sig['ts']
-            delta   = price_now - sig['price']
-            # Hit vero: il delta deve coprire le fee reali
-            # $1000 margine × 5x leva = $5000 esposti
-            # Fee: $5000 × 0.02% × 2 lati = $2.00
-            pnl_sim = delta * (5000.0 / sig['price'])  # lordo — fee al close
-            hit     = delta > 0  # direzione corretta
-            
-            if elapsed >= 60:
-                # Chiudi con verità a 60 secondi
-                sig['delta_60'] = round(delta, 2)
-                sig['hit_60']   = hit
-                sig['pnl_60']   = round(pnl_sim, 2)
-                sig['elapsed']  = round(elapsed, 1)
-                self._closed.append(sig)
-                if len(self._closed) > 500:
-                    self._closed.pop(0)
-                # Aggiorna statistiche
-                self._aggiorna_stats(sig)
+            if ts_now - sig['ts'] >= 60:
+                self._chiudi(sig, price_now, ts_now)
             else:
                 ancora_aperti.append(sig)
         
@@ -5760,10 +6620,6 @@ class VeritatisTracker:
             conn = _safe_connect(db_path, timeout=15)
             conn.execute("PRAGMA busy_timeout=15000;")
             c = conn.cursor()
-            c.execute("""CREATE TABLE IF NOT EXISTS veritas_stats
-                         (chiave TEXT PRIMARY KEY, data TEXT)""")
-            c.execute("""CREATE TABLE IF NOT EXISTS veritas_closed
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT)""")
             # Salva stats
             for k, s in self._stats.items():
                 c.execute("INSERT OR REPLACE INTO veritas_stats VALUES (?,?)",
@@ -6546,13 +7402,18 @@ class PredittoreContestuale:
     HISTORY_MAX = 300    # storia per momentum/accelerazione
     STATS_MAX = 500      # statistiche aggregate (errore, accuracy)
 
-    def __init__(self):
+    def __init__(self, wheel=None):
         from collections import deque
         # Storia prezzi: (timestamp, prezzo) — per calcolare contesto
         self._prezzi = deque(maxlen=self.HISTORY_MAX)
         # Predizioni in volo: (ts_predizione, prezzo_allora, predizione_a_60s,
         #                       momentum, accelerazione, oi_carica, oi_dir)
         self._in_volo = deque(maxlen=self.HISTORY_MAX)
+        # TIMING WHEEL: verifica a ts+WINDOW come scadenza. _timer_volo e'
+        # parallela a _in_volo: quando la deque piena scarta la predizione
+        # piu' vecchia, il suo timer va spento.
+        self._wheel = wheel
+        self._timer_volo = deque(maxlen=self.HISTORY_MAX)
         # Statistiche aggregate (solo dopo verifica a 60s)
         self._errori_abs = deque(maxlen=self.STATS_MAX)
         self._segno_giusti = deque(maxlen=self.STATS_MAX)
@@ -6570,39 +7431,61 @@ class PredittoreContestuale:
         """Chiamato ad ogni tick. Aggiorna storia, fa predizione, verifica vecchie."""
         self._prezzi.append((now, prezzo))
 
-        # 1) VERIFICA predizioni vecchie di ~60s
-        scaduti = []
-        for i, (ts_p, p_allora, pred, mom, acc, oic, odir) in enumerate(self._in_volo):
-            if now - ts_p >= self.WINDOW:
-                # Tempo di misurare. Prezzo vero adesso vs predizione di 60s fa
-                delta_reale = prezzo - p_allora
-                delta_predetto = pred - p_allora
-                errore = abs(pred - prezzo)
-                self._errori_abs.append(errore)
-                self._delta_predetti.append(delta_predetto)
-                self._delta_reali.append(delta_reale)
-                # Segno giusto?
-                if abs(delta_predetto) >= 0.5:  # ignora predizioni "flat"
-                    segno_ok = (delta_predetto > 0) == (delta_reale > 0)
-                    self._segno_giusti.append(1 if segno_ok else 0)
-                self._n_verificate += 1
-                scaduti.append(i)
-        # rimuovi dalla coda i verificati (dal fondo per non sballare gli indici)
-        for i in reversed(scaduti):
-            del self._in_volo[i]
+        # 1) VERIFICA predizioni vecchie di ~60s (con la ruota: _scadenza)
+        if self._wheel is None:
+            scaduti = []
+            for i, voce in enumerate(self._in_volo):
+                if now - voce[0] >= self.WINDOW:
+                    self._verifica(voce, prezzo)
+                    scaduti.append(i)
+            # rimuovi dalla coda i verificati (dal fondo per non sballare gli indici)
+            for i in reversed(scaduti):
+                del self._in_volo[i]
 
         # 2) NUOVA PREDIZIONE basata sul contesto attuale
         if len(self._prezzi) >= 30:
             pred, delta, mom, acc = self._calcola_predizione(prezzo,
                                                               oi_carica, oi_stato,
                                                               oi_carica_short, oi_stato_short)
-            self._in_volo.append((now, prezzo, pred, mom, acc, oi_carica,
-                                  'LONG' if oi_stato == 'FUOCO' else
-                                  'SHORT' if oi_stato_short == 'FUOCO' else 'FLAT'))
+            voce = (now, prezzo, pred, mom, acc, oi_carica,
+                    'LONG' if oi_stato == 'FUOCO' else
+                    'SHORT' if oi_stato_short == 'FUOCO' else 'FLAT')
+            if self._wheel is not None:
+                if len(self._timer_volo) == self._timer_volo.maxlen:
+                    self._timer_volo[0].cancel()   # sta per uscire dalla deque
+                self._timer_volo.append(
+                    self._wheel.schedule(now + self.WINDOW, self._scadenza, voce))
+            self._in_volo.append(voce)
             self._ultima_predizione = pred
             self._ultimo_delta = delta
             self._n_predizioni += 1
 
+    def _verifica(self, voce: tuple, prezzo: float):
+        """Prezzo vero adesso vs predizione di 60s fa."""
+        ts_p, p_allora, pred = voce[0], voce[1], voce[2]
+        delta_reale = prezzo - p_allora
+        delta_predetto = pred - p_allora
+        errore = abs(pred - prezzo)
+        self._errori_abs.append(errore)
+        self._delta_predetti.append(delta_predetto)
+        self._delta_reali.append(delta_reale)
+        # Segno giusto?
+        if abs(delta_predetto) >= 0.5:  # ignora predizioni "flat"
+            segno_ok = (delta_predetto > 0) == (delta_reale > 0)
+            self._segno_giusti.append(1 if segno_ok else 0)
+        self._n_verificate += 1
+
+    def _scadenza(self, now: float, prezzo: float, voce: tuple):
+        """Callback della ruota. Finestra costante → e' sempre la piu' vecchia."""
+        if self._in_volo and self._in_volo[0] is voce:
+            self._in_volo.popleft()
+            self._timer_volo.popleft()
+        else:
+            i = next(i for i, v in enumerate(self._in_volo) if v is voce)
+            del self._in_volo[i]
+            del self._timer_volo[i]
+        self._verifica(voce, prezzo)
+
     def _calcola_predizione(self, prezzo, oi_carica, oi_stato,
                             oi_carica_short, oi_stato_short):
         """
@@ -6713,10 +7596,11 @@ class LibroPesca:
     P3_COMP_DUR_MIN    = 6      # da almeno 6 tick consecutivi
     P3_SLOPE_MIN_ABS   = 0.0001 # drift_slope > 0.0001 in val assoluto (sta accelerando)
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, wheel=None):
         self.db_path = db_path
         self.enabled = LIBRO_PESCA_ENABLED
         self._in_volo = []
+        self._wheel = wheel   # TIMING WHEEL: chiusura a ts_piantata+orizzonte_s
         self._ultima_piantata_long  = 0.0
         self._ultima_piantata_short = 0.0
         # 15.J: cooldown per strategia × direzione (6 contatori)
@@ -6740,60 +7624,9 @@ class LibroPesca:
             log.info("[LIBRO_PESCA] disattivato (kill-switch). Set LIBRO_PESCA_ENABLED=true per attivare")
 
     def _init_db(self):
-        try:
-            conn = _safe_connect(self.db_path, timeout=30)
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS libro_pesca (
-                    id INTEGER PRIMARY KEY,
-                    ts_piantata REAL NOT NULL,
-                    prezzo_lenza REAL NOT NULL,
-                    direzione TEXT NOT NULL,
-                    orizzonte_s INTEGER NOT NULL,
-                    lasco REAL NOT NULL,
-                    regime TEXT,
-                    carica REAL,
-                    oi_stato TEXT,
-                    delta_atteso REAL,
-                    stato TEXT NOT NULL,
-                    ts_cattura REAL,
-                    prezzo_cattura REAL,
-                    ts_chiusura REAL,
-                    prezzo_chiusura REAL,
-                    pnl_paper REAL,
-                    esito_finale TEXT
-                )
-            """)
-            try:
-                cur.execute("ALTER TABLE libro_pesca ADD COLUMN versione TEXT DEFAULT 'v15b'")
-            except sqlite3.OperationalError:
-                pass
-            try:
-                cur.execute("ALTER TABLE libro_pesca ADD COLUMN fp_key TEXT")
-            except sqlite3.OperationalError:
-                pass
-            try:
-                cur.execute("ALTER TABLE libro_pesca ADD COLUMN fp_wr REAL")
-            except sqlite3.OperationalError:
-                pass
-            try:
-                cur.execute("ALTER TABLE libro_pesca ADD COLUMN fp_n INTEGER")
-            except sqlite3.OperationalError:
-                pass
-            try:
-                cur.execute("ALTER TABLE libro_pesca ADD COLUMN strategia TEXT")
-            except sqlite3.OperationalError:
-                pass
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_lp_orizzonte ON libro_pesca(orizzonte_s)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_lp_stato ON libro_pesca(stato)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_lp_esito ON libro_pesca(esito_finale)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_lp_versione ON libro_pesca(versione)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_lp_fp ON libro_pesca(fp_key)")
-            conn.commit()
-            conn.close()
+        # tabella, colonne v15b/fp_* e indici in schema_db.py
+        if _schema_pronto(self.db_path) is not None:
             log.info(f"[LIBRO_PESCA] DB init {self.db_path}")
-        except Exception as e:
-            log.warning(f"[LIBRO_PESCA_INIT_DB_ERR] {e}")
 
     def _reload_next_id(self):
         try:
@@ -6988,6 +7821,8 @@ class LibroPesca:
         self._next_id += 1
         self._in_volo.append(L)
         self._save(L)
+        if self._wheel is not None:
+            self._wheel.schedule(now + L['orizzonte_s'], self._scadenza, L)
         self._ultime_piantate[key] = now
         log.info(f"[LIBRO_PESCA_15J:{strategia.upper()}] entry {direzione} @${prezzo:.2f} | {ctx}")
 
@@ -6996,10 +7831,36 @@ class LibroPesca:
         """Compat 15.B/15.E — disabilitato in 15.F. Non chiamare."""
         return
 
+    def _chiudi(self, L: dict, now, prezzo):
+        """Lenza CATTURATA arrivata all'orizzonte: PnL paper e esito."""
+        L['ts_chiusura'] = now
+        L['prezzo_chiusura'] = round(prezzo, 2)
+        exp = self.TRADE_SIZE_USD * self.LEVERAGE
+        btc_qty = exp / max(1.0, L['prezzo_cattura'])
+        if L['direzione'] == "LONG":
+            delta = prezzo - L['prezzo_cattura']
+        else:
+            delta = L['prezzo_cattura'] - prezzo
+        fee = exp * self.FEE_PCT * 2.0
+        pnl = delta * btc_qty - fee
+        L['pnl_paper'] = round(pnl, 4)
+        L['stato'] = 'CHIUSA'
+        L['esito_finale'] = 'VERA' if pnl > 0 else 'BARATTOLO'
+        self._save(L)
+
+    def _scadenza(self, now, prezzo, L: dict):
+        """Callback della ruota: orizzonte raggiunto."""
+        self._in_volo.remove(L)
+        self._chiudi(L, now, prezzo)
+
     def tick(self, now, prezzo):
         """Verifica catture/scadenze/chiusure delle lenze in volo."""
         if not self.enabled:
             return
+        if self._wheel is not None:
+            # 15.J: le lenze nascono CATTURATE (niente ATTESA da sorvegliare),
+            # la chiusura all'orizzonte la fa la ruota
+            return
         rimanenti = []
         for L in self._in_volo:
             t_dalla_piantata = now - L['ts_piantata']
@@ -7028,20 +7889,7 @@ class LibroPesca:
                     rimanenti.append(L)
             elif L['stato'] == 'CATTURATA':
                 if t_dalla_piantata >= L['orizzonte_s']:
-                    L['ts_chiusura'] = now
-                    L['prezzo_chiusura'] = round(prezzo, 2)
-                    exp = self.TRADE_SIZE_USD * self.LEVERAGE
-                    btc_qty = exp / max(1.0, L['prezzo_cattura'])
-                    if L['direzione'] == "LONG":
-                        delta = prezzo - L['prezzo_cattura']
-                    else:
-                        delta = L['prezzo_cattura'] - prezzo
-                    fee = exp * self.FEE_PCT * 2.0
-                    pnl = delta * btc_qty - fee
-                    L['pnl_paper'] = round(pnl, 4)
-                    L['stato'] = 'CHIUSA'
-                    L['esito_finale'] = 'VERA' if pnl > 0 else 'BARATTOLO'
-                    self._save(L)
+                    self._chiudi(L, now, prezzo)
                 else:
                     rimanenti.append(L)
         self._in_volo = rimanenti
@@ -7175,6 +8023,151 @@ class LibroPesca:
         return out
 
 
+# ═══════════════════════════════════════════════════════════════════════
+#  TICK CONTEXT — i derivati di UN tick, calcolati una volta sola
+# ═══════════════════════════════════════════════════════════════════════
+#
+# PROBLEMA:
+#   Dentro un solo _process_tick_body gli stessi valori venivano
+#   ricalcolati da blocchi diversi: seed_scorer.score() 10 volte,
+#   analyzer.analyze() 2, il drift 50/50 su _prices_long 9, decelero,
+#   predittore_v2.get_stats() e tsunami.last_decision() ad ogni organo
+#   che li voleva (LibroPesca, signal tracker, shadow entry/exit, oracolo
+#   interno, SHORT gate).
+#
+# SOLUZIONE:
+#   TickContext nasce in cima al tick con i campi base (prezzo, tempo,
+#   numero del tick) e non si modifica piu'. I derivati sono pigri: il
+#   primo organo che li chiede li calcola, gli altri riusano lo stesso
+#   oggetto. Chi li riceve li LEGGE e basta.
+#
+#   Gli unici derivati che cambiano davvero a meta' tick vanno invalidati
+#   da chi li cambia (invalida()):
+#     - 'drift'   senza tick ring, campo.feed_tick sposta _prices_long
+#     - 'tsunami' tsunami.evaluate() produce una decisione nuova
+#   contesto(regime, drift) e' memorizzato per coppia di argomenti: il
+#   regime che cambia nel blocco REGIME non serve invalidarlo.
+#
+#   record() e' la fotografia dei derivati calcolati in quel tick:
+#   finisce nello shadow all'ingresso e nel data_json dell'M2_EXIT.
+# ═══════════════════════════════════════════════════════════════════════
+
+# Contatori di processo: calcoli fatti / risposte riusate dalla memoria
+_TICK_CTX_STATS = {'tick': 0, 'calcoli': 0, 'riusi': 0}
+
+
+class TickContext:
+    """Contesto immutabile di un tick, con derivati memorizzati."""
+
+    __slots__ = ('bot', 'price', 'now', 'n', '_memo')
+
+    def __init__(self, bot, price: float, now: float, n: int):
+        object.__setattr__(self, 'bot', bot)
+        object.__setattr__(self, 'price', price)
+        object.__setattr__(self, 'now', now)
+        object.__setattr__(self, 'n', n)
+        object.__setattr__(self, '_memo', {})
+        _TICK_CTX_STATS['tick'] += 1
+
+    def __setattr__(self, nome, valore):
+        raise AttributeError(f"TickContext e' in sola lettura ({nome})")
+
+    def _get(self, chiave, calcola):
+        memo = self._memo
+        if chiave in memo:
+            _TICK_CTX_STATS['riusi'] += 1
+            return memo[chiave]
+        _TICK_CTX_STATS['calcoli'] += 1
+        v = memo[chiave] = calcola()
+        return v
+
+    def invalida(self, *nomi):
+        """Scarta i derivati che un organo ha appena cambiato."""
+        for k in list(self._memo):
+            if k in nomi or (isinstance(k, tuple) and k[0] in nomi):
+                del self._memo[k]
+
+    # -- derivati ---------------------------------------------------------
+    def seed(self) -> dict:
+        return self._get('seed', self.bot.seed_scorer.score)
+
+    def seed_value(self) -> float:
+        """Score del seed, 0.0 finche' il buffer non e' pieno."""
+        s = self.seed()
+        return s.get('score', 0.0) if s.get('reason') != 'insufficient_data' else 0.0
+
+    def contesto(self, regime, drift) -> tuple:
+        """(momentum, volatility, trend) di ContestoAnalyzer.analyze."""
+        return self._get(('contesto', regime, drift),
+                         lambda: self.bot.analyzer.analyze(regime=regime, drift=drift))
+
+    def drift(self) -> float:
+        """Drift % fra media vecchia e nuova dei 100 prezzi lunghi del campo."""
+        def _calcola():
+            pl = self.bot.campo._prices_long
+            if len(pl) < 100:
+                return 0.0
+            p = list(pl)
+            old = sum(p[:50]) / 50
+            new = sum(p[-50:]) / 50
+            return (new - old) / old * 100 if old else 0.0
+        return self._get('drift', _calcola)
+
+    def decel(self) -> dict:
+        return self._get('decel', self.bot.decelero.analyze)
+
+    def pv2_stats(self) -> dict:
+        return self._get('pv2', self.bot.predittore_v2.get_stats)
+
+    def tsunami(self):
+        """Ultima decisione Tsunami (None se il detector non c'e')."""
+        ts = self.bot.tsunami
+        return self._get('tsunami', ts.last_decision if ts is not None else (lambda: None))
+
+    # -- registro ---------------------------------------------------------
+    def record(self) -> dict:
+        """Derivati di questo tick (solo quelli calcolati), pronti per json."""
+        m = self._memo
+        r = {'n': self.n, 'ts': round(self.now or 0.0, 3), 'price': self.price}
+        s = m.get('seed')
+        if s:
+            r['seed'] = {k: s[k] for k in ('score', 'reason', 'drift_persist', 'range_pos',
+                                           'compression', 'comp_duration', 'drift_slope')
+                         if k in s}
+        for k, v in m.items():
+            if isinstance(k, tuple) and k[0] == 'contesto':
+                r['contesto'] = {'regime': k[1], 'drift': round(k[2] or 0.0, 5),
+                                 'momentum': v[0], 'volatility': v[1], 'trend': v[2]}
+        if 'drift' in m:
+            r['drift'] = round(m['drift'], 5)
+        d = m.get('decel')
+        if d:
+            r['decel'] = {'score': d.get('decel_score'), 'exit': d.get('should_exit')}
+        t = m.get('tsunami')
+        if t:
+            r['tsunami'] = {'azione': t.get('azione'), 'confidenza': t.get('confidenza')}
+        p = m.get('pv2')
+        if p:
+            r['pv2'] = {k: p.get(k) for k in ('pred_v2_delta', 'pred_v2_n_segno',
+                                              'pred_v2_accuracy_segno')}
+        return r
+
+
+_PS_OFFSETS = {}
+
+def _ps_offsets(passo: float) -> tuple:
+    """Istanti di campionamento del tracker primi secondi: passo, 2*passo ... 10s."""
+    passo = min(10.0, max(0.25, float(passo or 1.0)))
+    offs = _PS_OFFSETS.get(passo)
+    if offs is None:
+        offs = []
+        for k in range(1, int(round(10.0 / passo)) + 1):
+            o = round(k * passo, 3)
+            offs.append(int(o) if float(o).is_integer() else o)
+        offs = _PS_OFFSETS[passo] = tuple(offs)
+    return offs
+
+
 class OvertopBassanoV16Production:
     """
     Bot BTC/USDC su Binance WebSocket.
@@ -7192,7 +8185,7 @@ class OvertopBassanoV16Production:
       MemoriaMatrimoni scala trust e irroga SEPARAZIONE/DIVORZIO.
     """
 
-    def __init__(self, heartbeat_data=None, db_execute=None, heartbeat_lock=None):
+    def __init__(self, heartbeat_data=None, db_execute=None, heartbeat_lock=None, clock=None):
         # ════════════════════════════════════════════════════════════════
         # FIX DATABASE LOCKED (5giu) — WAL + busy_timeout all'avvio.
         # Prima: sqlite3.connect nudo -> "database is locked" appena una query
@@ -7217,15 +8210,17 @@ class OvertopBassanoV16Production:
         self.symbol         = SYMBOL
         self.ws_url         = BINANCE_WS_URL
         self.paper_trade    = PAPER_TRADE
+        # EVENT CLOCK — tempo del tick = timestamp aggTrade. Iniettabile:
+        # il replay passa un EventClock(virtual=True).
+        self.clock          = clock if clock is not None else EventClock()
+
+        # SCHEMA DB: tutte le tabelle del bot, create/migrate PRIMA di ogni uso
+        self._schema = _schema_pronto(DB_PATH)
 
         # CONTATORE TRANS: carico il totale REALE dal DB (non riparte da zero al restart)
         try:
             import sqlite3 as _sqc
             _cc = _sqc.connect(DB_PATH, timeout=10)
-            _cc.execute("""CREATE TABLE IF NOT EXISTS trans_bloccati (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                causa TEXT, vpress REAL, comp REAL, prezzo REAL)""")
             _rows = _cc.execute("SELECT causa, COUNT(*) FROM trans_bloccati GROUP BY causa").fetchall()
             _cc.close()
             self._cromo_blocchi = {"vol_basso":0,"vol_isterico":0,"comp_alta":0,"cdur_breve":0,"totale":0}
@@ -7269,10 +8264,30 @@ class OvertopBassanoV16Production:
         self.wins    = 0
         self.losses  = 0
 
+        self._ctx = None   # TickContext del tick in corso (vedi _process_tick_body)
+        self._ctx_prec = None   # quello dell'ultimo tick finito, completo (per l'heartbeat)
+
+        # -- TICK RING (luglio2026): prezzi/qty/ts scritti una volta sola,
+        # in _ingest_tick. Analyzer, decelero e campo leggono finestre
+        # sull'anello invece di tenere ognuno la sua copia.
+        self.tick_ring = None
+        if _TICK_RING_AVAILABLE and os.environ.get("TICK_RING_OFF", "false").lower() != "true":
+            self.tick_ring = TickRing(int(os.environ.get("TICK_RING_SIZE", "4096")))
+
+        # -- TIMING WHEEL (luglio2026): i tracker registrano la scadenza
+        # 30/60/120s e vengono richiamati col prezzo di quel tick, invece di
+        # scorrere tutti gli aperti a ogni tick. Avanza in _process_tick_body.
+        self.wheel = None
+        if _TIMING_WHEEL_AVAILABLE and os.environ.get("TIMING_WHEEL_OFF", "false").lower() != "true":
+            self.wheel = TimingWheel()
+
+        # TRACKER PRIMI SECONDI: traccia in corso (vedi _ps_chiudi)
+        self._ps_traccia = None
+
         # -- Componenti core ----------------------------------------------
-        self.analyzer        = ContestoAnalyzer(window=50)
+        self.analyzer        = ContestoAnalyzer(window=50, ring=self.tick_ring)
         self.seed_scorer     = SeedScorer(window=50)
-        self.oracolo         = OracoloDinamico()
+        self.oracolo         = OracoloDinamico(wheel=self.wheel, ring=self.tick_ring)
         self.memoria         = MemoriaMatrimoni()
         
         # 🌊 TSUNAMI ENGINE — forza strutturata multi-scala
@@ -7287,7 +8302,7 @@ class OvertopBassanoV16Production:
         # self.signal_tracker prima che fosse inizializzato (riga 6667). In produzione
         # non si manifestava perché _CM_AVAILABLE=True salta il fallback, ma su ambienti
         # senza capsule_manager.py crashava.
-        self.signal_tracker  = PreTradeSignalTracker()
+        self.signal_tracker  = PreTradeSignalTracker(clock=self.clock, wheel=self.wheel, ring=self.tick_ring)
 
         # -- CAPSULE MANAGER UNIFICATO ------------------------------------
         if _CM_AVAILABLE:
@@ -7440,7 +8455,7 @@ class OvertopBassanoV16Production:
         self.ai_explainer    = AIExplainer(db_path=NARRATIVES_DB)
         self.calibratore     = AutoCalibratore()
         self.regime_detector = RegimeDetector()
-        self.decelero        = MomentumDecelerometer()
+        self.decelero        = MomentumDecelerometer(ring=self.tick_ring)
         self.position_sizer  = PositionSizer()
         self.telemetry       = StabilityTelemetry()
         # signal_tracker già inizializzato sopra (FIX VINCOLO B)
@@ -7508,7 +8523,7 @@ class OvertopBassanoV16Production:
         self._live_log = deque(maxlen=20)
 
         # -- MOTORE 2: CAMPO GRAVITAZIONALE (shadow trading) --------------
-        self.campo = CampoGravitazionale()
+        self.campo = CampoGravitazionale(ring=self.tick_ring)
         self.campo._bot_ref = self  # riferimento al bot per CapsuleManager
         self._shadow = None          # shadow trade aperto (dict o None)
         self._shadow_entry_time = None
@@ -7657,13 +8672,13 @@ class OvertopBassanoV16Production:
         self.supercervello  = SuperCervello()
         self._last_sc_dec   = None
         # -- VERITAS TRACKER: chi aveva ragione ───────────────────────────
-        self.veritas        = VeritatisTracker(sc_ref=self.supercervello)
+        self.veritas        = VeritatisTracker(sc_ref=self.supercervello, wheel=self.wheel)
         self.veritas.load(DB_PATH)  # carica statistiche dal disco al boot
 
         # -- PASSO 13: PREDITTORE CONTESTUALE V2 (15mag2026) ──────────────
         # Predizione DINAMICA basata sul contesto attuale. Misura sé stesso
         # contro il prezzo reale a 60s. Onesto. Indipendente dal pred_* vecchio.
-        self.predittore_v2 = PredittoreContestuale()
+        self.predittore_v2 = PredittoreContestuale(wheel=self.wheel)
 
         # -- PASSO 15.A: LIBRO DI PESCA (15mag2026) ────────────────────────
         # Default DISABILITATO (kill-switch). Per attivare → Render env:
@@ -7671,7 +8686,7 @@ class OvertopBassanoV16Production:
         # Quando disabilitato la classe esiste ma non fa nulla.
         # Istanziazione protetta da try/except per non rompere mai il bot.
         try:
-            self.libro_pesca = LibroPesca(DB_PATH)
+            self.libro_pesca = LibroPesca(DB_PATH, wheel=self.wheel)
         except Exception as _e_lp_init:
             log.error(f"[LIBRO_PESCA_INIT_ERR] {_e_lp_init} - libro_pesca disabilitato")
             self.libro_pesca = None
@@ -7738,7 +8753,8 @@ class OvertopBassanoV16Production:
         # tutto __init__, causando UnboundLocalError a riga 6157 dove
         # deque era usata PRIMA di questo punto. Rimosso l'import locale.
         # storico (timestamp, prezzo) ultimi 200 secondi (margine per 120s+buffer)
-        self._pt_storico = deque(maxlen=300)
+        # Con il tick ring lo storico sono gli ultimi 300 tick dell'anello.
+        self._pt_storico = deque(maxlen=300) if self.tick_ring is None else None
         # statistiche aggregate per orizzonte: errori, accuracy segno
         self._pt_stats = {
             60:  {'n': 0, 'errori_abs': deque(maxlen=200),
@@ -7768,7 +8784,24 @@ class OvertopBassanoV16Production:
         # Traccia i trade bloccati dai 5 livelli di protezione.
         # Per ogni trade bloccato, segue il prezzo e calcola cosa sarebbe successo.
         # Zavorra o protezione? I numeri rispondono.
-        self._phantoms_open = []       # trade fantasma aperti (max 5 simultanei)
+        self._phantoms_open = []       # trade fantasma aperti
+        # PHANTOM BOOK (luglio2026): stessi fantasmi, in colonne. Regge
+        # centinaia di aperti: alza PHANTOM_SCORE_MAX_OPEN per seguire ogni
+        # blocco SCORE_SOTTO invece di un campione di 5.
+        self._phantom_book_on = (_PHANTOM_BOOK_AVAILABLE and
+                                 os.environ.get("PHANTOM_BOOK_OFF", "false").lower() != "true")
+        if self._phantom_book_on:
+            self._phantoms_open = PhantomBook(exposure=5000.0)
+        # UNIVERSI PARALLELI (luglio2026): le tarature alternative del Campo
+        # giudicate sui tick veri, non sulle kline dei simula*.py.
+        self.universi = None
+        self._universi_salvato = 0.0
+        if _UNIVERSI_AVAILABLE and os.environ.get("UNIVERSI_OFF", "false").lower() != "true":
+            try:
+                self.universi = self._universi_crea()
+                log.info(f"[UNIVERSI] {self.universi.n} tarature in parallelo")
+            except Exception as _e_un:
+                log.warning(f"[UNIVERSI] init fallito: {_e_un}")
         self._phantoms_closed = deque(maxlen=100)  # ultimi 100 fantasmi chiusi
         self._phantom_stats = {        # statistiche per livello di blocco
             # 'BLOCK_REASON': {'blocked': N, 'would_win': N, 'would_lose': N, 'pnl_saved': $, 'pnl_missed': $}
@@ -7836,59 +8869,124 @@ class OvertopBassanoV16Production:
         self._ws_tick_count = getattr(self, '_ws_tick_count', 0)
         self._ws_reconnect_count = getattr(self, '_ws_reconnect_count', 0)
 
-        def on_message(ws, msg):
+        # ════════════════════════════════════════════════════════════════
+        # RING WS (luglio2026) — il pong arrivava tardi perche' on_message
+        # eseguiva l'intero tick sul thread del websocket (reconn=34). ORA
+        # on_message mette il frame grezzo nell'anello e torna subito a
+        # leggere il socket; il thread tick_consumer fa json + feeder +
+        # _process_tick. Burst EXPLOSIVE = coda che cresce, non keepalive
+        # che muore. Anello pieno = scarto il frame piu' vecchio e lo conto.
+        # ENV: WS_RING_OFF=true (elabora inline), WS_RING_SIZE (def 8192).
+        # ════════════════════════════════════════════════════════════════
+        # TICK JOURNAL (luglio2026): il flusso grezzo non si butta piu'.
+        # append() sul thread del tick e' una deque; il disco lo tocca il
+        # thread tick_journal. Base per replay esatto e studi a tick.
+        if getattr(self, "_tick_journal", None) is None:
+            self._tick_journal = None
+            if (_TICK_JOURNAL_AVAILABLE and
+                    os.environ.get("TICK_JOURNAL_OFF", "false").lower() != "true"):
+                try:
+                    _tj_dir = os.environ.get("TICK_JOURNAL_DIR",
+                                             os.path.join(os.path.dirname(DB_PATH) or ".", "ticks"))
+                    self._tick_journal = TickJournal(
+                        _tj_dir, keep_hours=int(os.environ.get("TICK_JOURNAL_KEEP_H", "72")))
+                    log.info(f"[TICK_JOURNAL] registro tick attivo in {_tj_dir}")
+                except Exception as _e_tj:
+                    log.warning(f"[TICK_JOURNAL] init fallita (silenziato): {_e_tj}")
+                    self._tick_journal = None
+                # CANDELE DAL JOURNAL (agosto2026): dopo un restart Tsunami e
+                # features_1m ripartivano da zero (o dalle candele salvate
+                # nel brain, vecchie quanto l'ultimo save). Le ricostruisco dai
+                # tick registrati; si fondono per ts con quelle ripristinate.
+                # ENV: CANDELE_BACKFILL_OFF=true
+                if (self._tick_journal is not None and self.tsunami is not None and
+                        os.environ.get("CANDELE_BACKFILL_OFF", "false").lower() != "true"):
+                    try:
+                        _t0_bf = time.time()
+                        _n_bf = self.tsunami.backfill(_tj_dir)
+                        self._candele_backfill = {"tick": _n_bf,
+                                                  "ms": round((time.time() - _t0_bf) * 1000, 1)}
+                        log.info(f"[CANDELE] backfill: {_n_bf} tick dal journal "
+                                 f"in {self._candele_backfill['ms']}ms")
+                    except Exception as _e_bf:
+                        log.warning(f"[CANDELE] backfill fallito (silenziato): {_e_bf}")
+        # POTATORE DB (agosto2026): la ritenzione dei log gira nel suo
+        # thread. AUTOPULITORE_OFF resta l'interruttore (letto ad ogni giro).
+        # Con il diario attivo le tabelle schema_db.DIARIO in DB_PATH sono il
+        # suo storico (le viste le mostrano come storia): fuori dai default,
+        # la loro ritenzione e' cancellare i file del diario. POTATORE_TABELLE
+        # le rimette se indicate a mano.
+        if getattr(self, "_potatore", None) is None:
+            self._potatore = None
+            if _POTATORE_DB_AVAILABLE:
+                try:
+                    _pt_base = None
+                    if (_SCHEMA_DB_AVAILABLE and _diario() is not None
+                            and os.environ.get("DIARIO_STORICO_OFF", "false").lower() != "true"):
+                        _pt_base = {t: r for t, r in _POTATORE_DEFAULT.items()
+                                    if t not in _schema_db.DIARIO}
+                    self._potatore = PotatoreDB(
+                        DB_PATH,
+                        regole=_potatore_regole(os.environ.get("POTATORE_TABELLE", ""), _pt_base),
+                        ogni_s=float(os.environ.get("POTATORE_OGNI_S", "600")),
+                        chunk=int(os.environ.get("POTATORE_CHUNK", "500")),
+                        lock=_DB_GLOBAL_LOCK,
+                        attivo=lambda: not _CONFIG.snap.bool("AUTOPULITORE_OFF", False),
+                        converti=os.environ.get("POTATORE_CONVERTI", "false").lower() == "true",
+                    ).start()
+                    log.info(f"[POTATORE] ritenzione attiva su {len(self._potatore.regole)} tabelle")
+                except Exception as _e_pt:
+                    log.warning(f"[POTATORE] init fallita (silenziato): {_e_pt}")
+                    self._potatore = None
+        # KLINE PREFETCH (luglio2026): solo se CAMPO_ESTERNO deve ancora
+        # sentire Binance. Thread suo, il gate legge la cache e basta.
+        if getattr(self, "_kline_prefetch", None) is None:
+            self._kline_prefetch = None
+            if (_TICK_FEED_AVAILABLE and
+                    (os.environ.get("CAMPO_ESTERNO_FONTE", "locale").lower() == "remoto" or
+                     os.environ.get("CAMPO_ESTERNO_PREFETCH", "false").lower() == "true")):
+                try:
+                    self._kline_prefetch = KlinePrefetcher(
+                        every_s=float(os.environ.get("CAMPO_ESTERNO_PREFETCH_S", "10"))).start()
+                    log.info("[CAMPO_ESTERNO] prefetch kline 1m attivo")
+                except Exception as _e_kp:
+                    log.warning(f"[CAMPO_ESTERNO] prefetch init fallito (silenziato): {_e_kp}")
+                    self._kline_prefetch = None
+
+        _ring_on = (_TICK_FEED_AVAILABLE and
+                    os.environ.get("WS_RING_OFF", "false").lower() != "true")
+        if _ring_on and getattr(self, "_ws_ring", None) is None:
+            self._ws_ring = FrameRing(int(os.environ.get("WS_RING_SIZE", "8192")))
+
+        def _journal_scartato(msg, recv_ts):
+            # frame scartato dall'anello pieno: il tick non lo vede, ma il
+            # journal registra ogni aggTrade arrivato (replay esatto).
+            # Thread WS, solo negli overflow.
+            if self._tick_journal is None:
+                return
+            try:
+                data  = json.loads(msg)
+                price = float(data.get('p', 0))
+                if price > 0:
+                    self._tick_journal.append(aggtrade_event_ts(data) or recv_ts, data.get('a'),
+                                              price, float(data.get('q', 1.0)), data.get('m'))
+            except Exception as e:
+                log.debug(f"[TICK_JOURNAL] frame scartato illeggibile: {e}")
+
+        if getattr(self, "_ws_ring", None) is not None:
+            self._ws_ring.on_drop = _journal_scartato
+
+        def _handle_frame(msg, recv_ts):
             try:
-                # DIAG: logga ESPLICITAMENTE i primi 3 messaggi e poi ogni 100
-                self._ws_tick_count += 1
-                if self._ws_tick_count <= 3 or self._ws_tick_count % 500 == 0:
-                    log.info(f"[WS_TICK_DIAG] msg#{self._ws_tick_count} len={len(msg)} preview={msg[:120]}")
                 data   = json.loads(msg)
                 price  = float(data.get('p', 0))
                 volume = float(data.get('q', 1.0))
                 if price > 0:
-                    self.analyzer.add_price(price)
-                    self.seed_scorer.add_tick(price, volume)
-                    if self.tsunami is not None:
-                        self.tsunami.feed_tick(price, volume)
-                    self._last_volume = volume
-                    # ════════════════════════════════════════════════════════
-                    # FIX 18giu (Roberto: "il bot conta i tick ma non scrive
-                    # piu' niente dalle 19:02"). PRIMA _process_tick era nello
-                    # stesso try del parsing: se crashava ad ogni tick, l'errore
-                    # veniva silenziato e il bot restava cieco (contatore sale,
-                    # tabelle ferme). ORA _process_tick ha il SUO try che:
-                    #  1) registra il crash COMPLETO (con traceback) nella tabella
-                    #     crash_log del DB -> diagnosticabile con una query.
-                    #  2) conta i crash consecutivi: se il motore crasha sempre,
-                    #     il contatore _proc_crash_streak cresce e si vede.
-                    # Cosi' il bot non resta mai "cieco in silenzio".
-                    # ════════════════════════════════════════════════════════
-                    try:
-                        self._process_tick(price)
-                        self._proc_crash_streak = 0   # ok: azzero lo streak
-                    except Exception as _e_proc:
-                        import traceback as _tb_proc
-                        self._proc_crash_streak = getattr(self, "_proc_crash_streak", 0) + 1
-                        _tb_str = _tb_proc.format_exc()
-                        log.error(f"[PROC_TICK_CRASH] streak={self._proc_crash_streak} "
-                                  f"{type(_e_proc).__name__}: {_e_proc}")
-                        log.error(f"[PROC_TICK_TB] {_tb_str}")
-                        # registra nel DB solo i primi crash e poi ogni 200, per non floodare
-                        if self._proc_crash_streak <= 5 or self._proc_crash_streak % 200 == 0:
-                            try:
-                                _cc = _safe_connect(DB_PATH, timeout=10)
-                                _cc.execute("""CREATE TABLE IF NOT EXISTS crash_log (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    ts TEXT DEFAULT CURRENT_TIMESTAMP,
-                                    streak INTEGER, err_type TEXT, err_msg TEXT, traceback TEXT)""")
-                                _cc.execute("""INSERT INTO crash_log (streak, err_type, err_msg, traceback)
-                                    VALUES (?,?,?,?)""",
-                                    (self._proc_crash_streak, type(_e_proc).__name__,
-                                     str(_e_proc), _tb_str[:2000]))
-                                _cc.commit()
-                                _cc.close()
-                            except Exception:
-                                pass
+                    _ev_ts = aggtrade_event_ts(data)
+                    if self._tick_journal is not None:
+                        self._tick_journal.append(_ev_ts or recv_ts, data.get('a'),
+                                                  price, volume, data.get('m'))
+                    self._ingest_tick(price, volume, _ev_ts, recv_ts)
                 else:
                     log.warning(f"[WS_TICK_NOPRICE] msg#{self._ws_tick_count} data={data}")
             except Exception as e:
@@ -7896,6 +8994,21 @@ class OvertopBassanoV16Production:
                 import traceback
                 log.error(f"[WS_MSG_TB] {traceback.format_exc()}")
 
+        def on_message(ws, msg):
+            # Thread WS: SOLO ricezione. Niente parsing, niente tick.
+            self._ws_tick_count += 1
+            if self._ws_tick_count <= 3 or self._ws_tick_count % 500 == 0:
+                log.info(f"[WS_TICK_DIAG] msg#{self._ws_tick_count} len={len(msg)} preview={msg[:120]}")
+            _ring = getattr(self, "_ws_ring", None)
+            if _ring is not None:
+                _ring.push(msg, time.time())
+            else:
+                _handle_frame(msg, time.time())
+
+        if _ring_on and getattr(self, "_ws_consumer", None) is None:
+            self._ws_consumer = start_consumer(self._ws_ring, _handle_frame)
+            log.info(f"[WS_RING] consumatore tick avviato (capacita' {self._ws_ring.capacity} frame)")
+
 
         def on_error(ws, error):
             log.error(f"[WS_ERROR] type={type(error).__name__} err={error}")
@@ -7992,6 +9105,57 @@ class OvertopBassanoV16Production:
         log.info(f"[WS_WATCHDOG] Watchdog tick avviato (soglia {os.environ.get('WS_WATCHDOG_SEC','60')}s)")
 
 
+    def _ingest_tick(self, price: float, volume: float, event_ts: float = None, recv_ts: float = None):
+        """
+        Un tick aggTrade entra nel bot: orologio, feeder, _process_tick.
+        Unico ingresso sia per il WS live sia per il replay.
+        """
+        # EVENT CLOCK (luglio2026): l'orologio avanza al timestamp exchange
+        # PRIMA dei feeder, cosi' candele e finestre vedono il tempo vero.
+        self.clock.advance(event_ts, recv_ts)
+        if self.tick_ring is not None:
+            self.tick_ring.push(price, volume, self.clock.now())
+        self.analyzer.add_price(price)
+        self.seed_scorer.add_tick(price, volume)
+        if self.tsunami is not None:
+            self.tsunami.feed_tick(price, volume, self.clock.now())
+        self._last_volume = volume
+        # ════════════════════════════════════════════════════════
+        # FIX 18giu (Roberto: "il bot conta i tick ma non scrive
+        # piu' niente dalle 19:02"). PRIMA _process_tick era nello
+        # stesso try del parsing: se crashava ad ogni tick, l'errore
+        # veniva silenziato e il bot restava cieco (contatore sale,
+        # tabelle ferme). ORA _process_tick ha il SUO try che:
+        #  1) registra il crash COMPLETO (con traceback) nella tabella
+        #     crash_log del DB -> diagnosticabile con una query.
+        #  2) conta i crash consecutivi: se il motore crasha sempre,
+        #     il contatore _proc_crash_streak cresce e si vede.
+        # Cosi' il bot non resta mai "cieco in silenzio".
+        # ════════════════════════════════════════════════════════
+        try:
+            self._process_tick(price)
+            self.clock.mark_decision()
+            self._proc_crash_streak = 0   # ok: azzero lo streak
+        except Exception as _e_proc:
+            import traceback as _tb_proc
+            self._proc_crash_streak = getattr(self, "_proc_crash_streak", 0) + 1
+            _tb_str = _tb_proc.format_exc()
+            log.error(f"[PROC_TICK_CRASH] streak={self._proc_crash_streak} "
+                      f"{type(_e_proc).__name__}: {_e_proc}")
+            log.error(f"[PROC_TICK_TB] {_tb_str}")
+            # registra nel DB solo i primi crash e poi ogni 200, per non floodare
+            if self._proc_crash_streak <= 5 or self._proc_crash_streak % 200 == 0:
+                try:
+                    # crash_log: schema unico in schema_db (fonte = chi scrive)
+                    _db_inserisci(DB_PATH,
+                        """INSERT INTO crash_log (ts, fonte, streak, err_type, err_msg, traceback)
+                        VALUES (?,?,?,?,?,?)""",
+                        (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), "ingest_tick",
+                         self._proc_crash_streak, type(_e_proc).__name__,
+                         str(_e_proc), _tb_str[:2000]))
+                except Exception:
+                    pass
+
     # ========================================================================
     # PROCESS TICK - orchestratore principale
     # ========================================================================
@@ -8006,8 +9170,12 @@ class OvertopBassanoV16Production:
          - se c'era una predizione: errore_assoluto, segno_giusto
         Aggrega in self._pt_stats per esposizione su /trading/status.
         """
-        # 1) snapshot del momento
-        self._pt_storico.append((now, price))
+        # 1) snapshot del momento (con l'anello e' gia' scritto da _ingest_tick)
+        if self._pt_storico is not None:
+            self._pt_storico.append((now, price))
+        else:
+            _pt_ts = self.tick_ring.window('ts', 300)
+            _pt_px = self.tick_ring.window('price', 300)
         # snapshot della predizione corrente del bot (pred_score interno)
         try:
             # PATCH 0: diagnostico legge stato completo + salva source per filtri post-hoc
@@ -8038,10 +9206,16 @@ class OvertopBassanoV16Production:
             target_ts = now - W
             # trova lo snapshot più vicino a target_ts (entro ±2s di tolleranza)
             snap_old = None
-            for (ts_old, price_old) in self._pt_storico:
-                if abs(ts_old - target_ts) <= 2.0:
-                    snap_old = (ts_old, price_old)
-                    break
+            if self._pt_storico is not None:
+                for (ts_old, price_old) in self._pt_storico:
+                    if abs(ts_old - target_ts) <= 2.0:
+                        snap_old = (ts_old, price_old)
+                        break
+            else:
+                # ts monotono (EventClock): il primo >= target-2 e' il candidato
+                i = bisect_left(_pt_ts, target_ts - 2.0)
+                if i < len(_pt_ts) and _pt_ts[i] <= target_ts + 2.0:
+                    snap_old = (float(_pt_ts[i]), float(_pt_px[i]))
             if snap_old is None:
                 continue
             # movimento reale a W secondi
@@ -8091,7 +9265,7 @@ class OvertopBassanoV16Production:
             out[f'{W}s'] = row
         return out
 
-    def _process_tick(self, price: float):
+    def _process_tick(self, price: float, event_ts: float = None):
         # ════════════════════════════════════════════════════════════════
         # BLINDAGGIO DIAGNOSTICO (18giu2026, notte — Roberto: "si e' bloccato
         # tutto"). I tick salivano (contatore +1 in on_message) ma niente si
@@ -8100,6 +9274,8 @@ class OvertopBassanoV16Production:
         # (tabella crash_log) con riga esatta, e FAIL-CONTINUE: il bot non si
         # blocca piu'. Domani: SELECT dal crash_log -> riga colpevole -> fix.
         # ════════════════════════════════════════════════════════════════
+        if event_ts is not None:
+            self.clock.advance(event_ts)
         try:
             return self._process_tick_body(price)
         except Exception as _tick_err:
@@ -8116,12 +9292,13 @@ class OvertopBassanoV16Production:
                 pass
             try:
                 _dbp = getattr(self, 'db_path', None) or os.environ.get('DB_PATH', '/var/data/trading_data.db')
-                _cx = _safe_connect(_dbp, timeout=30)
-                _cx.execute("CREATE TABLE IF NOT EXISTS crash_log (id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, err_type TEXT, err_msg TEXT, riga TEXT, tb TEXT)")
-                _cx.execute("INSERT INTO crash_log (ts, err_type, err_msg, riga, tb) VALUES (?,?,?,?,?)",
-                            (time.strftime('%Y-%m-%d %H:%M:%S'), type(_tick_err).__name__, str(_tick_err)[:300], _riga[:300], _tbtxt[:2000]))
-                _cx.commit()
-                _cx.close()
+                # crash_log: schema unico in schema_db (prima riga/tb qui,
+                # streak/traceback in _ingest_tick: una delle due INSERT falliva)
+                _schema_pronto(_dbp)
+                _db_inserisci(_dbp,
+                    "INSERT INTO crash_log (ts, fonte, err_type, err_msg, riga, traceback) VALUES (?,?,?,?,?,?)",
+                    (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()), "process_tick",
+                     type(_tick_err).__name__, str(_tick_err)[:300], _riga[:300], _tbtxt[:2000]))
             except Exception:
                 pass
             log.error(f"[TICK_CRASH] {type(_tick_err).__name__}: {_tick_err} @ {_riga}")
@@ -8131,7 +9308,25 @@ class OvertopBassanoV16Production:
 
 
     def _process_tick_body(self, price: float):
-        now = time.time()
+        now = self.clock.now()
+        # TICK CONTEXT (luglio2026): i derivati di questo tick, una volta sola.
+        # Vive SOLO dentro il tick: finito (o crashato) il tick, _ctx torna
+        # None e _tctx() fuori dal tick (callback, heartbeat) non legge piu'
+        # i derivati congelati dell'ultimo prezzo. Il completo va in _ctx_prec.
+        tctx = self._ctx = TickContext(self, price, now, self.analyzer.tick_count)
+        try:
+            return self._process_tick_organi(price, now, tctx)
+        finally:
+            self._ctx_prec = tctx
+            self._ctx = None
+
+    def _process_tick_organi(self, price: float, now: float, tctx: TickContext):
+        # Manopole env: nuovo snapshot se env/override cambiati (CONFIG_REFRESH_S)
+        _CONFIG.maybe_refresh(now)
+
+        # Scadenze dei tracker dovute a questo tick (30/60/120s, post-trade, lenze, primi secondi)
+        if self.wheel is not None:
+            self.wheel.advance(now, price)
 
         # Config hot-reload ogni 30 s
         if now - self.last_config_check > 30:
@@ -8164,64 +9359,45 @@ class OvertopBassanoV16Production:
         # separano (maschio tiene/sale, dopata gia' molla). Solo osservazione,
         # NON decide niente. Scrive in tabella primi_secondi.
         # ENV TRACK_PRIMI_SEC_OFF=true per spegnerlo. try/except: mai rompe il tick.
+        # agosto2026: i campioni restano in memoria e la traccia si scrive
+        # tutta insieme quando chiude (12s o aggancio nuovo), dallo scrittore
+        # DB. PRIMI_SEC_PASSO=0.25 → un campione ogni 250ms, stesso costo DB.
         # ════════════════════════════════════════════════════════════════
         try:
-            if os.environ.get("TRACK_PRIMI_SEC_OFF", "false").lower() != "true":
+            if not _CONFIG.snap.bool("TRACK_PRIMI_SEC_OFF", False):
                 _ag_ts = getattr(self, "_rit_aggancio_ts", None)
                 # timestamp AUTONOMO del tracker: parte al nuovo aggancio e dura
                 # 10s anche dopo che il ritardo ha deciso (entra/scarta a ~4s).
                 _ps_nascita = getattr(self, "_ps_nascita_ts", None)
-                _ps_prezzo0 = getattr(self, "_ps_prezzo0", None)
                 if _ag_ts is not None and _ag_ts != getattr(self, "_ps_last_ag_ts", None):
-                    # nuovo aggancio rilevato: faccio nascere una nuova traccia
+                    # nuovo aggancio rilevato: chiudo la traccia precedente e
+                    # ne faccio nascere una nuova
+                    self._ps_chiudi()
                     _ps_nascita = now
-                    _ps_prezzo0 = price
                     self._ps_nascita_ts = now
-                    self._ps_prezzo0 = price
                     self._ps_last_ag_ts = _ag_ts
-                if _ps_nascita is not None:
+                    _offs = _ps_offsets(_CONFIG.snap.float("PRIMI_SEC_PASSO", 1.0))
+                    self._ps_traccia = {"nascita": now, "prezzo0": price,
+                                        "offsets": _offs, "righe": []}
+                    if self.wheel is not None:
+                        # TIMING WHEEL: i campioni sono scadenze, il tick non riguarda la traccia
+                        for _sec in _offs:
+                            self.wheel.schedule(now + _sec, self._ps_campiona, now, price, _sec)
+                        self.wheel.schedule(now + 12, self._ps_fine, now)
+                if self.wheel is None and _ps_nascita is not None:
                     _eta = now - _ps_nascita   # secondi di vita (autonomi, fino a 10s+)
-                    if _eta > 12:
-                        # traccia esaurita: chiudo, aspetto il prossimo aggancio
+                    _tr = self._ps_traccia
+                    if _eta > 12 or _tr is None:
+                        # traccia esaurita: scrivo, aspetto il prossimo aggancio
+                        self._ps_chiudi()
                         self._ps_nascita_ts = None
                     else:
-                        _ag_prezzo = _ps_prezzo0 if _ps_prezzo0 is not None else price
-                        if not hasattr(self, "_ps_campionati"):
-                            self._ps_campionati = {}
-                        _gia = self._ps_campionati.get(_ps_nascita, set())
-                        _exp = float(os.environ.get("EXPOSURE_USD", "5000"))
-                        for _sec in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
-                            # campiona al primo tick che supera _sec secondi di vita
-                            if _eta >= _sec and _sec not in _gia:
-                                _var_usd = ((price - _ag_prezzo) / _ag_prezzo) * _exp if _ag_prezzo else 0.0
-                                _ps = None
-                                try:
-                                    import sqlite3 as _sq3ps
-                                    _ps = _sq3ps.connect(DB_PATH, timeout=10)
-                                    _ps.execute("PRAGMA busy_timeout=10000;")
-                                    _ps.execute("""CREATE TABLE IF NOT EXISTS primi_secondi (
-                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                        aggancio_ts REAL, secondo INTEGER,
-                                        prezzo_aggancio REAL, prezzo_ora REAL, var_usd REAL)""")
-                                    _ps.execute(
-                                        """INSERT INTO primi_secondi
-                                           (aggancio_ts, secondo, prezzo_aggancio, prezzo_ora, var_usd)
-                                           VALUES (?,?,?,?,?)""",
-                                        (_ps_nascita, _sec, float(_ag_prezzo), float(price), float(_var_usd)))
-                                    _ps.commit()
-                                    _gia.add(_sec)
-                                    self._ps_campionati[_ps_nascita] = _gia
-                                except Exception:
-                                    pass
-                                finally:
-                                    if _ps is not None:
-                                        try: _ps.close()
-                                        except Exception: pass
-                        # pulizia: tengo solo gli ultimi 50 agganci tracciati
-                        if len(self._ps_campionati) > 50:
-                            for _k in list(self._ps_campionati.keys())[:-50]:
-                                self._ps_campionati.pop(_k, None)
+                        _offs = _tr["offsets"]
+                        _k = len(_tr["righe"])
+                        # campiona al primo tick che supera _sec secondi di vita
+                        while _k < len(_offs) and _eta >= _offs[_k]:
+                            self._ps_campione(_tr, _offs[_k], price)
+                            _k += 1
         except Exception:
             pass
 
@@ -8274,10 +9450,10 @@ class OvertopBassanoV16Production:
                     _drift = getattr(self.campo, '_last_drift_pct', 0.0)
                 except Exception:
                     _drift = 0.0
-                _mom, _vol, _trd = self.analyzer.analyze(regime=_regime_now, drift=_drift)
+                _mom, _vol, _trd = tctx.contesto(_regime_now, _drift)
                 _orac_mem = getattr(self.oracolo, '_memory', None)
                 # 15.J — SeedScorer fornisce TUTTI gli indicatori micro
-                _seed_data = self.seed_scorer.score() if hasattr(self, 'seed_scorer') else {}
+                _seed_data = tctx.seed()
                 _drift_persist = _seed_data.get('drift_persist', 0.5)
                 _range_pos     = _seed_data.get('range_pos', 0.5)
                 _compression   = _seed_data.get('compression', 1.0)
@@ -8288,7 +9464,7 @@ class OvertopBassanoV16Production:
                 _v2_n = 0
                 _v2_acc = 0.0
                 try:
-                    _pv2_stats = self.predittore_v2.get_stats()
+                    _pv2_stats = tctx.pv2_stats()
                     _v2_delta = _pv2_stats.get('pred_v2_delta', 0.0)
                     _v2_n     = _pv2_stats.get('pred_v2_n_segno', 0)
                     _v2_acc   = (_pv2_stats.get('pred_v2_accuracy_segno', 0) or 0) / 100.0
@@ -8329,8 +9505,9 @@ class OvertopBassanoV16Production:
         self.regime_detector.add_tick(price, self._last_volume)
         self.decelero.add_price(price)
 
-        # Aggiorna regime ogni 60s
-        if now - self._last_regime_check > 60:
+        # Aggiorna regime ogni 60s. detect() ora e' qualche sum() in C sulle
+        # deque, niente liste: con REGIME_CHECK_S=0 si valuta a ogni tick.
+        if now - self._last_regime_check > _CONFIG.snap.float("REGIME_CHECK_S", 60):
             regime, conf, detail = self.regime_detector.detect()
             if regime != self._regime_current:
                 self._log("🌍", f"REGIME → {regime} (conf={conf:.0%}) | "
@@ -8350,19 +9527,11 @@ class OvertopBassanoV16Production:
             # Finestra LUNGA (200 tick ~3-4 min) per trend sostenuto
             # Finestra BREVE (50 tick ~1 min) per reattività
             if regime == 'RANGING' and len(self.regime_detector.prices) >= 50:
-                _prezzi_all = list(self.regime_detector.prices)
-
-                # Finestra breve — movimento rapido
-                _p50     = _prezzi_all[-50:]
-                _move50  = (_p50[-1] - _p50[0]) / _p50[0] * 100
-                _up50    = sum(1 for i in range(len(_p50)-1) if _p50[i+1] > _p50[i])
-                _dir50   = _up50 / max(len(_p50)-1, 1)
-
-                # Finestra lunga — trend sostenuto (se disponibile)
-                _p200    = _prezzi_all[-200:] if len(_prezzi_all) >= 200 else _prezzi_all
-                _move200 = (_p200[-1] - _p200[0]) / _p200[0] * 100
-                _up200   = sum(1 for i in range(len(_p200)-1) if _p200[i+1] > _p200[i])
-                _dir200  = _up200 / max(len(_p200)-1, 1)
+                # Finestra breve (50) — movimento rapido
+                # Finestra lunga (fino a 200) — trend sostenuto
+                # Dalle somme scorrevoli del detector, senza riaffettare.
+                _move50, _dir50, _move200, _dir200 = \
+                    self.regime_detector.finestre_autocorrettore()
 
                 # TRENDING_BULL: movimento sostenuto in entrambe le finestre
                 # oppure movimento forte in finestra breve
@@ -8399,8 +9568,10 @@ class OvertopBassanoV16Production:
         # Cosi' il DB NON puo' piu' rigonfiarsi, chiunque le scriva.
         # Le tabelle VERE (trades, signatures) NON sono toccate.
         # Interruttore: AUTOPULITORE_OFF=true lo spegne.
+        # Con il POTATORE DB attivo (thread suo) qui non si fa piu' nulla.
         # ════════════════════════════════════════════════════════════════
-        if (os.environ.get("AUTOPULITORE_OFF", "false").lower() != "true"
+        if (getattr(self, "_potatore", None) is None
+                and not _CONFIG.snap.bool("AUTOPULITORE_OFF", False)
                 and now - getattr(self, "_last_dbclean", 0) > 600):
             self._last_dbclean = now
             _tabelle_log = {
@@ -8679,19 +9850,14 @@ class OvertopBassanoV16Production:
             log.debug(f"[CI_TICK_ERR] {_ci_e}")
 
         # Calcola drift per il downgrade momentum in RANGING
-        _drift_for_classify = 0.0
-        if len(self.campo._prices_long) >= 100:
-            _pl = list(self.campo._prices_long)
-            _avg_old = sum(_pl[:50]) / 50
-            _avg_new = sum(_pl[-50:]) / 50
-            _drift_for_classify = (_avg_new - _avg_old) / _avg_old * 100
+        _drift_for_classify = tctx.drift()
 
         # -- MOTORE 2: Feed SEMPRE — buffer prezzi deve crescere ogni tick --
-        _seed_quick = self.seed_scorer.score()
-        _seed_val = _seed_quick.get('score', 0.0) if _seed_quick.get('reason') != 'insufficient_data' else 0.0
-        self.campo.feed_tick(price, self._last_volume, _seed_val)
+        self.campo.feed_tick(price, self._last_volume, tctx.seed_value())
+        if self.tick_ring is None:
+            tctx.invalida('drift')   # senza anello feed_tick ha appena spostato _prices_long
 
-        contesto = self.analyzer.analyze(regime=self._regime_current, drift=_drift_for_classify)
+        contesto = tctx.contesto(self._regime_current, _drift_for_classify)
 
         # analyzer ritorna (momentum, volatility, trend) oppure (None, None, None)
         _contesto_ok = contesto[0] is not None
@@ -8713,13 +9879,13 @@ class OvertopBassanoV16Production:
 
         # Oracolo e Veritas girano sempre
         self._oracolo_interno_tick(price, _mom, _vol, _trd)
-        self.veritas.aggiorna(price, time.time())
+        self.veritas.aggiorna(price, now)
         # Salva Veritas su disco ogni 60 secondi
         if not hasattr(self, '_veritas_last_save'):
             self._veritas_last_save = 0
-        if time.time() - self._veritas_last_save >= 60:
+        if now - self._veritas_last_save >= 60:
             self.veritas.save(DB_PATH)
-            self._veritas_last_save = time.time()
+            self._veritas_last_save = now
 
         if not _contesto_ok:
             return
@@ -8792,7 +9958,7 @@ class OvertopBassanoV16Production:
                 # ORA: aggancia SOLO se la direzione del mercato e' LONG. In fase
                 # ribassista resta FUORI = comportamento corretto LONG-only.
                 _dir_mercato = getattr(getattr(self, "campo", None), "_direction", "LONG")
-                _long_ok = (_dir_mercato == "LONG") or (os.environ.get("LONG_ONLY_GATE_OFF", "false").lower() == "true")
+                _long_ok = (_dir_mercato == "LONG") or (_CONFIG.snap.bool("LONG_ONLY_GATE_OFF", False))
                 if _segnale_vivo and _long_ok:
                     # NASCITA candidato: primo tick in cui il segnale e' vivo
                     # dopo un periodo di silenzio -> fisso il prezzo di nascita
@@ -8844,8 +10010,8 @@ class OvertopBassanoV16Production:
                     #   confermare la tendenza. 3 = tendenza vera (2 puo' essere
                     #   rumore). Abbassa a 2 per piu' reattivita'.
                     # ════════════════════════════════════════════════════════════
-                    if os.environ.get("CANCELLO_SALITA_OFF", "false").lower() != "true":
-                        _mosse_n = int(float(os.environ.get("CANCELLO_MOSSE", "3")))
+                    if not _CONFIG.snap.bool("CANCELLO_SALITA_OFF", False):
+                        _mosse_n = int(_CONFIG.snap.float("CANCELLO_MOSSE", 3))
                         _prec    = getattr(self, "_canc_prezzo_prec", price)
 
                         if price > _prec:
@@ -8864,7 +10030,7 @@ class OvertopBassanoV16Production:
                         # valori che le firme leggeranno (non _rit_picco_pre sporcato).
                         _cn_nascita = getattr(self, "_canc_nascita_prezzo", None)
                         if _cn_nascita:
-                            _cn_exp = float(os.environ.get("EXPOSURE", "5000"))
+                            _cn_exp = _CONFIG.snap.float("EXPOSURE", 5000)
                             _cn_grasso = (price - _cn_nascita) * (_cn_exp / _cn_nascita)
                             if _cn_grasso > getattr(self, "_canc_picco_proprio", 0.0):
                                 self._canc_picco_proprio = _cn_grasso
@@ -8885,7 +10051,7 @@ class OvertopBassanoV16Production:
                             # tick per tick il grasso: questa traccia E' la dinamica vera
                             # del movimento dopo il picco. Da qui si misura se TIENE (maschio)
                             # o CROLLA (trans/femmina) - sui fatti, non su una soglia inventata.
-                            _cn_soglia_traccia = float(os.environ.get("MD_MFE_MIN", "2.0"))
+                            _cn_soglia_traccia = _CONFIG.snap.float("MD_MFE_MIN", 2.0)
                             if self._canc_picco_proprio >= _cn_soglia_traccia:
                                 if not hasattr(self, "_canc_traccia_post") or self._canc_traccia_post is None:
                                     self._canc_traccia_post = []
@@ -8903,11 +10069,11 @@ class OvertopBassanoV16Production:
                         # che rimbalza a zero grasso NON entra piu'.
                         _md_aggancio = getattr(self, "_rit_prezzo_aggancio", None)
                         if _md_aggancio:
-                            _md_exp = float(os.environ.get("EXPOSURE", "5000"))
+                            _md_exp = _CONFIG.snap.float("EXPOSURE", 5000)
                             _md_grasso = (price - _md_aggancio) * (_md_exp / _md_aggancio)
                         else:
                             _md_grasso = 0.0
-                        _md_grasso_min = float(os.environ.get("CANCELLO_GRASSO_MIN", "1.5"))
+                        _md_grasso_min = _CONFIG.snap.float("CANCELLO_GRASSO_MIN", 1.5)
                         # FIX 23giu pomeriggio (Roberto: "abbiamo sbloccato i maschi
                         # stamattina, attenzione"): il vincolo grasso QUI strozzava
                         # i maschi in RANGE_DEAD (2 mosse su ma grasso istantaneo
@@ -8916,7 +10082,7 @@ class OvertopBassanoV16Production:
                         # (le loro porte), NON serve il grasso qui. Default: entra
                         # su 2 mosse su (come stamattina che funzionava). Il vincolo
                         # grasso si riattiva con MD_GRASSO_GATE=true se serve.
-                        _md_gate = os.environ.get("MD_GRASSO_GATE", "false").lower() == "true"
+                        _md_gate = _CONFIG.snap.bool("MD_GRASSO_GATE", False)
                         # ════════════════════════════════════════════════════════
                         # FIX 23giu NOTTE (Roberto, ERRORE TROVATO): MASCHIO_DIRETTO
                         # entrava su 2 mosse su SENZA guardare il MAE. Ma il MAE E'
@@ -8928,7 +10094,7 @@ class OvertopBassanoV16Production:
                         # ENV MD_MAE_MAX (default 1.0 = soglia certificata sui 2000
                         # trade: mae<=1.1 maschio 85%). 0 = controllo spento.
                         # ════════════════════════════════════════════════════════
-                        _md_mae_max = float(os.environ.get("MD_MAE_MAX", "0.5"))
+                        _md_mae_max = _CONFIG.snap.float("MD_MAE_MAX", 0.5)
                         # FIX 24giu: leggo il crollo PROPRIO (non _rit_crollo_min che
                         # il filtro vecchio azzera). _canc_crollo_proprio = min $ sotto
                         # nascita, calcolato da MASCHIO_DIRETTO stesso, mai sporcato.
@@ -8969,7 +10135,7 @@ class OvertopBassanoV16Production:
                         # i maschi lenti, win_persi 33-83) e il gate mosse_su.
                         # Vedi VERITA_BLINDATA_OVERTOP.md. NON reintrodurre i 12s.
                         # ════════════════════════════════════════════════════════
-                        _md_mfe_min = float(os.environ.get("MD_MFE_MIN", "2.0"))
+                        _md_mfe_min = _CONFIG.snap.float("MD_MFE_MIN", 2.0)
                         _md_picco = getattr(self, "_canc_picco_proprio", 0.0)
                         # FILTRO PROVATO SUI DATI REALI (415 trade, 27giu): il picco
                         # d'osservazione (MFE) >= soglia. Con MFE>=2: 50 trade entrano,
@@ -8983,7 +10149,7 @@ class OvertopBassanoV16Production:
                         # -> NON entra (visto a costo zero, prima del trade).
                         # Il trade 928 (TRANS picco 3.01, -3.03) entrava a soglia secca:
                         # con la conferma sarebbe stato scartato (era gia' crollato).
-                        _md_conferma = float(os.environ.get("MD_CONFERMA", "0.7"))
+                        _md_conferma = _CONFIG.snap.float("MD_CONFERMA", 0.7)
                         # ha raggiunto la soglia di picco?
                         _md_picco_ok = (_md_picco >= _md_mfe_min)
                         # CANC_STATS: prima volta che raggiunge la soglia MFE
@@ -8996,7 +10162,7 @@ class OvertopBassanoV16Production:
                         # sopra la soglia di conferma; trans/femmina crollano subito.
                         _md_traccia = getattr(self, "_canc_traccia_post", None) or []
                         _md_soglia_tenuta = _md_picco * _md_conferma
-                        _md_tick_tenuti = int(os.environ.get("MD_TICK_TENUTI", "3"))
+                        _md_tick_tenuti = _CONFIG.snap.int("MD_TICK_TENUTI", 3)
                         # conto quanti degli ultimi tick tracciati tengono sopra la soglia
                         _md_ultimi = _md_traccia[-_md_tick_tenuti:] if len(_md_traccia) >= _md_tick_tenuti else _md_traccia
                         _md_tiene = (len(_md_ultimi) >= _md_tick_tenuti) and all(g >= _md_soglia_tenuta for g in _md_ultimi)
@@ -9006,7 +10172,7 @@ class OvertopBassanoV16Production:
                         # _canc_tick_salita conta i tick consecutivi in cui il grasso
                         # cresce — alto = salita dritta, basso = spike/rumore/femmina.
                         # ENV MD_TICK_SALITA_MIN (default 3). 0 = filtro spento.
-                        _md_salita_min = int(float(os.environ.get("MD_TICK_SALITA_MIN", "3")))
+                        _md_salita_min = int(_CONFIG.snap.float("MD_TICK_SALITA_MIN", 3))
                         _md_tick_sal   = getattr(self, "_canc_tick_salita", 0)
                         _md_salita_ok  = (_md_salita_min <= 0) or (_md_tick_sal >= _md_salita_min)
                         _md_ok = _md_mfe_ok and _md_salita_ok
@@ -9028,12 +10194,11 @@ class OvertopBassanoV16Production:
                             self._canc_maschio_ok = True
                             _MAX_PH = 5
                             _gia_aperto = (len(getattr(self, "_phantoms_open", []) or []) >= _MAX_PH)
-                            _dir_ok = (self.campo._direction == "LONG") or (os.environ.get("LONG_ONLY_GATE_OFF", "false").lower() == "true")
+                            _dir_ok = (self.campo._direction == "LONG") or (_CONFIG.snap.bool("LONG_ONLY_GATE_OFF", False))
                             if (not _gia_aperto) and _dir_ok and (not getattr(self, "_maschio_diretto_in_corso", False)):
                                 try:
                                     self._maschio_diretto_in_corso = True
-                                    _seed_q = self.seed_scorer.score()
-                                    _seed_v = _seed_q.get('score', 0.0) if _seed_q.get('reason') != 'insufficient_data' else 0.0
+                                    _seed_v = tctx.seed_value()
                                     _fp_wr = self.oracolo.get_wr(momentum, volatility, trend, self.campo._direction)
                                     _md_grasso_ora = getattr(self, '_canc_grasso_ora', _md_picco)
                                     self._log_m2("🐺", f"MASCHIO CONFERMATO: picco {_md_picco:.2f}$, tiene a {_md_grasso_ora:.2f}$ = ENTRA (confermato dopo il picco)")
@@ -9088,7 +10253,7 @@ class OvertopBassanoV16Production:
                         # ammazzo al primo respiro. Lo storno ha soglia PROPRIA piu'
                         # larga (CANCELLO_STORNI, default 5): do tempo al maschio lento
                         # di ritracciare e ripartire, senza ucciderlo come femmina.
-                        _storni_n = int(float(os.environ.get("CANCELLO_STORNI", "5")))
+                        _storni_n = int(_CONFIG.snap.float("CANCELLO_STORNI", 5))
                         if self._canc_giu_consec >= _storni_n:
                             _cancello_passa = False
                             self._canc_maschio_ok = False
@@ -9125,11 +10290,11 @@ class OvertopBassanoV16Production:
             try:
                 _cs = getattr(self, '_canc_stats', None)
                 if _cs is not None:
-                    _cs_interval = float(os.environ.get('CANC_STATS_MIN', '5')) * 60
+                    _cs_interval = _CONFIG.snap.float("CANC_STATS_MIN", 5) * 60
                     if (time.time() - _cs['ts']) >= _cs_interval:
                         _n_cand = _cs['cand']
                         _mfe_l  = _cs['mfe_list']
-                        _mfe_min_cfg = float(os.environ.get('MD_MFE_MIN', '2.0'))
+                        _mfe_min_cfg = _CONFIG.snap.float("MD_MFE_MIN", 2.0)
                         # distribuzione MFE per bucket
                         def _bkt(lst, lo, hi): return sum(1 for x in lst if lo <= x < hi)
                         _bk = [
@@ -9187,15 +10352,15 @@ class OvertopBassanoV16Production:
                 # firme proprie la fermano. Metal detector nel muro, non un flag.
                 _pb_picco = getattr(self, "_canc_picco_proprio", 0.0)
                 _pb_crollo = getattr(self, "_canc_crollo_proprio", 0.0)
-                _pb_picco_min = float(os.environ.get("MD_MFE_MIN", "0.0"))
-                _pb_mae_max = float(os.environ.get("MD_MAE_MAX", "1.0"))
+                _pb_picco_min = _CONFIG.snap.float("MD_MFE_MIN", 0.0)
+                _pb_mae_max = _CONFIG.snap.float("MD_MAE_MAX", 1.0)
                 _pb_firme_ok = (_pb_picco >= _pb_picco_min) and (_pb_crollo >= -_pb_mae_max)
                 # PORTA B DISATTIVATA (24giu sera): era il doppione di P3 che leggeva
                 # il picco in un momento diverso -> fessura da cui sfuggiva la femmina
                 # 0.664. Ora apre SOLO la porta unica sopra. CHIUSA NEL CODICE
                 # (and False) il 26giu: era la 2a porta senza cattura picco ->
                 # trade con etichetta FEMMINA falsa (picco azzerato). UNA PORTA SOLA.
-                if False and getattr(self, "_canc_maschio_ok", False) and _pb_firme_ok and os.environ.get("MASCHIO_BYPASS_VERO", "false").lower() == "true":
+                if False and getattr(self, "_canc_maschio_ok", False) and _pb_firme_ok and _CONFIG.snap.bool("MASCHIO_BYPASS_VERO", False):
                     try:
                         _seed_v = getattr(self, "_last_seed", 0.5)
                         self._log_m2("🐺", "MASCHIO BYPASS VERO: apro diretto, salto VERITAS/CAPSULE/SCORE/CONST")
@@ -9217,6 +10382,16 @@ class OvertopBassanoV16Production:
         if self._phantoms_open:
             self._update_phantoms(price, momentum)
 
+        # -- UNIVERSI PARALLELI: uscite delle posizioni di carta -------------
+        if self.universi is not None:
+            try:
+                self.universi.step(price, now, momentum)
+                if now - self._universi_salvato >= _CONFIG.snap.float("UNIVERSI_SALVA_S", 300):
+                    self._universi_salvato = now
+                    self._universi_salva()
+            except Exception as _e_un:
+                log.debug(f"[UNIVERSI_ERR] {_e_un}")
+
         # -- POST-TRADE TRACKER: monitora cosa succede dopo exit ----------
         if self.oracolo._post_trade_queue:
             self.oracolo.update_post_trade(price)
@@ -9225,8 +10400,7 @@ class OvertopBassanoV16Production:
         # score_now() calcola senza decidere — pura mappa del segnale nel tempo.
         # Registra tutto ciò che supera 25, prima di qualsiasi filtro.
         if self.campo._tick_count > self.campo.WARMUP_TICKS and momentum:
-            _seed_q = self.seed_scorer.score()
-            _seed_v = _seed_q.get('score', 0.0) if _seed_q.get('reason') != 'insufficient_data' else 0.0
+            _seed_v = tctx.seed_value()
             _fp_wr  = self.oracolo.get_wr(momentum, volatility, trend, self.campo._direction)
             _sn     = self.campo.score_now(_seed_v, _fp_wr, momentum, volatility,
                                             trend, self._regime_current, self.campo._direction)
@@ -9234,15 +10408,23 @@ class OvertopBassanoV16Production:
                 # Salva sempre l'ultimo score per il grafico
                 self.campo._last_score  = _sn['score']
                 self.campo._last_soglia = _sn['soglia']
+                # UNIVERSI PARALLELI: stesse feature, tutte le tarature
+                if self.universi is not None:
+                    try:
+                        _ta = self.universi.usa_ta
+                        self.universi.valuta(
+                            now, price, _seed_v, _fp_wr, momentum, volatility, trend,
+                            self._regime_current, self.campo._direction,
+                            rsi_s=self.campo._rsi_score() if _ta else 0.0,
+                            macd_s=self.campo._macd_score() if _ta else 0.0,
+                            soglia_piatta=_CONFIG.snap.bool("SOGLIA_PIATTA", False),
+                            base=self.campo.SOGLIA_BASE, soglia_min=self.campo.SOGLIA_MIN,
+                            floor=self._universi_floor())
+                    except Exception as _e_un:
+                        log.debug(f"[UNIVERSI_ERR] {_e_un}")
                 # Registra nel tracker se score >= 25
                 # Calcola drift reale — _last_drift non esiste su campo
-                _st_drift = 0.0
-                if len(self.campo._prices_long) >= 100:
-                    _st_p = list(self.campo._prices_long)
-                    _st_old = sum(_st_p[:50]) / 50
-                    _st_new = sum(_st_p[-50:]) / 50
-                    if _st_old > 0:
-                        _st_drift = (_st_new - _st_old) / _st_old * 100
+                _st_drift = tctx.drift()
                 self.signal_tracker.record_signal(
                     price=price,
                     direction=self.campo._direction,
@@ -9290,6 +10472,97 @@ class OvertopBassanoV16Production:
     # ENTRY - catena decisionale completa
     # ========================================================================
 
+    def _universi_floor(self) -> float:
+        """Pavimento del vivo come in evaluate(): SCORE_FLOOR, default 34 con SOGLIA_PIATTA, 48 senza."""
+        if _CONFIG.snap.bool("SOGLIA_PIATTA", False):
+            return float(_CONFIG.snap.int("SCORE_FLOOR", 34))
+        return float(_CONFIG.snap.int("SCORE_FLOOR", 48))
+
+    def _universi_crea(self):
+        """UNIVERSI PARALLELI: tarature da UNIVERSI_FILE (lista JSON) o griglia attorno al vivo."""
+        _floor = self._universi_floor()
+        _file = os.environ.get("UNIVERSI_FILE", "")
+        if _file:
+            with open(_file) as _f:
+                _varianti = json.load(_f)
+        else:
+            _varianti = _universi_griglia(int(os.environ.get("UNIVERSI_N", "256")),
+                                          seme=int(os.environ.get("UNIVERSI_SEME", "16")),
+                                          score_floor=_floor)
+        return UniversiParalleli(_varianti, exposure=self.EXPOSURE, fee=self.FEE_TRADE,
+                                 stop_live=self.STOP_LIVE,
+                                 pausa_s=float(os.environ.get("UNIVERSI_PAUSA_S", "30")),
+                                 soglia_min=self.campo.SOGLIA_MIN,
+                                 soglia_max=self.campo.SOGLIA_MAX,
+                                 riga0_vivo=not _file)
+
+    def _universi_salva(self):
+        """Tabella universi_paralleli: una riga per taratura, riscritta ogni UNIVERSI_SALVA_S."""
+        _ts = time.time()
+        _sql = """INSERT OR REPLACE INTO universi_paralleli
+                  (id, ts, trades, wr, pnl, max_dd, aperta, uscite, taratura)
+                  VALUES (?,?,?,?,?,?,?,?,?)"""
+        _righe = [(r['id'], _ts, r['trades'], r['wr'], r['pnl'], r['max_dd'], int(r['aperta']),
+                   json.dumps(r['uscite']),
+                   json.dumps({k: r[k] for k in ('W', 'SOGLIA_BASE', 'REG_F', 'SCORE_FLOOR')}))
+                  for r in self.universi.tabella(ordine="id")]
+        # dal tick: allo scrittore DB, niente connessione/commit sul thread del tick
+        w = _db_scrittore(DB_PATH)
+        if w is not None:
+            w.esegui_molti(_sql, _righe)
+            return
+        conn = _safe_connect(DB_PATH, timeout=10)
+        try:
+            conn.executemany(_sql, _righe)
+            conn.commit()
+        finally:
+            conn.close()
+
+    _PS_INS = """INSERT INTO primi_secondi
+                   (aggancio_ts, secondo, prezzo_aggancio, prezzo_ora, var_usd)
+                   VALUES (?,?,?,?,?)"""
+
+    def _ps_campione(self, traccia: dict, sec, price: float):
+        """Un campione della traccia, in memoria (secondo puo' essere 0.25, 0.5...)."""
+        prezzo0 = traccia["prezzo0"]
+        _var_usd = ((price - prezzo0) / prezzo0) * _CONFIG.snap.float("EXPOSURE_USD", 5000) if prezzo0 else 0.0
+        traccia["righe"].append((traccia["nascita"], sec, float(prezzo0), float(price), float(_var_usd)))
+
+    def _ps_chiudi(self):
+        """Traccia chiusa: tutti i suoi campioni in primi_secondi in un colpo."""
+        tr, self._ps_traccia = self._ps_traccia, None
+        if not tr or not tr["righe"]:
+            return
+        try:
+            _diario_inserisci_molti(DB_PATH, "primi_secondi", self._PS_INS, tr["righe"])
+        except Exception as _e:
+            log.debug(f"[PRIMI_SEC] scrittura traccia: {_e}")
+
+    def _ps_campiona(self, now: float, price: float, nascita: float, prezzo0: float, sec):
+        """Callback della ruota: secondo `sec` di vita della traccia nata a `nascita`."""
+        tr = self._ps_traccia
+        if tr is None or tr["nascita"] != nascita:
+            return   # arrivato un aggancio nuovo: questa traccia e' gia' chiusa
+        if _CONFIG.snap.bool("TRACK_PRIMI_SEC_OFF", False):
+            return
+        if now - nascita > 12:
+            return   # ci pensa _ps_fine
+        self._ps_campione(tr, sec, price)
+
+    def _ps_fine(self, now: float, price: float, nascita: float):
+        """Callback della ruota a 12s: la traccia chiude e si scrive."""
+        tr = self._ps_traccia
+        if tr is not None and tr["nascita"] == nascita:
+            self._ps_chiudi()
+            self._ps_nascita_ts = None
+
+    def _tctx(self) -> TickContext:
+        """Contesto del tick in corso (fuori dal tick: uno nuovo, senza memoria)."""
+        ctx = self._ctx
+        if ctx is None:
+            ctx = TickContext(self, None, self.clock.now(), self.analyzer.tick_count)
+        return ctx
+
     def _log(self, emoji: str, msg: str):
         """Aggiunge una riga al log live e la spinge subito a heartbeat_data."""
         ts = datetime.utcnow().strftime('%H:%M:%S')
@@ -9311,7 +10584,7 @@ class OvertopBassanoV16Production:
     def _evaluate_entry(self, price, momentum, volatility, trend):
 
         # -- 1. SEED SCORER ------------------------------------------------
-        seed = self.seed_scorer.score()
+        seed = self._tctx().seed()
         dynamic_seed_thresh = self.calibratore.get_params()['seed_threshold']
         if not seed['pass'] or seed['score'] < dynamic_seed_thresh:
             self._log("⚡", f"SEED FAIL score={seed['score']:.3f} | {momentum}/{volatility}/{trend} @ ${price:.1f}")
@@ -9486,7 +10759,7 @@ class OvertopBassanoV16Production:
         duration_avg = self.trade_open["duration_avg"]
 
         if duration > duration_avg * 0.3:   # solo dopo il 30% della durata attesa
-            decel = self.decelero.analyze()
+            decel = self._tctx().decel()
             if decel['should_exit']:
                 self._log("📉", f"DECEL EXIT {self.current_matrimonio} | "
                          f"decel={decel['decel_score']:.2f} "
@@ -10109,12 +11382,7 @@ class OvertopBassanoV16Production:
 
     def _tele_ctx(self, trend_override=None, vol_override=None, bridge_reason=None):
         """Snapshot di contesto per telemetria. Zero logica, solo lettura."""
-        drift = 0.0
-        if len(self.campo._prices_long) >= 100:
-            _p = list(self.campo._prices_long)
-            _old = sum(_p[:50]) / 50
-            _new = sum(_p[-50:]) / 50
-            drift = (_new - _old) / _old * 100 if _old else 0
+        drift = self._tctx().drift()
         return {
             'regime': self._regime_current,
             'direction': self.campo._direction,
@@ -10329,7 +11597,7 @@ class OvertopBassanoV16Production:
         # ===============================================================
         
         # Analizza l'energia ribassista ATTUALE
-        decel = self.decelero.analyze()
+        decel = self._tctx().decel()
         decel_score = decel.get('decel_score', 0)
         mom_fast = decel.get('mom_fast', 0)  # momentum veloce (ultimi 5 tick)
         
@@ -10372,7 +11640,7 @@ class OvertopBassanoV16Production:
         
         # Cooldown: minimo 120 secondi tra flip normali
         # MA: OI SHORT FUOCO >= 0.85 bypassa il cooldown — il mercato ha dichiarato
-        now = time.time()
+        now = self.clock.now()
         _oi_short_fuoco = (getattr(self, '_oi_stato_short', '') == "FUOCO" and
                            getattr(self, '_oi_carica_short', 0) >= 0.85)
         cooldown_ok = (now - campo._direction_last_change) >= 120 or _oi_short_fuoco
@@ -10513,7 +11781,7 @@ class OvertopBassanoV16Production:
         _tsunami_short_ok = False
         try:
             if hasattr(self, 'tsunami') and self.tsunami is not None:
-                _ts_last = self.tsunami.last_decision()
+                _ts_last = self._tctx().tsunami()
                 if _ts_last:
                     _v2 = _ts_last.get('verdetti', {}).get('2min', {})
                     if (_v2.get('direction') == 'DOWN' and 
@@ -10547,7 +11815,12 @@ class OvertopBassanoV16Production:
             if not hasattr(self, '_shadow_short_log'):
                 self._shadow_short_log = []
             if not hasattr(self, '_shadow_short_phantoms'):
-                self._shadow_short_phantoms = []       # phantom SHORT aperti
+                # phantom SHORT aperti: PnL netto, nomi d'uscita storici
+                self._shadow_short_phantoms = (
+                    PhantomBook(capacity=8, exposure=self.TRADE_SIZE_USD * self.LEVERAGE,
+                                fee=self.TRADE_SIZE_USD * self.LEVERAGE * self.FEE_PCT * 2,
+                                nomi={"HARD_STOP": "HARD_STOP_SIM", "DECEL_WIN_SIM": "WIN_SIM"})
+                    if self._phantom_book_on else [])
             if not hasattr(self, '_shadow_short_results'):
                 self._shadow_short_results = deque(maxlen=100)  # risultati chiusi
             
@@ -10568,6 +11841,7 @@ class OvertopBassanoV16Production:
             if len(self._shadow_short_phantoms) < 3 and current_price > 0:
                 self._shadow_short_phantoms.append({
                     'price_entry': current_price,
+                    'direction': 'SHORT',
                     'entry_time': now,
                     'drift': drift,
                     'macd_hist': macd_hist,
@@ -10710,7 +11984,7 @@ class OvertopBassanoV16Production:
         ds = sum(dd[-5:])/5 - sum(dd[-15:])/15 if len(dd) >= 15 else 0
 
         # Volume pressure dal seed scorer
-        _sv = self.seed_scorer.score()
+        _sv = self._tctx().seed()
         # ════════════════════════════════════════════════════════════════
         # PATCH 1 (16mag2026) — VOL_PRESSURE OPZIONE B
         # PRIMA: vp = _sv.get('vol_accel', 0.5) + 1.0
@@ -10848,7 +12122,7 @@ class OvertopBassanoV16Production:
                         sc_decisione="BLOCCA",  # default blocca fino a verifica
                         sc_confidenza=0.5,
                         regime=self._regime_current,
-                        ts=time.time()
+                        ts=self.clock.now()
                     )
 
         # VERITAS: registra ogni transizione a FUOCO o ogni CARICA >= 0.60
@@ -10869,7 +12143,7 @@ class OvertopBassanoV16Production:
                     sc_decisione=sc_dec,
                     sc_confidenza=sc_conf,
                     regime=self._regime_current,
-                    ts=time.time()
+                    ts=self.clock.now()
                 )
             elif self._oi_stato == "CARICA" and self._oi_carica >= 0.55:
                 # Carica alta — registra anche senza FUOCO completo
@@ -10884,7 +12158,7 @@ class OvertopBassanoV16Production:
                         sc_decisione="ATTESA_SC",
                         sc_confidenza=0.0,
                         regime=self._regime_current,
-                        ts=time.time()
+                        ts=self.clock.now()
                     )
 
         # Narrativa — aggiorna ogni 2 secondi max
@@ -10911,7 +12185,7 @@ class OvertopBassanoV16Production:
                     sc_decisione=sc_decisione,
                     sc_confidenza=sc_conf,
                     regime=self._regime_current,
-                    ts=time.time()
+                    ts=self.clock.now()
                 )
 
         # Esponi nel heartbeat
@@ -11001,7 +12275,7 @@ class OvertopBassanoV16Production:
                     _pv2_conf  = conferme
                     _pv2_tot   = totale
                     try:
-                        _pv2_stats = self.predittore_v2.get_stats()
+                        _pv2_stats = self._tctx().pv2_stats()
                         _pv2_nver  = _pv2_stats.get('pred_v2_n_verificate', 0)
                         if _pv2_nver >= 30:
                             _pv2_ready = True
@@ -11080,7 +12354,7 @@ class OvertopBassanoV16Production:
                     # PASSO 13 — PREDITTORE V2 ONESTO (statistiche misurate)
                     # ════════════════════════════════════════════════════════════
                     try:
-                        _pv2 = self.predittore_v2.get_stats()
+                        _pv2 = self._tctx().pv2_stats()
                         for _k, _v in _pv2.items():
                             self.heartbeat_data[_k] = _v
                     except Exception as _e_pv2:
@@ -11169,13 +12443,7 @@ class OvertopBassanoV16Production:
                 # FIX: _ctx aggiornato SEMPRE ad ogni tick dell'Oracolo Interno,
                 # indipendentemente da movimenti_pred/supercervello.
                 # drift calcolato realmente da _prices_long (non _last_drift che non esiste).
-                _ia_drift_ctx = 0.0
-                if len(self.campo._prices_long) >= 100:
-                    _p_ctx = list(self.campo._prices_long)
-                    _avg_old_ctx = sum(_p_ctx[:50]) / 50
-                    _avg_new_ctx = sum(_p_ctx[-50:]) / 50
-                    if _avg_old_ctx > 0:
-                        _ia_drift_ctx = (_avg_new_ctx - _avg_old_ctx) / _avg_old_ctx * 100
+                _ia_drift_ctx = self._tctx().drift()
                 self.realtime_engine._ctx = {
                     'sc_pesi': self.supercervello._pesi.copy() if hasattr(self, 'supercervello') else {},
                     'oi_carica': self._oi_carica,
@@ -11350,7 +12618,7 @@ class OvertopBassanoV16Production:
                 # nascita. Calcolo leggero e già usato altrove, nessun effetto
                 # sulle decisioni: solo per riempire il verbale dell'occhio.
                 try:
-                    _seed_early = self.seed_scorer.score()
+                    _seed_early = self._tctx().seed()
                     _verbale["range_pos"]   = _seed_early.get("range_pos")
                     _verbale["drift_slope"] = _seed_early.get("drift_slope")
                     _verbale["seed_score"]  = _seed_early.get("score")
@@ -11441,7 +12709,7 @@ class OvertopBassanoV16Production:
                 return
 
             # ── SEED (veto fisico 3) ───────────────────────────────────────
-            seed = self.seed_scorer.score()
+            seed = self._tctx().seed()
             if seed.get('reason') == 'insufficient_data':
                 self._log_m2("🔇", f"SEED_INSUFFICIENTE score={seed.get('score',0):.2f}")
                 _verbale["blocked_by"] = "ZONA1_SEED_INSUFFICIENT"
@@ -11566,6 +12834,7 @@ class OvertopBassanoV16Production:
             # ════════════════════════════════════════════════════════════════
             if self.tsunami is not None:
                 _ts_decision = self.tsunami.evaluate()
+                self._tctx().invalida('tsunami')
                 _campo_dir = self.campo._direction  # LONG o SHORT corrente
 
                 # Deposizione Tsunami nel verbale (statuto: tsunami.vota())
@@ -11855,7 +13124,7 @@ class OvertopBassanoV16Production:
             # dal gate peak come tutti. Reversibile: false (o non settata) = vecchio
             # comportamento. NON tocca la logica interna di P1, solo l'ingresso.
             # ═══════════════════════════════════════════════════════════════
-            _p1_off = os.environ.get("P1_EXPLOSIVE_OFF", "false").lower() == "true"
+            _p1_off = _CONFIG.snap.bool("P1_EXPLOSIVE_OFF", False)
             if (_effective_regime == 'EXPLOSIVE' and _eo_carica >= 0.80
                     and not _p1_off):
                 _verbale["percorso"] = "P1_EXPLOSIVE"
@@ -12009,7 +13278,7 @@ class OvertopBassanoV16Production:
                                              seed['score'], momentum, volatility, trend)
                         _verbale["blocked_by"] = f"SC_EXPLOSIVE:{_sc_p1.get('motivo','')[:30]}"
                         self._log_constitutional(_verbale, "SC_BLOCCA_EXPLOSIVE")
-                        if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                        if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                             return
                         self._log_m2("👁", "OBSERVER: SC_BLOCCA_EXPLOSIVE avrebbe bloccato — LASCIO PASSARE")
 
@@ -12101,13 +13370,7 @@ class OvertopBassanoV16Production:
                 # ════════════════════════════════════════════════════════════════
                 DRIFT_MIN_MAGNITUDE = 0.006   # PATCH 12: soglia minima drift
                 try:
-                    _p12_drift = 0.0
-                    if len(self.campo._prices_long) >= 100:
-                        _p_p12 = list(self.campo._prices_long)
-                        _avg_old_p12 = sum(_p_p12[:50]) / 50
-                        _avg_new_p12 = sum(_p_p12[-50:]) / 50
-                        if _avg_old_p12 > 0:
-                            _p12_drift = (_avg_new_p12 - _avg_old_p12) / _avg_old_p12 * 100
+                    _p12_drift = self._tctx().drift()
                     if abs(_p12_drift) < DRIFT_MIN_MAGNITUDE:
                         self._log_m2("🚧",
                             f"ENTRY_BLOCKED_FLAT_DRIFT drift={_p12_drift:+.4f} "
@@ -12115,7 +13378,7 @@ class OvertopBassanoV16Production:
                             f"reason=ZONA_MORTA_MERCATO")
                         _verbale["blocked_by"] = "PATCH12_FLAT_DRIFT"
                         self._log_constitutional(_verbale, "PRE_OPEN_VETO_FLAT_DRIFT_P1")
-                        if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                        if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                             return
                         self._log_m2("👁", "OBSERVER: FLAT_DRIFT avrebbe bloccato — LASCIO PASSARE")
                 except Exception as _e_p12_p1:
@@ -12135,7 +13398,7 @@ class OvertopBassanoV16Production:
                     if getattr(self, "canvas", None) is not None:
                         # PRIMA DEL SEME (2giu): vita dell'energia anche su P1
                         try:
-                            _seed_p1 = self.seed_scorer.score()
+                            _seed_p1 = self._tctx().seed()
                             _verbale["range_pos"]   = _seed_p1.get("range_pos")
                             _verbale["drift_slope"] = _seed_p1.get("drift_slope")
                             _verbale["seed_score"]  = _seed_p1.get("score")
@@ -12159,7 +13422,7 @@ class OvertopBassanoV16Production:
                         _ts_conf_p1 = None
                         try:
                             if hasattr(self, 'tsunami') and self.tsunami is not None:
-                                _last_ts_p1 = self.tsunami.last_decision()
+                                _last_ts_p1 = self._tctx().tsunami()
                                 if _last_ts_p1 is not None:
                                     _v_ts_p1 = _last_ts_p1.get('verdetti', {})
                                     _ts30_p1 = _v_ts_p1.get('30s', {}).get('direction')
@@ -12220,7 +13483,7 @@ class OvertopBassanoV16Production:
                             self._log_m2("👵", f"MATRIGNA BLOCCA P1: {_mat_motivo}")
                             _verbale["blocked_by"] = f"MATRIGNA:{_mat_info.get('firma_key','?')}"
                             self._log_constitutional(_verbale, "PRE_OPEN_VETO_MATRIGNA_P1")
-                            if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                            if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                                 return
                             self._log_m2("👁", "OBSERVER: MATRIGNA P1 avrebbe bloccato — LASCIO PASSARE")
                         elif "OBSERVER_WOULD_BLOCK" in _mat_motivo:
@@ -12237,8 +13500,8 @@ class OvertopBassanoV16Production:
                 # Con MACCHINA_PURA attiva NON deve aprire MAI, cablato — non un ENV
                 # che ti dimentichi (default era false=APERTA, il buco). Le femmine
                 # entravano da qui scavalcando MASCHIO_DIRETTO.
-                _pura = os.environ.get("MACCHINA_PURA", "true").lower() == "true"
-                if _pura or os.environ.get("P1_OFF", "true").lower() == "true":
+                _pura = _CONFIG.snap.bool("MACCHINA_PURA", True)
+                if _pura or _CONFIG.snap.bool("P1_OFF", True):
                     self._log_m2("🚫", "P1 CHIUSA (macchina pura): entra solo MASCHIO_DIRETTO")
                     return
                 self._open_shadow_position(price, score, soglia, seed, size,
@@ -12322,7 +13585,7 @@ class OvertopBassanoV16Production:
                 # i borderline passano (non strangoliamo i maschi).
                 # ENV: MERCATO_MORTO_OFF=true per spegnere/tarare al volo.
                 # ════════════════════════════════════════════════════════════
-                if os.environ.get("MERCATO_MORTO_OFF", "false").lower() != "true":
+                if not _CONFIG.snap.bool("MERCATO_MORTO_OFF", False):
                     _mom = str(momentum).upper()
                     _vol = str(volatility).upper()
                     _tox = ("TOSSICO" in _campo_veto) or ("CTX_" in _campo_veto)
@@ -12348,7 +13611,7 @@ class OvertopBassanoV16Production:
             # 20 campioni di un indicatore che non si usa piu'. Il warmup VERO
             # (prezzi, _prices_long) resta nel motore a monte. ATTRITO_OFF=true
             # spegne questo doppione e il grace post-warmup. REVERSIBILE.
-            _attrito_warmup = os.environ.get("ATTRITO_OFF","false").lower() == "true"
+            _attrito_warmup = _CONFIG.snap.bool("ATTRITO_OFF", False)
             _warmup_rsi = len(self.campo._prices_ta) if hasattr(self.campo, '_prices_ta') else 0
             if _warmup_rsi < 20 and not _attrito_warmup:
                 self._log_m2("⏳", f"BOOT_GUARD: warmup RSI {_warmup_rsi}/20")
@@ -12414,7 +13677,7 @@ class OvertopBassanoV16Production:
                     # sotto uccideva i maschi (log: SCORE_SOTTO 20-29 vs 34).
                     # ENV SCORE_SCAVALCA_MASCHIO (default true) per spegnerlo.
                     # ════════════════════════════════════════════════════════════
-                    _scava = os.environ.get("SCORE_SCAVALCA_MASCHIO", "true").lower() in ("true","1","yes")
+                    _scava = _CONFIG.snap.bool("SCORE_SCAVALCA_MASCHIO", True, vero=("true", "1", "yes"))
                     _e_maschio = bool(getattr(self, "_canc_maschio_ok", False))
                     if _scava and _e_maschio:
                         self._log_m2("🐺", f"MASCHIO SCAVALCA SCORE_SOTTO: {score:.1f} vs {soglia:.1f} "
@@ -12423,7 +13686,7 @@ class OvertopBassanoV16Production:
                     else:
                         # Dittatore SCORE_SOTTO — rinviato a 5b da decisione Roberto.
                         self._log_m2("🔇", f"SCORE_SOTTO: {score:.1f} vs {soglia:.1f}")
-                        if score > 50 and len(self._phantoms_open) < 5:
+                        if score > 50 and len(self._phantoms_open) < _CONFIG.snap.int("PHANTOM_SCORE_MAX_OPEN", 5):
                             self._record_phantom(price, f"SCORE_{score:.0f}_vs_{soglia:.0f}",
                                                  seed['score'], momentum, volatility, trend)
                         _verbale["blocked_by"] = "DITTATORE_SCORE_SOTTO_rinviato_5b"
@@ -12570,7 +13833,7 @@ class OvertopBassanoV16Production:
                 self._log_m2("🚫", f"SC_BLOCCA: {_sc_dec['motivo']}")
                 self._record_phantom(price, f"SC_BLOCCA_{_sc_dec['motivo'][:20]}",
                                      seed['score'], momentum, volatility, trend)
-                if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                     return
                 self._log_m2("👁", "OBSERVER: SC_BLOCCA avrebbe bloccato — LASCIO PASSARE")
 
@@ -12662,13 +13925,7 @@ class OvertopBassanoV16Production:
             # ════════════════════════════════════════════════════════════════
             DRIFT_MIN_MAGNITUDE = 0.006
             try:
-                _p12_drift = 0.0
-                if len(self.campo._prices_long) >= 100:
-                    _p_p12 = list(self.campo._prices_long)
-                    _avg_old_p12 = sum(_p_p12[:50]) / 50
-                    _avg_new_p12 = sum(_p_p12[-50:]) / 50
-                    if _avg_old_p12 > 0:
-                        _p12_drift = (_avg_new_p12 - _avg_old_p12) / _avg_old_p12 * 100
+                _p12_drift = self._tctx().drift()
                 if abs(_p12_drift) < DRIFT_MIN_MAGNITUDE:
                     self._log_m2("🚧",
                         f"ENTRY_BLOCKED_FLAT_DRIFT drift={_p12_drift:+.4f} "
@@ -12676,7 +13933,7 @@ class OvertopBassanoV16Production:
                         f"reason=ZONA_MORTA_MERCATO")
                     _verbale["blocked_by"] = "PATCH12_FLAT_DRIFT"
                     self._log_constitutional(_verbale, "PRE_OPEN_VETO_FLAT_DRIFT_P2")
-                    if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                    if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                         return
                     self._log_m2("👁", "OBSERVER: FLAT_DRIFT P2 avrebbe bloccato — LASCIO PASSARE")
             except Exception as _e_p12_p2:
@@ -12704,7 +13961,7 @@ class OvertopBassanoV16Production:
                         self._log_m2("👵", f"MATRIGNA BLOCCA P2: {_mat_motivo}")
                         _verbale["blocked_by"] = f"MATRIGNA:{_mat_info.get('firma_key','?')}"
                         self._log_constitutional(_verbale, "PRE_OPEN_VETO_MATRIGNA_P2")
-                        if os.environ.get("CANCELLI_OBSERVER", "false").lower() != "true":
+                        if not _CONFIG.snap.bool("CANCELLI_OBSERVER", False):
                             return
                         self._log_m2("👁", "OBSERVER: MATRIGNA P2 avrebbe bloccato — LASCIO PASSARE")
                     elif "OBSERVER_WOULD_BLOCK" in _mat_motivo:
@@ -12723,17 +13980,14 @@ class OvertopBassanoV16Production:
             # Documento audit: /mnt/user-data/outputs/AUDIT_SINAPSI_13GIU2026.md
             # ════════════════════════════════════════════════════════════════
             try:
-                if os.environ.get("SINAPSI_LOOKUP_ENABLED", "false").lower() == "true":
-                    _sin_days = int(os.environ.get("SINAPSI_LOOKUP_DAYS", "7"))
-                    _sin_min_n = int(os.environ.get("SINAPSI_LOOKUP_MIN_N", "20"))
+                if _CONFIG.snap.bool("SINAPSI_LOOKUP_ENABLED", False):
+                    _sin_days = _CONFIG.snap.int("SINAPSI_LOOKUP_DAYS", 7)
+                    _sin_min_n = _CONFIG.snap.int("SINAPSI_LOOKUP_MIN_N", 20)
                     _sin_dir = self.campo._direction
                     _sin_reg = self._regime_current
                     _sin_cutoff = time.time() - (_sin_days * 86400)
                     _sin_conn = None
                     try:
-                        import sqlite3 as _sql_sin
-                        _sin_conn = _sql_sin.connect(self.db_path, timeout=5)
-                        _sin_conn.execute("PRAGMA busy_timeout=5000;")
                         # Lookup: casi storici con firma identica (regime/direction/momentum/volatility/trend)
                         _sin_q = """SELECT COUNT(*) AS n,
                                            SUM(CASE WHEN is_win=1 THEN 1 ELSE 0 END) AS wins,
@@ -12747,9 +14001,18 @@ class OvertopBassanoV16Production:
                                       AND volatility = ?
                                       AND trend = ?
                                       AND mfe_usd IS NOT NULL"""
-                        _sin_cur = _sin_conn.execute(_sin_q, (_sin_cutoff, _sin_reg, _sin_dir,
-                                                              momentum, volatility, trend))
-                        _sin_row = _sin_cur.fetchone()
+                        _sin_par = (_sin_cutoff, _sin_reg, _sin_dir, momentum, volatility, trend)
+                        # DIARIO DB: phantom_forensic sta nei file per giorno,
+                        # la stessa query gira sull'unione dei giorni richiesti
+                        _sin_d = _diario_per(self.db_path, "phantom_forensic")
+                        if _sin_d is not None:
+                            with _sin_d.leggi(_sin_cutoff) as _sin_c:
+                                _sin_row = _sin_c.execute(_sin_q, _sin_par).fetchone()
+                        else:
+                            import sqlite3 as _sql_sin
+                            _sin_conn = _sql_sin.connect(self.db_path, timeout=5)
+                            _sin_conn.execute("PRAGMA busy_timeout=5000;")
+                            _sin_row = _sin_conn.execute(_sin_q, _sin_par).fetchone()
                         _sin_n = _sin_row[0] if _sin_row else 0
                         _sin_wins = _sin_row[1] if _sin_row else 0
                         _sin_peak = _sin_row[2] if _sin_row else None
@@ -12767,27 +14030,13 @@ class OvertopBassanoV16Production:
                                 self._log_m2("⚠️",
                                     f"SINAPSI_AVVISO: contesto storicamente sfavorevole "
                                     f"WR={_sin_wr:.0%} su n={_sin_n} casi (peak medio {_sin_peak:.2f}$)")
-                        # Registra l'osservazione su tabella dedicata
-                        _sin_conn.execute("""CREATE TABLE IF NOT EXISTS sinapsi_observations (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            ts REAL,
-                            firma TEXT,
-                            n_storici INTEGER,
-                            wr_storico REAL,
-                            peak_medio_storico REAL,
-                            crollo_medio_storico REAL,
-                            bot_decisione TEXT,
-                            entry_price REAL,
-                            score REAL,
-                            soglia REAL
-                        )""")
-                        _sin_conn.execute("""INSERT INTO sinapsi_observations
+                        # Registra l'osservazione su tabella dedicata (schema_db)
+                        _diario_inserisci(self.db_path, "sinapsi_observations", """INSERT INTO sinapsi_observations
                             (ts, firma, n_storici, wr_storico, peak_medio_storico,
                              crollo_medio_storico, bot_decisione, entry_price, score, soglia)
                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                             (time.time(), _sin_firma, _sin_n, _sin_wr, _sin_peak,
                              _sin_crollo, "ENTERING", float(price), float(score), float(soglia)))
-                        _sin_conn.commit()
                     except Exception as _e_sin:
                         log.debug(f"[SINAPSI_ERR] {_e_sin}")
                     finally:
@@ -12807,8 +14056,8 @@ class OvertopBassanoV16Production:
             # FIX 24giu (Roberto "metal detector"): porta SCORE-BASED laterale.
             # Da QUI entrava la femmina delle 12:00 (score 36.84, peak 0). Default
             # era false=APERTA. Con MACCHINA_PURA NON apre MAI, cablato.
-            _pura_sc = os.environ.get("MACCHINA_PURA", "true").lower() == "true"
-            if _pura_sc or os.environ.get("SCORE_ENTRY_OFF", "true").lower() == "true":
+            _pura_sc = _CONFIG.snap.bool("MACCHINA_PURA", True)
+            if _pura_sc or _CONFIG.snap.bool("SCORE_ENTRY_OFF", True):
                 # log silenziato 24giu (Roberto): stampava a OGNI candidato debole,
                 # decine di righe inutili che intasavano i log e nascondevano gli
                 # eventi veri (maschi, trans, trade). La porta e' chiusa per design.
@@ -12828,6 +14077,38 @@ class OvertopBassanoV16Production:
             except Exception:
                 pass
 
+    def _campo_esterno_closes(self):
+        """
+        Chiusure 1m per CAMPO_ESTERNO, senza rete: (closes, fonte) oppure
+        (None, None). Candele locali prima (o la cache remota con
+        CAMPO_ESTERNO_FONTE=remoto), l'altra fonte come ripiego.
+        """
+        max_age = _CONFIG.snap.float("CAMPO_ESTERNO_MAX_AGE_S", 90)
+
+        def _locale():
+            if self.tsunami is None:
+                return None
+            c = self.tsunami.aggregator.closes_1m(6)
+            return c if len(c) >= 5 else None
+
+        def _remoto():
+            kp = getattr(self, "_kline_prefetch", None)
+            if kp is None:
+                return None
+            c = kp.get(max_age)
+            return c if c and len(c) >= 5 else None
+
+        ordine = [("locale", _locale), ("remoto", _remoto)]
+        if _CONFIG.snap.str("CAMPO_ESTERNO_FONTE", "locale").lower() == "remoto":
+            ordine.reverse()
+        for fonte, fn in ordine:
+            c = fn()
+            if c is not None:
+                self._campo_esterno_fonte = fonte
+                return c, fonte
+        self._campo_esterno_fonte = None
+        return None, None
+
     def _open_shadow_position(self, price, score, soglia, seed, size,
                                momentum, volatility, trend,
                                matrimonio_name, fingerprint_wr):
@@ -12870,7 +14151,7 @@ class OvertopBassanoV16Production:
             #       Si alza se passano ancora piatte, si abbassa se taglia maschi.
             # try/except totale, FAIL-OPEN: mai bloccare per errore del cancello.
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("CANCELLO_APERTURA_OFF", "false").lower() != "true" and not getattr(self, "_maschio_diretto_in_corso", False):
+            if not _CONFIG.snap.bool("CANCELLO_APERTURA_OFF", False) and not getattr(self, "_maschio_diretto_in_corso", False):
                 try:
                     # ════════════════════════════════════════════════════════════
                     # FILTRO MASCHIO/FEMMINA (19giu2026, Roberto) — REGOLA PURA.
@@ -12898,11 +14179,11 @@ class OvertopBassanoV16Production:
                     # ════════════════════════════════════════════════════════════
                     _grasso  = getattr(self, "_canc_max_usd", None) or getattr(self, "_rit_picco_pre", None) or 0.0
                     _sgonfio = getattr(self, "_canc_tick_da_max", None) or 0
-                    _respiro = int(float(os.environ.get("CANCELLO_RESPIRO_TICK", "40")))
+                    _respiro = int(_CONFIG.snap.float("CANCELLO_RESPIRO_TICK", 40))
                     # grasso CORRENTE ora (per misurare la discesa vera dal picco)
                     try:
                         _delta_ora = (price - self._rit_prezzo_aggancio) if getattr(self, "_rit_prezzo_aggancio", 0) else 0.0
-                        _exp_ora   = float(os.environ.get("EXPOSURE", "5000"))
+                        _exp_ora   = _CONFIG.snap.float("EXPOSURE", 5000)
                         _grasso_ora = _delta_ora * (_exp_ora / self._rit_prezzo_aggancio) if getattr(self, "_rit_prezzo_aggancio", 0) else 0.0
                     except Exception:
                         _grasso_ora = _grasso
@@ -12918,7 +14199,7 @@ class OvertopBassanoV16Production:
                     # tiene il grasso in alto PASSA. ENV CANCELLO_TIENI_PCT (default
                     # 0.60): finche' il grasso corrente >= 60% del picco, e' vivo.
                     # ════════════════════════════════════════════════════════════
-                    _tieni_pct = float(os.environ.get("CANCELLO_TIENI_PCT", "0.60"))
+                    _tieni_pct = _CONFIG.snap.float("CANCELLO_TIENI_PCT", 0.60)
                     _e_sceso = (_grasso > 0.0 and _grasso_ora < _grasso * _tieni_pct)
                     _si_sgonfia = (_sgonfio >= _respiro) and _e_sceso
                     # ════════════════════════════════════════════════════════════
@@ -12937,7 +14218,7 @@ class OvertopBassanoV16Production:
                     # La MACCHINA filtra in USCITA (PRESA_TRANS +3, stop -1), NON qui.
                     # Quindi cancello apertura usa soglia PROPRIA bassa: entra chi ha
                     # un minimo di grasso vivo, il resto lo decide l'uscita.
-                    _grasso_min = float(os.environ.get("CANCELLO_APERTURA_MIN", "0.0"))
+                    _grasso_min = _CONFIG.snap.float("CANCELLO_APERTURA_MIN", 0.0)
                     # ════════════════════════════════════════════════════════════
                     # REGOLA ROBERTO (22giu sera): NON guardare il PICCO. Guarda il
                     # GRASSO CHE HA ADESSO IN MANO (_grasso_ora). Se adesso ha grasso
@@ -12982,37 +14263,35 @@ class OvertopBassanoV16Production:
             # 🌍 CAMPO_ESTERNO — gate kline pre-entrata (luglio2026, Roberto)
             # simula27 (walk-forward + OOS + permutation p=0.000):
             # accel>20 AND mom>0 AND t5m>200 → +33.9$ su 20 trade filtrati.
-            # FAIL-OPEN: se Binance non risponde in 3s, entro comunque.
+            # FIX luglio2026: niente piu' HTTP sul thread del tick (fino a
+            # 3s di blocco proprio all'entrata). Le chiusure 1m vengono
+            # dalle candele locali del TsunamiEngine, stesse kline di
+            # Binance ma gia' in RAM. Con CAMPO_ESTERNO_FONTE=remoto (o
+            # finche' le candele locali non bastano) si legge la cache del
+            # KlinePrefetcher, scartata se piu' vecchia di MAX_AGE.
+            # FAIL-OPEN: nessuna fonte valida → entro comunque.
             # ENV: CAMPO_ESTERNO_OFF=true  → disabilita gate
+            #      CAMPO_ESTERNO_FONTE     (locale | remoto, default locale)
+            #      CAMPO_ESTERNO_MAX_AGE_S (default 90)
             #      CAMPO_ACCEL_MIN (default 20)
             #      CAMPO_MOM_MIN   (default 0)
             #      CAMPO_T5M_MIN   (default 200)
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("CAMPO_ESTERNO_OFF", "false").lower() != "true":
+            if not _CONFIG.snap.bool("CAMPO_ESTERNO_OFF", False):
                 try:
-                    import urllib.request as _ur, urllib.parse as _up
-                    _ce_ts_ms  = int(time.time() * 1000)
-                    _ce_params = _up.urlencode({
-                        "symbol": "BTCUSDC", "interval": "1m",
-                        "endTime": _ce_ts_ms, "limit": 6,
-                    })
-                    with _ur.urlopen(
-                        f"https://api.binance.com/api/v3/klines?{_ce_params}",
-                        timeout=3
-                    ) as _ce_r:
-                        _ce_klines = json.loads(_ce_r.read())
-                    if _ce_klines and len(_ce_klines) >= 5:
-                        _ce_c     = [float(k[4]) for k in _ce_klines]
+                    _ce_c, _ce_fonte = self._campo_esterno_closes()
+                    if _ce_c is not None:
                         _ce_t5m   = _ce_c[-1] - _ce_c[0]
                         _ce_mom   = _ce_c[-1] - _ce_c[-2]
                         _ce_accel = _ce_mom - (_ce_c[-3] - _ce_c[-4])
-                        _ce_a_min = float(os.environ.get("CAMPO_ACCEL_MIN", "20"))
-                        _ce_m_min = float(os.environ.get("CAMPO_MOM_MIN",    "0"))
-                        _ce_t_min = float(os.environ.get("CAMPO_T5M_MIN",  "200"))
+                        _ce_a_min = _CONFIG.snap.float("CAMPO_ACCEL_MIN", 20)
+                        _ce_m_min = _CONFIG.snap.float("CAMPO_MOM_MIN", 0)
+                        _ce_t_min = _CONFIG.snap.float("CAMPO_T5M_MIN", 200)
                         _ce_passa = (_ce_accel > _ce_a_min and
                                      _ce_mom   > _ce_m_min and
                                      _ce_t5m   > _ce_t_min)
-                        _ce_log   = (f"accel={_ce_accel:+.1f}>{_ce_a_min} "
+                        _ce_log   = (f"[{_ce_fonte}] "
+                                     f"accel={_ce_accel:+.1f}>{_ce_a_min} "
                                      f"mom={_ce_mom:+.1f}>{_ce_m_min} "
                                      f"t5m={_ce_t5m:+.1f}>{_ce_t_min}")
                         if _ce_passa:
@@ -13039,11 +14318,14 @@ class OvertopBassanoV16Production:
                                 pass
                             return  # NON APRE — campo esterno sfavorevole
                     else:
-                        print(f"[CAMPO_ESTERNO] kline insufficienti — FAIL-CLOSED")
-                        return  # NON APRE — campo non verificabile
+                        print(f"[CAMPO_ESTERNO] nessuna fonte 1m valida — FAIL-OPEN")
+                        try:
+                            self._ritardo_stats["campo_esterno_failopen"] = \
+                                self._ritardo_stats.get("campo_esterno_failopen", 0) + 1
+                        except Exception:
+                            pass
                 except Exception as _ce_err:
-                    print(f"[CAMPO_ESTERNO] {_ce_err} — FAIL-CLOSED")
-                    return  # NON APRE — campo non verificabile
+                    print(f"[CAMPO_ESTERNO] {_ce_err} — FAIL-OPEN")
 
             # ════════════════════════════════════════════════════════════════
             # 🛡️ GRANDE FRATELLO DIREZIONE (GF) — 8giu, Roberto
@@ -13066,10 +14348,10 @@ class OvertopBassanoV16Production:
             # gira SEMPRE, anche in MACCHINA_PURA. La regola "in short si sta fuori"
             # NON e' vecchio cervello: e' fondamentale (Roberto). Prima _pura_gf la
             # saltava -> il bot apriva LONG mentre il mercato colava. Ora no.
-            if os.environ.get("GF_DIREZIONE_OFF", "false").lower() != "true":
+            if not _CONFIG.snap.bool("GF_DIREZIONE_OFF", False):
                 _gf_dir = getattr(self.campo, "_direction", "LONG")
                 if _gf_dir == "LONG":
-                    _gf_soglia = float(os.environ.get("GF_DRIFT_SOGLIA", "-0.05"))
+                    _gf_soglia = _CONFIG.snap.float("GF_DRIFT_SOGLIA", -0.05)
                     _gf_prices = list(getattr(self.campo, "_prices_long", []))
                     if len(_gf_prices) >= 100:
                         _gf_old = sum(_gf_prices[:50]) / 50
@@ -13136,8 +14418,8 @@ class OvertopBassanoV16Production:
             # FIX 24giu (Roberto): SEME_GATE guardiano VECCHIO (398 false-female sui
             # dati, narrazione smentita). Bloccava il maschio dopo "ENTRA SUBITO".
             # Con MACCHINA_PURA non interviene.
-            _pura_seme = os.environ.get("MACCHINA_PURA", "true").lower() == "true"
-            if not _pura_seme and len(_sh) >= 2 and os.environ.get("SEME_GATE_OFF","false").lower() != "true":
+            _pura_seme = _CONFIG.snap.bool("MACCHINA_PURA", True)
+            if not _pura_seme and len(_sh) >= 2 and not _CONFIG.snap.bool("SEME_GATE_OFF", False):
                 _seme_medio = (_sh[0] + _sh[-1]) / 2.0
                 if _seme_medio < SEME_GATE_SOGLIA:
                     self._log("🚫", f"SEME_GATE BLOCCO femmina: seme={_seme_medio:.3f} "
@@ -13182,12 +14464,12 @@ class OvertopBassanoV16Production:
             # FIX 24giu (Roberto): CROMO guardiano VECCHIO (anti-fee non anti-trans,
             # 2638 trade bloccati 0 crash evitati). Bloccava il maschio dopo
             # "ENTRA SUBITO". Con MACCHINA_PURA non interviene.
-            _pura_cromo = os.environ.get("MACCHINA_PURA", "true").lower() == "true"
-            CROMO_GATE_ON   = (not _pura_cromo) and os.environ.get("CROMO_GATE_ON", "true").lower() == "true"
-            CROMO_VPRESS_MIN = float(os.environ.get("CROMO_VPRESS_MIN", "0.46"))
-            CROMO_VPRESS_MAX = float(os.environ.get("CROMO_VPRESS_MAX", "1.13"))
-            CROMO_COMP_MAX   = float(os.environ.get("CROMO_COMP_MAX", "0.64"))
-            CROMO_CDUR_MIN   = float(os.environ.get("CROMO_CDUR_MIN", "0"))
+            _pura_cromo = _CONFIG.snap.bool("MACCHINA_PURA", True)
+            CROMO_GATE_ON   = (not _pura_cromo) and _CONFIG.snap.bool("CROMO_GATE_ON", True)
+            CROMO_VPRESS_MIN = _CONFIG.snap.float("CROMO_VPRESS_MIN", 0.46)
+            CROMO_VPRESS_MAX = _CONFIG.snap.float("CROMO_VPRESS_MAX", 1.13)
+            CROMO_COMP_MAX   = _CONFIG.snap.float("CROMO_COMP_MAX", 0.64)
+            CROMO_CDUR_MIN   = _CONFIG.snap.float("CROMO_CDUR_MIN", 0)
             if CROMO_GATE_ON:
                 _vp = seed.get('vol_pressure')
                 _cp = seed.get('compression')
@@ -13208,26 +14490,12 @@ class OvertopBassanoV16Production:
                         # PERSISTENZA 6giu: scrivo il blocco nel DB (non solo in RAM).
                         # Cosi' NON si azzera al restart e si fanno i conti veri:
                         # quando e' stato bloccato, con che firma, a che prezzo.
-                        _cn = None
                         try:
-                            import sqlite3 as _sq3
-                            _cn = _sq3.connect(DB_PATH, timeout=15)
-                            _cn.execute("PRAGMA busy_timeout=15000;")
-                            _cn.execute("""CREATE TABLE IF NOT EXISTS trans_bloccati (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                causa TEXT, vpress REAL, comp REAL, prezzo REAL)""")
-                            _cn.execute("INSERT INTO trans_bloccati (causa,vpress,comp,prezzo) VALUES (?,?,?,?)",
-                                        (_causa, float(_vp), float(_cp), float(price)))
-                            _cn.commit()
+                            _db_inserisci(DB_PATH,
+                                "INSERT INTO trans_bloccati (causa,vpress,comp,prezzo) VALUES (?,?,?,?)",
+                                (_causa, float(_vp), float(_cp), float(price)))
                         except Exception:
                             pass
-                        finally:
-                            if _cn is not None:
-                                try:
-                                    _cn.close()
-                                except Exception:
-                                    pass
                         self._log("🚫", f"CROMO_GATE v4 BLOCCO femmina ({_causa}) "
                                         f"[tot: {self._cromo_blocchi['totale']}]: "
                                         f"vpress={_vp:.3f}[{CROMO_VPRESS_MIN}-{CROMO_VPRESS_MAX}] "
@@ -13244,7 +14512,7 @@ class OvertopBassanoV16Production:
                         # block_reason marcato CROMO_ così si filtra in query.
                         # ════════════════════════════════════════════════════════
                         try:
-                            if float(os.environ.get("CROMO_OSSERVA_SEC", "30")) > 0:
+                            if _CONFIG.snap.float("CROMO_OSSERVA_SEC", 30) > 0:
                                 self._record_phantom(
                                     price,
                                     f"CROMO_{_causa}_vp{_vp:.2f}_cp{_cp:.2f}",
@@ -13268,19 +14536,19 @@ class OvertopBassanoV16Production:
             # ⚠ PROVA: guardare dal vivo se i maschi lenti salgono e i trans
             #   calano. Reversibile in un colpo: RITARDO_INGRESSO_SEC=0.
             # ════════════════════════════════════════════════════════════════
-            _rit_sec = float(os.environ.get("RITARDO_INGRESSO_SEC", "4"))
+            _rit_sec = _CONFIG.snap.float("RITARDO_INGRESSO_SEC", 4)
             # FIX 24giu (Roberto): TUTTO questo blocco "ritardo" e' il vecchio sistema
             # di mine (MINA_MAE, ANTIISTERIA, ANTICORDATA, CONTRO, RIPIENO, GATE...)
             # che bloccavano il maschio DOPO "ENTRA SUBITO" (logga ma non apre).
             # Con MACCHINA_PURA il maschio e' gia' stato giudicato dalle firme
             # (picco/mae propri): NON deve incontrare nessuna di queste mine vecchie.
             # Le salto TUTTE in un colpo.
-            _pura_rit = os.environ.get("MACCHINA_PURA", "true").lower() == "true"
+            _pura_rit = _CONFIG.snap.bool("MACCHINA_PURA", True)
             if _pura_rit:
                 _rit_sec = 0   # macchina pura: nessuna mina del vecchio sistema ritardo
             if _rit_sec > 0:
                 _rit_now      = time.time()
-                _rit_gap      = float(os.environ.get("RITARDO_RESET_GAP", "3.0"))
+                _rit_gap      = _CONFIG.snap.float("RITARDO_RESET_GAP", 3.0)
                 _rit_aggancio = getattr(self, "_rit_aggancio_ts", None)
                 _rit_last     = getattr(self, "_rit_last_call", 0.0)
                 if not hasattr(self, "_ritardo_stats"):
@@ -13301,7 +14569,7 @@ class OvertopBassanoV16Production:
                     # prezzo vicino, il nuovo aggancio NON parte pulito: eredita
                     # il minimo del crollo, così l'anti-falsa-ripartenza lo becca.
                     # ENV: RIAGGANCIO_MEMORIA_SEC (default 20; 0 = spento).
-                    _riag_sec = float(os.environ.get("RIAGGANCIO_MEMORIA_SEC", "20"))
+                    _riag_sec = _CONFIG.snap.float("RIAGGANCIO_MEMORIA_SEC", 20)
                     _ult_crollo_ts = getattr(self, "_rit_ultimo_crollo_ts", None)
                     if _riag_sec > 0 and _ult_crollo_ts is not None and (_rit_now - _ult_crollo_ts) <= _riag_sec:
                         # ri-aggancio dopo un crollo recente -> eredita il sospetto
@@ -13324,13 +14592,6 @@ class OvertopBassanoV16Production:
                         import sqlite3 as _sq3ag
                         _ag = _sq3ag.connect(DB_PATH, timeout=15)
                         _ag.execute("PRAGMA busy_timeout=15000;")
-                        _ag.execute("""CREATE TABLE IF NOT EXISTS ritardo_agganci (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                            aggancio_ts REAL, direction TEXT,
-                            vpress REAL, comp REAL, seed REAL,
-                            momentum TEXT, volatility TEXT, trend TEXT,
-                            prezzo REAL, peak_pnl REAL, entrato INTEGER DEFAULT 0)""")
                         _cur_ag = _ag.execute(
                             """INSERT INTO ritardo_agganci
                                (aggancio_ts, direction, vpress, comp, seed,
@@ -13364,7 +14625,7 @@ class OvertopBassanoV16Production:
                 # ENV: MAE_FILTRO_USD (default 0.50; 0 = spento). E' in $ sul
                 # movimento prezzo proporzionale a size/exposure. Reversibile.
                 # ════════════════════════════════════════════════════════════
-                _mae_soglia = float(os.environ.get("MAE_FILTRO_USD", "0.50"))
+                _mae_soglia = _CONFIG.snap.float("MAE_FILTRO_USD", 0.50)
                 if _mae_soglia > 0:
                     # uso il prezzo di NASCITA fisso (10giu fix radice): non si
                     # resetta a ogni ripartenza del conteggio. Prima il TRANS che
@@ -13373,7 +14634,7 @@ class OvertopBassanoV16Production:
                     if _prezzo_aggancio is None:
                         self._rit_prezzo_nascita = price
                         _prezzo_aggancio = price
-                    _exposure = float(os.environ.get("EXPOSURE_USD", "5000"))
+                    _exposure = _CONFIG.snap.float("EXPOSURE_USD", 5000)
                     # POSIZIONE ASSOLUTA rispetto all'aggancio (10giu, logica corretta):
                     # i dati di Roberto dicono maschi SEMPRE sopra zero (mae -0.08),
                     # dopate SEMPRE sotto (mae -1.06). Quindi NON misuro la caduta dal
@@ -13422,7 +14683,7 @@ class OvertopBassanoV16Production:
                     if _crollo_min is None or _pos_usd < _crollo_min:
                         self._rit_crollo_min = _pos_usd
                         _crollo_min = _pos_usd
-                    _crollo_max = float(os.environ.get("CROLLO_MAX_USD", "2.0"))
+                    _crollo_max = _CONFIG.snap.float("CROLLO_MAX_USD", 2.0)
                     if _crollo_max > 0 and _crollo_min is not None and _crollo_min <= -_crollo_max:
                         # ha toccato il fondo (crollo) durante l'attesa -> marcio anche se rimbalza
                         self._log("💀", f"FALSA RIPARTENZA scartata "
@@ -13468,7 +14729,7 @@ class OvertopBassanoV16Production:
                     # momentum coerenti. ENV: VOL_ISTERICO_MAX (default 0 = spento,
                     # accendere a ~1.0 per bloccare vp oltre soglia con mom DEBOLE).
                     # ════════════════════════════════════════════════════════
-                    _vol_ist = float(os.environ.get("VOL_ISTERICO_MAX", "0"))
+                    _vol_ist = _CONFIG.snap.float("VOL_ISTERICO_MAX", 0)
                     if _vol_ist > 0:
                         _vp_now = seed.get("vol_pressure")
                         if (_vp_now is not None and float(_vp_now) >= _vol_ist
@@ -13552,8 +14813,8 @@ class OvertopBassanoV16Production:
                             self._rit_picco_pre = _pos_usd
                             _picco_pre = _pos_usd
                             self._rit_picco_pre_ag_ts = getattr(self, "_rit_aggancio_ts", None)
-                        _sgonfio_pct = float(os.environ.get("SCATTO_SGONFIO_PCT", "0.50"))
-                        _picco_min = float(os.environ.get("SCATTO_PICCO_MIN", "0.6"))
+                        _sgonfio_pct = _CONFIG.snap.float("SCATTO_SGONFIO_PCT", 0.50)
+                        _picco_min = _CONFIG.snap.float("SCATTO_PICCO_MIN", 0.6)
                         if _sgonfio_pct > 0 and _picco_pre is not None and _picco_pre >= _picco_min:
                             # quanto si è sgonfiato dal picco dell'attesa?
                             _sgonfio = (_picco_pre - _pos_usd) / _picco_pre if _picco_pre > 0 else 0
@@ -13589,15 +14850,15 @@ class OvertopBassanoV16Production:
                         # ENV: SALITA_MIN_USD (default 0.40; 0 = spento).
                         #      SALITA_DOPO_SEC (default 3 = do 3s al maschio per salire).
                         # ════════════════════════════════════════════════════════
-                        _salita_min = float(os.environ.get("SALITA_MIN_USD", "0.40"))
-                        _salita_dopo = float(os.environ.get("SALITA_DOPO_SEC", "3"))
+                        _salita_min = _CONFIG.snap.float("SALITA_MIN_USD", 0.40)
+                        _salita_dopo = _CONFIG.snap.float("SALITA_DOPO_SEC", 3)
                         # CANCELLO_TIENI_PCT (18giu, Roberto): quanto deve stare VICINO
                         # al suo picco nel momento della decisione per essere maschio.
                         # 0.75 = deve tenere almeno il 75% del massimo raggiunto.
                         # Il rimbalzo-femmina (sale a +1.1, crolla a +0.1 = 9% del picco)
                         # viene tagliato. Il maschio che respira (+1.5 -> +1.4 = 93%) passa.
                         # Cosi' guardiamo il FILM (la sequenza), non la FOTO (l'istante).
-                        _tieni_pct = float(os.environ.get("CANCELLO_TIENI_PCT", "0.75"))
+                        _tieni_pct = _CONFIG.snap.float("CANCELLO_TIENI_PCT", 0.75)
                         if _salita_min > 0:
                             _eta_attesa = _rit_now - _rit_aggancio
                             _picco_osservato = getattr(self, "_rit_picco_pre", None) or 0.0
@@ -13654,7 +14915,7 @@ class OvertopBassanoV16Production:
                         # dopata che si svuota -> NON entra, non paghiamo fee.
                         # ENV: RIPIEG_PRE_USD (default 0.60; 0 = spento). Reversibile.
                         # ════════════════════════════════════════════════════════
-                        _ripieg_soglia = float(os.environ.get("RIPIEG_PRE_USD", "0.60"))
+                        _ripieg_soglia = _CONFIG.snap.float("RIPIEG_PRE_USD", 0.60)
                         if _ripieg_soglia > 0:
                             _picco_pre = getattr(self, "_rit_picco_pre", None)
                             if _picco_pre is None or self._rit_aggancio_ts == _rit_now:
@@ -13699,10 +14960,10 @@ class OvertopBassanoV16Production:
                     # Il tempo è il giudice. ENV: ANTICORDA_ZONA (default 1.0 = zona
                     #  incerta ±1$), RITARDO_EXTRA_SEC (default 2). ANTICORDA_OFF spegne.
                     # ════════════════════════════════════════════════════════
-                    if os.environ.get("ANTICORDA_OFF", "false").lower() != "true":
-                        _zona = float(os.environ.get("ANTICORDA_ZONA", "1.0"))
-                        _extra = float(os.environ.get("RITARDO_EXTRA_SEC", "2"))
-                        _exp_fin = float(os.environ.get("EXPOSURE_USD", "5000"))
+                    if not _CONFIG.snap.bool("ANTICORDA_OFF", False):
+                        _zona = _CONFIG.snap.float("ANTICORDA_ZONA", 1.0)
+                        _extra = _CONFIG.snap.float("RITARDO_EXTRA_SEC", 2)
+                        _exp_fin = _CONFIG.snap.float("EXPOSURE_USD", 5000)
                         _ep_fin = getattr(self, "_rit_prezzo_nascita", None) or price
                         _dir_fin = getattr(self.campo, "_direction", "LONG")
                         _delta_fin = (price - _ep_fin) / _ep_fin
@@ -13781,11 +15042,11 @@ class OvertopBassanoV16Production:
                     #   GATE_PEAK_OBSERVER (true)    = true osserva, false decide
                     #   GATE_PEAK_OFF (false)        = true spegne del tutto
                     # ════════════════════════════════════════════════════════════════
-                    if os.environ.get("GATE_PEAK_OFF", "false").lower() != "true":
+                    if not _CONFIG.snap.bool("GATE_PEAK_OFF", False):
                         try:
-                            _gp_soglia = float(os.environ.get("GATE_PEAK_USD", "1.0"))
-                            _gp_finestra = float(os.environ.get("GATE_PEAK_FINESTRA_SEC", "15"))
-                            _gp_observer = os.environ.get("GATE_PEAK_OBSERVER", "true").lower() == "true"
+                            _gp_soglia = _CONFIG.snap.float("GATE_PEAK_USD", 1.0)
+                            _gp_finestra = _CONFIG.snap.float("GATE_PEAK_FINESTRA_SEC", 15)
+                            _gp_observer = _CONFIG.snap.bool("GATE_PEAK_OBSERVER", True)
                             _gp_picco = getattr(self, "_rit_picco_pre", None)
                             _gp_picco = _gp_picco if _gp_picco is not None else -999.0
                             # il picco e' valido solo se osservato entro la finestra
@@ -13802,15 +15063,8 @@ class OvertopBassanoV16Production:
                             # Tabella usa-e-getta: DROP quando la taratura e' fatta.
                             # ════════════════════════════════════════════════
                             try:
-                                _go = _safe_connect(DB_PATH, timeout=5)
-                                _go.execute("PRAGMA busy_timeout=5000;")
-                                _go.execute("""CREATE TABLE IF NOT EXISTS gate_peak_osserva (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    ts REAL DEFAULT (strftime('%s','now')),
-                                    picco_pre REAL, soglia REAL, t_atteso REAL,
-                                    passa INTEGER, observer INTEGER,
-                                    regime TEXT, direction TEXT, prezzo REAL)""")
-                                _go.execute("""INSERT INTO gate_peak_osserva
+                                _diario_inserisci(DB_PATH, "gate_peak_osserva",
+                                    """INSERT INTO gate_peak_osserva
                                     (picco_pre, soglia, t_atteso, passa, observer, regime, direction, prezzo)
                                     VALUES (?,?,?,?,?,?,?,?)""",
                                     (float(_gp_picco), float(_gp_soglia), float(_rit_atteso),
@@ -13818,8 +15072,6 @@ class OvertopBassanoV16Production:
                                      str(getattr(self, "_regime_current", "") or ""),
                                      str(getattr(getattr(self, "campo", None), "_direction", "") or ""),
                                      float(price)))
-                                _go.commit()
-                                _go.close()
                             except Exception:
                                 pass
                             if _gp_passa:
@@ -13896,6 +15148,7 @@ class OvertopBassanoV16Production:
                 "nato_ts":       time.time(),   # istante di nascita, per filmato 10s/20s
                 "pnl_10s":       None,           # fotografia PnL a 10 secondi (riempita dopo)
                 "pnl_20s":       None,           # fotografia PnL a 20 secondi (riempita dopo)
+                "tick_ctx":      self._tctx().record(),   # derivati del tick d'ingresso
                 "direction":     self.campo._direction,
                 "duration_avg":  matrimonio.get("duration_avg", 20),
                 "score":         round(score, 2),
@@ -13908,7 +15161,7 @@ class OvertopBassanoV16Production:
                 # FIX 29giu (Roberto): salva la soglia MD_MFE_MIN usata ALL'ENTRATA.
                 # Alla chiusura, la classificazione SESSO usa QUESTA, non il valore
                 # corrente dell'ENV (che potrebbe essere cambiato → label sbagliata).
-                "md_mfe_min_entry": float(os.environ.get("MD_MFE_MIN", "2.0")),
+                "md_mfe_min_entry": _CONFIG.snap.float("MD_MFE_MIN", 2.0),
                 "seed":          round(seed.get('score', 0), 3),
                 # ════════════════════════════════════════════════════════════
                 # SEME D'INGRESSO (4giu, Roberto: "tutto questo PRIMA del trade")
@@ -13987,7 +15240,7 @@ class OvertopBassanoV16Production:
             # Questa è SOLO una telefonata "ehi, chi presidia? me lo segno".
             # ═════════════════════════════════════════════════════════════════
             self._shadow_capsula_v2_attribuita = None
-            if os.environ.get("CAPSULE_V2_HOOK_ENABLED", "false").lower() == "true":
+            if _CONFIG.snap.bool("CAPSULE_V2_HOOK_ENABLED", False):
                 try:
                     import requests as _rq_cv2
                     _direction = self._shadow.get('direction', 'LONG')
@@ -14023,11 +15276,7 @@ class OvertopBassanoV16Production:
                         if hasattr(self, 'supercervello') and self.supercervello is not None \
                         else {'source': 'NO_SC'}
                     _rsi_entry = getattr(self.campo, '_last_rsi', 50)
-                    _drift_entry = 0.0
-                    if len(self.campo._prices_long) >= 100:
-                        _p = list(self.campo._prices_long)
-                        _drift_entry = (sum(_p[-50:])/50 - sum(_p[:50])/50) \
-                                       / (sum(_p[:50])/50) * 100
+                    _drift_entry = self._tctx().drift()
                     # ════════════════════════════════════════════════════════════════
                     # PATCH 13 BUG 20b — Cattura segnali pre-entry (OSSERVATIVO)
                     # ════════════════════════════════════════════════════════════════
@@ -14098,7 +15347,7 @@ class OvertopBassanoV16Production:
                     _ts_conf = None
                     try:
                         if hasattr(self, 'tsunami') and self.tsunami is not None:
-                            _last_ts = self.tsunami.last_decision()
+                            _last_ts = self._tctx().tsunami()
                             if _last_ts is not None:
                                 _v_ts = _last_ts.get('verdetti', {})
                                 _t30 = _v_ts.get('30s', {})
@@ -14162,9 +15411,10 @@ class OvertopBassanoV16Production:
                     self._shadow['_winsig_entry'] = _sig_entry
                     self._shadow['_winsig_match_at_entry'] = _match_at_entry
                     if _match_at_entry is not None:
+                        _vicini = self._winsig.nearest_match(_sig_entry)
                         self._log_m2("🔬",
                             f"WINSIG entry match_with_last_WIN={_match_at_entry:.2f} "
-                            f"(0=diverso, 1=identico)")
+                            f"(0=diverso, 1=identico) | piu' simili {_vicini}")
             except Exception as _wse:
                 # Mai bloccare l'entry per un problema del logger osservativo
                 pass
@@ -14288,35 +15538,15 @@ class OvertopBassanoV16Production:
             pnl_finale = curva[-1][1]
             peak_nascita = max((p[2] for p in curva), default=0.0)
             t_peak = next((p[0] for p in curva if p[2] >= peak_nascita), None)
-            conn = _safe_connect(DB_PATH, timeout=30)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS curva_nascita (
-                    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                    trade_ts     REAL,
-                    firma        TEXT,
-                    n_punti      INTEGER,
-                    peak_nascita REAL,
-                    t_peak_s     REAL,
-                    pnl_a_10s    REAL,
-                    curva_json   TEXT,
-                    created_ts   REAL DEFAULT (strftime('%s','now'))
-                )
-            """)
-            # Migrazione dolce: aggiunge pnl_finale se la tabella e' vecchia
-            try:
-                _cols = [r[1] for r in conn.execute("PRAGMA table_info(curva_nascita)").fetchall()]
-                if 'pnl_finale' not in _cols:
-                    conn.execute("ALTER TABLE curva_nascita ADD COLUMN pnl_finale REAL")
-            except Exception as _ae:
-                log.debug(f"[CURVA_NASCITA_MIGRATE] {_ae}")
-            conn.execute("""
+            _riga = (trade_ts, firma, n_punti, round(peak_nascita, 4),
+                     t_peak, round(pnl_a_10s, 4), json.dumps(curva), round(pnl_finale, 4))
+            _ins = """
                 INSERT INTO curva_nascita
                     (trade_ts, firma, n_punti, peak_nascita, t_peak_s, pnl_a_10s, curva_json, pnl_finale)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (trade_ts, firma, n_punti, round(peak_nascita, 4),
-                  t_peak, round(pnl_a_10s, 4), json.dumps(curva), round(pnl_finale, 4)))
-            conn.commit()
-            conn.close()
+            """
+            # tabella e colonna pnl_finale: schema_db al boot
+            _db_inserisci(DB_PATH, _ins, _riga)
         except Exception as _e:
             log.debug(f"[SAVE_CURVA_NASCITA_ERR] {_e}")
 
@@ -14506,7 +15736,7 @@ class OvertopBassanoV16Production:
             # ZONA_MORTA disattivata: non si taglia per tempo un trade in perdita.
             # (Lo stop loss 2% qui sotto resta il solo freno sulle perdite.)
 
-            HARD_STOP_USD = float(os.environ.get("HARD_STOP_USD", str(self.STOP_LIVE)))
+            HARD_STOP_USD = _CONFIG.snap.float("HARD_STOP_USD", self.STOP_LIVE)
             if current_pnl_real < -HARD_STOP_USD:
                 self._close_shadow_trade(price, f"HARD_STOP_${abs(current_pnl_real):.1f}_max${HARD_STOP_USD:.0f}")
                 return
@@ -14536,10 +15766,10 @@ class OvertopBassanoV16Production:
             # Soglia peak 1.5 -> 3.0: prende TUTTE le 9 femmine (0 sfuggite), costa
             # solo 2 maschietti (peak 1.84/+1.65 e 1.24/+1.10). Baratto: blocca 9
             # femmine (2 da -9) per 2 maschi da +1. Il +22 (peak 22) non e' toccato.
-            _freno_off   = os.environ.get("FRENO_COLATA_OFF", "false").lower() == "true"
-            _freno_pnl   = float(os.environ.get("FRENO_COLATA_PNL", "3.5"))
-            _freno_peak  = float(os.environ.get("FRENO_COLATA_PEAK", "3.0"))
-            _freno_tempo = float(os.environ.get("KILLER_TEMPO", "35"))
+            _freno_off   = _CONFIG.snap.bool("FRENO_COLATA_OFF", False)
+            _freno_pnl   = _CONFIG.snap.float("FRENO_COLATA_PNL", 3.5)
+            _freno_peak  = _CONFIG.snap.float("FRENO_COLATA_PEAK", 3.0)
+            _freno_tempo = _CONFIG.snap.float("KILLER_TEMPO", 35)
             if (not _freno_off
                     and current_pnl_real < -_freno_pnl
                     and self._trade_peak_pnl < _freno_peak
@@ -14596,7 +15826,7 @@ class OvertopBassanoV16Production:
             # sale e NON cede non scatta (resta protetto, corre). Stessa logica
             # del SALVA_VERDE sotto, solo anticipata. Spegnibile TRAIL_OFF.
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("TRAIL_OFF", "false").lower() != "true":
+            if not _CONFIG.snap.bool("TRAIL_OFF", False):
                 _ep_sv = self._shadow["price_entry"]
                 _sdelta_sv = (price - _ep_sv) if entry_direction != "SHORT" else (_ep_sv - price)
                 _cur_sv = _sdelta_sv * (5000.0 / _ep_sv)   # lordo
@@ -14604,8 +15834,8 @@ class OvertopBassanoV16Production:
                     _max_sv = (_ep_sv - self._shadow_min_price) * (5000.0 / _ep_sv)
                 else:
                     _max_sv = (self._shadow_max_price - _ep_sv) * (5000.0 / _ep_sv)
-                _vm_sv = float(os.environ.get("VERDE_MIN_USD",   "2.5"))  # lordo min per "verde genuino"
-                _vf_sv = float(os.environ.get("VERDE_FLOOR_USD", "2.0"))  # lordo floor: non tornare rosso
+                _vm_sv = _CONFIG.snap.float("VERDE_MIN_USD", 2.5)  # lordo min per "verde genuino"
+                _vf_sv = _CONFIG.snap.float("VERDE_FLOOR_USD", 2.0)  # lordo floor: non tornare rosso
                 # FIX 30giu (Roberto): VERDE_FLOOR.
                 # PRIMA (bug): _cur_sv >= _vm_sv — richiedeva che il CORRENTE fosse >= $2.5.
                 #   Un tick veloce portava il lordo da $3 a $1.5 → condizione falsa → NON scattava.
@@ -14700,14 +15930,14 @@ class OvertopBassanoV16Production:
             # L'etichetta nel reason ci dice CHE COSA era: cosi leggiamo i trade
             # senza errori (maschio corso vs trans strappato).
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("PRESA_TRANS_OFF", "false").lower() != "true":
-                _presa_trans = float(os.environ.get("PRESA_TRANS_USD", "3.0"))  # lordo soglia attivazione
+            if not _CONFIG.snap.bool("PRESA_TRANS_OFF", False):
+                _presa_trans = _CONFIG.snap.float("PRESA_TRANS_USD", 3.0)  # lordo soglia attivazione
                 # soglia che separa TRANS da MASCHIO: se cede da un picco BASSO
                 # (<= TRANS_PICCO_MAX) = trans che molla subito. Se cede da picco
                 # ALTO (oltre) = maschio che ha corso -> lascia al trailing.
-                _trans_picco_max = float(os.environ.get("TRANS_PICCO_MAX", "4.5"))
+                _trans_picco_max = _CONFIG.snap.float("TRANS_PICCO_MAX", 4.5)
                 _cede_dal_picco = max_profit - current_pnl
-                _trans_cede = float(os.environ.get("TRANS_CEDE_USD", "0.5"))
+                _trans_cede = _CONFIG.snap.float("TRANS_CEDE_USD", 0.5)
                 if max_profit >= _presa_trans:
                     # ha superato +3. Distinguo dal PICCO raggiunto + se cede:
                     if _cede_dal_picco >= _trans_cede and max_profit <= _trans_picco_max:
@@ -14731,9 +15961,9 @@ class OvertopBassanoV16Production:
             # Cosi' il maschio lento da +5/+8 non viene tagliato dalla presa a +3 ma
             # accompagnato fino allo storno. ENV: TRAILING_MAE_OFF, TRAILING_MARGINE.
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("TRAILING_MAE_OFF", "false").lower() != "true":
-                _tr_attiva  = float(os.environ.get("TRAILING_ATTIVA", "1.0"))
-                _tr_margine = float(os.environ.get("TRAILING_MARGINE", "1.1"))
+            if not _CONFIG.snap.bool("TRAILING_MAE_OFF", False):
+                _tr_attiva  = _CONFIG.snap.float("TRAILING_ATTIVA", 1.0)
+                _tr_margine = _CONFIG.snap.float("TRAILING_MARGINE", 1.1)
                 _retreat_grasso = retreat * (5000.0 / self._shadow["price_entry"])
                 if max_profit >= _tr_attiva and _retreat_grasso >= _tr_margine:
                     self._log_m2("✂️",
@@ -14756,7 +15986,7 @@ class OvertopBassanoV16Production:
             #   - PRESA_TRANS -> strappa il trans/grasso SUBITO, fee pagate
             #   - TRAILING_MAE -> corsa del maschio (mae basso)
             # ════════════════════════════════════════════════════════════════
-            if os.environ.get("MACCHINA_PURA", "true").lower() == "true":
+            if _CONFIG.snap.bool("MACCHINA_PURA", True):
                 return None  # nessuna uscita vecchia: la macchina ha gia' deciso sopra
 
 
@@ -14789,13 +16019,13 @@ class OvertopBassanoV16Production:
             # AVG(pnl) FROM trades WHERE reason='CASSA_GRASSO';
             # ════════════════════════════════════════════════════════════════
             try:
-                if os.environ.get("CASSA_GRASSO_OFF", "true").lower() != "true":
+                if not _CONFIG.snap.bool("CASSA_GRASSO_OFF", True):
                     _nato_cg = self._shadow.get("nato_ts")
                     if _nato_cg is not None:
                         _eta_cg = time.time() - _nato_cg
-                        _cg_min_eta  = float(os.environ.get("CASSA_MIN_ETA",  "10.0"))
-                        _cg_peak_min = float(os.environ.get("CASSA_PEAK_MIN", "1.5"))
-                        _cg_giu_usd  = float(os.environ.get("CASSA_GIU_USD",  "0.5"))
+                        _cg_min_eta  = _CONFIG.snap.float("CASSA_MIN_ETA", 10.0)
+                        _cg_peak_min = _CONFIG.snap.float("CASSA_PEAK_MIN", 1.5)
+                        _cg_giu_usd  = _CONFIG.snap.float("CASSA_GIU_USD", 0.5)
                         # max_profit e' gia' calcolato sopra (riga 13442). E' il PICCO storico del trade.
                         _peak_ok    = (max_profit >= _cg_peak_min)
                         _eta_ok     = (_eta_cg >= _cg_min_eta)
@@ -14810,30 +16040,14 @@ class OvertopBassanoV16Production:
                             if not hasattr(self, "_cassa_grasso_tagli"):
                                 self._cassa_grasso_tagli = 0
                             self._cassa_grasso_tagli += 1
-                            _cg = None
                             try:
-                                import sqlite3 as _sqcg
-                                _cg = _sqcg.connect(self.db_path, timeout=15)
-                                _cg.execute("PRAGMA busy_timeout=15000;")
-                                _cg.execute("""CREATE TABLE IF NOT EXISTS cassa_grasso_tagli (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                    eta_s REAL, peak_max REAL, pnl_taglio REAL,
-                                    ceduto_usd REAL, prezzo REAL)""")
-                                _cg.execute("""INSERT INTO cassa_grasso_tagli 
+                                _diario_inserisci(self.db_path, "cassa_grasso_tagli", """INSERT INTO cassa_grasso_tagli 
                                     (eta_s,peak_max,pnl_taglio,ceduto_usd,prezzo) 
                                     VALUES (?,?,?,?,?)""",
                                     (float(_eta_cg), float(max_profit), float(current_pnl),
                                      float(max_profit - current_pnl), float(price)))
-                                _cg.commit()
                             except Exception:
                                 pass
-                            finally:
-                                if _cg is not None:
-                                    try:
-                                        _cg.close()
-                                    except Exception:
-                                        pass
                             return self._close_shadow_trade(price, "CASSA_GRASSO")
             except Exception:
                 pass
@@ -14857,12 +16071,12 @@ class OvertopBassanoV16Production:
             # ⚠ Tarato su 103 curve storiche. Da validare sui nuovi trade.
             # ════════════════════════════════════════════════════════════════
             try:
-                if os.environ.get("ANTIPREC_OFF", "false").lower() != "true":
+                if not _CONFIG.snap.bool("ANTIPREC_OFF", False):
                     _nato_ap = self._shadow.get("nato_ts")
                     if _nato_ap is not None:
                         _eta_ap = time.time() - _nato_ap
-                        _ap_min_eta  = float(os.environ.get("ANTIPREC_MIN_ETA", "8.0"))
-                        _ap_peak_min = float(os.environ.get("ANTIPREC_PEAK_MIN", "0.5"))
+                        _ap_min_eta  = _CONFIG.snap.float("ANTIPREC_MIN_ETA", 8.0)
+                        _ap_peak_min = _CONFIG.snap.float("ANTIPREC_PEAK_MIN", 0.5)
                         # registro il PnL precedente per capire se sta scendendo
                         _pnl_prec = self._shadow.get("_ap_pnl_prec")
                         self._shadow["_ap_pnl_prec"] = round(current_pnl, 3)
@@ -14879,7 +16093,7 @@ class OvertopBassanoV16Production:
                         # rientra: ha visto verde, resta protetto.
                         if (_eta_ap >= _ap_min_eta and _in_perdita
                                 and _mai_verde
-                                and os.environ.get("ANTIPRECIPIZIO_OFF", "false").lower() != "true"
+                                and not _CONFIG.snap.bool("ANTIPRECIPIZIO_OFF", False)
                                 and not self._shadow.get("_ap_gia_tagliato")):
                             self._shadow["_ap_gia_tagliato"] = True
                             self._log("✂️", f"ANTIPRECIPIZIO taglia TRANS @ {_eta_ap:.0f}s: "
@@ -14888,26 +16102,11 @@ class OvertopBassanoV16Production:
                             if not hasattr(self, "_antiprec_tagli"):
                                 self._antiprec_tagli = 0
                             self._antiprec_tagli += 1
-                            _ca = None
                             try:
-                                import sqlite3 as _sqa
-                                _ca = _sqa.connect(self.db_path, timeout=15)
-                                _ca.execute("PRAGMA busy_timeout=15000;")
-                                _ca.execute("""CREATE TABLE IF NOT EXISTS antiprec_tagli (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                    eta_s REAL, pnl_taglio REAL, peak_max REAL, prezzo REAL)""")
-                                _ca.execute("INSERT INTO antiprec_tagli (eta_s,pnl_taglio,peak_max,prezzo) VALUES (?,?,?,?)",
+                                _diario_inserisci(self.db_path, "antiprec_tagli", "INSERT INTO antiprec_tagli (eta_s,pnl_taglio,peak_max,prezzo) VALUES (?,?,?,?)",
                                             (float(_eta_ap), float(current_pnl), float(max_profit), float(price)))
-                                _ca.commit()
                             except Exception:
                                 pass
-                            finally:
-                                if _ca is not None:
-                                    try:
-                                        _ca.close()
-                                    except Exception:
-                                        pass
                             return self._close_shadow_trade(price, "ANTIPRECIPIZIO")
             except Exception:
                 pass
@@ -14931,8 +16130,8 @@ class OvertopBassanoV16Production:
                     # ENV: PRESA_SECCA_OFF (default false = attiva),
                     #      PRESA_SECCA_USD (default 1.0 = chiudi appena tocchi +1$).
                     # ════════════════════════════════════════════════════════════════
-                    if os.environ.get("PRESA_SECCA_OFF", "false").lower() != "true":
-                        _presa_usd = float(os.environ.get("PRESA_SECCA_USD", "1.0"))
+                    if not _CONFIG.snap.bool("PRESA_SECCA_OFF", False):
+                        _presa_usd = _CONFIG.snap.float("PRESA_SECCA_USD", 1.0)
                         # current_pnl e' LORDO. Tolgo la fee (2$) per avere il NETTO.
                         # Cosi' PRESA_SECCA_USD=1.0 significa "+1$ NETTO in tasca".
                         _presa_netto = current_pnl - (self.TRADE_SIZE_USD * self.LEVERAGE * self.FEE_PCT * 2)
@@ -14940,27 +16139,12 @@ class OvertopBassanoV16Production:
                             self._log_m2("💰",
                                 f"PRESA SECCA: +{_presa_netto:.2f}$ NETTO a {_eta:.0f}s "
                                 f"(lordo +{current_pnl:.2f}$) — porto a casa SUBITO")
-                            _ps = None
                             try:
-                                import sqlite3 as _sqps
-                                _ps = _sqps.connect(self.db_path, timeout=15)
-                                _ps.execute("PRAGMA busy_timeout=15000;")
-                                _ps.execute("""CREATE TABLE IF NOT EXISTS presa_secca_tagli (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                    eta_s REAL, pnl_presa REAL, prezzo REAL)""")
-                                _ps.execute("""INSERT INTO presa_secca_tagli
+                                _diario_inserisci(self.db_path, "presa_secca_tagli", """INSERT INTO presa_secca_tagli
                                     (eta_s, pnl_presa, prezzo) VALUES (?, ?, ?)""",
                                     (float(_eta), float(_presa_netto), float(price)))
-                                _ps.commit()
                             except Exception:
                                 pass
-                            finally:
-                                if _ps is not None:
-                                    try:
-                                        _ps.close()
-                                    except Exception:
-                                        pass
                             return self._close_shadow_trade(price, "PRESA_SECCA")
                     if _eta >= 10 and self._shadow.get("pnl_10s") is None:
                         self._shadow["pnl_10s"] = round(current_pnl, 3)
@@ -14980,9 +16164,9 @@ class OvertopBassanoV16Production:
                     # INCASSO_GIU_USD (0.4). Reversibile.
                     # ════════════════════════════════════════════════════════════════
                     if (_eta >= 10 and
-                        os.environ.get("INCASSO_10S_OFF", "false").lower() != "true"):
-                        _i10_min = float(os.environ.get("INCASSO_10S_MIN", "0.6"))
-                        _i10_giu = float(os.environ.get("INCASSO_GIU_USD", "0.4"))
+                        not _CONFIG.snap.bool("INCASSO_10S_OFF", False)):
+                        _i10_min = _CONFIG.snap.float("INCASSO_10S_MIN", 0.6)
+                        _i10_giu = _CONFIG.snap.float("INCASSO_GIU_USD", 0.4)
                         _p10_inc = self._shadow.get("pnl_10s")
                         if (_p10_inc is not None and _p10_inc >= _i10_min and
                             current_pnl < (_p10_inc - _i10_giu) and
@@ -14993,30 +16177,14 @@ class OvertopBassanoV16Production:
                                 f"{current_pnl:+.2f}$ (ceduto {_p10_inc - current_pnl:.2f}$) "
                                 f"— il momento giusto, chiudo")
                             # Tabella tracciamento (creata al primo taglio)
-                            _i10c = None
                             try:
-                                import sqlite3 as _sqi10
-                                _i10c = _sqi10.connect(self.db_path, timeout=15)
-                                _i10c.execute("PRAGMA busy_timeout=15000;")
-                                _i10c.execute("""CREATE TABLE IF NOT EXISTS incasso_10s_tagli (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                    eta_s REAL, pnl_10s REAL, pnl_taglio REAL,
-                                    ceduto_usd REAL, prezzo REAL)""")
-                                _i10c.execute("""INSERT INTO incasso_10s_tagli
+                                _diario_inserisci(self.db_path, "incasso_10s_tagli", """INSERT INTO incasso_10s_tagli
                                     (eta_s, pnl_10s, pnl_taglio, ceduto_usd, prezzo)
                                     VALUES (?, ?, ?, ?, ?)""",
                                     (float(_eta), float(_p10_inc), float(current_pnl),
                                      float(_p10_inc - current_pnl), float(price)))
-                                _i10c.commit()
                             except Exception:
                                 pass
-                            finally:
-                                if _i10c is not None:
-                                    try:
-                                        _i10c.close()
-                                    except Exception:
-                                        pass
                             return self._close_shadow_trade(price, "INCASSO_10S")
                     if _eta >= 20 and self._shadow.get("pnl_20s") is None:
                         self._shadow["pnl_20s"] = round(current_pnl, 3)
@@ -15031,12 +16199,12 @@ class OvertopBassanoV16Production:
                         # Interruttore: TRANELLO_OFF=true lo spegne. Reversibile.
                         # ⚠ TARATO SU 6 TRADE. Da validare sui nuovi.
                         # ════════════════════════════════════════════════════════
-                        if os.environ.get("TRANELLO_OFF", "false").lower() != "true":
+                        if not _CONFIG.snap.bool("TRANELLO_OFF", False):
                             _p10 = self._shadow.get("pnl_10s")
                             _p20 = self._shadow.get("pnl_20s")
                             # soglia "ancora forte": se a 20s e' sopra questo, e' un
                             # maschio sano anche se sceso un po' (salva i 06:09).
-                            _tr_forte = float(os.environ.get("TRANELLO_FORTE", "2.0"))
+                            _tr_forte = _CONFIG.snap.float("TRANELLO_FORTE", 2.0)
                             if _p10 is not None and _p20 is not None:
                                 _cresce   = _p20 > _p10
                                 _in_verde = _p20 > 0
@@ -15050,26 +16218,11 @@ class OvertopBassanoV16Production:
                                     if not hasattr(self, "_tranello_tagli"):
                                         self._tranello_tagli = 0
                                     self._tranello_tagli += 1
-                                    _ct = None
                                     try:
-                                        import sqlite3 as _sqt
-                                        _ct = _sqt.connect(self.db_path, timeout=15)
-                                        _ct.execute("PRAGMA busy_timeout=15000;")
-                                        _ct.execute("""CREATE TABLE IF NOT EXISTS tranello_tagli (
-                                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                                            pnl_10s REAL, pnl_20s REAL, prezzo REAL)""")
-                                        _ct.execute("INSERT INTO tranello_tagli (pnl_10s,pnl_20s,prezzo) VALUES (?,?,?)",
+                                        _diario_inserisci(self.db_path, "tranello_tagli", "INSERT INTO tranello_tagli (pnl_10s,pnl_20s,prezzo) VALUES (?,?,?)",
                                                     (float(_p10), float(_p20), float(price)))
-                                        _ct.commit()
                                     except Exception:
                                         pass
-                                    finally:
-                                        if _ct is not None:
-                                            try:
-                                                _ct.close()
-                                            except Exception:
-                                                pass
                                     return self._close_shadow_trade(price, "TRANELLO_TRANS")
             except Exception:
                 pass
@@ -15090,7 +16243,7 @@ class OvertopBassanoV16Production:
             
             # -- COMPONENTE 3: DECELERAZIONE (peso 25) -----------------
             # Derivata seconda: l'impulso sta frenando?
-            decel = self.decelero.analyze()
+            decel = self._tctx().decel()
             decel_score_val = decel.get('decel_score', 0)
             # Bassa decelerazione = alto punteggio (resta)
             decel_comp = int((1.0 - decel_score_val) * 25)
@@ -15296,7 +16449,7 @@ class OvertopBassanoV16Production:
                 # Regolabile da env senza redeploy.
                 # ════════════════════════════════════════════════════════════
                 _margine_pct = 0.0004   # 0.04% di $5k = $2 netto target
-                _floor_low_deb = float(os.environ.get('FLOOR_LOW_DEBOLE', '2.20'))
+                _floor_low_deb = _CONFIG.snap.float("FLOOR_LOW_DEBOLE", 2.20)
                 PROFIT_FLOOR_LOW     = _floor_low_deb                              # ~$2.20 lordo (era 3.00)
                 PROFIT_FLOOR_HIGH    = _fee_rt + (_exp_usd * _margine_pct * 1.0)   # ~$4.00 lordo
                 PROFIT_BIG_THRESHOLD = _fee_rt + (_exp_usd * _margine_pct * 1.6)   # ~$5.20 lordo
@@ -15339,7 +16492,7 @@ class OvertopBassanoV16Production:
                 # Attivo solo sopra TRAIL_MIN$ di profitto (lascia formare il
                 # grasso). Spegnibile con TRAIL_OFF=true. Reversibile.
                 # ═══════════════════════════════════════════════════════════
-                if os.environ.get("TRAIL_OFF", "false").lower() != "true":
+                if not _CONFIG.snap.bool("TRAIL_OFF", False):
                     # ═══════════════════════════════════════════════════════
                     # SALVA IL VERDE (11giu, Roberto) — niente soglie di profitto!
                     # Errore precedente: PRENDI_SUBITO a +2.5 e TRAIL_MIN a 1.5
@@ -15364,8 +16517,8 @@ class OvertopBassanoV16Production:
                     # VERDE_MIN_USD, cosi' il NETTO resta positivo. Mai fottuti.
                     # 0 = spento.
                     # ═══════════════════════════════════════════════════════
-                    _trail_giu  = float(os.environ.get("TRAIL_GIU_USD", "0.5"))
-                    _verde_min  = float(os.environ.get("VERDE_MIN_USD", "2.5"))
+                    _trail_giu  = _CONFIG.snap.float("TRAIL_GIU_USD", 0.5)
+                    _verde_min  = _CONFIG.snap.float("VERDE_MIN_USD", 2.5)
                     if _trail_giu > 0 and current_pnl >= _verde_min:
                         # lordo in mano copre le fee + margine E ho ceduto dal
                         # picco -> salvo il verde NETTO che ho, vicino al picco
@@ -15387,7 +16540,7 @@ class OvertopBassanoV16Production:
                 # picco, vicino al massimo). Niente più ritirate percentuali.
                 # Riattivabile: env PROFIT_LOCK_VECCHIO_ON=true
                 # ═══════════════════════════════════════════════════════════
-                if os.environ.get("PROFIT_LOCK_VECCHIO_ON", "false").lower() == "true":
+                if _CONFIG.snap.bool("PROFIT_LOCK_VECCHIO_ON", False):
                     # ─ Livello 4 PROTECT_HI: WIN grosso, lascia correre ─
                     if max_profit >= PROFIT_BIG_THRESHOLD:
                         retreat_pct_now = retreat / max_profit
@@ -15459,9 +16612,9 @@ class OvertopBassanoV16Production:
                 # KILLER_TEMPO=35s  (i win medi vivono ~100s, i loss ~35s:
                 #   dopo 35s un maschio vero ha già preso energia).
                 # Disarmabile: env KILLER_E40_OFF=true
-                _killer_off = os.environ.get("KILLER_E40_OFF", "false").lower() == "true"
-                _killer_e_soglia = float(os.environ.get("KILLER_E_SOGLIA", "40"))
-                _killer_tempo    = float(os.environ.get("KILLER_TEMPO", "35"))
+                _killer_off = _CONFIG.snap.bool("KILLER_E40_OFF", False)
+                _killer_e_soglia = _CONFIG.snap.float("KILLER_E_SOGLIA", 40)
+                _killer_tempo    = _CONFIG.snap.float("KILLER_TEMPO", 35)
                 if (not _killer_off
                         and exit_energy < _killer_e_soglia
                         and duration >= _killer_tempo
@@ -15689,15 +16842,12 @@ class OvertopBassanoV16Production:
             if self._shadow_entry_momentum and self._shadow_entry_volatility and self._shadow_entry_trend:
                 # Calcola range_position e drift per contesto
                 _rp = 0.5
-                _dr = 0.0
                 if len(self.campo._prices_long) >= 200:
                     _recent = list(self.campo._prices_long)[-200:]
                     _rh, _rl = max(_recent), min(_recent)
                     if _rh > _rl:
                         _rp = (price - _rl) / (_rh - _rl)
-                if len(self.campo._prices_long) >= 100:
-                    _p = list(self.campo._prices_long)
-                    _dr = (sum(_p[-50:])/50 - sum(_p[:50])/50) / (sum(_p[:50])/50) * 100
+                _dr = self._tctx().drift()
 
                 self.oracolo.record(
                     self._shadow_entry_momentum,
@@ -15738,10 +16888,7 @@ class OvertopBassanoV16Production:
 
             # -- INTELLIGENZA AUTONOMA - M2 registra con contesto completo ----
             # Calcola drift corrente per le capsule L2_DRIFT
-            _ia_drift = 0.0
-            if len(self.campo._prices_long) >= 100:
-                _p = list(self.campo._prices_long)
-                _ia_drift = (sum(_p[-50:])/50 - sum(_p[:50])/50) / (sum(_p[:50])/50) * 100
+            _ia_drift = self._tctx().drift()
 
             # FIX 24giu (Roberto: "un maschio vero che ha perso NON va etichettato
             # come femmina"). Salvo il picco PROPRIO raggiunto in osservazione + il
@@ -15755,7 +16902,7 @@ class OvertopBassanoV16Production:
             # soglia sesso = soglia d'ingresso (chi e' ENTRATO ha picco>=soglia, NON e' femmina)
             # FIX 29giu: legge la soglia salvata ALL'ENTRATA (non il valore corrente dell'ENV).
             _md_picco_min_cls = self._shadow.get("md_mfe_min_entry",
-                                    float(os.environ.get("MD_MFE_MIN", "1.0"))) if self._shadow else float(os.environ.get("MD_MFE_MIN", "1.0"))
+                                    _CONFIG.snap.float("MD_MFE_MIN", 1.0)) if self._shadow else _CONFIG.snap.float("MD_MFE_MIN", 1.0)
             if _picco_oss >= _md_picco_min_cls:
                 _sesso = "MASCHIO" if is_win else "TRANS"
             else:
@@ -15984,6 +17131,9 @@ class OvertopBassanoV16Production:
                           "n_sign_flips":    self._shadow.get("nascita_sign_flips"),
                           "pnl_10s":         self._shadow.get("pnl_10s"),
                           "pnl_20s":         self._shadow.get("pnl_20s"),
+                          # TICK CONTEXT (luglio2026): cosa vedevano gli organi
+                          # nel tick in cui si e' deciso l'ingresso
+                          "tick_ctx_entry":  self._shadow.get("tick_ctx"),
                       })))
                 conn.commit()
                 conn.close()
@@ -15999,7 +17149,7 @@ class OvertopBassanoV16Production:
             # avverrà al prossimo tick del thread auto_verifica.
             # ═════════════════════════════════════════════════════════════════
             if (self._shadow_capsula_v2_attribuita and
-                os.environ.get("CAPSULE_V2_HOOK_ENABLED", "false").lower() == "true"):
+                _CONFIG.snap.bool("CAPSULE_V2_HOOK_ENABLED", False)):
                 try:
                     import requests as _rq_cv2x
                     _cap_id = self._shadow_capsula_v2_attribuita
@@ -16038,7 +17188,7 @@ class OvertopBassanoV16Production:
             # vederlo la prossima volta.
             # ═════════════════════════════════════════════════════════════════
             if (not is_win and pnl < 0 and
-                os.environ.get("CAPSULE_V2_HOOK_ENABLED", "false").lower() == "true"):
+                _CONFIG.snap.bool("CAPSULE_V2_HOOK_ENABLED", False)):
                 try:
                     import requests as _rq_loss
                     _payload_loss = {
@@ -16560,7 +17710,7 @@ class OvertopBassanoV16Production:
         _ts_conf = None
         try:
             if hasattr(self, 'tsunami') and self.tsunami is not None:
-                _last = self.tsunami.last_decision()
+                _last = self._tctx().tsunami()
                 if _last is not None:
                     _v = _last.get('verdetti', {})
                     _t30 = _v.get('30s', {})
@@ -16586,7 +17736,7 @@ class OvertopBassanoV16Production:
             'momentum':     momentum,
             'volatility':   volatility,
             'trend':        trend,
-            'entry_time':   time.time(),
+            'entry_time':   self.clock.now(),
             'max_price':    price,
             'min_price':    price,
             'regime':       self._regime_current,
@@ -16639,15 +17789,45 @@ class OvertopBassanoV16Production:
 
     def _update_phantoms(self, price, momentum):
         """Aggiorna tutti i fantasmi aperti - chiamato ad ogni tick."""
+        now = self.clock.now()
+        if self._phantom_book_on:
+            # PHANTOM BOOK: regole su tutto il libro a maschere, chiusure in blocco
+            for ph, reason, _pnl, _dur in self._phantoms_open.step(price, now, momentum, self.STOP_LIVE):
+                self._close_phantom(ph, price, reason)
+        else:
+            self._close_phantoms_lista(price, momentum, now)
+        
+        # -- SHADOW SHORT PHANTOMS - SHORT evitati in RANGING ----------
+        if hasattr(self, '_shadow_short_phantoms'):
+            if self._phantom_book_on:
+                chiusi_ss = self._shadow_short_phantoms.step(price, now, momentum, self.STOP_LIVE)
+            else:
+                chiusi_ss = self._shadow_short_lista(price, momentum, now)
+            for ph, reason, pnl, dur in chiusi_ss:
+                if not hasattr(self, '_shadow_short_results'):
+                    self._shadow_short_results = deque(maxlen=100)
+                self._shadow_short_results.append({
+                    'pnl': round(pnl, 2),
+                    'duration': round(dur, 1),
+                    'is_win': pnl > 0,
+                    'exit_reason': reason,
+                    'drift': ph['drift'],
+                    'macd_hist': ph['macd_hist'],
+                    'bearish_energy': ph['bearish_energy'],
+                    'price_entry': ph['price_entry'],
+                })
+
+    def _close_phantoms_lista(self, price, momentum, now):
+        """Ripiego senza PHANTOM BOOK: lista di dict scorsa uno per uno."""
         to_close = []
         for i, ph in enumerate(self._phantoms_open):
             if price > ph['max_price']:
                 ph['max_price'] = price
-                ph['max_price_ts'] = time.time()   # FIX 19giu: QUANDO ha toccato il picco
+                ph['max_price_ts'] = now   # FIX 19giu: QUANDO ha toccato il picco
             if price < ph['min_price']:
                 ph['min_price'] = price
 
-            duration = time.time() - ph['entry_time']
+            duration = now - ph['entry_time']
             # PnL LORDO USDC: fee esclusa dal monitoring (come il bot reale)
             _ph_exp = 5000.0
             _ph_btc = _ph_exp / ph['price_entry']
@@ -16683,59 +17863,46 @@ class OvertopBassanoV16Production:
 
         # Chiudi dal fondo per non rompere gli indici
         for i, close_price, reason in reversed(to_close):
-            self._close_phantom(i, close_price, reason)
-        
-        # -- SHADOW SHORT PHANTOMS - SHORT evitati in RANGING ----------
-        if hasattr(self, '_shadow_short_phantoms'):
-            to_close_ss = []
-            for i, ph in enumerate(self._shadow_short_phantoms):
-                if price > ph['max_price']:
-                    ph['max_price'] = price
-                if price < ph['min_price']:
-                    ph['min_price'] = price
-                
-                duration = time.time() - ph['entry_time']
-                # PnL SHORT: guadagna se prezzo scende
-                delta = ph['price_entry'] - price
-                exposure = self.TRADE_SIZE_USD * self.LEVERAGE
-                btc_qty = exposure / ph['price_entry']
-                pnl_gross = delta * btc_qty
-                pnl = pnl_gross - (exposure * self.FEE_PCT * 2)
-                
-                close_reason = None
-                if pnl < -self.STOP_LIVE:  # stop lordo $7
-                    close_reason = "HARD_STOP_SIM"
-                elif duration > 15 and pnl < 0:
-                    close_reason = "DECEL_SIM"
-                elif duration > 10 and momentum == "FORTE":  # SHORT esce su FORTE
-                    close_reason = "SMORZ_SIM"
-                elif duration > 20 and pnl > 0:
-                    close_reason = "WIN_SIM"
-                elif duration > 60:
-                    close_reason = "TIMEOUT_SIM"
-                
-                if close_reason:
-                    to_close_ss.append((i, pnl, duration, close_reason))
+            self._close_phantom(self._phantoms_open.pop(i), close_price, reason)
+
+    def _shadow_short_lista(self, price, momentum, now):
+        """Ripiego senza PHANTOM BOOK per gli SHORT evitati: [(ph, uscita, pnl, durata)]."""
+        to_close_ss = []
+        for i, ph in enumerate(self._shadow_short_phantoms):
+            if price > ph['max_price']:
+                ph['max_price'] = price
+            if price < ph['min_price']:
+                ph['min_price'] = price
             
-            for i, pnl, dur, reason in reversed(to_close_ss):
-                ph = self._shadow_short_phantoms.pop(i)
-                if not hasattr(self, '_shadow_short_results'):
-                    self._shadow_short_results = deque(maxlen=100)
-                self._shadow_short_results.append({
-                    'pnl': round(pnl, 2),
-                    'duration': round(dur, 1),
-                    'is_win': pnl > 0,
-                    'exit_reason': reason,
-                    'drift': ph['drift'],
-                    'macd_hist': ph['macd_hist'],
-                    'bearish_energy': ph['bearish_energy'],
-                    'price_entry': ph['price_entry'],
-                })
+            duration = now - ph['entry_time']
+            # PnL SHORT: guadagna se prezzo scende
+            delta = ph['price_entry'] - price
+            exposure = self.TRADE_SIZE_USD * self.LEVERAGE
+            btc_qty = exposure / ph['price_entry']
+            pnl_gross = delta * btc_qty
+            pnl = pnl_gross - (exposure * self.FEE_PCT * 2)
+            
+            close_reason = None
+            if pnl < -self.STOP_LIVE:  # stop lordo $7
+                close_reason = "HARD_STOP_SIM"
+            elif duration > 15 and pnl < 0:
+                close_reason = "DECEL_SIM"
+            elif duration > 10 and momentum == "FORTE":  # SHORT esce su FORTE
+                close_reason = "SMORZ_SIM"
+            elif duration > 20 and pnl > 0:
+                close_reason = "WIN_SIM"
+            elif duration > 60:
+                close_reason = "TIMEOUT_SIM"
+            
+            if close_reason:
+                to_close_ss.append((i, pnl, duration, close_reason))
+        
+        return [(self._shadow_short_phantoms.pop(i), reason, pnl, dur)
+                for i, pnl, dur, reason in reversed(to_close_ss)]
 
-    def _close_phantom(self, idx, price, reason):
-        """Chiude un fantasma e registra il risultato."""
+    def _close_phantom(self, ph, price, reason):
+        """Chiude un fantasma (gia' tolto dagli aperti) e registra il risultato."""
         try:
-            ph = self._phantoms_open.pop(idx)
             # PnL REALE FUTURES - stessa formula dei trade veri
             if ph.get('direction', 'LONG') == 'SHORT':
                 delta_price = ph['price_entry'] - price
@@ -16817,8 +17984,7 @@ class OvertopBassanoV16Production:
                 # era sempre falso → forensic MORTO dal 14 maggio. Ora registra
                 # TUTTI i blocchi: il sistema di verifica torna a vedere il dopo.
                 if block:  # qualunque blocco, non solo TSUNAMI
-                    import sqlite3 as _sql
-                    _duration = time.time() - ph.get('entry_time', time.time())
+                    _duration = self.clock.now() - ph.get('entry_time', self.clock.now())
 
                     # ── FIX MFE/MAE (28mag, Roberto) ─────────────────────────
                     # max_price/min_price sono tracciati a ogni tick in
@@ -16842,8 +18008,8 @@ class OvertopBassanoV16Production:
                         _mfe_usd = round((_ph_pe - _ph_min) * _ph_btc, 4)  # favorevole se scende
                         _mae_usd = round((_ph_max - _ph_pe) * _ph_btc, 4)  # avverso se sale
 
-                    _conn = _sql.connect(DB_PATH)
-                    _conn.execute("""
+                    # DIARIO DB: nel file del giorno (o in DB_PATH, via scrittore)
+                    _diario_inserisci(DB_PATH, "phantom_forensic", """
                         INSERT INTO phantom_forensic (
                             ts_entry, ts_close, block_reason, direction,
                             price_entry, price_close, pnl_netto, is_win, duration_sec,
@@ -16861,7 +18027,7 @@ class OvertopBassanoV16Production:
                                   ?, ?,
                                   ?, ?, ?, ?)
                     """, (
-                        ph.get('entry_time'), time.time(), block, ph.get('direction','LONG'),
+                        ph.get('entry_time'), self.clock.now(), block, ph.get('direction','LONG'),
                         ph['price_entry'], price, round(pnl_netto, 4), 1 if is_win_netto else 0, _duration,
                         ph.get('_fp_ts_30s_str'), ph.get('_fp_ts_30s_dir'), ph.get('_fp_ts_30s_coe'),
                         ph.get('_fp_ts_2_str'),   ph.get('_fp_ts_2_dir'),   ph.get('_fp_ts_2_coe'),
@@ -16875,8 +18041,6 @@ class OvertopBassanoV16Production:
                         ph.get('_fp_score'), ph.get('_fp_soglia'),
                         _ph_max, _ph_min, _mfe_usd, _mae_usd,
                     ))
-                    _conn.commit()
-                    _conn.close()
             except Exception as _fe:
                 pass  # mai bloccare per errori di logging
 
@@ -16978,11 +18142,19 @@ class OvertopBassanoV16Production:
             commands = []
             # -- PROTOCOLLO NUOVO: legge da DB (bridge predittivo V48+) ----
             try:
-                conn = _safe_connect(DB_PATH, timeout=30)
-                rows = conn.execute(
-                    "SELECT value FROM bot_state WHERE key='bridge_cmd'"
-                ).fetchall()
-                conn.close()
+                # pool read-only: la lettura periodica non prende il lock degli scrittori
+                _lett = _db_lettori(DB_PATH)
+                if _lett is not None:
+                    with _lett.leggi() as conn:
+                        rows = conn.execute(
+                            "SELECT value FROM bot_state WHERE key='bridge_cmd'"
+                        ).fetchall()
+                else:
+                    conn = _safe_connect(DB_PATH, timeout=30)
+                    rows = conn.execute(
+                        "SELECT value FROM bot_state WHERE key='bridge_cmd'"
+                    ).fetchall()
+                    conn.close()
                 if rows:
                     db_cmds = json.loads(rows[0][0])
                     # Bridge predittivo scrive oggetto singolo {type, data, ts}
@@ -17350,6 +18522,58 @@ class OvertopBassanoV16Production:
                 })
                 # -- STABILITY TELEMETRY ------------------------
                 _hb_set("telemetry",           lambda: self.telemetry.generate_report())
+                # -- RING WS: profondita' coda, scarti, lag ricezione→tick --
+                _hb_set("ws_ring",             lambda: (self._ws_ring.stats()
+                                                        if getattr(self, "_ws_ring", None) is not None
+                                                        else {"attivo": False}))
+                # -- EVENT CLOCK: tempo exchange + latenza exchange→decisione --
+                _hb_set("clock",               lambda: self.clock.stats())
+                _hb_set("tick_ring",           lambda: (self.tick_ring.stats()
+                                                        if self.tick_ring is not None
+                                                        else {"attivo": False}))
+                _hb_set("phantom_book",        lambda: (self._phantoms_open.stats()
+                                                        if self._phantom_book_on
+                                                        else {"attivo": False, "aperti": len(self._phantoms_open)}))
+                _hb_set("universi",            lambda: (self.universi.stats()
+                                                        if self.universi is not None
+                                                        else {"attivo": False}))
+                _hb_set("timing_wheel",        lambda: (self.wheel.stats()
+                                                        if self.wheel is not None
+                                                        else {"attivo": False}))
+                _hb_set("config",              lambda: {k: v for k, v in _CONFIG.effective().items()
+                                                        if k != "manopole"})
+                _hb_set("tick_ctx",            lambda: dict(_TICK_CTX_STATS,
+                                                        ultimo=(self._ctx_prec.record()
+                                                                if self._ctx_prec is not None else None)))
+                _hb_set("db_scrittore",        lambda: {
+                    "scrittori": {os.path.basename(k): w.stats() for k, w in _DB_SCRITTORI.items()},
+                    "lettori":   {os.path.basename(k): r.stats() for k, r in _DB_LETTORI.items()},
+                } if _SCRITTORE_DB_AVAILABLE else {"attivo": False})
+                _hb_set("potatore",            lambda: (self._potatore.stats()
+                                                        if getattr(self, "_potatore", None) is not None
+                                                        else {"attivo": False}))
+                _hb_set("diario",              lambda: (_DIARIO[0].stats()
+                                                        if _DIARIO and _DIARIO[0] is not None
+                                                        else {"attivo": False}))
+                _hb_set("tick_journal",        lambda: (self._tick_journal.stats()
+                                                        if getattr(self, "_tick_journal", None) is not None
+                                                        else {"attivo": False}))
+                _hb_set("campo_esterno",       lambda: {
+                    "fonte":    os.environ.get("CAMPO_ESTERNO_FONTE", "locale").lower(),
+                    "ultima":   getattr(self, "_campo_esterno_fonte", None),
+                    "bars_1m":  (len(self.tsunami.aggregator.serie["1min"])
+                                 if self.tsunami is not None else 0),
+                    "prefetch": (self._kline_prefetch.stats()
+                                 if getattr(self, "_kline_prefetch", None) is not None
+                                 else None),
+                })
+                _hb_set("candele",             lambda: ({
+                    "timeframe":   self.tsunami.aggregator.stats(),
+                    "features_1m": self.tsunami.aggregator.features_1m(),
+                    "backfill":    getattr(self, "_candele_backfill", None),
+                    "verdetti":    {"ricalcolati": self.tsunami.gate.analisi,
+                                    "da_cache":    self.tsunami.gate.riusi},
+                } if self.tsunami is not None else {"attivo": False}))
         except Exception as e:
             log.error(f"[HEARTBEAT_ERROR] {e}")
         finally:
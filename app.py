@@ -147,6 +147,25 @@ def db_execute(query, params=None, fetch=False):
                 return None
             time.sleep(0.5)
 
+def diario_execute(tabella, query, params=None, da_ts=0):
+    """SELECT su una tabella di osservazione. Con il DIARIO DB attivo
+    (phantom_forensic & co. in un file per giorno) gira sui file da da_ts
+    in poi; altrimenti e' db_execute(..., fetch=True) su DB_PATH."""
+    try:
+        from OVERTOP_BASSANO_V16_PRODUCTION import _diario_per
+        diario = _diario_per(DB_PATH, tabella)
+    except Exception:
+        diario = None
+    if diario is None:
+        return db_execute(query, params, fetch=True)
+    try:
+        with diario.leggi(da_ts) as conn:
+            cur = conn.execute(query, params or [])
+            return cur.fetchall() if "COUNT" not in query.upper() else cur.fetchone()
+    except Exception as e:
+        log(f"[DIARIO] lettura {tabella}: {e}")
+        return None
+
 # ═══════════════════════════════════════════════════════════════════════════
 # DOWNLOAD SECRET per endpoint protetti
 # ═══════════════════════════════════════════════════════════════════════════
@@ -295,6 +314,15 @@ def send_command():
 def get_config():
     return jsonify({"version": "V6.0+V15_PRODUCTION+IA", "db": DB_PATH}), 200
 
+@app.route('/config/effective', methods=['GET'])
+def config_effective():
+    """Manopole env lette dal bot: valore effettivo, default, fonte (env/override)."""
+    try:
+        from OVERTOP_BASSANO_V16_PRODUCTION import _CONFIG
+        return jsonify(_CONFIG.effective()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ═══════════════════════════════════════════════════════════════════════════
 # DIAGNOSTIC — tutto quello che serve per capire lo stato del sistema
 # ═══════════════════════════════════════════════════════════════════════════
@@ -551,12 +579,12 @@ def diretta_view():
         _cutoff_str = _dt2.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         _cutoff_str_3h = (_dt2.datetime.utcnow() - _dt2.timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
         # TAGLIATI dal cancello (questo run) — ts_entry è epoch
-        tagli = db_execute("""
+        tagli = diario_execute("phantom_forensic", """
             SELECT ts_entry, mfe_usd, block_reason
             FROM phantom_forensic
             WHERE block_reason='MINA_CANCELLO_SALITA' AND ts_entry > ?
-            ORDER BY id DESC LIMIT 60
-        """, [_cutoff], fetch=True) or []
+            ORDER BY ts_entry DESC LIMIT 60
+        """, [_cutoff], da_ts=_cutoff) or []
         # ENTRATI (trade veri, questo run) — timestamp è TEXT datetime
         entrati = db_execute("""
             SELECT timestamp, pnl, reason
@@ -636,16 +664,16 @@ def diretta_view():
                 return 0
             except Exception:
                 return 0
-        _r_fem = db_execute("""
+        _r_fem = diario_execute("phantom_forensic", """
             SELECT COUNT(*) FROM phantom_forensic
             WHERE block_reason='MINA_CANCELLO_SALITA' AND ts_entry > ?
             AND mfe_usd <= 1.5
-        """, [_cutoff], fetch=True)
-        _r_trn = db_execute("""
+        """, [_cutoff], da_ts=_cutoff)
+        _r_trn = diario_execute("phantom_forensic", """
             SELECT COUNT(*) FROM phantom_forensic
             WHERE block_reason='MINA_CANCELLO_SALITA' AND ts_entry > ?
             AND mfe_usd > 1.5
-        """, [_cutoff], fetch=True)
+        """, [_cutoff], da_ts=_cutoff)
         n_femmine = _count_one(_r_fem)
         n_trans   = _count_one(_r_trn)
         n_tagli   = n_femmine + n_trans
@@ -5643,6 +5671,16 @@ ORCHESTRATOR_ENABLED   = os.environ.get("ORCHESTRATOR_ENABLED", "true").lower()
 ORCHESTRATOR_INTERVAL  = int(os.environ.get("ORCHESTRATOR_INTERVAL_S", "10"))  # ogni 10s
 ORCHESTRATOR_MIN_OCCURRENCES = int(os.environ.get("ORCHESTRATOR_MIN_OCC", "2"))  # min N trade per auto-genesi capsula (Roberto: 2 basta)
 
+# Capsule canvas compilate (capsule_compilate.py): condizioni → predicati + indice
+# campo → capsule, ricompilate solo quando cambia un file. Kill switch: CAPSULE_COMPILATE_OFF=true
+try:
+    from capsule_compilate import InsiemeCapsule, compila_condizioni
+    _compilate_ok = os.environ.get("CAPSULE_COMPILATE_OFF", "false").lower() != "true"
+except ImportError:
+    _compilate_ok = False
+_orchestrator_file_cache = {}                            # path → ((mtime_ns, size), capsula)
+_orchestrator_insieme = {"chiave": None, "insieme": None}
+
 # Tabelle DB per orchestrator (create al boot)
 def _orchestrator_init_db():
     """Crea tabelle DB per logging orchestrator."""
@@ -5687,6 +5725,7 @@ _orchestrator_init_db()
 def _orchestrator_load_capsule():
     """Legge tutte le capsule dal disco. Restituisce dict {id: capsula_dict}."""
     capsule = {}
+    visti = {}
     for dir_path, stato_dir in [
         (CANVAS_CAPSULE_DIR, "attiva"),
         (CANVAS_QUARANTENA_DIR, "in_quarantena"),
@@ -5697,18 +5736,45 @@ def _orchestrator_load_capsule():
             if not fname.endswith(".json"):
                 continue
             try:
-                with open(os.path.join(dir_path, fname), "r", encoding="utf-8") as f:
-                    c = json.load(f)
+                path = os.path.join(dir_path, fname)
+                # File invariato (mtime+size) → stessa capsula già letta: niente json.load
+                st = os.stat(path)
+                firma = (st.st_mtime_ns, st.st_size)
+                prima = _orchestrator_file_cache.get(path)
+                if prima is not None and prima[0] == firma:
+                    c = prima[1]
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        c = json.load(f)
+                visti[path] = (firma, c)
                 cid = c.get("id")
                 if cid:
                     c["_stato_disco"] = stato_dir
-                    c["_path"] = os.path.join(dir_path, fname)
+                    c["_path"] = path
                     capsule[cid] = c
             except Exception as e:
                 log(f"[ORCHESTRATOR] ⚠️ Capsula non leggibile {fname}: {e}")
+    _orchestrator_file_cache.clear()
+    _orchestrator_file_cache.update(visti)
     return capsule
 
 
+def _orchestrator_compilate(capsule):
+    """InsiemeCapsule delle capsule caricate; ricompilato solo se qualche file è cambiato."""
+    if not _compilate_ok:
+        return None
+    chiave = tuple(id(c) for c in capsule.values())
+    if _orchestrator_insieme["chiave"] != chiave:
+        try:
+            _orchestrator_insieme["insieme"] = InsiemeCapsule(
+                list(capsule.values()), 'orchestratore', compilatore=compila_condizioni)
+        except Exception as e:
+            log(f"[ORCHESTRATOR] ⚠️ Compilazione capsule: {e}")
+            _orchestrator_insieme["insieme"] = None
+        _orchestrator_insieme["chiave"] = chiave
+    return _orchestrator_insieme["insieme"]
+
+
 def _orchestrator_evaluate_condition(regola, snapshot):
     """Valuta una singola regola contro lo snapshot. Restituisce bool."""
     try:
@@ -6111,12 +6177,16 @@ def _orchestrator_tick():
         # 2. Costruisci snapshot stato
         snapshot = _orchestrator_build_snapshot()
         
-        # 3. Valuta ogni capsula
+        # 3. Valuta ogni capsula (compilate: solo le candidate dell'indice)
+        insieme = _orchestrator_compilate(capsule)
+        if insieme is not None:
+            scattate = list(insieme.corrispondenti(snapshot))
+        else:
+            scattate = [c for c in capsule.values() if _orchestrator_evaluate_capsula(c, snapshot)]
         attivate = 0
-        for cid, capsula in capsule.items():
-            if _orchestrator_evaluate_capsula(capsula, snapshot):
-                _orchestrator_log_shadow_activation(capsula, snapshot, attivata=True)
-                attivate += 1
+        for capsula in scattate:
+            _orchestrator_log_shadow_activation(capsula, snapshot, attivata=True)
+            attivate += 1
         
         # 4. Scansiona nuovi trade chiusi (per genesi)
         _orchestrator_scan_new_trades()
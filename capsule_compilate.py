@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ CAPSULE COMPILATE — trigger tradotti in predicati, indice per chiave
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  CapsuleRuntime._check_trigger, CapsuleManager._check_triggers e
+  _orchestrator_evaluate_condition (app.py) rileggono il JSON di ogni
+  trigger di ogni capsula a ogni valutazione: get di param/campo,
+  ripiego value/valore, OPS[op]. E le capsule si scorrono TUTTE, anche
+  quelle che un == su momentum/direzione esclude a colpo d'occhio.
+
+SOLUZIONE:
+  Al caricamento (load/reload/refresh) ogni lista di trigger diventa UN
+  predicato: gli == in una tupla (param, valore), i confronti numerici
+  <, <=, >, >= sullo stesso param fusi in un intervallo, il resto come
+  chiusure. Stesso esito dei tre interpreti, ognuno col suo dialetto
+  (DIALETTI): cosa succede se il param manca, se l'op e' sconosciuto,
+  None come assente. Un'eccezione = trigger falso, come prima.
+
+  Poi un indice: ogni capsula va sotto UNA chiave che la esclude
+    - == (o 'in' su una lista): tabella di decisione per l'insieme dei
+      suoi param categorici, es. (momentum, volatility, trend, direction)
+      → {('DEBOLE','ALTA','DOWN','LONG'): [capsule]}: una lookup hash per
+      insieme di param, qualunque sia il numero di capsule;
+    - altrimenti un intervallo numerico: capsule ordinate per estremo
+      inferiore (o superiore), bisect sul valore del contesto;
+    - altrimenti (OR, trigger vuoti, solo !=...): sempre da provare.
+  corrispondenti(ctx) prova solo i candidati, nell'ordine originale
+  (priorita'), e restituisce chi passa: il costo segue le capsule che
+  possono scattare, non quante ce ne sono.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+from bisect import bisect_left, bisect_right
+
+_MANCA = object()
+
+_NUMERICI = ('<', '<=', '>', '>=')
+_OPS = {
+    '>':      lambda a, b: a > b,
+    '>=':     lambda a, b: a >= b,
+    '<':      lambda a, b: a < b,
+    '<=':     lambda a, b: a <= b,
+    '==':     lambda a, b: a == b,
+    '!=':     lambda a, b: a != b,
+    'in':     lambda a, b: a in b,
+    'not_in': lambda a, b: a not in b,
+}
+
+# Come legge i trigger ciascun interprete.
+#   chiavi:       (param, op, valore) — liste = alternative, la prima presente vince
+#   lascia:       param assente nel contesto → il trigger si ignora
+#                 (False = trigger falso; gli op <, <=, >, >= falliscono comunque)
+#   none_manca:   un valore None nel contesto conta come assente
+#   op_ignoto:    esito con op sconosciuto (None = si ignora)
+#   incompleto:   esito con param/op vuoti (None = si ignora)
+#   ops:          operatori conosciuti
+DIALETTI = {
+    # CapsuleRuntime (capsule_attive.json)
+    'runtime': {
+        'chiavi': (('param',), ('op',), ('value',)), 'lascia': False,
+        'none_manca': False, 'op_ignoto': False, 'incompleto': False,
+        'ops': _OPS,
+    },
+    # CapsuleManager (SQLite): formato vecchio param/value e Oracle campo/valore
+    'manager': {
+        'chiavi': (('param', 'campo'), ('op',), ('value', 'valore')), 'lascia': True,
+        'none_manca': False, 'op_ignoto': None, 'incompleto': None,
+        'ops': _OPS,
+    },
+    # Orchestratore canvas (app.py): regole campo/operatore/valore
+    'orchestratore': {
+        'chiavi': (('campo',), ('operatore',), ('valore',)), 'lascia': False,
+        'none_manca': True, 'op_ignoto': False, 'incompleto': False,
+        'ops': {k: f for k, f in _OPS.items() if k != 'not_in'},
+    },
+}
+
+
+def _leggi(t: dict, chiavi: tuple, primo_vero: bool):
+    """Primo campo del trigger fra le alternative (param or campo / value if 'value' in t)."""
+    if primo_vero:
+        for k in chiavi:
+            v = t.get(k)
+            if v:
+                return v
+        return t.get(chiavi[-1])
+    for k in chiavi:
+        if k in t:
+            return t[k]
+    return None
+
+
+def _numero(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and v == v
+
+
+def _hashabile(v) -> bool:
+    try:
+        hash(v)
+        return True
+    except TypeError:
+        return False
+
+
+
+
+class _Predicato:
+    """Una lista di trigger in AND, gia' smontata. Chiamata: ctx → bool."""
+
+    __slots__ = ('uguali', 'intervalli', 'altri', 'lascia', 'none_manca', 'falso')
+
+    def __init__(self, uguali, intervalli, altri, lascia, none_manca, falso=False):
+        self.uguali     = uguali        # ((param, valore), ...)
+        self.intervalli = intervalli    # ((param, lo, lo_stretto, hi, hi_stretto), ...)
+        self.altri      = altri         # ((param, op, fn, valore, passa_se_manca), ...)
+        self.lascia     = lascia        # == su param assente: si ignora (manager)
+        self.none_manca = none_manca
+        self.falso      = falso         # trigger che nessun contesto soddisfa (op ignoto...)
+
+    def __call__(self, ctx: dict) -> bool:
+        if self.falso:
+            return False
+        nm = self.none_manca
+        try:
+            for p, v in self.uguali:
+                x = ctx.get(p, _MANCA)
+                if x is _MANCA or (nm and x is None):
+                    if self.lascia:
+                        continue
+                    return False
+                if not x == v:
+                    return False
+            for p, lo, lo_s, hi, hi_s in self.intervalli:
+                x = ctx.get(p, _MANCA)
+                if x is _MANCA or (nm and x is None):
+                    return False
+                if lo is not None and not (x > lo if lo_s else x >= lo):
+                    return False
+                if hi is not None and not (x < hi if hi_s else x <= hi):
+                    return False
+            for p, _op, fn, v, passa in self.altri:
+                x = ctx.get(p, _MANCA)
+                if x is _MANCA or (nm and x is None):
+                    if passa:
+                        continue
+                    return False
+                if not fn(x, v):
+                    return False
+            return True
+        except Exception:
+            return False
+
+
+class _Alternative:
+    """Regole in OR (orchestratore): basta una. Non indicizzabile."""
+
+    __slots__ = ('regole',)
+    uguali = intervalli = altri = ()
+    falso = False
+
+    def __init__(self, regole):
+        self.regole = regole
+
+    def __call__(self, ctx: dict) -> bool:
+        return any(r(ctx) for r in self.regole)
+
+
+def compila(triggers: list, dialetto: str = 'manager') -> _Predicato:
+    """Lista di trigger in AND → predicato, con la semantica dell'interprete del dialetto."""
+    d = DIALETTI[dialetto]
+    kp, ko, kv = d['chiavi']
+    ops, lascia = d['ops'], d['lascia']
+    uguali, altri, limiti = [], [], {}     # limiti: param → [lo, lo_stretto, hi, hi_stretto]
+    falso = False
+    for t in triggers or []:
+        p  = _leggi(t, kp, primo_vero=True)
+        op = _leggi(t, ko, primo_vero=True)
+        v  = _leggi(t, kv, primo_vero=False)
+        if not p or not op:
+            falso = falso or d['incompleto'] is False
+            continue
+        if op not in ops:
+            falso = falso or d['op_ignoto'] is False
+            continue
+        if op in _NUMERICI and _numero(v):
+            # piu' confronti sullo stesso param = un intervallo (vince l'estremo piu' stretto)
+            b = limiti.setdefault(p, [None, False, None, False])
+            s = op in ('>', '<')
+            if op in ('>', '>='):
+                if b[0] is None or v > b[0] or (v == b[0] and s):
+                    b[0], b[1] = v, s
+            elif b[2] is None or v < b[2] or (v == b[2] and s):
+                b[2], b[3] = v, s
+        elif op == '==':
+            uguali.append((p, v))
+        else:
+            # op d'ordine su param assente: falso anche nel dialetto che lascia passare
+            altri.append((p, op, ops[op], v, lascia and op not in _NUMERICI))
+    intervalli = tuple((p, b[0], b[1], b[2], b[3]) for p, b in limiti.items())
+    return _Predicato(tuple(uguali), intervalli, tuple(altri), lascia,
+                      d['none_manca'], falso)
+
+
+def compila_condizioni(capsula: dict):
+    """condizioni_attivazione di una capsula canvas (app.py) → predicato."""
+    cond = capsula.get("condizioni_attivazione", {})
+    op_logico = cond.get("operatore", "AND").upper()
+    regole = cond.get("regole", [])
+    if not regole or op_logico not in ("AND", "OR"):
+        return _Predicato((), (), (), False, True, falso=True)
+    if op_logico == "AND":
+        return compila(regole, 'orchestratore')
+    return _Alternative(tuple(compila([r], 'orchestratore') for r in regole))
+
+
+def _chiavi_categoriche(pred) -> list:
+    """(param, valori) di ogni == / 'in' su lista che puo' fare da chiave hash."""
+    out = []
+    for p, v in pred.uguali:
+        if _hashabile(v):
+            out.append((p, (v,)))
+    for p, op, _fn, v, _passa in pred.altri:
+        if op == 'in' and isinstance(v, (list, tuple, set, frozenset)) \
+                and all(_hashabile(e) for e in v):
+            out.append((p, tuple(v)))
+    return out
+
+
+def _righe(chiavi: list, max_righe: int = 64):
+    """
+    (param ordinati, righe della tabella) da [(param, valori)]: prodotto dei
+    valori ('in' ne ha piu' d'uno). Oltre max_righe si lascia fuori il param
+    con piu' valori (lo controlla comunque il predicato).
+    """
+    per_param = {}
+    for p, vals in chiavi:
+        if p in per_param:
+            # due vincoli sullo stesso param: basta l'intersezione
+            per_param[p] = [v for v in per_param[p] if v in set(vals)]
+        else:
+            per_param[p] = list(dict.fromkeys(vals))
+    while True:
+        firma = tuple(sorted(per_param))
+        n = 1
+        for p in firma:
+            n *= len(per_param[p])
+        if n <= max_righe or len(firma) == 1:
+            break
+        del per_param[max(firma, key=lambda p: len(per_param[p]))]
+    righe = [()]
+    for p in firma:
+        righe = [r + (v,) for r in righe for v in per_param[p]]
+    return firma, righe
+
+
+class InsiemeCapsule:
+    """
+    Capsule compilate + indice. Ordine = quello della lista passata
+    (gia' per priorita') o sorted(capsule, key=ordine). Da ricostruire a
+    ogni load/reload.
+    """
+
+    def __init__(self, capsule: list, dialetto: str = 'manager', compilatore=None,
+                 ordine=None):
+        d = DIALETTI[dialetto]
+        self.sorgente   = capsule
+        self.capsule    = sorted(capsule, key=ordine) if ordine else list(capsule)
+        self.lascia     = d['lascia']
+        self.none_manca = d['none_manca']
+        if compilatore is None:
+            compilatore = lambda c: compila(c.get('trigger', []), dialetto)
+        self._pred = [compilatore(c) for c in self.capsule]
+
+        chiavi = [_chiavi_categoriche(pr) for pr in self._pred]
+        self._tabelle = {}     # (param, ...) → {(valore, ...): [pos]}
+        self._tutti   = {}     # (param, ...) → [pos] (param assente / valore non hashabile)
+        self._bassi   = {}     # param → ([lo ordinati], [pos]) — estremo inferiore
+        self._alti    = {}     # param → ([hi ordinati], [pos]) — solo estremo superiore
+        self._sempre  = []
+        bassi, alti = {}, {}
+        for i, (pr, ch) in enumerate(zip(self._pred, chiavi)):
+            if pr.falso:
+                continue                                   # non scatta mai
+            if ch:
+                firma, righe = _righe(ch)
+                tab = self._tabelle.setdefault(firma, {})
+                for r in righe:
+                    tab.setdefault(r, []).append(i)
+                self._tutti.setdefault(firma, []).append(i)
+                continue
+            lo = next((iv for iv in pr.intervalli if iv[1] is not None), None)
+            if lo is not None:
+                bassi.setdefault(lo[0], []).append((lo[1], i))
+                continue
+            hi = next((iv for iv in pr.intervalli if iv[3] is not None), None)
+            if hi is not None:
+                alti.setdefault(hi[0], []).append((hi[3], i))
+                continue
+            self._sempre.append(i)
+        for dst, src in ((self._bassi, bassi), (self._alti, alti)):
+            for p, coppie in src.items():
+                coppie.sort()
+                dst[p] = ([c[0] for c in coppie], [c[1] for c in coppie])
+
+    def __len__(self):
+        return len(self.capsule)
+
+    def aggiornato(self, capsule: list) -> bool:
+        """Compilato da questa stessa lista, e non e' cresciuta/calata da allora."""
+        return capsule is self.sorgente and len(capsule) == len(self.capsule)
+
+    def _candidati(self, ctx: dict) -> list:
+        cand = list(self._sempre)
+        nm = self.none_manca
+        for firma, tab in self._tabelle.items():
+            riga = tuple(ctx.get(p, _MANCA) for p in firma)
+            if any(x is _MANCA or (nm and x is None) for x in riga):
+                if self.lascia:
+                    cand.extend(self._tutti[firma])
+                continue
+            try:
+                cand.extend(tab.get(riga, ()))
+            except TypeError:
+                cand.extend(self._tutti[firma])
+        for p, (los, pos) in self._bassi.items():
+            x = ctx.get(p, _MANCA)
+            if x is _MANCA or x is None:
+                continue
+            try:
+                cand.extend(pos[:bisect_right(los, x)])
+            except TypeError:
+                pass                        # confronto impossibile: falso per tutte
+        for p, (his, pos) in self._alti.items():
+            x = ctx.get(p, _MANCA)
+            if x is _MANCA or x is None:
+                continue
+            try:
+                cand.extend(pos[bisect_left(his, x):])
+            except TypeError:
+                pass
+        return sorted(set(cand))
+
+    def corrispondenti(self, ctx: dict):
+        """Capsule i cui trigger passano, in ordine di priorita' (generatore: si puo' fermare)."""
+        pred, caps = self._pred, self.capsule
+        for i in self._candidati(ctx):
+            if pred[i](ctx):
+                yield caps[i]
+
+    def stats(self) -> dict:
+        return {
+            'capsule':    len(self.capsule),
+            'tabelle':    {'+'.join(f): len(t) for f, t in self._tabelle.items()},
+            'intervalli': sorted(set(self._bassi) | set(self._alti)),
+            'sempre':     len(self._sempre),
+        }
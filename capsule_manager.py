@@ -29,10 +29,19 @@ import json
 import time
 import logging
 import os
+import threading
 from collections import deque, defaultdict
 
 log = logging.getLogger(__name__)
 
+# Trigger compilati + indice per chiave (capsule_compilate.py).
+# Senza il modulo, o con CAPSULE_COMPILATE_OFF=true: _check_triggers su ogni capsula.
+try:
+    from capsule_compilate import InsiemeCapsule
+    _COMPILATE_AVAILABLE = True
+except ImportError:
+    _COMPILATE_AVAILABLE = False
+
 # ===========================================================================
 # SCHEMA DB
 # ===========================================================================
@@ -66,6 +75,21 @@ CREATE TABLE IF NOT EXISTS capsule_log (
     context_json TEXT,
     pnl_impact   REAL DEFAULT 0.0
 );
+-- Versione delle capsule: la alzano i trigger a ogni scrittura (CapsuleManager,
+-- oracle_auto, dashboard, script). hits/last_hit_ts non contano: non cambiano la cache.
+CREATE TABLE IF NOT EXISTS capsule_versione (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    v  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO capsule_versione (id, v) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS capsule_versione_ins AFTER INSERT ON capsule
+BEGIN UPDATE capsule_versione SET v = v + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS capsule_versione_del AFTER DELETE ON capsule
+BEGIN UPDATE capsule_versione SET v = v + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS capsule_versione_upd AFTER UPDATE OF
+    id, asset, livello, tipo, trigger_json, azione_json, priority, enabled,
+    samples, wr, pnl_avg, scade_ts, note ON capsule
+BEGIN UPDATE capsule_versione SET v = v + 1 WHERE id = 1; END;
 """
 
 OPS = {
@@ -160,12 +184,33 @@ class CapsuleManager:
     MAX_AGE_L2       = 86400   # 24h
     MAX_AGE_L3       = 3600    # 1h
     ANALISI_INTERVAL = 30
+    CACHE_MAX_S      = 300     # rilettura di sicurezza anche senza cambi di versione
+    HIT_FLUSH_S      = 30      # hits/capsule_log in memoria al massimo per 30s
+    HIT_BATCH        = 200     # ... o fino a 200 FIRED
 
     def __init__(self, db_path: str, asset: str = "BTCUSDC"):
         self.db_path         = db_path
         self.asset           = asset
         self._cache          = []
         self._cache_ts       = 0.0
+        self._insieme        = None   # _cache compilata (InsiemeCapsule)
+        # Cache guidata dai cambi: PRAGMA data_version + capsule_versione.v
+        # (CM_VERSIONE_OFF=true → rilettura ogni 10s come prima)
+        self._versionata     = os.environ.get("CM_VERSIONE_OFF","false").lower() != "true"
+        self._conn_v         = None   # connessione di sola lettura per la versione
+        self._lock_v         = threading.Lock()
+        self._data_version   = None
+        self._versione       = None
+        self._v_cache        = None   # versione da cui e' stata letta _cache
+        self._scade_prima    = float("inf")   # scade_ts piu' vicino fra le capsule in cache
+        self._ricariche      = 0      # refresh fatti (per reload/check_reload)
+        self._visto_reload   = 0
+        self._visto_check    = 0
+        # FIRED accumulati, scritti a lotti da _flush_hits
+        self._hit_lock       = threading.Lock()
+        self._hit_pendenti   = {}     # capsule_id → [n, ultimo_ts]
+        self._log_pendenti   = []     # righe capsule_log
+        self._hit_flush_ts   = time.time()
         self._trade_buffer   = deque(maxlen=200)
         self._trade_count    = 0
         self._ctx            = {}
@@ -182,6 +227,10 @@ class CapsuleManager:
     def _init_db(self):
         with sqlite3.connect(self.db_path) as c:
             c.executescript(SCHEMA)
+            # last_hit_ts non era nello SCHEMA: senza, l'UPDATE di _fire falliva in silenzio
+            cols = [r[1] for r in c.execute("PRAGMA table_info(capsule)").fetchall()]
+            if "last_hit_ts" not in cols:
+                c.execute("ALTER TABLE capsule ADD COLUMN last_hit_ts REAL")
 
     def _seed_static(self):
         """Inserisce capsule statiche al boot. Ripristina se rimosse (filesystem efimero Render)."""
@@ -257,6 +306,13 @@ class CapsuleManager:
     def _refresh_cache(self):
         try:
             ora = time.time()
+            # versione PRIMA della lettura: una scrittura nel mezzo forza un altro giro, mai cache vecchia
+            v = None
+            if self._versionata:
+                try:
+                    v = self._versione_db()
+                except Exception as e:
+                    log.error(f"[CM] versione: {e}")
             with sqlite3.connect(self.db_path) as c:
                 rows = c.execute("""
                     SELECT id,asset,livello,tipo,trigger_json,azione_json,
@@ -273,9 +329,61 @@ class CapsuleManager:
                 "wr":r[9],"pnl_avg":r[10],"scade_ts":r[11],"note":r[12],
             } for r in rows]
             self._cache_ts = ora
+            self._scade_prima = min((float(r[11]) for r in rows if r[11]), default=float("inf"))
+            self._ricariche += 1
+            self._v_cache = v
+            self._compila_cache()
         except Exception as e:
             log.error(f"[CM] refresh_cache: {e}")
 
+    def _versione_db(self):
+        """capsule_versione.v, riletta solo se PRAGMA data_version dice che qualcuno ha scritto."""
+        with self._lock_v:
+            if self._conn_v is None:
+                self._conn_v = sqlite3.connect(self.db_path, check_same_thread=False)
+            dv = self._conn_v.execute("PRAGMA data_version").fetchone()[0]
+            if dv != self._data_version:
+                self._data_version = dv
+                row = self._conn_v.execute("SELECT v FROM capsule_versione WHERE id=1").fetchone()
+                self._versione = row[0] if row else None
+            return self._versione
+
+    def _aggiorna_cache(self):
+        """Rilegge la cache solo se le capsule sono cambiate (o ne scade una)."""
+        ora = time.time()
+        if ora - self._hit_flush_ts > self.HIT_FLUSH_S:
+            self._flush_hits()
+        v = None
+        if self._versionata:
+            try:
+                v = self._versione_db()
+            except Exception as e:
+                log.error(f"[CM] versione: {e}")
+        if v is None:
+            # senza versione (spenta o illeggibile): rilettura a tempo come prima
+            if ora - self._cache_ts > 10:
+                self._refresh_cache()
+        elif (v != self._v_cache or ora >= self._scade_prima
+                or ora - self._cache_ts > self.CACHE_MAX_S):
+            self._refresh_cache()
+
+    def _compila_cache(self):
+        """Trigger della cache → predicati + indice. Fallisce aperto: si torna a _check_triggers."""
+        self._insieme = None
+        if not _COMPILATE_AVAILABLE or os.environ.get("CAPSULE_COMPILATE_OFF","false").lower() == "true":
+            return
+        try:
+            self._insieme = InsiemeCapsule(self._cache, 'manager')
+        except Exception as e:
+            log.error(f"[CM] compila_cache: {e}")
+
+    def _corrispondenti(self, contesto: dict):
+        """Capsule della cache i cui trigger passano, in ordine di priorita'."""
+        ins = self._insieme
+        if ins is not None and ins.aggiornato(self._cache):
+            return ins.corrispondenti(contesto)
+        return (cap for cap in self._cache if self._check_triggers(cap["trigger"], contesto))
+
     # -------------------------------------------------------------------------
     # VALUTAZIONE
     # -------------------------------------------------------------------------
@@ -290,8 +398,7 @@ class CapsuleManager:
     }
 
     def valuta(self, contesto: dict) -> dict:
-        if time.time() - self._cache_ts > 10:
-            self._refresh_cache()
+        self._aggiorna_cache()
 
         res = {"blocca":False,"size_mult":1.0,"soglia_boost":0.0,
                "reason":"","capsule_id":"",
@@ -307,9 +414,7 @@ class CapsuleManager:
         )
         _is_vincente = _ctx_key in self._WHITELIST_VINCENTI
 
-        for cap in self._cache:
-            if not self._check_triggers(cap["trigger"], contesto):
-                continue
+        for cap in self._corrispondenti(contesto):
             act  = cap["azione"]
             atype = act.get("type") or act.get("tipo", "")
 
@@ -458,8 +563,7 @@ class CapsuleManager:
           oracolo_override   bool         — almeno una capsula chiede override
           flags              dict         — altri flag (sblocca_short_ranging, ecc.)
         """
-        if time.time() - self._cache_ts > 10:
-            self._refresh_cache()
+        self._aggiorna_cache()
 
         out = {
             "block_score":         0.0,
@@ -494,9 +598,7 @@ class CapsuleManager:
                 return min(1.0, max(0.0, cap.get("samples",0) / 10.0))
             return 0.5
 
-        for cap in self._cache:
-            if not self._check_triggers(cap["trigger"], contesto):
-                continue
+        for cap in self._corrispondenti(contesto):
             act   = cap["azione"]
             atype = act.get("type") or act.get("tipo", "")
             peso  = _peso(cap)
@@ -655,15 +757,39 @@ class CapsuleManager:
         return True
 
     def _fire(self, cap_id: str, ctx: dict):
+        """Registra l'uso di una capsula: in memoria, al DB a lotti (_flush_hits)."""
         try:
-            with sqlite3.connect(self.db_path) as c:
-                c.execute("UPDATE capsule SET hits=hits+1, last_hit_ts=? WHERE id=?", (time.time(), cap_id,))
-                c.execute("INSERT INTO capsule_log (ts,capsule_id,asset,event,context_json) VALUES (?,?,?,?,?)",
-                    (time.time(), cap_id, self.asset, "FIRED",
-                     json.dumps({k:v for k,v in ctx.items() if isinstance(v,(str,int,float,bool))})))
+            ora = time.time()
+            riga = (ora, cap_id, self.asset, "FIRED",
+                    json.dumps({k:v for k,v in ctx.items() if isinstance(v,(str,int,float,bool))}))
+            with self._hit_lock:
+                h = self._hit_pendenti.setdefault(cap_id, [0, ora])
+                h[0] += 1
+                h[1] = ora
+                self._log_pendenti.append(riga)
+                pieno = len(self._log_pendenti) >= self.HIT_BATCH
+            if pieno or ora - self._hit_flush_ts > self.HIT_FLUSH_S:
+                self._flush_hits()
         except Exception:
             pass
 
+    def _flush_hits(self):
+        """hits/last_hit_ts e righe capsule_log accumulati: una transazione."""
+        with self._hit_lock:
+            hits, righe = self._hit_pendenti, self._log_pendenti
+            self._hit_pendenti, self._log_pendenti = {}, []
+            self._hit_flush_ts = time.time()
+        if not righe:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as c:
+                c.executemany("UPDATE capsule SET hits=hits+?, last_hit_ts=? WHERE id=?",
+                              [(n, ts, cid) for cid, (n, ts) in hits.items()])
+                c.executemany("INSERT INTO capsule_log (ts,capsule_id,asset,event,context_json) VALUES (?,?,?,?,?)",
+                              righe)
+        except Exception as e:
+            log.error(f"[CM] flush hits ({len(righe)} FIRED persi): {e}")
+
     # -------------------------------------------------------------------------
     # APPRENDIMENTO
     # -------------------------------------------------------------------------
@@ -973,6 +1099,7 @@ class CapsuleManager:
         - La scadenza temporale (scade_ts) NON disabilita più automaticamente
         """
         try:
+            self._flush_hits()      # i conteggi in memoria decidono chi e' ancora usata
             GIORNI_30 = 30 * 24 * 3600
             ora = time.time()
             with sqlite3.connect(self.db_path) as c:
@@ -998,6 +1125,7 @@ class CapsuleManager:
 
     def get_all_for_dashboard(self) -> list:
         try:
+            self._flush_hits()
             ora = time.time()
             with sqlite3.connect(self.db_path) as c:
                 rows = c.execute("""
@@ -1073,15 +1201,18 @@ class CapsuleManager:
         except Exception:
             return {"attive":0,"static":0,"learned":0,"auto":0,"trade_osservati":0}
 
-    # Compatibility
+    # Compatibility — True solo se la cache e' cambiata dall'ultima chiamata
+    # (come CapsuleRuntime.reload: hash del file cambiato)
     def reload(self) -> bool:
-        self._refresh_cache()
-        return True
+        self._aggiorna_cache()
+        nuova, self._visto_reload = self._ricariche != self._visto_reload, self._ricariche
+        return nuova
 
     def check_reload(self) -> bool:
         """Compatibility con ConfigHotReloader.check_reload()"""
-        self._refresh_cache()
-        return True
+        self._aggiorna_cache()
+        nuova, self._visto_check = self._ricariche != self._visto_check, self._ricariche
+        return nuova
 
     @property
     def capsules(self):
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ CONFIG SNAPSHOT — env letto UNA volta, tipizzato, ricaricabile a caldo
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  Fra _process_tick_body e _close_shadow_trade ~126 letture
+  float(os.environ.get(...)) / os.environ.get(...).lower() == "true"
+  ad OGNI tick: dizionario dell'ambiente + parsing della stringa, per
+  manopole che cambiano una volta al giorno.
+
+SOLUZIONE:
+  ConfigSnapshot: fotografia immutabile di os.environ (+ override da
+  file) con letture tipizzate. Ogni (tipo, nome, default) e' convertito
+  la prima volta che un organo lo chiede e poi e' un lookup di dict.
+  Il default resta quello scritto sul sito che legge: lo stesso nome
+  con default diversi in punti diversi continua a comportarsi uguale.
+
+  ConfigStore tiene lo snapshot corrente. refresh() ne pubblica uno
+  nuovo solo se env o file di override sono cambiati; chi sta leggendo
+  finisce il tick sul vecchio (lo scambio e' un'assegnazione).
+  Ricarica: dal tick ogni CONFIG_REFRESH_S (default 30), o subito con
+  SIGHUP.
+
+OVERRIDE A CALDO (tuning live su Render senza redeploy):
+  CONFIG_OVERRIDE_FILE (default: config_override.json accanto al DB)
+  {"SCORE_FLOOR": "62", "TRAIL_OFF": "true"} — vince sull'env. Togliere
+  la chiave = torna all'env.
+
+  effective() → ogni manopola letta dal bot: tipo, default, valore
+  effettivo e da dove arriva (env / override / default). /config/effective
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import json
+import time
+import logging
+from types import MappingProxyType
+
+log = logging.getLogger(__name__)
+
+_TIPI = {
+    'bool':  None,          # gestito a parte (insieme dei valori "veri")
+    'float': float,
+    'int':   int,
+    'str':   str,
+}
+
+
+class ConfigSnapshot:
+    """Ambiente congelato a un istante. Le letture non fanno parsing due volte."""
+
+    __slots__ = ('version', 'ts', '_env', '_override', '_memo')
+
+    def __init__(self, env: dict, override: dict = None, version: int = 0):
+        self.version   = version
+        self.ts        = time.time()
+        self._override = MappingProxyType(dict(override or {}))
+        merged = dict(env)
+        merged.update(self._override)
+        self._env      = MappingProxyType(merged)
+        self._memo     = {}
+
+    def raw(self, nome: str, default: str = None):
+        return self._env.get(nome, default)
+
+    def _leggi(self, tipo: str, nome: str, default, vero=('true',)):
+        chiave = (tipo, nome, default, vero)
+        try:
+            return self._memo[chiave]
+        except KeyError:
+            pass
+        s = self._env.get(nome)
+        if s is None:
+            v = default
+        elif tipo == 'bool':
+            v = s.lower() in vero
+        else:
+            v = _TIPI[tipo](s)      # ValueError come prima: niente memo
+        self._memo[chiave] = v
+        return v
+
+    def bool(self, nome: str, default: bool = False, vero=('true',)) -> bool:
+        """env.get(nome, default).lower() in vero"""
+        return self._leggi('bool', nome, bool(default), vero)
+
+    def float(self, nome: str, default: float = 0.0) -> float:
+        return self._leggi('float', nome, float(default))
+
+    def int(self, nome: str, default: int = 0) -> int:
+        return self._leggi('int', nome, int(default))
+
+    def str(self, nome: str, default: str = '') -> str:
+        return self._leggi('str', nome, default)
+
+    def effective(self) -> dict:
+        """Manopole lette da questo snapshot, con il valore effettivo."""
+        out = {}
+        # list(): il tick puo' aggiungere voci mentre l'HTTP legge
+        for (tipo, nome, default, _vero), v in sorted(list(self._memo.items()),
+                                                      key=lambda kv: kv[0][1]):
+            if nome in self._override:
+                fonte = 'override'
+            elif nome in self._env:
+                fonte = 'env'
+            else:
+                fonte = 'default'
+            voce = out.setdefault(nome, {'tipo': tipo, 'fonte': fonte,
+                                         'valore': v, 'default': []})
+            if default not in voce['default']:
+                voce['default'].append(default)
+            if fonte == 'default' and len(voce['default']) > 1:
+                # stesso nome, default diversi sui vari siti
+                voce['valore'] = None
+        return out
+
+
+class ConfigStore:
+    """Snapshot corrente + ricarica (timer dal tick, SIGHUP, a mano)."""
+
+    def __init__(self, override_path: str = None, refresh_s: float = 30.0):
+        self.override_path = override_path
+        self.refresh_s     = refresh_s
+        self._ov_mtime     = None
+        self._ov           = {}
+        self.errors        = 0
+        self.last_err      = None
+        self.reloads       = 0
+        self._last_check   = 0.0
+        self.snap          = ConfigSnapshot(os.environ, self._leggi_override(), version=1)
+
+    def _leggi_override(self) -> dict:
+        p = self.override_path
+        if not p:
+            return {}
+        try:
+            m = os.path.getmtime(p)
+        except OSError:
+            self._ov_mtime, self._ov = None, {}
+            return {}
+        if m != self._ov_mtime:
+            try:
+                with open(p) as f:
+                    dati = json.load(f)
+                # valori sempre stringa, come l'env
+                self._ov = {str(k): (v if isinstance(v, str) else json.dumps(v))
+                            for k, v in dati.items()}
+                self._ov_mtime = m
+            except Exception as e:
+                self.errors += 1
+                self.last_err = f"{type(e).__name__}: {e}"
+                log.warning(f"[CONFIG] override illeggibile {p}: {self.last_err}")
+        return self._ov
+
+    def refresh(self, force: bool = False) -> bool:
+        """Pubblica un nuovo snapshot se env/override sono cambiati."""
+        ov = self._leggi_override()
+        cur = self.snap
+        env = dict(os.environ)
+        merged = dict(env)
+        merged.update(ov)
+        if not force and merged == dict(cur._env) and ov == dict(cur._override):
+            return False
+        self.snap = ConfigSnapshot(env, ov, version=cur.version + 1)
+        self.reloads += 1
+        log.info(f"[CONFIG] snapshot v{self.snap.version} pubblicato")
+        return True
+
+    def maybe_refresh(self, now: float) -> bool:
+        """Chiamato dal tick: ricarica al massimo ogni refresh_s secondi."""
+        if now - self._last_check < self.refresh_s:
+            return False
+        self._last_check = now
+        try:
+            return self.refresh()
+        except Exception as e:
+            self.errors += 1
+            self.last_err = f"{type(e).__name__}: {e}"
+            return False
+
+    def install_sighup(self) -> bool:
+        """kill -HUP <pid> → refresh immediato. Solo dal main thread."""
+        try:
+            import signal
+            signal.signal(signal.SIGHUP, lambda *_a: self.refresh(force=True))
+            return True
+        except (ValueError, AttributeError, OSError):
+            return False
+
+    def effective(self) -> dict:
+        s = self.snap
+        return {
+            'version':       s.version,
+            'ts':            s.ts,
+            'reloads':       self.reloads,
+            'override_file': self.override_path,
+            'override':      dict(s._override),
+            'errors':        self.errors,
+            'last_err':      self.last_err,
+            'manopole':      s.effective(),
+        }
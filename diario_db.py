@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ DIARIO DB — le tabelle di osservazione in un file SQLite per giorno
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  phantom_forensic, telemetry, primi_secondi, i *_tagli dei gate...
+  scrivono molto e valgono poco a distanza di giorni, ma stavano nello
+  stesso trading_data.db di trades, capsule e bot_state: stesso file,
+  stesso WAL, stessi lock delle letture della dashboard. Il DB caldo
+  cresceva con loro, e un'analisi pesante bloccava il trading.
+
+SOLUZIONE:
+  Ogni tabella di schema_db.DIARIO si scrive nel file del giorno (UTC):
+      <dir>/diario_20260817.db          (per_ora: diario_20260817_14.db)
+  con il suo ScrittoreDB (thread e connessione del file, nessun lock del
+  processo: e' un altro file). A cambio giorno lo scrittore vecchio si
+  chiude in un thread a parte e i file oltre keep_giorni si cancellano:
+  la ritenzione e' un unlink, niente DELETE.
+
+  Letture su piu' giorni: leggi(da_ts) apre una connessione in memoria,
+  ATTACH in sola lettura dei file che coprono l'intervallo (al massimo
+  MAX_ATTACH, i piu' recenti) e una TEMP VIEW per tabella con lo stesso
+  nome (UNION ALL): la query di sempre gira invariata. Per intervalli
+  piu' lunghi: per_file() interroga un file alla volta.
+
+  Ogni SELECT della vista elenca le colonne dello schema ATTUALE
+  (schema_db), NULL dove un file vecchio non le ha: una colonna aggiunta
+  dopo non rompe la UNION con i file di prima. Un file senza la tabella
+  resta fuori da quella vista.
+
+  Lo storico: le righe scritte in trading_data.db prima del diario
+  (storico=DB_PATH) entrano nelle viste e in per_file() come il file
+  piu' vecchio, finche' ci stanno nei MAX_ATTACH. Niente copia: il DB
+  del bot resta com'e', il diario le vede.
+
+  La riga va nel file del momento in cui si scrive (non del suo ts): un
+  phantom aperto alle 23:59 e chiuso alle 00:01 sta nel file del giorno
+  dopo, e una lettura da un ts in poi lo trova comunque.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import re
+import time
+import calendar
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from scrittore_db import ScrittoreDB
+import schema_db
+
+log = logging.getLogger(__name__)
+
+# SQLITE_MAX_ATTACHED vale 10 di default
+MAX_ATTACH = 10
+
+_NOME_FILE = re.compile(r"^diario_(\d{8})(?:_(\d{2}))?\.db$")
+
+
+class DiarioDB:
+    """Scritture per giorno (o per ora) sulle tabelle di schema_db.DIARIO."""
+
+    def __init__(self, base_dir: str, per_ora: bool = False, keep_giorni: float = 14,
+                 flush_ms: float = 200, batch: int = 500, storico: str = None):
+        self.base_dir    = base_dir
+        self.storico     = storico           # DB con le righe di prima del diario
+        self.per_ora     = per_ora
+        self.keep_giorni = float(keep_giorni)
+        self.flush_ms    = flush_ms
+        self.batch       = batch
+        self.tabelle     = frozenset(schema_db.DIARIO)
+        # colonne dello schema attuale, nell'ordine del CREATE
+        self.colonne     = {t.nome: [c for c, _ in t.colonne()]
+                            for t in schema_db.TABELLE if t.nome in self.tabelle}
+        self.passo       = 3600 if per_ora else 86400
+        self._mx         = threading.Lock()
+        self._chiave     = None              # partizione corrente (inizio in epoch)
+        self._scrittore  = None
+        self.file_aperti = 0
+        self.file_cancellati = 0
+        self.righe       = 0
+        os.makedirs(base_dir, exist_ok=True)
+
+    # ── nomi dei file ──────────────────────────────────────────────────
+    def _inizio(self, ts: float) -> int:
+        return int(ts // self.passo * self.passo)
+
+    def file_per(self, ts: float = None) -> str:
+        t = time.gmtime(self._inizio(time.time() if ts is None else ts))
+        nome = time.strftime("diario_%Y%m%d_%H.db" if self.per_ora else "diario_%Y%m%d.db", t)
+        return os.path.join(self.base_dir, nome)
+
+    def partizioni(self) -> list:
+        """[(inizio_epoch, durata_s, path)] dei file presenti, dal piu' vecchio."""
+        out = []
+        try:
+            nomi = os.listdir(self.base_dir)
+        except OSError:
+            return out
+        for nome in nomi:
+            m = _NOME_FILE.match(nome)
+            if not m:
+                continue
+            # i nomi sono in UTC; un file per ora e uno per giorno possono
+            # convivere se si cambia modo: valgono entrambi
+            inizio = calendar.timegm(time.strptime(m.group(1) + (m.group(2) or "00"), "%Y%m%d%H"))
+            out.append((inizio, 3600 if m.group(2) else 86400, os.path.join(self.base_dir, nome)))
+        out.sort()
+        return out
+
+    def file_tra(self, da_ts: float, a_ts: float = None) -> list:
+        """I file che possono contenere righe scritte in [da_ts, a_ts]."""
+        a_ts = time.time() if a_ts is None else a_ts
+        out = []
+        for inizio, durata, path in self.partizioni():
+            if inizio + durata > da_ts and inizio <= a_ts:
+                out.append(path)
+        return out
+
+    # ── scrittura ──────────────────────────────────────────────────────
+    def scrittore(self) -> ScrittoreDB:
+        """Lo scrittore del file corrente; a cambio partizione apre il nuovo."""
+        chiave = self._inizio(time.time())
+        w = self._scrittore
+        if chiave == self._chiave and w is not None:
+            return w
+        with self._mx:
+            if chiave == self._chiave and self._scrittore is not None:
+                return self._scrittore
+            path = self.file_per(chiave)
+            schema_db.pronto(path, 'diario')
+            vecchio = self._scrittore
+            self._scrittore = ScrittoreDB(path, flush_ms=self.flush_ms, batch=self.batch)
+            self._chiave = chiave
+            self.file_aperti += 1
+            log.info(f"[DIARIO] scrivo su {os.path.basename(path)}")
+        # chiusura del vecchio e ritenzione: fuori dal thread che scrive
+        threading.Thread(target=self._cambio, args=(vecchio,), daemon=True,
+                         name="diario_cambio").start()
+        return self._scrittore
+
+    def _cambio(self, vecchio):
+        if vecchio is not None:
+            try:
+                vecchio.chiudi()
+            except Exception as e:
+                log.warning(f"[DIARIO] chiusura {vecchio.db_path}: {e}")
+        try:
+            self.pulisci()
+        except Exception as e:
+            log.warning(f"[DIARIO] pulizia: {e}")
+
+    def esegui(self, sql: str, params=()):
+        self.scrittore().esegui(sql, params)
+        self.righe += 1
+
+    def esegui_molti(self, sql: str, righe):
+        righe = list(righe)
+        self.scrittore().esegui_molti(sql, righe)
+        self.righe += len(righe)
+
+    def pulisci(self, adesso: float = None) -> list:
+        """Cancella i file finiti da piu' di keep_giorni. Ritorna i cancellati."""
+        adesso = time.time() if adesso is None else adesso
+        limite = adesso - self.keep_giorni * 86400
+        corrente = self.file_per(adesso)
+        via = []
+        for inizio, durata, path in self.partizioni():
+            if path == corrente or inizio + durata > limite:
+                continue
+            for f in (path, path + "-wal", path + "-shm"):
+                try:
+                    os.remove(f)
+                except FileNotFoundError:
+                    pass
+            schema_db.dimentica(path, 'diario')
+            via.append(os.path.basename(path))
+        if via:
+            self.file_cancellati += len(via)
+            log.info(f"[DIARIO] ritenzione {self.keep_giorni:g}g: cancellati {via}")
+        return via
+
+    # ── lettura ────────────────────────────────────────────────────────
+    def _storico(self):
+        """Il DB dello storico se c'e' (e non e' un file del diario)."""
+        p = self.storico
+        if p and os.path.exists(p) and not _NOME_FILE.match(os.path.basename(p)):
+            return p
+        return None
+
+    def fonti(self, da_ts: float, a_ts: float = None) -> list:
+        """File da leggere per [da_ts, a_ts], dal piu' vecchio: storico + giorni."""
+        files = self.file_tra(da_ts, a_ts)
+        storico = self._storico()
+        if storico is not None and len(files) < MAX_ATTACH:
+            return [storico] + files
+        return files[-MAX_ATTACH:]
+
+    def _select(self, conn, alias: str, nome: str) -> str:
+        """SELECT delle colonne dello schema attuale; NULL per quelle che il file non ha."""
+        ha = {r[1] for r in conn.execute(f"PRAGMA {alias}.table_info({nome})")}
+        cols = ", ".join(col if col in ha else f"NULL AS {col}" for col in self.colonne[nome])
+        return f"SELECT {cols} FROM {alias}.{nome}"
+
+    @contextmanager
+    def leggi(self, da_ts: float, a_ts: float = None):
+        """
+        with diario.leggi(ts0) as conn: conn.execute("SELECT ... FROM phantom_forensic ...")
+        Le tabelle del diario sono TEMP VIEW sull'unione dei file attaccati.
+        """
+        files = self.fonti(da_ts, a_ts)
+        storico = self._storico()
+        c = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+        try:
+            presenti = {}
+            for i, path in enumerate(files):
+                alias = f"d{i}"
+                c.execute("ATTACH DATABASE ? AS " + alias,
+                          ("file:" + os.path.abspath(path) + "?mode=ro",))
+                for (nome,) in c.execute(f"SELECT name FROM {alias}.sqlite_master WHERE type='table'"):
+                    if nome not in self.tabelle:
+                        continue
+                    # nello storico le tabelle ci sono sempre (schema 'bot'): solo se piene
+                    if path == storico and c.execute(
+                            f"SELECT 1 FROM {alias}.{nome} LIMIT 1").fetchone() is None:
+                        continue
+                    presenti.setdefault(nome, []).append(alias)
+            for nome, alias in presenti.items():
+                corpo = " UNION ALL ".join(self._select(c, a, nome) for a in alias)
+                c.execute(f"CREATE TEMP VIEW {nome} AS {corpo}")
+            yield c
+        finally:
+            c.close()
+
+    def per_file(self, sql: str, params=(), da_ts: float = 0, a_ts: float = None):
+        """Righe di sql su ogni file dell'intervallo (storico compreso), dal piu' vecchio."""
+        storico = self._storico()
+        for path in ([storico] if storico is not None else []) + self.file_tra(da_ts, a_ts):
+            c = sqlite3.connect("file:" + os.path.abspath(path) + "?mode=ro", uri=True)
+            try:
+                for riga in c.execute(sql, params):
+                    yield riga
+            finally:
+                c.close()
+
+    def stats(self) -> dict:
+        w = self._scrittore
+        parts = self.partizioni()
+        return {
+            'dir':             self.base_dir,
+            'storico':         self._storico(),
+            'per_ora':         self.per_ora,
+            'corrente':        os.path.basename(w.db_path) if w is not None else None,
+            'file':            len(parts),
+            'mb':              round(sum(os.path.getsize(p) for _, _, p in parts
+                                         if os.path.exists(p)) / 1e6, 2),
+            'righe':           self.righe,
+            'file_aperti':     self.file_aperti,
+            'file_cancellati': self.file_cancellati,
+            'scrittore':       w.stats() if w is not None else None,
+        }
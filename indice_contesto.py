@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ INDICE CONTESTO — i trade passati in colonne per il context-matching
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  OracoloDinamico.context_match scorreva _trade_history in Python:
+  distanza pesata a mano per ogni trade (con mom_map/vol_map ricostruiti
+  a ogni elemento), poi sort dell'intera lista per prenderne 5. Per
+  questo la storia era tenuta a 200 trade.
+
+SOLUZIONE:
+  Ogni trade e' codificato UNA volta, quando entra, in una riga numerica:
+  regime e direzione come codici (si confrontano solo per uguaglianza),
+  momentum e volatilita' come ordinali (FORTE=2/MEDIO=1/DEBOLE=0,
+  ALTA=2/MEDIA=1/BASSA=0), rsi, drift, range_position, pnl.
+  La distanza verso una situazione e' UN'espressione su colonne, stessi
+  pesi di prima; i k vicini arrivano da argpartition, ordinati per
+  distanza e, a pari distanza, per ordine d'ingresso (come il sort
+  stabile di prima).
+
+  Anello a capacita' fissa (default 50000): pieno, il nuovo trade
+  sovrascrive il piu' vecchio. seq = numero progressivo del trade,
+  serve al pareggio e al salvataggio incrementale (righe_da(seq)).
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+
+MOM_ORD = {'FORTE': 2, 'MEDIO': 1, 'DEBOLE': 0}
+VOL_ORD = {'ALTA': 2, 'MEDIA': 1, 'BASSA': 0}
+
+# pesi di context_match; le colonne continue sono salvate gia' scalate
+P_REGIME, P_DIREZIONE, P_MOM, P_VOL = 3.0, 2.0, 1.0, 0.5
+S_RSI, S_DRIFT, S_RANGE = 1.5 / 20.0, 1.5 / 0.10, 2.0
+PARI = 1e-9
+
+
+class IndiceContesto:
+    """Storia dei trade per il k-NN del context-matching. Un solo scrittore."""
+
+    def __init__(self, capacita: int = 50000):
+        self.capacita = max(16, int(capacita))
+        C = self.capacita
+        # cat = coppia (regime, direzione) * 9 + momentum * 3 + volatilita'
+        self._cat   = np.zeros(C, dtype=np.intp)
+        self._cont  = np.zeros((3, C), dtype=np.float64)   # rsi, drift, range scalati
+        self._pnl   = np.zeros(C, dtype=np.float64)
+        self._seq   = np.zeros(C, dtype=np.int64)
+        self._coppie = {}               # (regime, direzione) → indice
+        self._grezzi = [None] * C       # riga com'era (per il salvataggio)
+        self._d   = np.empty(C)         # buffer della query
+        self._tmp = np.empty(C)
+        self.n   = 0                    # righe valide
+        self.seq = 0                    # trade inseriti in totale (prossimo seq)
+
+    def __len__(self):
+        return self.n
+
+    def aggiungi(self, regime: str, direction: str, momentum: str, volatility: str,
+                 rsi: float = 50.0, drift: float = 0.0, range_position: float = 0.5,
+                 pnl: float = 0.0, seq: int = None):
+        """Un trade chiuso. seq esplicito solo quando si ricarica dal DB."""
+        if seq is None:
+            seq = self.seq
+        rsi = 50.0 if rsi is None else float(rsi)
+        drift = 0.0 if drift is None else float(drift)
+        range_position = 0.5 if range_position is None else float(range_position)
+        coppia = self._coppie.setdefault((regime, direction), len(self._coppie))
+        i = seq % self.capacita
+        self._cat[i] = coppia * 9 + MOM_ORD.get(momentum, 1) * 3 + VOL_ORD.get(volatility, 1)
+        self._cont[0, i] = rsi * S_RSI
+        self._cont[1, i] = drift * S_DRIFT
+        self._cont[2, i] = range_position * S_RANGE
+        self._pnl[i] = pnl
+        self._seq[i] = seq
+        self._grezzi[i] = (regime, direction, momentum, volatility, rsi, drift, range_position, pnl)
+        self.seq = max(self.seq, seq + 1)
+        self.n = min(self.n + 1, self.capacita)
+
+    def clear(self):
+        self.n = 0
+        self.seq = 0
+
+    def _tabella_cat(self, regime, momentum, volatility, direction):
+        """Distanza categorica per ogni valore di cat, verso questa situazione."""
+        coppie = np.array([P_REGIME * (r != regime) + P_DIREZIONE * (d != direction)
+                           for (r, d) in self._coppie], dtype=np.float64)
+        m = np.abs(np.arange(3) - MOM_ORD.get(momentum, 1)) * P_MOM
+        v = np.abs(np.arange(3) - VOL_ORD.get(volatility, 1)) * P_VOL
+        return (coppie[:, None] + (m[:, None] + v[None, :]).ravel()[None, :]).ravel()
+
+    def distanze(self, regime: str, momentum: str, volatility: str,
+                 direction: str, rsi: float, drift: float, range_position: float):
+        """Distanza pesata di ogni trade in storia (stessi pesi di context_match)."""
+        n = self.n
+        d, tmp = self._d[:n], self._tmp[:n]
+        np.take(self._tabella_cat(regime, momentum, volatility, direction), self._cat[:n], out=d)
+        for j, q in enumerate((rsi * S_RSI, drift * S_DRIFT, range_position * S_RANGE)):
+            np.subtract(self._cont[j, :n], q, out=tmp)
+            np.abs(tmp, out=tmp)
+            d += tmp
+        return d
+
+    def vicini(self, regime: str, momentum: str, volatility: str, direction: str,
+               rsi: float, drift: float, range_position: float, k: int = 5):
+        """(distanze, pnl) dei k trade piu' vicini, dal piu' vicino."""
+        n = self.n
+        if n == 0:
+            return np.zeros(0), np.zeros(0)
+        d = self.distanze(regime, momentum, volatility, direction, rsi, drift, range_position)
+        if n > k:
+            # tutti quelli entro la k-esima distanza, poi pareggio per ordine d'ingresso
+            kth = d[np.argpartition(d, k - 1)[k - 1]]
+            cand = np.flatnonzero(d <= kth + PARI)
+        else:
+            cand = np.arange(n)
+        # distanze uguali a meno dell'arrotondamento = pari (l'ordine dei termini cambia l'ultima cifra)
+        ordine = cand[np.lexsort((self._seq[cand], np.round(d[cand] / PARI)))][:k]
+        return d[ordine].copy(), self._pnl[ordine]
+
+    def righe_da(self, seq0: int) -> list:
+        """Trade con seq >= seq0 ancora in anello, per il salvataggio incrementale."""
+        primo = max(seq0, self.seq - self.n)
+        return [(s,) + self._grezzi[s % self.capacita] for s in range(primo, self.seq)]
+
+    def stats(self) -> dict:
+        return {
+            'trade':    self.n,
+            'capacita': self.capacita,
+            'seq':      self.seq,
+            'contesti': len(self._coppie),
+        }
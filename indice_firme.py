@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ INDICE FIRME — le firme di WinningSignatureLogger in memoria, per esito
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  compute_match_at_entry, a ogni entry candidata: connessione SQLite
+  sotto il lock globale del DB, SELECT ... ORDER BY ts DESC LIMIT 20,
+  json.loads di ogni riga, poi similarity() campo per campo in Python.
+
+SOLUZIONE:
+  Per esito (WIN_NET / LOSS_FEE / LOSS_REAL) un anello di firme:
+  ts, campi numerici gia' divisi per il loro range tipico (NaN = campo
+  assente), campi categorici come codici (-1 = assente), e il dict
+  originale a fianco. save_signature lo aggiorna insieme al DB; al boot
+  si ricarica dal DB solo cio' che e' ancora vivo (TTL).
+
+  similarita(): la stessa formula di similarity() su tutte le firme
+  vive di un esito in un colpo — categorici 1/0 peso 1.5, numerici
+  max(0, 1 - |a-b|/range) peso 1, solo i campi presenti in entrambe.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+
+
+class _Anello:
+    """Firme di un esito, dalla piu' vecchia alla piu' nuova."""
+
+    def __init__(self, cap: int, n_num: int, n_cat: int):
+        self.cap   = cap
+        self.ts    = np.full(cap, -np.inf)
+        self.num   = np.full((cap, n_num), np.nan)
+        self.cat   = np.full((cap, n_cat), -1, dtype=np.int32)
+        self.firme = [None] * cap
+        self.n     = 0          # firme inserite in totale
+
+    def aggiungi(self, ts: float, num, cat, firma: dict):
+        i = self.n % self.cap
+        self.ts[i], self.num[i], self.cat[i], self.firme[i] = ts, num, cat, firma
+        self.n += 1
+
+    def vive(self, cutoff: float):
+        """Indici delle firme con ts >= cutoff, dalla piu' nuova."""
+        m = min(self.n, self.cap)
+        ordine = (self.n - 1 - np.arange(m)) % self.cap
+        return ordine[self.ts[ordine] >= cutoff]
+
+
+class IndiceFirme:
+    """Firme per esito, numeriche normalizzate e categoriche codificate."""
+
+    def __init__(self, numerici: list, categorici: list, range_tipici: dict,
+                 capacita: int = 256):
+        self.numerici   = list(numerici)
+        self.categorici = list(categorici)
+        self.scala      = np.array([float(range_tipici.get(f, 1.0)) for f in self.numerici])
+        self.capacita   = capacita
+        self._codici    = [{} for _ in self.categorici]   # per campo: valore → codice
+        self._anelli    = {}
+
+    def _anello(self, esito: str) -> _Anello:
+        a = self._anelli.get(esito)
+        if a is None:
+            a = self._anelli[esito] = _Anello(self.capacita, len(self.numerici),
+                                              len(self.categorici))
+        return a
+
+    def _codifica(self, firma: dict, nuovi: bool):
+        num = np.full(len(self.numerici), np.nan)
+        for j, f in enumerate(self.numerici):
+            v = firma.get(f)
+            if v is None:
+                continue
+            try:
+                num[j] = float(v)
+            except (ValueError, TypeError):
+                pass
+        num /= self.scala
+        cat = np.full(len(self.categorici), -1, dtype=np.int32)
+        for j, f in enumerate(self.categorici):
+            v = firma.get(f)
+            if v is None:
+                continue
+            cod = self._codici[j]
+            c = cod.get(v)
+            if c is None:
+                if not nuovi:
+                    c = -2          # mai visto: presente, ma non combacia con nessuno
+                else:
+                    c = cod[v] = len(cod)
+            cat[j] = c
+        return num, cat
+
+    def aggiungi(self, esito: str, firma: dict, ts: float):
+        num, cat = self._codifica(firma, nuovi=True)
+        self._anello(esito).aggiungi(ts, num, cat, firma)
+
+    def recenti(self, esito: str, cutoff: float, limite: int = 20) -> list:
+        """Dict delle firme vive di un esito, dalla piu' nuova (come il SELECT)."""
+        a = self._anelli.get(esito)
+        if a is None:
+            return []
+        return [a.firme[i] for i in a.vive(cutoff)[:limite]]
+
+    def similarita(self, firma: dict, esito: str, cutoff: float, limite: int = None):
+        """Similarita' 0-1 verso ogni firma viva dell'esito, dalla piu' nuova."""
+        a = self._anelli.get(esito)
+        if a is None:
+            return np.zeros(0)
+        idx = a.vive(cutoff)
+        if limite is not None:
+            idx = idx[:limite]
+        if len(idx) == 0 or not firma:
+            return np.zeros(len(idx))
+        qn, qc = self._codifica(firma, nuovi=False)
+        C = a.cat[idx]
+        ok_c = (C != -1) & (qc != -1)
+        N = a.num[idx]
+        ok_n = ~np.isnan(N) & ~np.isnan(qn)
+        sim_n = np.where(ok_n, np.maximum(0.0, 1.0 - np.abs(N - qn)), 0.0)
+        somma = 1.5 * (ok_c & (C == qc)).sum(axis=1) + sim_n.sum(axis=1)
+        pesi = 1.5 * ok_c.sum(axis=1) + ok_n.sum(axis=1)
+        return np.divide(somma, pesi, out=np.zeros(len(idx)), where=pesi > 0)
+
+    def stats(self) -> dict:
+        return {e: a.n for e, a in self._anelli.items()}
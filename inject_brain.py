@@ -10,7 +10,7 @@ INJECT_BRAIN — Iniezione dati storici nell'Oracolo
 ╚══════════════════════════════════════════════════════════════════════╝
 """
 
-import sqlite3, json, random, argparse
+import sqlite3, json, random, argparse, time
 random.seed(42)
 
 EXPOSURE = 5000.0
@@ -116,6 +116,31 @@ def build_memoria(data):
     return {"trust":t,"separazione":s,"blacklist":b,"divorzio":[],"wins":w,"losses":l,"wr_history":h}
 
 
+SCALARI_FP=('wins','samples','pnl_sum','real_samples')
+
+def ha_tabella(conn,nome):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",(nome,)).fetchone() is not None
+
+def esistenti(conn,rows):
+    """Fingerprint gia' nel DB: righe di oracolo_fp, piu' la riga JSON 'oracolo' se c'e' ancora."""
+    ex={}
+    if ha_tabella(conn,'oracolo_fp'):
+        for fp,w,n,p,r,code in conn.execute(
+                "SELECT fp,wins,samples,pnl_sum,real_samples,code_json FROM oracolo_fp"):
+            ex[fp]=dict(json.loads(code or '{}'),wins=w or 0,samples=n or 0,pnl_sum=p or 0,real_samples=r or 0)
+    if 'oracolo' in rows:
+        for fp,re in json.loads(rows['oracolo']).items():
+            # la tabella e' il dato piu' recente: il JSON vale solo dove non c'e'
+            if fp not in ex or ex[fp].get('real_samples',0)==0: ex[fp]=re
+    return ex
+
+def riga_fp(fp,e,ts):
+    """Riga di oracolo_fp come PersistenzaStato._riga_fp del bot."""
+    code={k:list(v) for k,v in e.items() if k not in SCALARI_FP and isinstance(v,list)}
+    return (fp,float(e.get('wins',0)),float(e.get('samples',0)),float(e.get('pnl_sum',0)),
+            int(e.get('real_samples',0)),json.dumps(code),ts)
+
+
 def inject(db_path, dry_run=False):
     print(f"\n{'='*60}")
     print(f"  INJECT_BRAIN USDC | exposure=${EXPOSURE} fee=${FEE} be=+${FEE/BTC_QTY:.0f}BTC")
@@ -141,8 +166,11 @@ def inject(db_path, dry_run=False):
     try:
         conn=sqlite3.connect(db_path)
         rows=dict(conn.execute("SELECT key,value FROM bot_state").fetchall())
-        if 'oracolo' in rows:
-            ex=json.loads(rows['oracolo'])
+        # Il bot tiene l'Oracolo a righe in oracolo_fp e cancella
+        # la riga JSON 'oracolo' al primo save: i fingerprint esistenti si
+        # leggono da ENTRAMBE, e si scrive dove il bot li cerca.
+        ex=esistenti(conn,rows)
+        if ex:
             mg=dict(oracolo)
             for fp,re in ex.items():
                 if re.get('real_samples',0)>0:
@@ -152,7 +180,14 @@ def inject(db_path, dry_run=False):
                     else: mg[fp]=re
             oracolo=mg
             print(f"\n  Merge con {len(ex)} fingerprint esistenti")
-        conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('oracolo',?)",(json.dumps(oracolo),))
+        if ha_tabella(conn,'oracolo_fp'):
+            ts=time.time()
+            conn.executemany("INSERT OR REPLACE INTO oracolo_fp VALUES (?,?,?,?,?,?,?)",
+                             [riga_fp(fp,e,ts) for fp,e in oracolo.items()])
+            conn.execute("DELETE FROM bot_state WHERE key='oracolo'")
+        else:
+            # DB di prima delle righe: il bot la legge al boot e la riscrive a righe
+            conn.execute("INSERT OR REPLACE INTO bot_state VALUES ('oracolo',?)",(json.dumps(oracolo),))
         if 'memoria' in rows:
             em=json.loads(rows['memoria'])
             rd=em.get('divorzio',[])
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ MOTORE CANDELE — candele OHLCV su N timeframe, in colonne NumPy
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  CandelaAggregator aveva quattro timeframe scritti a mano (30s, 1m, 2m,
+  10m), ognuno con il suo attributo letto e riscritto via getattr/setattr
+  a ogni tick, e candele come dataclass in deque. Chi le usava
+  (TsunamiDetector) le ricopiava in liste e le rianalizzava a ogni
+  chiamata, anche se nessuna candela si era chiusa.
+
+SOLUZIONE:
+  Un insieme configurabile di timeframe (1s ... 1h), ciascuno una _Serie:
+  la candela in corso come scalari (il tick tocca solo quelli), le
+  candele chiuse in un anello di colonne ts/o/h/l/c/v/n.
+
+  feed_tick() ritorna i timeframe che hanno CHIUSO una candela in questo
+  tick e avvisa gli ascoltatori (su_chiusura): chi calcola qualcosa
+  sulle candele chiuse lo ricalcola solo li'. Ogni serie ha un numero
+  di versione che cresce a ogni chiusura (e a ogni ripristino).
+
+  backfill(): al boot le candele si ricostruiscono dal tick journal
+  (tick_journal.py), vettoriale per file orario, cosi' Tsunami e
+  features_1m non ripartono da zero dopo un restart. from_persist() e
+  backfill() si fondono per timestamp: l'ordine in cui arrivano non conta.
+
+  features_1m(): le metriche "kline" dei simula*.py (trend_5m, mom_last,
+  vol_spike, bull_streak, ...) calcolate sulle candele 1m locali invece
+  di /api/v3/klines.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# nome → secondi (i nomi storici di Tsunami restano '30s', '2min', '10min', '1min')
+TIMEFRAME = {
+    '1s': 1, '5s': 5, '15s': 15, '30s': 30,
+    '1min': 60, '2min': 120, '5min': 300, '10min': 600,
+    '15min': 900, '30min': 1800, '1h': 3600,
+}
+
+_COLONNE = ('ts', 'o', 'h', 'l', 'c', 'v', 'n')
+
+
+@dataclass
+class Candela:
+    """Una candela OHLCV virtuale (aggregata da tick)."""
+    timestamp_start: float
+    open:   float
+    high:   float
+    low:    float
+    close:  float
+    volume: float
+    n_tick: int  # numero di tick aggregati
+
+    def to_dict(self):
+        return {
+            'ts': self.timestamp_start,
+            'o':  round(self.open, 2),
+            'h':  round(self.high, 2),
+            'l':  round(self.low, 2),
+            'c':  round(self.close, 2),
+            'v':  round(self.volume, 4),
+            'n':  self.n_tick,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            timestamp_start=d['ts'],
+            open=d['o'], high=d['h'], low=d['l'], close=d['c'],
+            volume=d['v'], n_tick=d['n'],
+        )
+
+
+def parse_timeframe(spec: str) -> dict:
+    """'30s:30,1min:60,1h:24' → {'30s': 30, '1min': 60, '1h': 24} (nome: candele tenute)."""
+    out = {}
+    for parte in (spec or '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        nome, _, storia = parte.partition(':')
+        nome = nome.strip()
+        if nome not in TIMEFRAME:
+            log.warning(f"[CANDELE] timeframe sconosciuto ignorato: {nome!r}")
+            continue
+        out[nome] = int(storia) if storia.strip() else 30
+    return out
+
+
+class _Serie:
+    """Un timeframe: candela in corso come scalari, candele chiuse in anello."""
+
+    __slots__ = ('nome', 'sec', 'cap', 'col', 'chiuse', 'versione',
+                 'cur_ts', 'cur_o', 'cur_h', 'cur_l', 'cur_c', 'cur_v', 'cur_n')
+
+    def __init__(self, nome: str, sec: int, storia: int):
+        self.nome, self.sec, self.cap = nome, sec, max(1, int(storia))
+        self.col = {k: np.zeros(self.cap, dtype=np.int64 if k == 'n' else np.float64)
+                    for k in _COLONNE}
+        self.chiuse   = 0           # candele chiuse in totale
+        self.versione = 0           # cresce a ogni chiusura o ripristino
+        self.cur_ts   = None
+        self.cur_o = self.cur_h = self.cur_l = self.cur_c = self.cur_v = 0.0
+        self.cur_n = 0
+
+    def __len__(self):
+        return min(self.chiuse, self.cap)
+
+    def apri(self, ts0, price: float, volume: float):
+        self.cur_ts = ts0
+        self.cur_o = self.cur_h = self.cur_l = self.cur_c = price
+        self.cur_v, self.cur_n = volume, 1
+
+    def archivia(self):
+        i = self.chiuse % self.cap
+        c = self.col
+        c['ts'][i], c['o'][i], c['h'][i], c['l'][i] = self.cur_ts, self.cur_o, self.cur_h, self.cur_l
+        c['c'][i], c['v'][i], c['n'][i] = self.cur_c, self.cur_v, self.cur_n
+        self.chiuse += 1
+        self.versione += 1
+
+    def ordine(self) -> np.ndarray:
+        """Indici delle candele chiuse, dalla piu' vecchia."""
+        m = len(self)
+        return (self.chiuse - m + np.arange(m)) % self.cap
+
+    def colonne(self, ultime: int = None) -> dict:
+        idx = self.ordine()
+        if ultime is not None:
+            idx = idx[-ultime:] if ultime > 0 else idx[:0]
+        return {k: a[idx] for k, a in self.col.items()}
+
+    def corrente(self):
+        if self.cur_ts is None:
+            return None
+        return Candela(self.cur_ts, self.cur_o, self.cur_h, self.cur_l,
+                       self.cur_c, self.cur_v, self.cur_n)
+
+    def candele(self) -> list:
+        c = self.colonne()
+        return [Candela(*r) for r in zip(c['ts'].tolist(), c['o'].tolist(), c['h'].tolist(),
+                                         c['l'].tolist(), c['c'].tolist(), c['v'].tolist(),
+                                         c['n'].tolist())]
+
+    def unisci(self, righe: dict, corrente: tuple = None):
+        """
+        Fonde candele chiuse arrivate da fuori (persistenza, journal) con le
+        proprie: per ts, le proprie vincono; mai oltre la candela in corso.
+        corrente = (ts, o, h, l, c, v, n): diventa la candela in corso se non ce n'e' una.
+        """
+        mie = self.colonne()
+        limite = self.cur_ts
+        if limite is None and corrente is not None:
+            limite = corrente[0]
+        tutte = {}
+        for src in (righe, mie):                       # le mie per ultime: sovrascrivono
+            if src is None or len(src['ts']) == 0:
+                continue
+            for r in zip(*(np.asarray(src[k]).tolist() for k in _COLONNE)):
+                if limite is None or r[0] < limite:
+                    tutte[r[0]] = r
+        tenute = [tutte[t] for t in sorted(tutte)][-self.cap:]
+        for k in self.col.values():
+            k[:] = 0
+        for i, r in enumerate(tenute):
+            for k, x in zip(_COLONNE, r):
+                self.col[k][i] = x
+        self.chiuse = len(tenute)
+        self.versione += 1
+        if self.cur_ts is None and corrente is not None:
+            (self.cur_ts, self.cur_o, self.cur_h, self.cur_l,
+             self.cur_c, self.cur_v, self.cur_n) = corrente
+
+
+class MotoreCandele:
+    """
+    Candele su piu' timeframe. timeframe = {nome: candele tenute}, nomi da TIMEFRAME.
+    Un solo scrittore (il thread del tick).
+    """
+
+    def __init__(self, timeframe: dict):
+        self._serie = [_Serie(nome, TIMEFRAME[nome], storia) for nome, storia in timeframe.items()]
+        self.serie = {s.nome: s for s in self._serie}
+        self.su_chiusura = []       # callback(nome_tf, candela_chiusa | None=ripristino)
+        self.tick_n = 0
+
+    def feed_tick(self, price: float, volume: float = 1.0, ts: float = None) -> tuple:
+        """Aggiorna ogni timeframe. Ritorna i nomi dei timeframe che hanno chiuso una candela."""
+        if ts is None:
+            import time
+            ts = time.time()
+        self.tick_n += 1
+        its = int(ts)
+        chiuse = ()
+        for s in self._serie:
+            t0 = (its // s.sec) * s.sec
+            if t0 == s.cur_ts:
+                if price > s.cur_h:
+                    s.cur_h = price
+                if price < s.cur_l:
+                    s.cur_l = price
+                s.cur_c = price
+                s.cur_v += volume
+                s.cur_n += 1
+            else:
+                if s.cur_ts is not None:
+                    s.archivia()
+                    chiuse += (s.nome,)
+                s.apri(t0, price, volume)
+        if chiuse and self.su_chiusura:
+            self._avvisa(chiuse, chiusa=True)
+        return chiuse
+
+    def _avvisa(self, nomi, chiusa: bool):
+        for nome in nomi:
+            s = self.serie[nome]
+            c = None
+            if chiusa:
+                i = (s.chiuse - 1) % s.cap
+                c = Candela(*(s.col[k][i].item() for k in _COLONNE))
+            for fn in self.su_chiusura:
+                try:
+                    fn(nome, c)
+                except Exception as e:
+                    log.error(f"[CANDELE] ascoltatore {nome}: {e}")
+
+    # ── lettura ─────────────────────────────────────────────────────────
+    def get_candele(self, timeframe: str) -> list:
+        """Candele chiuse del timeframe (lista di Candela, dalla piu' vecchia)."""
+        s = self.serie.get(timeframe)
+        return s.candele() if s is not None else []
+
+    def colonne(self, timeframe: str, ultime: int = None) -> dict:
+        """Candele chiuse come array ts/o/h/l/c/v/n (copie), dalla piu' vecchia."""
+        return self.serie[timeframe].colonne(ultime)
+
+    def corrente(self, timeframe: str):
+        s = self.serie.get(timeframe)
+        return s.corrente() if s is not None else None
+
+    def versione(self, timeframe: str) -> int:
+        return self.serie[timeframe].versione
+
+    def klines(self, timeframe: str, n: int) -> dict:
+        """Ultime n candele CON quella in corso, come /api/v3/klines?limit=n."""
+        s = self.serie[timeframe]
+        c = s.colonne(n - 1 if s.cur_ts is not None else n)
+        if s.cur_ts is not None:
+            cur = (s.cur_ts, s.cur_o, s.cur_h, s.cur_l, s.cur_c, s.cur_v, s.cur_n)
+            c = {k: np.append(c[k], x) for k, x in zip(_COLONNE, cur)}
+        return c
+
+    def closes(self, timeframe: str, n: int = 6) -> list:
+        """
+        Ultime n chiusure, dalla piu' vecchia alla candela in corso
+        inclusa: lo stesso vettore che dava /api/v3/klines?limit=n.
+        Un intervallo senza tick non ha candela: ripeto la chiusura
+        precedente, come fa Binance. Lista piu' corta se manca storia.
+        """
+        s = self.serie.get(timeframe)
+        if s is None or s.cur_ts is None:
+            return []
+        sec = s.sec
+        out = [s.cur_c]
+        target = s.cur_ts - sec
+        limite = s.cur_ts - n * sec
+        c = s.colonne(n)
+        for ts0, cl in zip(reversed(c['ts'].tolist()), reversed(c['c'].tolist())):
+            # candela fuori finestra (es. ripristinata dopo un restart):
+            # gli intervalli in mezzo non li ho visti, non li invento
+            if len(out) >= n or ts0 <= limite:
+                break
+            while ts0 < target and len(out) < n:
+                out.append(cl)               # buco: intervallo senza scambi
+                target -= sec
+            if ts0 == target and len(out) < n:
+                out.append(cl)
+                target -= sec
+        out.reverse()
+        return out
+
+    def features(self, timeframe: str = '1min', n: int = 6, baseline: int = 30):
+        """
+        Metriche "kline" dei simula*.py (estrai_metriche_ricche) sulle
+        ultime n candele locali (quella in corso inclusa); vol_rel contro
+        la media volume delle `baseline` candele prima. None se < 5 candele.
+        """
+        s = self.serie.get(timeframe)
+        if s is None:
+            return None
+        k = self.klines(timeframe, n)
+        if len(k['ts']) < 5:
+            return None
+        opens, highs, lows = k['o'].tolist(), k['h'].tolist(), k['l'].tolist()
+        closes, vols = k['c'].tolist(), k['v'].tolist()
+        ranges = [h - l for h, l in zip(highs, lows)]
+        bodies = [abs(c - o) for c, o in zip(closes, opens)]
+
+        # candele chiuse prima della finestra (quelle nella finestra sono len-1 o len)
+        dentro = len(k['ts']) - (1 if s.cur_ts is not None else 0)
+        prima = s.colonne()['v']
+        prima = prima[:len(prima) - dentro][-baseline:]
+        vol_baseline = float(prima.mean()) if len(prima) else None
+
+        mom_now  = closes[-1] - closes[-2]
+        mom_prev = closes[-3] - closes[-4]
+        accel    = mom_now - mom_prev
+        vol_abs  = sum(vols)
+        vol_avg  = vol_abs / len(vols)
+        vol_rel  = vol_avg / vol_baseline if vol_baseline and vol_baseline > 0 else None
+        mean_prev = sum(vols[:-1]) / (len(vols) - 1) if len(vols) > 1 else vols[-1]
+        bull_streak = 0
+        for i in range(len(closes) - 1, 0, -1):
+            if closes[i] > opens[i]:
+                bull_streak += 1
+            else:
+                break
+        gaps = [closes[i] - closes[i - 1] for i in range(1, len(closes))]
+        mean_range_prev = sum(ranges[:-1]) / (len(ranges) - 1) if len(ranges) > 1 else ranges[-1]
+        range_medio = sum(ranges) / len(ranges)
+        accels = [closes[i] - 2 * closes[i - 1] + closes[i - 2] for i in range(2, len(closes))]
+        return {
+            "trend_5m":     closes[-1] - closes[0],
+            "mom_last":     mom_now,
+            "trend_accel":  accel,
+            "bull_count":   sum(1 for c, o in zip(closes, opens) if c > o),
+            "vol_abs":      vol_abs,
+            "vol_rel":      vol_rel,
+            "vol_spike":    vols[-1] / mean_prev if mean_prev > 0 else 1.0,
+            "bull_streak":  bull_streak,
+            "body_last":    bodies[-1] / ranges[-1] if ranges[-1] > 0 else 0.0,
+            "mom_consist":  1 if all(g > 0 for g in gaps) else 0,
+            "n_gaps_pos":   sum(1 for g in gaps if g > 0),
+            "range_expand": 1 if ranges[-1] > mean_range_prev else 0,
+            "range_ratio":  ranges[-1] / mean_range_prev if mean_range_prev > 0 else 1.0,
+            "vol_accel":    1 if vols[-1] > vols[-2] else 0,
+            "accel_sharp":  accel / range_medio if range_medio > 0 else 0.0,
+            "accel_curve":  accels[-1] - accels[-2] if len(accels) >= 2 else 0.0,
+        }
+
+    # ── persistenza ─────────────────────────────────────────────────────
+    def to_persist(self) -> dict:
+        """Candele chiuse per il DB (fix #18): {tf: [Candela.to_dict()]}."""
+        return {nome: [c.to_dict() for c in s.candele()] for nome, s in self.serie.items()}
+
+    def from_persist(self, data: dict):
+        """Ripristina le candele dal DB al boot (fuse con quelle gia' presenti)."""
+        try:
+            toccati = []
+            for nome, s in self.serie.items():
+                righe = data.get(nome)
+                if not righe:
+                    continue
+                s.unisci({k: [d[k] for d in righe] for k in _COLONNE})
+                toccati.append(nome)
+            if toccati:
+                self._avvisa(toccati, chiusa=False)
+            log.info("[CANDELE_LOAD] Ripristinate: " +
+                     " ".join(f"{n}={len(s)}" for n, s in self.serie.items()))
+        except Exception as e:
+            log.error(f"[CANDELE_LOAD] Errore ripristino: {e}")
+
+    def backfill(self, directory: str, t1: float = None) -> int:
+        """
+        Ricostruisce le candele dal tick journal: la finestra e' quella del
+        timeframe con piu' storia (secondi x candele). Ritorna i tick letti.
+        L'ultima candela di ogni timeframe diventa quella in corso.
+        """
+        from tick_journal import journal_files, JournalReader
+        import time
+        if t1 is None:
+            t1 = time.time()
+        t0 = t1 - max(s.sec * (s.cap + 1) for s in self._serie)
+        blocchi = []
+        for path in journal_files(directory, t0, t1):
+            try:
+                with JournalReader(path) as r:
+                    a = r.array()
+                    m = (a['event_ts'] >= t0) & (a['event_ts'] <= t1)
+                    blocchi.append((a['event_ts'][m].copy(), a['price'][m].copy(), a['qty'][m].copy()))
+            except Exception as e:
+                log.warning(f"[CANDELE] backfill {os.path.basename(path)}: {e}")
+        if not blocchi:
+            return 0
+        ts = np.concatenate([b[0] for b in blocchi])
+        px = np.concatenate([b[1] for b in blocchi])
+        qt = np.concatenate([b[2] for b in blocchi])
+        if len(ts) == 0:
+            return 0
+        sec_int = ts.astype(np.int64)
+        for s in self._serie:
+            b = (sec_int // s.sec) * s.sec
+            cambi = np.flatnonzero(np.diff(b)) + 1
+            inizi = np.concatenate(([0], cambi))
+            fini  = np.concatenate((cambi, [len(b)])) - 1
+            righe = {
+                'ts': b[inizi].astype(np.float64), 'o': px[inizi], 'c': px[fini],
+                'h': np.maximum.reduceat(px, inizi), 'l': np.minimum.reduceat(px, inizi),
+                'v': np.add.reduceat(qt, inizi), 'n': np.diff(np.concatenate((inizi, [len(b)]))),
+            }
+            ultima = tuple(righe[k][-1].item() for k in _COLONNE)
+            s.unisci({k: a[:-1] for k, a in righe.items()}, corrente=ultima)
+        self._avvisa(list(self.serie), chiusa=False)
+        log.info(f"[CANDELE] backfill dal journal: {len(ts)} tick → " +
+                 " ".join(f"{n}={len(s)}" for n, s in self.serie.items()))
+        return int(len(ts))
+
+    def stats(self) -> dict:
+        return {nome: {'chiuse': s.chiuse, 'tenute': len(s), 'versione': s.versione,
+                       'corrente': s.corrente().to_dict() if s.cur_ts is not None else None}
+                for nome, s in self.serie.items()}
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ PHANTOM BOOK — i fantasmi aperti in colonne NumPy
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  _update_phantoms scorreva ogni tick la lista _phantoms_open (dict con
+  ~25 chiavi _fp_* l'uno) e _shadow_short_phantoms: per ciascuno PnL,
+  regole HARD_STOP/DECEL/SMORZ/WIN/TIMEOUT una alla volta, pop(i) dalla
+  lista. In una raffica di blocchi se ne aprono centinaia: per questo
+  i blocchi venivano campionati (SCORE_SOTTO solo se < 5 aperti).
+
+SOLUZIONE:
+  Colonne preallocate per cio' che il tick tocca: prezzo d'ingresso,
+  segno direzione (+1 LONG / -1 SHORT), ts d'ingresso, max/min prezzo,
+  ts del massimo. Il dict del fantasma (fingerprint forense, blocco,
+  contesto) sta in una tabella a fianco, stessa riga, e il tick non lo
+  tocca: viene aggiornato con max/min solo alla chiusura.
+
+  step(): max/min, PnL e regole di uscita come maschere sull'intero
+  libro. Le regole hanno la stessa precedenza di prima (la prima che
+  scatta decide). Le righe chiuse escono in un colpo solo (compattazione
+  stabile: l'ordine d'ingresso resta).
+
+  Le soglie sono quelle del bot reale (stop live lordo, 15s/10s/20s/60s);
+  fee e nomi delle uscite sono per libro: il libro degli SHORT evitati
+  in RANGING usa PnL netto e i suoi nomi storici.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+
+# codici uscita, in ordine di precedenza
+_USCITE = ("HARD_STOP", "DECEL_SIM", "SMORZ_SIM", "DECEL_WIN_SIM", "TIMEOUT_SIM")
+
+
+def regole_uscita(segno, entry, durata, price: float, momentum: str,
+                  stop_live: float, exposure: float, fee: float = 0.0):
+    """
+    Regole di uscita su colonne di posizioni: (codice, pnl).
+    codice 0 = resta aperta, k = _USCITE[k-1] (la prima che scatta decide).
+    Condivisa con i libri di carta degli universi paralleli.
+    """
+    # PnL LORDO USDC come il bot reale (fee solo se il libro la chiede)
+    pnl = np.round(segno * (price - entry) * (exposure / entry), 4) - fee
+
+    smorz = (segno > 0) if momentum == "DEBOLE" else (segno < 0) if momentum == "FORTE" else None
+    regole = [
+        pnl < -stop_live,
+        (durata > 15) & (pnl < 0),
+        (durata > 10) & smorz if smorz is not None else np.zeros(len(pnl), dtype=bool),
+        (durata > 20) & (pnl > 0),
+        durata > 60,
+    ]
+    return np.select(regole, range(1, len(regole) + 1), default=0), pnl
+
+
+class PhantomBook:
+    """Fantasmi aperti: colonne per il tick, dict a fianco per la forense."""
+
+    def __init__(self, capacity: int = 64, exposure: float = 5000.0,
+                 fee: float = 0.0, nomi: dict = None):
+        self.exposure = exposure
+        self.fee      = fee                    # tolta dal PnL prima delle regole
+        self.nomi     = tuple((nomi or {}).get(u, u) for u in _USCITE)
+        self.n        = 0
+        self._alloca(max(8, int(capacity)))
+        self.aperti_max = 0
+        self.chiusi     = 0
+
+    def _alloca(self, cap: int):
+        vecchi = getattr(self, '_col', None)
+        self._col = {c: np.zeros(cap, dtype=np.float64)
+                     for c in ('entry', 'segno', 't0', 'hi', 'lo', 'hi_ts')}
+        lato = [None] * cap
+        if vecchi is not None:
+            for c, a in vecchi.items():
+                self._col[c][:self.n] = a[:self.n]
+            lato[:self.n] = self._lato[:self.n]
+        self._lato = lato
+        self.capacity = cap
+
+    # -- interfaccia "come la lista di prima" -------------------------------
+    def __len__(self):
+        return self.n
+
+    def __bool__(self):
+        return self.n > 0
+
+    def __iter__(self):
+        """Dict dei fantasmi aperti (max/min aggiornati), in ordine d'ingresso."""
+        for i in range(self.n):
+            yield self._materializza(i)
+
+    def append(self, ph: dict):
+        """Apre un fantasma dal dict di _record_phantom (price_entry, direction, entry_time, ...)."""
+        if self.n == self.capacity:
+            self._alloca(2 * self.capacity)
+        i, c = self.n, self._col
+        p = float(ph['price_entry'])
+        c['entry'][i] = p
+        c['segno'][i] = -1.0 if ph.get('direction', 'LONG') == 'SHORT' else 1.0
+        c['t0'][i]    = float(ph['entry_time'])
+        c['hi'][i]    = float(ph.get('max_price', p))
+        c['lo'][i]    = float(ph.get('min_price', p))
+        c['hi_ts'][i] = float(ph.get('max_price_ts', 0.0) or 0.0)
+        self._lato[i] = ph
+        self.n += 1
+        if self.n > self.aperti_max:
+            self.aperti_max = self.n
+
+    def clear(self):
+        for i in range(self.n):
+            self._lato[i] = None
+        self.n = 0
+
+    def _materializza(self, i: int) -> dict:
+        ph, c = self._lato[i], self._col
+        ph['max_price'] = float(c['hi'][i])
+        ph['min_price'] = float(c['lo'][i])
+        if c['hi_ts'][i]:
+            ph['max_price_ts'] = float(c['hi_ts'][i])
+        return ph
+
+    # -- il tick ------------------------------------------------------------
+    def step(self, price: float, now: float, momentum: str, stop_live: float) -> list:
+        """
+        Aggiorna tutto il libro al prezzo del tick e chiude chi esce.
+        Ritorna [(dict, uscita, pnl, durata)] nell'ordine in cui il vecchio
+        ciclo li chiudeva (dall'ultimo aperto al primo).
+        """
+        n = self.n
+        if n == 0:
+            return []
+        c = self._col
+        hi, lo = c['hi'][:n], c['lo'][:n]
+        su = price > hi
+        if su.any():
+            hi[su] = price
+            c['hi_ts'][:n][su] = now
+        np.minimum(lo, price, out=lo)
+
+        durata = now - c['t0'][:n]
+        codice, pnl = regole_uscita(c['segno'][:n], c['entry'][:n], durata, price,
+                                    momentum, stop_live, self.exposure, self.fee)
+        esce = codice > 0
+        if not esce.any():
+            return []
+
+        idx = np.flatnonzero(esce)
+        chiusi = [(self._materializza(i), self.nomi[codice[i] - 1], float(pnl[i]), float(durata[i]))
+                  for i in idx[::-1]]
+        # compattazione stabile: chi resta scala in testa, stesso ordine
+        resta = ~esce
+        m = int(resta.sum())
+        for a in c.values():
+            a[:m] = a[:n][resta]
+        lato = self._lato
+        tenuti = [lato[i] for i in np.flatnonzero(resta)]
+        lato[:m] = tenuti
+        for i in range(m, n):
+            lato[i] = None
+        self.n = m
+        self.chiusi += len(chiusi)
+        return chiusi
+
+    def stats(self) -> dict:
+        return {
+            'aperti':     self.n,
+            'aperti_max': self.aperti_max,
+            'capacity':   self.capacity,
+            'chiusi':     self.chiusi,
+        }
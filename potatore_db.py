@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ POTATORE DB — ritenzione delle tabelle di log, fuori dal thread del tick
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  L'AUTO-PULITORE, ogni 10 minuti e sul thread del tick, faceva per
+  dieci tabelle SELECT COUNT(*) (scansione intera) e poi
+  DELETE ... WHERE id NOT IN (SELECT id ... ORDER BY id DESC LIMIT N):
+  una transazione sola, lunga quanto la tabella, con il DB bloccato in
+  scrittura. E' cosi' che il DB e' arrivato a 442MB e ai lock.
+
+SOLUZIONE:
+  Le tabelle di log hanno id crescente (rowid). Il taglio si calcola
+  dagli estremi dell'indice, senza contare:
+    righe:  MIN(rowid), MAX(rowid) -> taglio = max - N + 1    (O(1))
+    eta':   ricerca binaria sul rowid della prima riga con
+            ts >= adesso - eta'                               (O(log n))
+  e si cancella WHERE rowid < taglio a pezzi di CHUNK righe, ognuno in
+  una transazione corta, dal thread db_potatore. Tra un pezzo e l'altro
+  il lock del processo e' libero: lo scrittore e il tick passano.
+
+  Dopo il taglio, se il DB e' in auto_vacuum=INCREMENTAL, le pagine
+  libere tornano al filesystem con PRAGMA incremental_vacuum. I byte
+  recuperati (pagine in meno x page_size) finiscono in stats().
+
+REGOLE (per tabella):
+  "2000"  -> tiene le ultime 2000 righe (ripulisce oltre 1.5x, come prima)
+  "7d"    -> tiene gli ultimi 7 giorni (s/m/h/d); colonna tempo trovata
+             da sola (ts, timestamp, ...) o indicata: "7d@ts_piantata"
+  "0"/"off" -> tabella esclusa
+
+DIARIO:
+  Con il diario attivo (diario_db.py) le tabelle di schema_db.DIARIO
+  (phantom_forensic, telemetry, telemetry_decisioni, telemetry_trade, ...)
+  non si scrivono piu' in DB_PATH: le righe che restano li' sono lo
+  "storico" che le viste del diario mostrano come storia. Potarle qui
+  cancellerebbe quella storia, quindi il bot le toglie da REGOLE_DEFAULT
+  (parse_regole(spec, base)) e la loro ritenzione e' quella del diario
+  (DIARIO_KEEP_GIORNI). Restano nei default con DIARIO_OFF=true o
+  DIARIO_STORICO_OFF=true; POTATORE_TABELLE le rimette se indicate.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import re
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+# Le tabelle di log di sempre (AUTO-PULITORE 6giu). trades/firme NON ci sono.
+REGOLE_DEFAULT = {
+    "canvas_snapshots": "2000", "regime_edge_log": "2000",
+    "capsule_log": "2000", "capsula_fase_osservazioni": "2000",
+    "phantom_forensic": "2000", "regime_edge_esiti": "2000",
+    "capsula_fase_verdetti": "2000", "capsula_tsunami_verdetti": "2000",
+    "canvas_shadow_log": "2000", "libro_pesca": "2000",
+    # StabilityTelemetry: prima DELETE ... (SELECT MAX(id) - 50000) a ogni flush
+    "telemetry": "50000", "telemetry_decisioni": "50000", "telemetry_trade": "50000",
+}
+
+# colonne tempo cercate, in ordine, per le regole a eta'
+COLONNE_TEMPO = ("ts", "timestamp", "ts_entry", "ts_piantata", "created_ts", "trade_ts")
+
+_UNITA = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_NOME_OK = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_regola(testo: str):
+    """'2000' -> ('righe', 2000, None); '7d@ts' -> ('eta', 604800, 'ts'); '0'/'off' -> None."""
+    testo = str(testo).strip().lower()
+    if testo in ("", "0", "off", "no"):
+        return None
+    col = None
+    if "@" in testo:
+        testo, col = testo.split("@", 1)
+        if not _NOME_OK.match(col):
+            raise ValueError(f"colonna non valida: {col}")
+    if testo[-1] in _UNITA:
+        return ("eta", float(testo[:-1]) * _UNITA[testo[-1]], col)
+    n = int(testo)
+    return ("righe", n, None) if n > 0 else None
+
+
+def parse_regole(spec: str, base: dict = None) -> dict:
+    """'phantom_forensic:5000,telemetry:3d' sopra REGOLE_DEFAULT (o base)."""
+    regole = {}
+    for t, r in (REGOLE_DEFAULT if base is None else base).items():
+        regole[t] = parse_regola(r)
+    for voce in (spec or "").split(","):
+        voce = voce.strip()
+        if not voce:
+            continue
+        t, _, r = voce.partition(":")
+        t = t.strip()
+        if not _NOME_OK.match(t):
+            raise ValueError(f"tabella non valida: {t}")
+        regole[t] = parse_regola(r)
+    return {t: r for t, r in regole.items() if r is not None}
+
+
+def _epoch(v):
+    """ts REAL (epoch) o TEXT ('YYYY-MM-DD HH:MM:SS', ISO; senza fuso = UTC)."""
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        pass
+    try:
+        d = datetime.fromisoformat(str(v).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return d.timestamp()
+
+
+class PotatoreDB:
+    """Thread db_potatore: ritenzione a pezzi + incremental_vacuum."""
+
+    def __init__(self, db_path: str, regole: dict = None, ogni_s: float = 600,
+                 chunk: int = 500, pausa_s: float = 0.02, lock=None, attivo=None,
+                 converti: bool = False):
+        self.db_path = db_path
+        self.regole  = parse_regole("") if regole is None else regole
+        self.ogni_s  = max(1.0, float(ogni_s))
+        self.chunk   = max(1, int(chunk))
+        self.pausa_s = max(0.0, float(pausa_s))
+        self._lock_db = lock                 # lock del processo, tenuto un pezzo alla volta
+        self._attivo  = attivo               # callable: False = salto il giro (interruttore live)
+        self._converti = converti            # VACUUM una tantum -> auto_vacuum=INCREMENTAL
+        self._stop    = threading.Event()
+        self._thread  = None
+        self._colonne = {}                   # tabella -> colonna tempo risolta
+        self.cicli    = 0
+        self.righe_tot = 0
+        self.byte_recuperati = 0
+        self.chunk_ms_max = 0.0
+        self.ultimo_ms = 0.0
+        self.ultimo_ts = None
+        self.ultimo_errore = None
+        self.auto_vacuum = None
+        self.tabelle = {}                    # tabella -> ultimo esito
+
+    # ── ciclo ──────────────────────────────────────────────────────────
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="db_potatore")
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        if self._converti:
+            try:
+                self.converti()
+            except Exception as e:
+                self.ultimo_errore = f"{type(e).__name__}: {e}"
+                log.warning(f"[POTATORE] conversione fallita: {e}")
+        # il primo giro dopo un po': il boot ha gia' abbastanza da fare
+        while not self._stop.wait(min(self.ogni_s, 60.0) if self.cicli == 0 else self.ogni_s):
+            if self._attivo is not None:
+                try:
+                    if not self._attivo():
+                        continue
+                except Exception:
+                    pass
+            try:
+                self.pota()
+            except Exception as e:
+                self.ultimo_errore = f"{type(e).__name__}: {e}"
+                log.warning(f"[POTATORE] giro fallito: {e}")
+
+    def _connetti(self):
+        c = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        c.execute("PRAGMA busy_timeout=30000;")
+        return c
+
+    def converti(self) -> bool:
+        """DB nato senza auto_vacuum: lo porta a INCREMENTAL con un VACUUM
+        completo (lungo su un DB grosso, DB bloccato). Solo su richiesta."""
+        c = self._connetti()
+        try:
+            if c.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            t0 = time.time()
+            if self._lock_db is not None:
+                self._lock_db.acquire()
+            try:
+                c.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                c.execute("VACUUM")
+            finally:
+                if self._lock_db is not None:
+                    self._lock_db.release()
+            log.info(f"[POTATORE] auto_vacuum=INCREMENTAL dopo VACUUM di {time.time() - t0:.1f}s")
+            return True
+        finally:
+            c.close()
+
+    def pota(self, adesso: float = None) -> dict:
+        """Un giro su tutte le regole. Ritorna {tabella: righe cancellate}."""
+        t0 = time.time()
+        adesso = time.time() if adesso is None else adesso
+        fatto = {}
+        c = self._connetti()
+        try:
+            self.auto_vacuum = c.execute("PRAGMA auto_vacuum").fetchone()[0]
+            for tab, regola in self.regole.items():
+                if self._stop.is_set():
+                    break
+                try:
+                    taglio = self._taglio(c, tab, regola, adesso)
+                    n = self._cancella(c, tab, taglio) if taglio is not None else 0
+                    self.tabelle[tab] = {"regola": f"{regola[0]}:{regola[1]:g}",
+                                         "taglio": taglio, "cancellate": n}
+                    if n:
+                        fatto[tab] = n
+                except sqlite3.Error as e:
+                    # tabella inesistente, WITHOUT ROWID, colonna tempo assente: salto
+                    self.tabelle[tab] = {"saltata": str(e)}
+            if fatto and self.auto_vacuum == 2:
+                self.byte_recuperati += self._vacuum(c)
+        finally:
+            c.close()
+        self.cicli += 1
+        self.righe_tot += sum(fatto.values())
+        self.ultimo_ms = (time.time() - t0) * 1000
+        self.ultimo_ts = adesso
+        if fatto:
+            log.info(f"[POTATORE] {fatto} in {self.ultimo_ms:.0f}ms "
+                     f"(recuperati {self.byte_recuperati / 1e6:.1f}MB in totale)")
+        return fatto
+
+    # ── taglio: il primo rowid da tenere ───────────────────────────────
+    def _taglio(self, c, tab: str, regola, adesso: float):
+        lo, hi = c.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {tab}").fetchone()
+        if lo is None:
+            return None
+        tipo, valore, col = regola
+        if tipo == "righe":
+            keep = int(valore)
+            # isteresi come l'AUTO-PULITORE: taglio solo se ben oltre la soglia
+            if hi - lo + 1 <= keep * 1.5:
+                return None
+            return hi - keep + 1
+        col = col or self._colonna_tempo(c, tab)
+        limite = adesso - valore
+        # prima riga con ts >= limite: ricerca binaria sul rowid (ts cresce con l'id)
+        sql = f"SELECT rowid, {col} FROM {tab} WHERE rowid >= ? ORDER BY rowid LIMIT 1"
+        riga = c.execute(sql, (lo,)).fetchone()
+        t = _epoch(riga[1])
+        if t is not None and t >= limite:
+            return None
+        # invariante: la riga a e' vecchia, tutte quelle >= b sono da tenere
+        a, b = lo, hi + 1
+        while b - a > 1:
+            m = (a + b) // 2
+            riga = c.execute(sql, (m,)).fetchone()
+            if riga is None or riga[0] >= b:
+                b = m                        # nessuna riga in [m, b)
+                continue
+            t = _epoch(riga[1])
+            if t is not None and t >= limite:
+                b = m
+            else:
+                a = riga[0]                  # ts illeggibile = vecchia
+        return b
+
+    def _colonna_tempo(self, c, tab: str) -> str:
+        col = self._colonne.get(tab)
+        if col is None:
+            presenti = {r[1] for r in c.execute(f"PRAGMA table_info({tab})")}
+            col = next((x for x in COLONNE_TEMPO if x in presenti), None)
+            if col is None:
+                raise sqlite3.OperationalError(f"{tab}: nessuna colonna tempo")
+            self._colonne[tab] = col
+        return col
+
+    # ── cancellazione a pezzi ──────────────────────────────────────────
+    def _cancella(self, c, tab: str, taglio: int) -> int:
+        tot = 0
+        lo = c.execute(f"SELECT MIN(rowid) FROM {tab}").fetchone()[0]
+        while lo is not None and lo < taglio and not self._stop.is_set():
+            fino = min(lo + self.chunk, taglio)
+            t0 = time.time()
+            if self._lock_db is not None:
+                self._lock_db.acquire()
+            try:
+                n = c.execute(f"DELETE FROM {tab} WHERE rowid < ?", (fino,)).rowcount
+            finally:
+                if self._lock_db is not None:
+                    self._lock_db.release()
+            self.chunk_ms_max = max(self.chunk_ms_max, (time.time() - t0) * 1000)
+            tot += max(0, n)
+            lo = fino
+            if self.pausa_s:
+                time.sleep(self.pausa_s)
+        return tot
+
+    def _vacuum(self, c, pagine: int = 2000) -> int:
+        """Restituisce le pagine libere al filesystem, a blocchi. Byte recuperati."""
+        ps = c.execute("PRAGMA page_size").fetchone()[0]
+        prima = c.execute("PRAGMA page_count").fetchone()[0]
+        while c.execute("PRAGMA freelist_count").fetchone()[0] > 0 and not self._stop.is_set():
+            if self._lock_db is not None:
+                self._lock_db.acquire()
+            try:
+                # executescript: l'incremental_vacuum va eseguito fino in fondo
+                c.executescript(f"PRAGMA incremental_vacuum({int(pagine)});")
+            finally:
+                if self._lock_db is not None:
+                    self._lock_db.release()
+            if self.pausa_s:
+                time.sleep(self.pausa_s)
+        dopo = c.execute("PRAGMA page_count").fetchone()[0]
+        return max(0, prima - dopo) * ps
+
+    def stats(self) -> dict:
+        return {
+            'cicli':           self.cicli,
+            'righe_tot':       self.righe_tot,
+            'byte_recuperati': self.byte_recuperati,
+            'auto_vacuum':     {0: "none", 1: "full", 2: "incremental"}.get(self.auto_vacuum),
+            'ultimo_ms':       round(self.ultimo_ms, 1),
+            'chunk_ms_max':    round(self.chunk_ms_max, 2),
+            'ultimo_errore':   self.ultimo_errore,
+            'tabelle':         self.tabelle,
+            'vivo':            self._thread is not None and self._thread.is_alive(),
+        }
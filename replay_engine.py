@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ REPLAY ENGINE — il bot vero, sui tick registrati, alla velocita' della CPU
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  L'unico modo di valutare una patch era il deploy su Render e ore di
+  paper trade. I simula*.py rifanno i conti a mano su kline 1m: non e'
+  il bot, e' una sua imitazione.
+
+SOLUZIONE:
+  Costruisce un OvertopBassanoV16Production VERO e gli passa i tick del
+  journal (tick_journal.py) o di un CSV, uno dopo l'altro, senza attese.
+
+  - DB:      DB_PATH punta a un file scratch (opzionale: copia di un DB
+             esistente come punto di partenza del cervello). DIARIO DB
+             spento: anche le osservazioni restano nel file scratch.
+  - Binance: connect_binance() e run() non vengono MAI chiamati.
+             I tick entrano da _ingest_tick(), lo stesso punto del WS.
+  - Tempo:   EventClock(virtual=True). Il modulo `time` del bot e degli
+             organi e' sostituito da _TempoVirtuale: time() = tempo del
+             tick, sleep() = niente. Finestre 30/60/120s, cooldown e
+             durate trade scorrono sul tempo registrato.
+  - Rete:    urllib.request.urlopen solleva subito. CAMPO_ESTERNO usa
+             le candele 1m locali costruite dai tick del replay; il
+             prefetch remoto non parte (vive in connect_binance).
+             CAPSULE_V2_HOOK forzato off. DeepSeek non viene chiamato:
+             i comandi arrivano dall'heartbeat di app.py, qui vuoto.
+
+  Stesso input + stesso DB iniziale = stesso output.
+
+OUTPUT:
+  ticks/s, righe trades / phantom_forensic create dal replay,
+  e (con --export) le due tabelle complete in CSV.
+
+USO:
+  python replay_engine.py --journal /var/data/ticks --da 2026-06-20 --a 2026-06-21
+  python replay_engine.py --csv ticks.csv --db-seed /var/data/trading_data.db --export out/
+  CSV: colonne event_ts, price, qty (opzionali: trade_id, is_buyer_maker)
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import csv
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+# Moduli del bot che leggono l'orologio a livello di modulo
+MODULI_OROLOGIO = (
+    "OVERTOP_BASSANO_V16_PRODUCTION",
+    "tsunami_detector",
+    "capsule_manager",
+    "capsula_fase",
+    "capsula_memoria",
+    "capsula_matrigna",
+    "capsula_regime_edge",
+    "breath_engine",
+    "nervosismo_engine",
+    "comparto_engine",
+)
+
+# Schema trades di app.py.init_db(): nel replay app.py non gira
+_SCHEMA_TRADES = """
+    CREATE TABLE IF NOT EXISTS trades (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp   TEXT DEFAULT (datetime('now')),
+        event_type  TEXT,
+        asset       TEXT,
+        price       REAL,
+        size        REAL,
+        pnl         REAL,
+        direction   TEXT,
+        reason      TEXT,
+        data_json   TEXT
+    )
+"""
+_SCHEMA_BOT_STATE = """
+    CREATE TABLE IF NOT EXISTS bot_state (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    )
+"""
+
+
+class _TempoVirtuale:
+    """
+    Sostituto del modulo `time` per i moduli del bot.
+    time() legge l'orologio del replay, sleep() non dorme.
+    Tutto il resto (perf_counter, strftime, ...) va al modulo vero.
+    """
+
+    def __init__(self, clock):
+        self._clock = clock
+
+    def time(self):
+        return self._clock.now()
+
+    def sleep(self, _secondi=0):
+        return None
+
+    def __getattr__(self, nome):
+        return getattr(time, nome)
+
+
+def _rete_spenta(*_a, **_k):
+    import urllib.error
+    raise urllib.error.URLError("replay: rete disattivata")
+
+
+def _prepara_db(db_path: str, seed: str = None):
+    for suff in ("", "-wal", "-shm"):
+        try:
+            os.remove(db_path + suff)
+        except FileNotFoundError:
+            pass
+    if seed:
+        shutil.copyfile(seed, db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute(_SCHEMA_TRADES)
+    conn.execute(_SCHEMA_BOT_STATE)
+    conn.commit()
+    conn.close()
+
+
+def _max_id(db_path: str, tabella: str) -> int:
+    try:
+        conn = sqlite3.connect(db_path)
+        r = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {tabella}").fetchone()
+        conn.close()
+        return int(r[0] or 0)
+    except sqlite3.Error:
+        return 0
+
+
+def leggi_csv(path: str):
+    """Tick da CSV: (event_ts, trade_id, price, qty, is_buyer_maker)."""
+    with open(path, newline="") as f:
+        for i, r in enumerate(csv.DictReader(f)):
+            ts = float(r["event_ts"])
+            if ts > 1e11:          # millisecondi
+                ts /= 1000.0
+            m = str(r.get("is_buyer_maker") or "0").strip().lower()
+            yield (ts, int(r.get("trade_id") or i), float(r["price"]),
+                   float(r.get("qty") or 0.0), 1 if m in ("1", "true") else 0)
+
+
+class ReplayEngine:
+    """
+    Un replay = un bot nuovo su un DB scratch.
+    Va costruito PRIMA di importare il modulo del bot altrove nel processo:
+    DB_PATH e' letto all'import.
+    """
+
+    def __init__(self, db_path: str, db_seed: str = None, verbose: bool = False):
+        self.db_path = os.path.abspath(db_path)
+        _prepara_db(self.db_path, db_seed)
+
+        os.environ["DB_PATH"] = self.db_path
+        os.environ["CAPSULE_V2_HOOK_ENABLED"] = "false"
+        os.environ["TICK_JOURNAL_OFF"] = "true"
+        os.environ["WS_RING_OFF"] = "true"
+        os.environ["DIARIO_OFF"] = "true"
+
+        import logging
+        if not verbose:
+            logging.disable(logging.WARNING)
+
+        import urllib.request
+        urllib.request.urlopen = _rete_spenta
+
+        import OVERTOP_BASSANO_V16_PRODUCTION as bot_mod
+        if os.path.abspath(bot_mod.DB_PATH) != self.db_path:
+            raise RuntimeError(
+                f"modulo bot gia' importato con DB_PATH={bot_mod.DB_PATH}: "
+                f"il replay non puo' scrivere sul DB vero")
+        from tick_feed import EventClock
+
+        self.clock = EventClock(virtual=True)
+        tempo = _TempoVirtuale(self.clock)
+        for nome in MODULI_OROLOGIO:
+            mod = sys.modules.get(nome)
+            if mod is not None and getattr(mod, "time", None) is time:
+                mod.time = tempo
+
+        self._id0 = {t: _max_id(self.db_path, t) for t in ("trades", "phantom_forensic")}
+        self.bot = bot_mod.OvertopBassanoV16Production(
+            heartbeat_data={},
+            heartbeat_lock=threading.Lock(),
+            clock=self.clock,
+        )
+        self.n_ticks = 0
+        self.elapsed = 0.0
+
+    def run(self, ticks, limite: int = 0, progress: int = 0) -> dict:
+        bot = self.bot
+        t_start = time.perf_counter()
+        for ts, _tid, price, qty, _m in ticks:
+            bot._ingest_tick(price, qty, ts, None)
+            self.n_ticks += 1
+            if progress and self.n_ticks % progress == 0:
+                dt = time.perf_counter() - t_start
+                print(f"[REPLAY] {self.n_ticks} tick  {self.n_ticks / dt:.0f} t/s  "
+                      f"{datetime.fromtimestamp(ts, tz=timezone.utc):%Y-%m-%d %H:%M:%S}",
+                      flush=True)
+            if limite and self.n_ticks >= limite:
+                break
+        self.elapsed = time.perf_counter() - t_start
+        return self.report()
+
+    def report(self) -> dict:
+        self.attendi_db()
+        nuovi = {t: _max_id(self.db_path, t) - self._id0[t] for t in self._id0}
+        st = self.clock.stats()
+        return {
+            "db":              self.db_path,
+            "ticks":           self.n_ticks,
+            "secondi":         round(self.elapsed, 2),
+            "ticks_per_s":     round(self.n_ticks / self.elapsed, 1) if self.elapsed else 0.0,
+            "ultimo_event_ts": st["event_ts"],
+            "trades":          nuovi["trades"],
+            "phantom":         nuovi["phantom_forensic"],
+            "crash":           getattr(self.bot, "_tick_crash_n", 0),
+        }
+
+    def attendi_db(self, timeout: float = 10.0):
+        """Le righe accodate allo scrittore DB (phantom_forensic...) su disco."""
+        import OVERTOP_BASSANO_V16_PRODUCTION as bot_mod
+        for w in list(bot_mod._DB_SCRITTORI.values()):
+            w.attendi(timeout)
+
+    def export(self, out_dir: str) -> list:
+        """Scrive trades e phantom_forensic (righe del replay) in CSV."""
+        self.attendi_db()
+        os.makedirs(out_dir, exist_ok=True)
+        scritti = []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for tabella in ("trades", "phantom_forensic"):
+                try:
+                    cur = conn.execute(f"SELECT * FROM {tabella} WHERE rowid > ?",
+                                       (self._id0[tabella],))
+                except sqlite3.Error:
+                    continue
+                path = os.path.join(out_dir, f"{tabella}.csv")
+                with open(path, "w", newline="") as f:
+                    w = csv.writer(f)
+                    w.writerow([d[0] for d in cur.description])
+                    w.writerows(cur)
+                scritti.append(path)
+        finally:
+            conn.close()
+        return scritti
+
+
+def _parse_data(s: str):
+    if s is None:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return datetime.fromisoformat(s).replace(tzinfo=timezone.utc).timestamp()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay deterministico del bot V16 sui tick registrati")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--journal", help="cartella dei ticks_*.bin")
+    src.add_argument("--csv", help="file CSV event_ts,price,qty[,trade_id,is_buyer_maker]")
+    ap.add_argument("--da", help="inizio (epoch o ISO, UTC)")
+    ap.add_argument("--a", help="fine (epoch o ISO, UTC)")
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "replay_trading.db"),
+                    help="DB scratch (viene azzerato)")
+    ap.add_argument("--db-seed", help="DB da copiare come stato iniziale (letto, mai scritto)")
+    ap.add_argument("--export", help="cartella dove scrivere trades.csv e phantom_forensic.csv")
+    ap.add_argument("--limite", type=int, default=0, help="massimo numero di tick")
+    ap.add_argument("--progress", type=int, default=100000, help="stampa ogni N tick (0 = mai)")
+    ap.add_argument("--verbose", action="store_true", help="lascia i log del bot")
+    args = ap.parse_args(argv)
+
+    if args.db_seed and os.path.abspath(args.db_seed) == os.path.abspath(args.db):
+        ap.error("--db e --db-seed devono essere file diversi")
+
+    eng = ReplayEngine(args.db, db_seed=args.db_seed, verbose=args.verbose)
+    t0, t1 = _parse_data(args.da), _parse_data(args.a)
+    if args.journal:
+        from tick_journal import iter_journal
+        ticks = iter_journal(args.journal, t0, t1)
+    else:
+        ticks = (r for r in leggi_csv(args.csv)
+                 if (t0 is None or r[0] >= t0) and (t1 is None or r[0] <= t1))
+
+    rep = eng.run(ticks, limite=args.limite, progress=args.progress)
+    print(f"[REPLAY] {rep['ticks']} tick in {rep['secondi']}s = {rep['ticks_per_s']} tick/s")
+    print(f"[REPLAY] trades={rep['trades']} phantom={rep['phantom']} crash={rep['crash']} db={rep['db']}")
+    if args.export:
+        for p in eng.export(args.export):
+            print(f"[REPLAY] export {p}")
+    return rep
+
+
+if __name__ == "__main__":
+    main()
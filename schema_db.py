@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ SCHEMA DB — tutte le tabelle del bot in un posto, create e migrate al boot
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  I CREATE TABLE erano sparsi nel codice che scrive: crash_log dentro il
+  gestore dei crash (due volte, con due schemi diversi: chi arrivava
+  primo vinceva, l'altro falliva la INSERT in silenzio), curva_nascita
+  con un PRAGMA table_info a ogni trade, telemetry a ogni flush, i
+  *_tagli e ritardo_agganci sul thread del tick. DDL e catalogo a ogni
+  scrittura, ALTER "idempotenti" a colpi di try/except.
+
+SOLUZIONE:
+  TABELLE: ogni tabella una volta, con i suoi indici, raggruppate per DB
+  ('bot' = DB_PATH, 'narrative' = NARRATIVES_DB, 'diario' = i file per
+  giorno delle tabelle di osservazione, vedi DIARIO). pronto(db_path) al
+  boot, una volta per processo:
+    1. CREATE TABLE / INDEX IF NOT EXISTS di tutto il gruppo;
+    2. colonne dichiarate che mancano sulle tabelle vecchie → ADD COLUMN
+       (senza vincoli/default non costanti, che ALTER non accetta);
+    3. MIGRAZIONI con numero > schema_version → eseguite in ordine e
+       registrate in schema_version (una riga per versione).
+  Chi scrive a runtime fa solo INSERT.
+
+  Nuova tabella o colonna: si aggiunge qui. Serve spostare dati: una
+  funzione in MIGRAZIONI col numero successivo.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+# sotto queste pagine (~8MB) il VACUUM per auto_vacuum=INCREMENTAL si fa al boot
+_PAGINE_VACUUM_BOOT = 2048
+
+
+class Tabella:
+    """Una tabella: colonne come nel CREATE, indici (nome, colonne)."""
+
+    __slots__ = ('nome', 'corpo', 'indici', 'gruppo')
+
+    def __init__(self, nome: str, corpo: str, indici=(), gruppo: str = 'bot'):
+        self.nome   = nome
+        self.corpo  = corpo.strip()
+        self.indici = tuple(indici)
+        self.gruppo = gruppo
+
+    def ddl(self) -> str:
+        return f"CREATE TABLE IF NOT EXISTS {self.nome} (\n    {self.corpo}\n)"
+
+    def colonne(self) -> list:
+        """[(nome, dichiarazione)] dal corpo, vincoli di tabella esclusi."""
+        out = []
+        for parte in _spezza(_senza_commenti(self.corpo)):
+            p = parte.strip()
+            if not p or p.split()[0].upper() in ('PRIMARY', 'UNIQUE', 'CHECK', 'FOREIGN', 'CONSTRAINT'):
+                continue
+            nome, _, decl = p.partition(' ')
+            out.append((nome, decl.strip()))
+        return out
+
+
+def _senza_commenti(s: str) -> str:
+    return '\n'.join(r.split('--')[0] for r in s.splitlines())
+
+
+def _spezza(s: str) -> list:
+    """Virgole di primo livello (DEFAULT (strftime('%s','now')) resta intero)."""
+    out, liv, cur = [], 0, []
+    for ch in s:
+        if ch == '(':
+            liv += 1
+        elif ch == ')':
+            liv -= 1
+        if ch == ',' and liv == 0:
+            out.append(''.join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    out.append(''.join(cur))
+    return out
+
+
+def _per_alter(decl: str) -> str:
+    """Dichiarazione accettabile da ALTER TABLE ADD COLUMN."""
+    d = re.sub(r"\s+DEFAULT\s+(\(.*\)|CURRENT_\w+)", "", decl, flags=re.I)
+    d = re.sub(r"\b(PRIMARY\s+KEY|AUTOINCREMENT|UNIQUE)\b", "", d, flags=re.I)
+    if not re.search(r"\bDEFAULT\b", d, flags=re.I):
+        d = re.sub(r"\bNOT\s+NULL\b", "", d, flags=re.I)
+    return ' '.join(d.split())
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# TABELLE
+# ═══════════════════════════════════════════════════════════════════════
+
+TABELLE = [
+    # ── stato e cervello (PersistenzaStato) ─────────────────────────────
+    Tabella('bot_state', """
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    """),
+    # scritta da app.py e dal bot; lo schema e' quello di app.init_db()
+    Tabella('trades', """
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp   TEXT DEFAULT (datetime('now')),
+        event_type  TEXT,
+        asset       TEXT,
+        price       REAL,
+        size        REAL,
+        pnl         REAL,
+        direction   TEXT,
+        reason      TEXT,
+        data_json   TEXT
+    """),
+    # INDICE CONTESTO: storia dell'Oracolo, una riga per trade (seq)
+    Tabella('oracolo_storia', """
+        seq            INTEGER PRIMARY KEY,
+        regime         TEXT,
+        direction      TEXT,
+        momentum       TEXT,
+        volatility     TEXT,
+        rsi            REAL,
+        drift          REAL,
+        range_position REAL,
+        pnl            REAL
+    """),
+    # CERVELLO A RIGHE: un fingerprint dell'Oracolo / un contesto del Signal
+    # Tracker per riga, riscritta solo quando cambia (code_json/dati_json:
+    # le deque come liste)
+    Tabella('oracolo_fp', """
+        fp           TEXT PRIMARY KEY,
+        wins         REAL,
+        samples      REAL,
+        pnl_sum      REAL,
+        real_samples INTEGER,
+        code_json    TEXT,
+        ts           REAL
+    """),
+    Tabella('signal_tracker_ctx', """
+        ctx       TEXT PRIMARY KEY,
+        n         INTEGER,
+        dati_json TEXT,
+        ts        REAL
+    """),
+    Tabella('capsule_permanenti', """
+        id                 TEXT PRIMARY KEY,
+        azione             TEXT,
+        params_json        TEXT,
+        motivo             TEXT,
+        forza              REAL,
+        contesto           TEXT,
+        creata_ts          TEXT,
+        analisi_causale    TEXT,
+        prompt_contestuale TEXT,
+        n_attivazioni      INTEGER DEFAULT 0
+    """),
+    # FIX #21 (12mag2026) forense dei phantom bloccati; FIX MFE/MAE (28mag)
+    # le ultime 4 colonne (traiettoria del prezzo)
+    Tabella('phantom_forensic', """
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts_entry        REAL,
+        ts_close        REAL,
+        block_reason    TEXT,
+        direction       TEXT,
+        price_entry     REAL,
+        price_close     REAL,
+        pnl_netto       REAL,
+        is_win          INTEGER,
+        duration_sec    REAL,
+        ts_30s_strength    REAL,
+        ts_30s_direction   TEXT,
+        ts_30s_coerenza    REAL,
+        ts_2min_strength   REAL,
+        ts_2min_direction  TEXT,
+        ts_2min_coerenza   REAL,
+        ts_10min_strength  REAL,
+        ts_10min_direction TEXT,
+        ts_10min_coerenza  REAL,
+        ts_confidenza      INTEGER,
+        seed_score      REAL,
+        oi_carica       REAL,
+        rsi             REAL,
+        macd            REAL,
+        momentum        TEXT,
+        volatility      TEXT,
+        trend           TEXT,
+        regime          TEXT,
+        matrimonio      TEXT,
+        score           REAL,
+        soglia          REAL,
+        max_price       REAL,
+        min_price       REAL,
+        mfe_usd         REAL,
+        mae_usd         REAL
+    """, indici=[('idx_phf_block_reason', 'block_reason, is_win')]),
+    Tabella('winning_signatures', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        trade_outcome TEXT NOT NULL,  -- WIN_NET / LOSS_FEE / LOSS_REAL
+        pnl_netto REAL,
+        pnl_lordo REAL,
+        signature_json TEXT NOT NULL,
+        match_at_entry REAL  -- similarita' all'ultima firma WIN viva, all'entry
+    """, indici=[('idx_winsig_ts', 'ts'), ('idx_winsig_outcome', 'trade_outcome')]),
+    Tabella('veritas_stats', """
+        chiave TEXT PRIMARY KEY,
+        data   TEXT
+    """),
+    Tabella('veritas_closed', """
+        id   INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT
+    """),
+    Tabella('libro_pesca', """
+        id INTEGER PRIMARY KEY,
+        ts_piantata REAL NOT NULL,
+        prezzo_lenza REAL NOT NULL,
+        direzione TEXT NOT NULL,
+        orizzonte_s INTEGER NOT NULL,
+        lasco REAL NOT NULL,
+        regime TEXT,
+        carica REAL,
+        oi_stato TEXT,
+        delta_atteso REAL,
+        stato TEXT NOT NULL,
+        ts_cattura REAL,
+        prezzo_cattura REAL,
+        ts_chiusura REAL,
+        prezzo_chiusura REAL,
+        pnl_paper REAL,
+        esito_finale TEXT,
+        versione TEXT DEFAULT 'v15b',
+        fp_key TEXT,
+        fp_wr REAL,
+        fp_n INTEGER,
+        strategia TEXT
+    """, indici=[('idx_lp_orizzonte', 'orizzonte_s'), ('idx_lp_stato', 'stato'),
+                 ('idx_lp_esito', 'esito_finale'), ('idx_lp_versione', 'versione'),
+                 ('idx_lp_fp', 'fp_key')]),
+    Tabella('universi_paralleli', """
+        id INTEGER PRIMARY KEY, ts REAL, trades INTEGER, wr REAL,
+        pnl REAL, max_dd REAL, aperta INTEGER, uscite TEXT, taratura TEXT
+    """),
+    # StabilityTelemetry: eventi liberi (capsule, bridge, segnali) e report
+    Tabella('telemetry', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        event_type TEXT, data_json TEXT
+    """),
+    # ... e a colonne le decisioni (flip/hold, parametri, regime, stato):
+    # da/a senza tipo, tengono direzioni, regimi o valori di parametro
+    Tabella('telemetry_decisioni', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts               REAL,
+        tipo             TEXT,
+        regime           TEXT,
+        direction        TEXT,
+        open_position    INTEGER,
+        chiave           TEXT,
+        da,
+        a,
+        n                INTEGER,
+        motivo           TEXT,
+        active_threshold REAL,
+        drift            REAL,
+        macd             REAL,
+        trend            TEXT,
+        volatility       TEXT,
+        bridge_reason    TEXT
+    """, indici=[('idx_teldec_tipo_ts', 'tipo, ts')]),
+    # ... e i trade (TRADE_ENTRY / TRADE_CLOSE)
+    Tabella('telemetry_trade', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts               REAL,
+        tipo             TEXT,
+        regime           TEXT,
+        direction        TEXT,
+        open_position    INTEGER,
+        trade_direction  TEXT,
+        pnl              REAL,
+        is_win           INTEGER,
+        exit_reason      TEXT,
+        duration         REAL,
+        score            REAL,
+        soglia           REAL,
+        matrimonio       TEXT,
+        active_threshold REAL,
+        drift            REAL,
+        macd             REAL,
+        trend            TEXT,
+        volatility       TEXT
+    """, indici=[('idx_teltrade_ts', 'ts')]),
+    # ── diagnostica ─────────────────────────────────────────────────────
+    # crash_log UNICO: prima due schemi (streak/traceback da _ingest_tick,
+    # riga/tb da _process_tick). fonte = chi ha scritto la riga.
+    Tabella('crash_log', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT DEFAULT CURRENT_TIMESTAMP,
+        fonte TEXT,
+        streak INTEGER,
+        err_type TEXT,
+        err_msg TEXT,
+        riga TEXT,
+        traceback TEXT
+    """),
+    # ── osservatori del tick (solo INSERT) ──────────────────────────────
+    Tabella('trans_bloccati', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        causa TEXT, vpress REAL, comp REAL, prezzo REAL
+    """),
+    Tabella('ritardo_agganci', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        aggancio_ts REAL, direction TEXT,
+        vpress REAL, comp REAL, seed REAL,
+        momentum TEXT, volatility TEXT, trend TEXT,
+        prezzo REAL, peak_pnl REAL, entrato INTEGER DEFAULT 0
+    """),
+    # secondo: intero a passo 1s, reale (0.25, 0.5 ...) con PRIMI_SEC_PASSO
+    Tabella('primi_secondi', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        aggancio_ts REAL, secondo INTEGER,
+        prezzo_aggancio REAL, prezzo_ora REAL, var_usd REAL
+    """),
+    Tabella('sinapsi_observations', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL,
+        firma TEXT,
+        n_storici INTEGER,
+        wr_storico REAL,
+        peak_medio_storico REAL,
+        crollo_medio_storico REAL,
+        bot_decisione TEXT,
+        entry_price REAL,
+        score REAL,
+        soglia REAL
+    """),
+    Tabella('gate_peak_osserva', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL DEFAULT (strftime('%s','now')),
+        picco_pre REAL, soglia REAL, t_atteso REAL,
+        passa INTEGER, observer INTEGER,
+        regime TEXT, direction TEXT, prezzo REAL
+    """),
+    Tabella('curva_nascita', """
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        trade_ts     REAL,
+        firma        TEXT,
+        n_punti      INTEGER,
+        peak_nascita REAL,
+        t_peak_s     REAL,
+        pnl_a_10s    REAL,
+        curva_json   TEXT,
+        created_ts   REAL DEFAULT (strftime('%s','now')),
+        pnl_finale   REAL
+    """),
+    # ── tagli della gestione posizione ──────────────────────────────────
+    Tabella('cassa_grasso_tagli', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        eta_s REAL, peak_max REAL, pnl_taglio REAL,
+        ceduto_usd REAL, prezzo REAL
+    """),
+    Tabella('antiprec_tagli', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        eta_s REAL, pnl_taglio REAL, peak_max REAL, prezzo REAL
+    """),
+    Tabella('presa_secca_tagli', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        eta_s REAL, pnl_presa REAL, prezzo REAL
+    """),
+    Tabella('incasso_10s_tagli', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        eta_s REAL, pnl_10s REAL, pnl_taglio REAL,
+        ceduto_usd REAL, prezzo REAL
+    """),
+    Tabella('tranello_tagli', """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        pnl_10s REAL, pnl_20s REAL, prezzo REAL
+    """),
+    # ── NARRATIVES_DB (AIExplainer) ─────────────────────────────────────
+    Tabella('narrative_log', """
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp  TEXT,
+        event_type TEXT,
+        narrative  TEXT,
+        trade_data TEXT
+    """, gruppo='narrative'),
+]
+
+# Tabelle di osservazione che vivono anche nei DB per giorno (diario_db.py):
+# stesso schema del gruppo 'bot', gruppo 'diario' = solo queste.
+DIARIO = (
+    'phantom_forensic', 'telemetry', 'telemetry_decisioni', 'telemetry_trade',
+    'primi_secondi', 'gate_peak_osserva',
+    'sinapsi_observations', 'cassa_grasso_tagli', 'antiprec_tagli',
+    'presa_secca_tagli', 'incasso_10s_tagli', 'tranello_tagli',
+)
+
+
+def _del_gruppo(t: Tabella, gruppo: str) -> bool:
+    return t.gruppo == gruppo or (gruppo == 'diario' and t.nome in DIARIO)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# MIGRAZIONI — (versione, gruppo, descrizione, fn(conn)); in ordine.
+# Girano DOPO create e colonne mancanti, una volta per DB.
+# ═══════════════════════════════════════════════════════════════════════
+
+def _m2_crash_log(conn):
+    """Le righe scritte col vecchio schema riga/tb: tb → traceback."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(crash_log)")}
+    if 'tb' in cols:
+        conn.execute("UPDATE crash_log SET traceback = tb WHERE traceback IS NULL")
+    conn.execute("UPDATE crash_log SET fonte = 'process_tick' WHERE fonte IS NULL AND riga IS NOT NULL")
+    conn.execute("UPDATE crash_log SET fonte = 'ingest_tick' WHERE fonte IS NULL AND streak IS NOT NULL")
+
+
+MIGRAZIONI = [
+    (1, 'bot',       "schema centrale: tabelle, indici, colonne mancanti", None),
+    (2, 'bot',       "crash_log unico: traceback da tb, fonte", _m2_crash_log),
+    (1, 'narrative', "schema centrale: narrative_log", None),
+    (1, 'diario',    "tabelle di osservazione per giorno", None),
+]
+
+
+def versione(gruppo: str = 'bot') -> int:
+    return max((v for v, g, _, _ in MIGRAZIONI if g == gruppo), default=0)
+
+
+def applica(conn, gruppo: str = 'bot') -> dict:
+    """Crea, completa e migra lo schema del gruppo su conn. Idempotente."""
+    t0 = time.time()
+    rep = {'gruppo': gruppo, 'create': [], 'colonne': [], 'migrazioni': []}
+    # DB nuovo (o quasi: app.py crea trades/bot_state prima del bot):
+    # auto_vacuum=INCREMENTAL, cosi' il potatore (potatore_db.py) restituisce
+    # al disco le pagine che libera. Il VACUUM su pochi MB e' istantaneo; su
+    # un DB gia' pieno sarebbe lungo: li' c'e' POTATORE_CONVERTI.
+    if (conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+            and conn.execute("PRAGMA page_count").fetchone()[0] <= _PAGINE_VACUUM_BOOT):
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        except Exception:
+            pass
+    rep['auto_vacuum'] = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        versione    INTEGER,
+        gruppo      TEXT,
+        descrizione TEXT,
+        ts          REAL,
+        PRIMARY KEY (versione, gruppo))""")
+    esistenti = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for t in TABELLE:
+        if not _del_gruppo(t, gruppo):
+            continue
+        if t.nome not in esistenti:
+            conn.execute(t.ddl())
+            rep['create'].append(t.nome)
+        else:
+            presenti = {r[1] for r in conn.execute(f"PRAGMA table_info({t.nome})")}
+            for nome, decl in t.colonne():
+                if nome not in presenti:
+                    conn.execute(f"ALTER TABLE {t.nome} ADD COLUMN {nome} {_per_alter(decl)}")
+                    rep['colonne'].append(f"{t.nome}.{nome}")
+        for nome_idx, cols in t.indici:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {nome_idx} ON {t.nome}({cols})")
+    attuale = conn.execute("SELECT MAX(versione) FROM schema_version WHERE gruppo = ?",
+                           (gruppo,)).fetchone()[0] or 0
+    for v, g, descr, fn in MIGRAZIONI:
+        if g != gruppo or v <= attuale:
+            continue
+        if fn is not None:
+            fn(conn)
+        conn.execute("INSERT OR REPLACE INTO schema_version VALUES (?,?,?,?)",
+                     (v, g, descr, time.time()))
+        rep['migrazioni'].append(v)
+    conn.commit()
+    rep['versione'] = max(attuale, versione(gruppo))
+    rep['ms'] = round((time.time() - t0) * 1000, 1)
+    return rep
+
+
+_FATTI = {}
+_LOCK = threading.Lock()
+
+
+def pronto(db_path: str, gruppo: str = 'bot', connetti=None) -> dict:
+    """
+    applica() su db_path una volta per processo (le chiamate dopo la prima
+    ritornano il rapporto di allora). connetti: funzione come sqlite3.connect.
+    """
+    chiave = (os.path.abspath(db_path), gruppo)
+    rep = _FATTI.get(chiave)
+    if rep is not None:
+        return rep
+    with _LOCK:
+        rep = _FATTI.get(chiave)
+        if rep is not None:
+            return rep
+        d = os.path.dirname(db_path)
+        if d and not os.path.exists(d):
+            os.makedirs(d, exist_ok=True)
+        conn = (connetti or sqlite3.connect)(db_path, timeout=30)
+        try:
+            rep = applica(conn, gruppo)
+        finally:
+            conn.close()
+        _FATTI[chiave] = rep
+        if rep['create'] or rep['colonne'] or rep['migrazioni']:
+            log.info(f"[SCHEMA] {os.path.basename(db_path)} v{rep['versione']}: "
+                     f"create={len(rep['create'])} colonne={rep['colonne']} "
+                     f"migrazioni={rep['migrazioni']} ({rep['ms']}ms)")
+        return rep
+
+
+def dimentica(db_path: str, gruppo: str = 'bot'):
+    """Il file e' stato cancellato: al prossimo pronto() lo schema si rifa'."""
+    with _LOCK:
+        _FATTI.pop((os.path.abspath(db_path), gruppo), None)
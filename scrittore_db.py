@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ SCRITTORE DB — un thread, una connessione, scritture a transazioni
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  Ogni scrittura (crash_log, primi_secondi, firme, curva_nascita,
+  telemetria) passava da _safe_connect: lock globale del processo,
+  connessione NUOVA, tre PRAGMA, una INSERT, commit (fsync), close.
+  Sul thread del tick. Anche le letture (comandi bridge, firme al boot)
+  prendevano lo stesso lock per tutta la vita della connessione.
+
+SOLUZIONE:
+  ScrittoreDB: il thread db_scrittore possiede UNA connessione aperta
+  per sempre. Chi scrive accoda un record (esegui / esegui_molti /
+  transazione) e torna subito: deque.append e un contatore sotto un
+  lock corto (_fatti), nessun disco.
+  Il thread raccoglie i record ogni FLUSH_MS o appena ce ne sono BATCH,
+  e li scrive in UNA transazione, in ordine di arrivo. Il lock globale
+  (_DB_GLOBAL_LOCK) lo prende solo per la durata di quella transazione:
+  le scritture del processo restano in fila come prima.
+
+  Un record che fallisce (tabella vecchia, vincolo) si conta e si
+  scarta; gli altri della transazione passano. stats(): coda e suo
+  massimo, righe, transazioni, errori, durata del commit, attesa in coda.
+
+  La coda ha un tetto (max_coda, 0 = senza): piena, chi produce aspetta
+  il prossimo blocco scritto invece di far crescere la memoria se il
+  disco si ferma (attese_piena in stats; dopo ATTESA_PIENA_S accoda lo
+  stesso, oltre_tetto: mai un produttore fermo per sempre). chiudi(): dopo _stop il thread
+  svuota la coda un'ultima volta; un record accodato a scrittore gia'
+  chiuso si conta in 'persi' (esito(False) per le transazioni).
+
+  transazione(fn, esito): fn gira in un SAVEPOINT, tutto o niente (se
+  solleva, nulla di cio' che ha scritto resta nel blocco). esito(ok) e'
+  chiamato sul thread scrittore DOPO il COMMIT del blocco: True solo se
+  fn e' passata e il commit anche. Chi deve sapere se i suoi dati sono
+  davvero su disco (es. segnali "sporco" da azzerare) lo fa li'.
+
+  LettoriDB: connessioni di sola lettura (mode=ro, WAL) in un piccolo
+  pool. In WAL chi legge non blocca chi scrive e viceversa: niente lock.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_PRAGMA = ("PRAGMA journal_mode=WAL;", "PRAGMA busy_timeout=30000;", "PRAGMA synchronous=NORMAL;")
+
+
+class ScrittoreDB:
+    """Scritture accodate, applicate dal thread db_scrittore a blocchi."""
+
+    ATTESA_PIENA_S = 5.0                     # attesa massima di chi trova la coda piena
+
+    def __init__(self, db_path: str, flush_ms: float = 200, batch: int = 500, lock=None,
+                 max_coda: int = 100000):
+        self.db_path  = db_path
+        self.flush_s  = max(0.01, flush_ms / 1000.0)
+        self.batch    = max(1, int(batch))
+        self.max_coda = max(0, int(max_coda))   # 0 = coda senza tetto
+        self._lock_db = lock                 # lock del processo, tenuto solo in transazione
+        self._coda    = deque()
+        self._sveglia = threading.Event()
+        self._fatti   = threading.Condition()
+        self._conn    = None
+        self._stop    = False
+        self._chiuso  = False                # thread uscito, coda svuotata l'ultima volta
+        self.accodati = 0                    # record accodati in totale (sotto _fatti)
+        self.scritti  = 0                    # record applicati (anche se falliti)
+        self.righe    = 0
+        self.transazioni = 0
+        self.errori   = 0
+        self.ultimo_errore = None
+        self.commit_ms_ultimo = 0.0
+        self.commit_ms_max    = 0.0
+        self._commit_ms_tot   = 0.0
+        self.attesa_ms_max    = 0.0          # dal accodamento al commit
+        self.coda_max    = 0                 # massimo della coda visto
+        self.attese_piena = 0                # accodamenti fermati dalla coda piena
+        self.oltre_tetto = 0                 # ... e accodati lo stesso dopo ATTESA_PIENA_S
+        self.persi       = 0                 # accodati a scrittore chiuso
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="db_scrittore")
+        self._thread.start()
+        atexit.register(self.chiudi)
+
+    # ── produttori (qualsiasi thread) ───────────────────────────────────
+    def esegui(self, sql: str, params=()):
+        self._accoda(('x', sql, params))
+
+    def esegui_molti(self, sql: str, righe):
+        righe = list(righe)
+        if righe:
+            self._accoda(('m', sql, righe))
+
+    def transazione(self, fn, esito=None):
+        """fn(conn) gira sul thread scrittore, dentro la transazione del blocco,
+        tutta o niente. esito(ok) dopo il commit del blocco (ok=False: non e' su disco)."""
+        self._accoda(('f', fn, esito))
+
+    def _accoda(self, rec):
+        # accodati += 1 non e' atomico fra produttori e attendi() ci conta:
+        # append e contatore sotto _fatti (lock corto, niente disco)
+        with self._fatti:
+            if (self.max_coda and len(self._coda) >= self.max_coda
+                    and threading.current_thread() is not self._thread):
+                # coda piena: aspetto che il thread scriva (lui stesso non
+                # aspetta mai, es. da un esito). Al massimo ATTESA_PIENA_S:
+                # chi tiene il lock del processo (connessione _safe_connect
+                # aperta) fermerebbe lo scrittore, dopo si accoda oltre il tetto
+                self.attese_piena += 1
+                self._sveglia.set()
+                fine = time.time() + self.ATTESA_PIENA_S
+                while len(self._coda) >= self.max_coda and self._thread.is_alive():
+                    resto = fine - time.time()
+                    if resto <= 0:
+                        self.oltre_tetto += 1
+                        break
+                    self._fatti.wait(min(resto, self.flush_s))
+            if not self._chiuso:
+                self._coda.append((time.time(), rec))
+                self.accodati += 1
+                n = len(self._coda)
+                if n > self.coda_max:
+                    self.coda_max = n
+                if n >= self.batch:
+                    self._sveglia.set()
+                return
+            self.persi += 1
+        # scrittore gia' chiuso: il record non andra' su disco
+        if self.persi == 1:
+            log.warning(f"[DB_SCRITTORE] {os.path.basename(self.db_path)}: record dopo chiudi(), perso")
+        if rec[0] == 'f' and rec[2] is not None:
+            try:
+                rec[2](False)
+            except Exception as e:
+                log.warning(f"[DB_SCRITTORE] esito: {e}")
+
+    def attendi(self, timeout: float = 5.0) -> bool:
+        """Aspetta che tutto cio' che e' accodato finora sia scritto."""
+        obiettivo = self.accodati
+        self._sveglia.set()
+        fine = time.time() + timeout
+        with self._fatti:
+            while self.scritti < obiettivo:
+                resto = fine - time.time()
+                if resto <= 0 or not self._thread.is_alive():
+                    return False
+                self._fatti.wait(resto)
+        return True
+
+    def chiudi(self, timeout: float = 5.0):
+        if self._stop:
+            return
+        self.attendi(timeout)
+        self._stop = True
+        self._sveglia.set()
+        self._thread.join(timeout)
+
+    # ── thread scrittore ────────────────────────────────────────────────
+    def _connetti(self):
+        c = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                            isolation_level=None)
+        for p in _PRAGMA:
+            try:
+                c.execute(p)
+            except Exception:
+                pass
+        return c
+
+    def _svuota(self):
+        while self._coda:
+            blocco = []
+            while self._coda and len(blocco) < self.batch:
+                blocco.append(self._coda.popleft())
+            self._scrivi(blocco)
+
+    def _loop(self):
+        while True:
+            self._sveglia.wait(self.flush_s)
+            self._sveglia.clear()
+            self._svuota()
+            if self._stop:
+                break
+        # ultimo giro: un _accoda in gara con chiudi() (dopo lo svuotamento
+        # sopra, prima di _stop) e' ancora in coda. Si chiude sotto _fatti
+        # solo a coda vuota: da li' _accoda vede _chiuso e non accoda piu'.
+        while True:
+            self._svuota()
+            with self._fatti:
+                if not self._coda:
+                    self._chiuso = True
+                    self._fatti.notify_all()
+                    break
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+    def _scrivi(self, blocco: list):
+        t0 = time.time()
+        righe = 0
+        esiti = []                           # [(esito, fn passata)] dei record 'f'
+        commit_ok = False
+        try:
+            if self._conn is None:
+                self._conn = self._connetti()
+            c = self._conn
+            if self._lock_db is not None:
+                self._lock_db.acquire()
+            try:
+                c.execute("BEGIN")
+                for _, (tipo, a, b) in blocco:
+                    try:
+                        if tipo == 'x':
+                            c.execute(a, b)
+                            righe += 1
+                        elif tipo == 'm':
+                            c.executemany(a, b)
+                            righe += len(b)
+                        else:
+                            c.execute("SAVEPOINT rec")
+                            try:
+                                a(c)
+                            except Exception:
+                                c.execute("ROLLBACK TO rec")
+                                c.execute("RELEASE rec")
+                                if b is not None:
+                                    esiti.append((b, False))
+                                raise
+                            c.execute("RELEASE rec")
+                            if b is not None:
+                                esiti.append((b, True))
+                    except Exception as e:
+                        self.errori += 1
+                        self.ultimo_errore = f"{type(e).__name__}: {e}"
+                c.execute("COMMIT")
+                commit_ok = True
+            finally:
+                if self._lock_db is not None:
+                    self._lock_db.release()
+        except Exception as e:
+            # commit fallito: il blocco e' perso, la connessione si riapre
+            self.errori += 1
+            self.ultimo_errore = f"{type(e).__name__}: {e}"
+            log.warning(f"[DB_SCRITTORE] blocco di {len(blocco)} perso: {e}")
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+            righe = 0
+        if not commit_ok:
+            # blocco perso: nessun record 'f' e' su disco, anche quelli mai girati
+            esiti = [(b, False) for _, (tipo, _a, b) in blocco if tipo == 'f' and b is not None]
+        for esito, ok in esiti:
+            try:
+                esito(ok)
+            except Exception as e:
+                log.warning(f"[DB_SCRITTORE] esito: {e}")
+        t1 = time.time()
+        ms = (t1 - t0) * 1000
+        self.commit_ms_ultimo = ms
+        self.commit_ms_max = max(self.commit_ms_max, ms)
+        self._commit_ms_tot += ms
+        self.attesa_ms_max = max(self.attesa_ms_max, (t1 - blocco[0][0]) * 1000)
+        self.transazioni += 1
+        self.righe += righe
+        with self._fatti:
+            self.scritti += len(blocco)
+            self._fatti.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            'coda':             len(self._coda),
+            'coda_max':         self.coda_max,
+            'max_coda':         self.max_coda,
+            'attese_piena':     self.attese_piena,
+            'oltre_tetto':      self.oltre_tetto,
+            'accodati':         self.accodati,
+            'persi':            self.persi,
+            'righe':            self.righe,
+            'transazioni':      self.transazioni,
+            'errori':           self.errori,
+            'ultimo_errore':    self.ultimo_errore,
+            'commit_ms_ultimo': round(self.commit_ms_ultimo, 2),
+            'commit_ms_medio':  round(self._commit_ms_tot / self.transazioni, 2) if self.transazioni else None,
+            'commit_ms_max':    round(self.commit_ms_max, 2),
+            'attesa_ms_max':    round(self.attesa_ms_max, 1),
+            'vivo':             self._thread.is_alive(),
+        }
+
+
+class LettoriDB:
+    """Pool di connessioni di sola lettura. Nessun lock: in WAL non serve."""
+
+    def __init__(self, db_path: str, n: int = 4):
+        self.db_path = db_path
+        self.n       = max(1, int(n))
+        self._pool   = queue.LifoQueue()
+        self._aperte = 0
+        self._mx     = threading.Lock()
+        self.letture = 0
+
+    def _apri(self):
+        uri = "file:" + os.path.abspath(self.db_path) + "?mode=ro"
+        c = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+        c.execute("PRAGMA busy_timeout=30000;")
+        return c
+
+    @contextmanager
+    def leggi(self):
+        """with lettori.leggi() as conn: ... (connessione restituita al pool all'uscita)."""
+        try:
+            c = self._pool.get_nowait()
+        except queue.Empty:
+            with self._mx:
+                nuova = self._aperte < self.n
+                if nuova:
+                    self._aperte += 1
+            if nuova:
+                try:
+                    c = self._apri()
+                except Exception:
+                    with self._mx:
+                        self._aperte -= 1
+                    raise
+            else:
+                c = self._pool.get(timeout=30)
+        ok = False
+        try:
+            yield c
+            ok = True
+        finally:
+            self.letture += 1
+            if ok:
+                self._pool.put(c)
+            else:
+                # connessione in stato incerto: la butto
+                try:
+                    c.close()
+                except Exception:
+                    pass
+                with self._mx:
+                    self._aperte -= 1
+
+    def stats(self) -> dict:
+        return {'aperte': self._aperte, 'libere': self._pool.qsize(), 'letture': self.letture}
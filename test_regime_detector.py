@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TEST REGIME DETECTOR — senza liste contro l'originale, stesso flusso
+═══════════════════════════════════════════════════════════════════════
+
+  RegimeDetectorOriginale e' add_tick/detect di prima (liste, variazioni
+  e medie rifatte a ogni chiamata) e le finestre 50/200 che
+  l'AUTOCORRETTORE riaffettava, copiati qui come riferimento. Il flusso
+  sintetico ha prezzi pari, volumi zero ed esplosioni di volume, salti
+  di regime: detect() chiamato a OGNI tick (isteresi compresa) e le
+  finestre dell'autocorrettore devono essere IDENTICI, bit per bit
+  (nessuna tolleranza: una confidence sulla soglia cambia il regime).
+
+  pytest test_regime_detector.py            (REGIME_TEST_TICK, def 50000)
+  python test_regime_detector.py [n_tick]   equivalenza + microbenchmark
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import time
+import random
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import OVERTOP_BASSANO_V16_PRODUCTION as bot
+
+
+class RegimeDetectorOriginale:
+    """add_tick/detect prima delle deque di variazioni, invariati (commenti tolti)."""
+
+    WINDOW = 200
+
+    def __init__(self):
+        self.prices    = deque(maxlen=self.WINDOW)
+        self.volumes   = deque(maxlen=self.WINDOW)
+        self._regime   = 'RANGING'
+        self._confidence = 0.0
+        self._pending_regime = 'RANGING'
+        self._pending_count  = 0
+        self.CHANGE_TICKS    = 30
+
+    def add_tick(self, price: float, volume: float = 1.0):
+        self.prices.append(price)
+        self.volumes.append(volume)
+
+    def detect(self) -> tuple:
+        if len(self.prices) < 50:
+            return 'RANGING', 0.0, {}
+
+        prices  = list(self.prices)
+        volumes = list(self.volumes)
+        n       = len(prices)
+
+        mid        = n // 2
+        avg_first  = sum(prices[:mid]) / mid
+        avg_second = sum(prices[mid:]) / (n - mid)
+        trend_pct  = (avg_second - avg_first) / avg_first * 100
+
+        changes    = [prices[i+1] - prices[i] for i in range(n-1)]
+        up_count   = sum(1 for c in changes if c > 0)
+        dir_ratio  = up_count / len(changes)
+
+        abs_changes = [abs(c) for c in changes]
+        avg_change  = sum(abs_changes) / len(abs_changes)
+        vol_first   = sum(abs_changes[:mid]) / mid
+        vol_second  = sum(abs_changes[mid:]) / (n - mid)
+        vol_ratio   = vol_second / max(vol_first, 0.001)
+
+        vol_recent  = sum(volumes[-50:]) / 50
+        vol_base    = sum(volumes[:50])  / 50
+        vol_accel   = vol_recent / max(vol_base, 0.001)
+
+        regime     = 'RANGING'
+        confidence = 0.5
+
+        if vol_accel > 2.0 and vol_ratio > 1.5:
+            regime     = 'EXPLOSIVE'
+            confidence = min(1.0, vol_accel / 3.0)
+        elif trend_pct > 0.3 and dir_ratio > 0.52:
+            regime     = 'TRENDING_BULL'
+            confidence = min(1.0, (dir_ratio - 0.50) * 5)
+        elif trend_pct < -0.3 and dir_ratio < 0.48:
+            regime     = 'TRENDING_BEAR'
+            confidence = min(1.0, (0.50 - dir_ratio) * 5)
+        else:
+            regime     = 'RANGING'
+            confidence = max(0.30, 1.0 - abs(dir_ratio - 0.5) * 2.0)
+
+        confidence = max(0.0, min(1.0, confidence))
+
+        if regime == self._regime:
+            self._pending_regime = regime
+            self._pending_count = 0
+        elif regime == self._pending_regime:
+            self._pending_count += 1
+            if self._pending_count >= self.CHANGE_TICKS:
+                self._regime = regime
+                self._pending_count = 0
+        else:
+            self._pending_regime = regime
+            self._pending_count = 1
+
+        if regime == self._regime:
+            self._confidence = confidence
+        else:
+            _transizione = self._pending_count / max(1, self.CHANGE_TICKS)
+            self._confidence = round(max(0.10, confidence * (1.0 - _transizione * 0.7)), 3)
+
+        return self._regime, self._confidence, {
+            'trend_pct':       round(trend_pct, 3),
+            'dir_ratio':       round(dir_ratio, 3),
+            'vol_accel':       round(vol_accel, 3),
+            'vol_ratio':       round(vol_ratio, 3),
+            'regime_calcolato': regime,
+            'confidence_calcolata': round(confidence, 3),
+            'pending_count':   self._pending_count,
+        }
+
+    def finestre_autocorrettore(self) -> tuple:
+        """Il blocco AUTOCORRETTORE di _process_tick di prima."""
+        _prezzi_all = list(self.prices)
+        _p50     = _prezzi_all[-50:]
+        _move50  = (_p50[-1] - _p50[0]) / _p50[0] * 100
+        _up50    = sum(1 for i in range(len(_p50)-1) if _p50[i+1] > _p50[i])
+        _dir50   = _up50 / max(len(_p50)-1, 1)
+        _p200    = _prezzi_all[-200:] if len(_prezzi_all) >= 200 else _prezzi_all
+        _move200 = (_p200[-1] - _p200[0]) / _p200[0] * 100
+        _up200   = sum(1 for i in range(len(_p200)-1) if _p200[i+1] > _p200[i])
+        _dir200  = _up200 / max(len(_p200)-1, 1)
+        return _move50, _dir50, _move200, _dir200
+
+
+def flusso(n: int, seme: int = 7):
+    """(prezzo, volume): BTC-like, prezzi al cent, volumi lognormali con zeri,
+    cambi di regime laterale/rialzo/ribasso/esplosivo ogni 3000 tick."""
+    rnd = random.Random(seme)
+    p = 79000.0
+    regime = 0
+    for i in range(n):
+        if i % 3000 == 0:
+            regime = rnd.randrange(4)
+        passo  = (1.0, 3.0, 3.0, 14.0)[regime]
+        spinta = (0.0, 3.5, -3.5, 0.0)[regime]
+        vmedia = (-3.0, -2.5, -2.5, -0.5)[regime]
+        if rnd.random() < 0.2:
+            d = 0.0                                   # prezzo invariato
+        else:
+            d = rnd.gauss(spinta, passo)
+        p = round(max(1000.0, p + d), 2)
+        v = 0.0 if rnd.random() < 0.03 else round(rnd.lognormvariate(vmedia, 1.5), 5)
+        yield p, v
+
+
+def confronta(n: int) -> int:
+    """Tick confrontati; AssertionError al primo risultato diverso."""
+    nuovo, vecchio = bot.RegimeDetector(), RegimeDetectorOriginale()
+    for i, (p, v) in enumerate(flusso(n)):
+        nuovo.add_tick(p, v)
+        vecchio.add_tick(p, v)
+        a, b = nuovo.detect(), vecchio.detect()
+        assert a == b, f"tick {i}: {a} != {b}"
+        if len(vecchio.prices) >= 50:
+            fa, fb = nuovo.finestre_autocorrettore(), vecchio.finestre_autocorrettore()
+            assert fa == fb, f"tick {i} autocorrettore: {fa} != {fb}"
+    return n
+
+
+def test_stesso_regime_tick_per_tick():
+    confronta(int(os.environ.get("REGIME_TEST_TICK", "50000")))
+
+
+def test_flusso_tocca_tutti_i_regimi():
+    r = bot.RegimeDetector()
+    visti = set()
+    for p, v in flusso(30000):
+        r.add_tick(p, v)
+        visti.add(r.detect()[2].get('regime_calcolato'))
+    assert {'RANGING', 'TRENDING_BULL', 'TRENDING_BEAR', 'EXPLOSIVE'} <= visti, visti
+
+
+def benchmark(n: int = 20000) -> dict:
+    """us per tick: add_tick + detect() (REGIME_CHECK_S=0: a ogni tick)."""
+    dati = list(flusso(n, seme=11))
+    out = {}
+    for nome, cls in (('originale', RegimeDetectorOriginale), ('nuovo', bot.RegimeDetector)):
+        r = cls()
+        t0 = time.perf_counter()
+        for p, v in dati:
+            r.add_tick(p, v)
+            r.detect()
+        out[nome] = (time.perf_counter() - t0) / n * 1e6
+    return out
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    t0 = time.time()
+    confronta(n)
+    print(f"[REGIME_TEST] {n} tick: detect e autocorrettore identici ({time.time() - t0:.1f}s)")
+    b = benchmark()
+    print(f"[REGIME_BENCH] add_tick + detect(): originale {b['originale']:.1f}us "
+          f"nuovo {b['nuovo']:.1f}us (x{b['originale'] / b['nuovo']:.1f})")
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TEST SEED SCORER — incrementale contro l'originale, stesso flusso di tick
+═══════════════════════════════════════════════════════════════════════
+
+  SeedScorerOriginale e' lo score() di prima (liste ricostruite a ogni
+  chiamata), copiato qui come riferimento. Il flusso sintetico ha prezzi
+  pari, volumi zero, salti di regime: il dict deve essere IDENTICO a
+  ogni tick (nessuna tolleranza: lo score decide la soglia di entry).
+
+  pytest test_seed_scorer.py            equivalenza (SEED_TEST_TICK, def 50000)
+  python test_seed_scorer.py [n_tick]   equivalenza + microbenchmark
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import time
+import random
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import OVERTOP_BASSANO_V16_PRODUCTION as bot
+
+
+class SeedScorerOriginale:
+    """Lo score() prima dell'incrementale, invariato."""
+
+    def __init__(self, window: int = 50):
+        self.prices  = deque(maxlen=window)
+        self.volumes = deque(maxlen=window)
+
+    def add_tick(self, price: float, volume: float = 1.0):
+        self.prices.append(price)
+        self.volumes.append(volume)
+
+    def score(self) -> dict:
+        if len(self.prices) < 20:
+            return {'score': 0.0, 'pass': False, 'reason': 'insufficient_data'}
+        prices  = list(self.prices)
+        volumes = list(self.volumes)
+        low20  = min(prices[-20:])
+        high20 = max(prices[-20:])
+        r20    = high20 - low20
+        range_pos = (prices[-1] - low20) / (r20 + 0.01)
+        r5  = max(prices[-5:])  - min(prices[-5:])
+        r10 = max(prices[-10:]) - min(prices[-10:])
+        compression_ratio = r5 / (r10 + 0.01)
+        comp_score = max(0.0, min(1.0, 1.0 - compression_ratio))
+        changes = [prices[i+1]-prices[i] for i in range(len(prices)-11, len(prices)-1)]
+        positive_ticks = sum(1 for c in changes if c > 0)
+        drift_persist  = positive_ticks / len(changes) if changes else 0.5
+        all_changes = [prices[i+1]-prices[i] for i in range(len(prices)-21, len(prices)-1)]
+        sign_flips  = sum(1 for i in range(1, len(all_changes))
+                          if all_changes[i]*all_changes[i-1] < 0)
+        flip_score  = max(0.0, min(1.0, 1.0 - sign_flips/10.0))
+        vm5  = sum(volumes[-5:])  / 5
+        vm15 = sum(volumes[-15:]) / 15 if len(volumes) >= 15 else vm5
+        vol_pressure = vm5 / (vm15 + 0.01)
+        vol_score    = min(1.0, vol_pressure / 2.0)
+        drift5  = [prices[i+1]-prices[i] for i in range(len(prices)-6, len(prices)-1)]
+        drift15 = [prices[i+1]-prices[i] for i in range(len(prices)-16, len(prices)-1)]
+        dm5  = sum(drift5)  / len(drift5)  if drift5  else 0
+        dm15 = sum(drift15) / len(drift15) if drift15 else 0
+        drift_slope = dm5 - dm15
+        slope_score = min(1.0, max(0.0, 0.5 + drift_slope / 0.001))
+        comp_dur = 0
+        for i in range(len(prices)-1, max(0, len(prices)-20), -1):
+            window = prices[max(0, i-5):i+1]
+            if (max(window)-min(window)) < r20*0.65:
+                comp_dur += 1
+            else:
+                break
+        dur_score = min(1.0, comp_dur / 8.0)
+        total = (range_pos   * 0.25 + comp_score  * 0.15 + drift_persist* 0.20 +
+                 flip_score  * 0.15 + vol_score   * 0.10 + slope_score * 0.10 +
+                 dur_score   * 0.05)
+        return {
+            'score':            round(total, 4),
+            'range_pos':        round(range_pos, 4),
+            'compression':      round(compression_ratio, 4),
+            'drift_persist':    round(drift_persist, 4),
+            'sign_flips':       sign_flips,
+            'vol_pressure':     round(vol_pressure, 4),
+            'drift_slope':      round(drift_slope, 6),
+            'comp_duration':    comp_dur,
+            'pass':             total >= bot.SEED_ENTRY_THRESHOLD,
+        }
+
+
+def flusso(n: int, seme: int = 7):
+    """(prezzo, volume): BTC-like, prezzi arrotondati al cent (pari), volumi
+    lognormali con zeri, cambi di regime laterale/trend/esplosivo."""
+    rnd = random.Random(seme)
+    p = 79000.0
+    regime = 0
+    for i in range(n):
+        if i % 5000 == 0:
+            regime = rnd.randrange(3)
+        passo = (0.8, 3.0, 12.0)[regime]
+        spinta = (0.0, 0.6, -1.5)[regime]
+        if rnd.random() < 0.2:
+            d = 0.0                                   # prezzo invariato
+        else:
+            d = rnd.gauss(spinta, passo)
+        p = round(max(1000.0, p + d), 2)
+        v = 0.0 if rnd.random() < 0.03 else round(rnd.lognormvariate(-3, 1.5), 5)
+        yield p, v
+
+
+def confronta(n: int) -> int:
+    """Tick confrontati; AssertionError al primo dict diverso."""
+    nuovo, vecchio = bot.SeedScorer(window=50), SeedScorerOriginale(window=50)
+    for i, (p, v) in enumerate(flusso(n)):
+        nuovo.add_tick(p, v)
+        vecchio.add_tick(p, v)
+        a, b = nuovo.score(), vecchio.score()
+        assert a == b, f"tick {i}: {a} != {b}"
+    return n
+
+
+def test_stesso_score_tick_per_tick():
+    confronta(int(os.environ.get("SEED_TEST_TICK", "50000")))
+
+
+def test_score_ripetuto_nello_stesso_tick():
+    s = bot.SeedScorer(window=50)
+    for p, v in flusso(100):
+        s.add_tick(p, v)
+    a = s.score()
+    a['score'] = -1                       # il chiamante puo' sporcare la copia
+    assert s.score() == SeedScorerOriginale_da(s).score()
+
+
+def SeedScorerOriginale_da(s):
+    o = SeedScorerOriginale(window=50)
+    for p, v in zip(s.prices, s.volumes):
+        o.add_tick(p, v)
+    return o
+
+
+def benchmark(n: int = 20000, chiamate: int = 3) -> dict:
+    """us per tick: add_tick + `chiamate` score(), come nel tick del bot."""
+    dati = list(flusso(n, seme=11))
+    out = {}
+    for nome, cls in (('originale', SeedScorerOriginale), ('incrementale', bot.SeedScorer)):
+        s = cls(window=50)
+        t0 = time.perf_counter()
+        for p, v in dati:
+            s.add_tick(p, v)
+            for _ in range(chiamate):
+                s.score()
+        out[nome] = (time.perf_counter() - t0) / n * 1e6
+    return out
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    t0 = time.time()
+    confronta(n)
+    print(f"[SEED_TEST] {n} tick: score identico ({time.time() - t0:.1f}s)")
+    b = benchmark()
+    print(f"[SEED_BENCH] add_tick + 3 score(): originale {b['originale']:.1f}us "
+          f"incrementale {b['incrementale']:.1f}us (x{b['originale'] / b['incrementale']:.1f})")
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TEST TICK RING — memoria piatta su un flusso lungo
+═══════════════════════════════════════════════════════════════════════
+
+  Il punto di TickRing/Escursione e' la memoria costante: anello
+  preallocato, finestre che sono viste, tracker "fra N secondi" che
+  tengono solo hi/lo invece di una lista di prezzi per segnale.
+  Qui un flusso sintetico lungo passa come nel bot: push a ogni tick,
+  finestre lette a ogni tick, un tracker aperto ogni 2s e chiuso a
+  30/60/120s. Dopo il riscaldamento la memoria non deve crescere:
+  tracemalloc (byte Python + NumPy) e RSS del processo (/proc, Linux).
+
+  Controllo anche che l'escursione letta dall'anello sia quella della
+  lista completa dei prezzi (il modo di prima).
+
+  pytest test_tick_ring.py            (RING_TEST_TICK, default 100000)
+  python test_tick_ring.py [n_tick]
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import gc
+import time
+import random
+import heapq
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tick_ring import TickRing, RingWindow, Escursione
+
+CAPACITA   = 4096
+TPS        = 10                  # tick al secondo del flusso sintetico
+SCADENZE   = (30.0, 60.0, 120.0)
+APRI_OGNI  = 20                  # un tracker ogni 2s
+MAX_TRACEMALLOC = 256 * 1024     # byte di crescita tollerati dopo il riscaldamento
+MAX_RSS         = 4 * 1024 * 1024
+
+
+def flusso(n: int, seme: int = 5):
+    """(prezzo, qty, ts): passeggiata al cent, 10 tick/s."""
+    rnd = random.Random(seme)
+    p, ts = 79000.0, 1.75e9
+    for _ in range(n):
+        p = round(max(1000.0, p + rnd.gauss(0.0, 4.0)), 2)
+        ts += 1.0 / TPS
+        yield p, round(rnd.lognormvariate(-3, 1.5), 5), ts
+
+
+class Banco:
+    """Anello + finestre + tracker, alimentati come in _ingest_tick."""
+
+    def __init__(self):
+        self.ring     = TickRing(CAPACITA)
+        self.finestre = [RingWindow(self.ring, k) for k in (20, 50, 200)]
+        self.qty      = RingWindow(self.ring, 50, canale='qty', storia=False)
+        self.aperti   = {}           # id -> Escursione
+        self.scadenze = []           # heap (ts scadenza, id, ts0, prossima scadenza)
+        self.chiusi   = 0
+        self._id      = 0
+
+    def tick(self, p: float, q: float, ts: float):
+        self.ring.push(p, q, ts)
+        for w in self.finestre:
+            w.tolist()
+        self.qty.tolist()
+        if self.ring.n % APRI_OGNI == 0:
+            self._id += 1
+            self.aperti[self._id] = Escursione(self.ring, ts, p)
+            heapq.heappush(self.scadenze, (ts + SCADENZE[0], self._id, ts, 1))
+        while self.scadenze and self.scadenze[0][0] <= ts:
+            _, k, ts0, j = heapq.heappop(self.scadenze)
+            self.aperti[k].fino_a(ts, p)
+            if j < len(SCADENZE):
+                heapq.heappush(self.scadenze, (ts0 + SCADENZE[j], k, ts0, j + 1))
+            else:
+                del self.aperti[k]
+                self.chiusi += 1
+
+
+def rss() -> int:
+    """Memoria residente in byte (0 dove /proc non c'e')."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def misura(n: int) -> dict:
+    """Crescita di memoria fra fine riscaldamento e fine flusso."""
+    banco = Banco()
+    dati = flusso(n + 3 * CAPACITA)
+    # riscaldamento: anello pieno, tracker a regime, cache delle finestre
+    for _ in range(3 * CAPACITA):
+        banco.tick(*next(dati))
+    gc.collect()
+    tracemalloc.start()
+    t0_py, r0 = tracemalloc.get_traced_memory()[0], rss()
+    for p, q, ts in dati:
+        banco.tick(p, q, ts)
+    gc.collect()
+    t1_py, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'tick':        n,
+        'chiusi':      banco.chiusi,
+        'aperti':      len(banco.aperti),
+        'py_delta':    t1_py - t0_py,
+        'py_picco':    picco - t0_py,
+        'rss_delta':   rss() - r0 if r0 else 0,
+    }
+
+
+def test_memoria_piatta_su_flusso_lungo():
+    m = misura(int(os.environ.get("RING_TEST_TICK", "100000")))
+    # a regime i tracker aperti sono quelli degli ultimi 120s, non di tutto il flusso
+    assert m['aperti'] <= int(max(SCADENZE) * TPS / APRI_OGNI) + 1, m
+    assert m['chiusi'] > 0, m
+    assert m['py_delta'] < MAX_TRACEMALLOC, m
+    assert m['py_picco'] < MAX_TRACEMALLOC, m
+    assert m['rss_delta'] < MAX_RSS, m
+
+
+def test_escursione_come_lista_completa():
+    ring = TickRing(CAPACITA)
+    prezzi = {}                      # ts0 -> prezzi visti da ts0 (il modo di prima)
+    aperti = {}
+    for i, (p, q, ts) in enumerate(flusso(20000, seme=9)):
+        ring.push(p, q, ts)
+        for k in prezzi:
+            prezzi[k].append(p)
+        if i % 50 == 0:
+            aperti[ts] = Escursione(ring, ts, p)
+            prezzi[ts] = [p]
+        for ts0 in [k for k in aperti if ts - k >= 60.0]:
+            esc = aperti.pop(ts0)
+            esc.fino_a(ts, p)
+            lista = prezzi.pop(ts0)
+            assert esc.completo
+            assert (esc.hi, esc.lo) == (max(lista), min(lista)), ts0
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    t0 = time.time()
+    m = misura(n)
+    print(f"[RING_TEST] {m['tick']} tick ({time.time() - t0:.1f}s): tracker chiusi={m['chiusi']} "
+          f"aperti={m['aperti']} | tracemalloc delta={m['py_delta']}B picco={m['py_picco']}B "
+          f"| rss delta={m['rss_delta'] // 1024}KB")
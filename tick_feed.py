@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TICK FEED — ricezione WS separata dall'elaborazione del tick
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA (20giu, reconn=34 nei log):
+  on_message faceva TUTTO sul thread del websocket-client: json.loads,
+  i feeder (analyzer, seed_scorer, tsunami) e l'intero _process_tick.
+  Un tick lento = pong in ritardo = Binance chiude la connessione.
+  Nei burst EXPLOSIVE il keepalive moriva proprio quando serviva.
+
+SOLUZIONE:
+  Il thread WS RICEVE e basta: mette il frame grezzo in un anello a
+  dimensione fissa e torna subito a leggere il socket (pong puntuale).
+  Un thread consumatore dedicato svuota l'anello ed esegue il tick.
+
+  Se il consumatore resta indietro e l'anello si riempie, il frame PIU'
+  VECCHIO viene scartato (il prezzo nuovo vale piu' di quello vecchio).
+  Ogni scarto e' contato: niente perdite silenziose.
+
+ESPOSTO IN HEARTBEAT (chiave ws_ring):
+  depth / max_depth   — frame in coda ora / picco dall'avvio
+  overflow            — quante volte l'anello si e' riempito (episodi)
+  dropped             — frame scartati in totale
+  lag_ms / lag_max_ms — attesa in coda dell'ultimo frame / peggiore
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import time
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class FrameRing:
+    """
+    Anello a capacita' fissa per i frame grezzi del WS.
+
+    Un produttore (thread WS) e un consumatore (thread tick). Lo slot
+    array e' preallocato: push/pop non allocano, solo indici.
+    """
+
+    def __init__(self, capacity: int = 8192, on_drop=None):
+        self.capacity = max(2, int(capacity))
+        # on_drop(frame, recv_ts): chi vuole il frame scartato (es. il tick
+        # journal, che registra tutto cio' che arriva). Fuori dal lock.
+        self.on_drop  = on_drop
+        self._frames  = [None] * self.capacity
+        self._ts      = [0.0] * self.capacity
+        self._head    = 0      # prossimo slot da leggere
+        self._size    = 0
+        self._cond    = threading.Condition(threading.Lock())
+
+        # Contatori (letti dall'heartbeat, scritti sotto lock)
+        self.pushed     = 0
+        self.consumed   = 0
+        self.overflow   = 0    # episodi di anello pieno
+        self.dropped    = 0    # frame scartati
+        self.max_depth  = 0
+        self.lag_ms     = 0.0
+        self.lag_max_ms = 0.0
+        self._pieno     = False
+
+    def push(self, frame, recv_ts: float = None) -> bool:
+        """
+        Accoda un frame. Non blocca MAI il thread WS.
+        Ritorna False se per farci stare il frame e' stato scartato il piu' vecchio.
+        """
+        if recv_ts is None:
+            recv_ts = time.time()
+        scartato = None
+        with self._cond:
+            ok = True
+            if self._size == self.capacity:
+                # anello pieno: sovrascrivo il piu' vecchio
+                if not self._pieno:
+                    self._pieno = True
+                    self.overflow += 1
+                self.dropped += 1
+                scartato = (self._frames[self._head], self._ts[self._head])
+                self._head = (self._head + 1) % self.capacity
+                self._size -= 1
+                ok = False
+            else:
+                self._pieno = False
+            idx = (self._head + self._size) % self.capacity
+            self._frames[idx] = frame
+            self._ts[idx]     = recv_ts
+            self._size += 1
+            self.pushed += 1
+            if self._size > self.max_depth:
+                self.max_depth = self._size
+            self._cond.notify()
+        if scartato is not None and self.on_drop is not None:
+            try:
+                self.on_drop(*scartato)
+            except Exception as e:
+                log.debug(f"[WS_RING] on_drop: {e}")
+        return ok
+
+    def pop(self, timeout: float = 1.0):
+        """
+        Estrae il frame piu' vecchio come (frame, recv_ts).
+        Attende fino a timeout secondi; None se l'anello resta vuoto.
+        """
+        with self._cond:
+            if self._size == 0:
+                self._cond.wait(timeout)
+                if self._size == 0:
+                    return None
+            idx = self._head
+            frame, recv_ts = self._frames[idx], self._ts[idx]
+            self._frames[idx] = None
+            self._head = (self._head + 1) % self.capacity
+            self._size -= 1
+            self.consumed += 1
+            lag = (time.time() - recv_ts) * 1000.0
+            self.lag_ms = lag
+            if lag > self.lag_max_ms:
+                self.lag_max_ms = lag
+            return frame, recv_ts
+
+    def depth(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'depth':      self._size,
+                'capacity':   self.capacity,
+                'max_depth':  self.max_depth,
+                'pushed':     self.pushed,
+                'consumed':   self.consumed,
+                'overflow':   self.overflow,
+                'dropped':    self.dropped,
+                'lag_ms':     round(self.lag_ms, 1),
+                'lag_max_ms': round(self.lag_max_ms, 1),
+            }
+
+
+def start_consumer(ring: FrameRing, handler, name: str = "tick_consumer") -> threading.Thread:
+    """
+    Avvia il thread che svuota l'anello chiamando handler(frame, recv_ts).
+    Un'eccezione nell'handler viene loggata e il consumatore continua:
+    il thread non deve morire mai, altrimenti il bot resta cieco.
+    """
+    def _loop():
+        while True:
+            item = ring.pop(timeout=1.0)
+            if item is None:
+                continue
+            try:
+                handler(item[0], item[1])
+            except Exception as e:
+                log.error(f"[TICK_CONSUMER_ERR] {type(e).__name__}: {e}")
+
+    t = threading.Thread(target=_loop, daemon=True, name=name)
+    t.start()
+    return t
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# EVENT CLOCK — il tempo del tick e' quello dell'exchange, non del server
+# ═══════════════════════════════════════════════════════════════════════
+# Prima ogni organo timbrava con time.time(): con la coda piena o il
+# thread lento, candele e finestre 30/60/120s scivolavano insieme al
+# ritardo di elaborazione. Ora il consumatore, PRIMA di passare il tick
+# agli organi, fa avanzare l'orologio al timestamp aggTrade (T, o E in
+# mancanza). Tutti gli organi del tick leggono clock.now().
+#
+# now() e' monotono: un timestamp exchange che torna indietro non fa
+# tornare indietro le finestre.
+# In modalita' virtuale (replay) now() non ripiega MAI sull'orologio di
+# sistema: il tempo esiste solo se lo porta un tick.
+# ═══════════════════════════════════════════════════════════════════════
+
+class EventClock:
+    """Orologio a tempo-evento condiviso dagli organi del tick."""
+
+    def __init__(self, virtual: bool = False):
+        self.virtual    = virtual
+        self._event_ts  = None    # secondi epoch del tick corrente
+        self._recv_ts   = None    # quando il frame e' arrivato al server
+        # Latenze (ms): exchange→ricezione e exchange→fine decisione
+        self.n_ticks         = 0
+        self.recv_lag_ms     = 0.0
+        self.decision_lag_ms = 0.0
+        self.decision_lag_max_ms = 0.0
+        self._decision_lag_sum   = 0.0
+        self._decision_lag_n     = 0     # campioni veri: non ogni tick ne ha uno
+
+    def advance(self, event_ts: float, recv_ts: float = None):
+        """Porta l'orologio al timestamp exchange del nuovo tick (secondi)."""
+        if event_ts is None:
+            return
+        if self._event_ts is None or event_ts > self._event_ts:
+            self._event_ts = event_ts
+        self._recv_ts = recv_ts
+        self.n_ticks += 1
+        if recv_ts is not None:
+            self.recv_lag_ms = (recv_ts - event_ts) * 1000.0
+
+    def now(self) -> float:
+        if self._event_ts is None:
+            return 0.0 if self.virtual else time.time()
+        return self._event_ts
+
+    def mark_decision(self):
+        """Chiamato a fine tick: misura exchange→decisione sul tempo reale."""
+        if self._event_ts is None or self.virtual:
+            return
+        lag = (time.time() - self._event_ts) * 1000.0
+        self.decision_lag_ms = lag
+        self._decision_lag_sum += lag
+        self._decision_lag_n += 1
+        if lag > self.decision_lag_max_ms:
+            self.decision_lag_max_ms = lag
+
+    def stats(self) -> dict:
+        n = max(1, self._decision_lag_n)
+        return {
+            'event_ts':             self._event_ts,
+            'virtual':              self.virtual,
+            'n_ticks':              self.n_ticks,
+            'recv_lag_ms':          round(self.recv_lag_ms, 1),
+            'decision_lag_ms':      round(self.decision_lag_ms, 1),
+            'decision_lag_avg_ms':  round(self._decision_lag_sum / n, 1),
+            'decision_lag_max_ms':  round(self.decision_lag_max_ms, 1),
+        }
+
+
+def aggtrade_event_ts(data: dict):
+    """Timestamp exchange (secondi) di un frame aggTrade: T, altrimenti E."""
+    ms = data.get('T') or data.get('E')
+    try:
+        return float(ms) / 1000.0 if ms else None
+    except (TypeError, ValueError):
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# KLINE PREFETCHER — conferma remota di CAMPO_ESTERNO fuori dal tick
+# ═══════════════════════════════════════════════════════════════════════
+# CAMPO_ESTERNO chiamava /api/v3/klines in linea, timeout 3s, proprio
+# nell'istante dell'entrata: tutto il tick fermo ad aspettare Binance.
+# Ora le chiusure 1m arrivano dalle candele locali (CandelaAggregator).
+# Se serve ancora il dato dell'exchange, questo thread tiene in cache
+# l'ultima risposta: il gate legge la cache in O(1) e la scarta se e'
+# piu' vecchia di max_age (fail-open: niente cache = nessun veto).
+# ═══════════════════════════════════════════════════════════════════════
+
+class KlinePrefetcher:
+    """Scarica le ultime kline ogni every_s secondi su un thread suo."""
+
+    URL = "https://api.binance.com/api/v3/klines"
+
+    def __init__(self, symbol: str = "BTCUSDC", interval: str = "1m",
+                 limit: int = 6, every_s: float = 10.0, timeout: float = 3.0):
+        self.symbol   = symbol
+        self.interval = interval
+        self.limit    = limit
+        self.every_s  = every_s
+        self.timeout  = timeout
+        self._closes  = None     # tupla immutabile: lettura senza lock
+        self._ts      = None     # time.time() dell'ultima risposta buona
+        self.fetches  = 0
+        self.errors   = 0
+        self.last_err = None
+        self._thread  = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="kline_prefetch")
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.fetch()
+            except Exception as e:
+                self.errors += 1
+                self.last_err = f"{type(e).__name__}: {e}"
+            time.sleep(self.every_s)
+
+    def fetch(self):
+        import json
+        import urllib.request, urllib.parse
+        q = urllib.parse.urlencode({"symbol": self.symbol, "interval": self.interval,
+                                    "limit": self.limit})
+        with urllib.request.urlopen(f"{self.URL}?{q}", timeout=self.timeout) as r:
+            klines = json.loads(r.read())
+        self._closes = tuple(float(k[4]) for k in klines)
+        self._ts = time.time()
+        self.fetches += 1
+
+    def age(self):
+        """Secondi dall'ultima risposta buona (None = mai arrivata)."""
+        return None if self._ts is None else time.time() - self._ts
+
+    def get(self, max_age_s: float = 90.0):
+        """Chiusure in cache, o None se assenti o piu' vecchie di max_age_s."""
+        closes, ts = self._closes, self._ts
+        if closes is None or ts is None or time.time() - ts > max_age_s:
+            return None
+        return list(closes)
+
+    def stats(self) -> dict:
+        a = self.age()
+        return {
+            'age_s':    round(a, 1) if a is not None else None,
+            'n':        len(self._closes) if self._closes else 0,
+            'fetches':  self.fetches,
+            'errors':   self.errors,
+            'last_err': self.last_err,
+        }
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TICK JOURNAL — registro binario append-only di ogni aggTrade ricevuto
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  on_message leggeva il tick e lo buttava. Ogni simula*.py doveva
+  riscaricare kline 1m da api.binance.com per indovinare cosa aveva
+  visto il bot. Niente replay esatto, niente studi a risoluzione tick.
+
+SOLUZIONE:
+  Ogni aggTrade finisce in un file binario a record fissi, uno per ora
+  (UTC, dal timestamp exchange):  <dir>/ticks_YYYYMMDD_HH.bin
+
+  Il thread del tick fa solo append() su una deque (nessun I/O).
+  Un thread writer svuota la deque ogni FLUSH_S e scrive nel file
+  mappato in memoria (mmap), crescendo a blocchi preallocati.
+
+FORMATO (little-endian):
+  header 64 byte:  magic 'OVTJ' | version u4 | record_size u4 | count u8
+  record 40 byte:  event_ts f8 | trade_id i8 | price f8 | qty f8 |
+                   is_buyer_maker u1 | pad 7
+  count e' aggiornato DOPO i record: un lettore vede sempre un prefisso
+  completo, anche mentre il writer sta scrivendo.
+
+LETTURA (zero-copy):
+  JournalReader(path).array()  → ndarray strutturato sopra il mmap
+                                  (memoryview se NumPy non c'e')
+  iter_journal(dir, t0, t1)    → tuple (event_ts, trade_id, price, qty, m)
+
+ENV:
+  TICK_JOURNAL_OFF=true   spegne il registro
+  TICK_JOURNAL_DIR        cartella (default: accanto al DB, /ticks)
+  TICK_JOURNAL_KEEP_H     ore di file tenuti su disco (default 72, 0 = tutti)
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import glob
+import mmap
+import time
+import struct
+import threading
+import logging
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+    _NP_OK = True
+except ImportError:
+    np = None
+    _NP_OK = False
+
+log = logging.getLogger(__name__)
+
+MAGIC        = b'OVTJ'
+VERSION      = 1
+HEADER_SIZE  = 64
+RECORD       = struct.Struct('<dqddB7x')     # event_ts, trade_id, price, qty, m
+RECORD_SIZE  = RECORD.size                   # 40
+_HEADER      = struct.Struct('<4sIIQ')       # magic, version, record_size, count
+GROW_RECORDS = 65536                          # crescita file: ~2.6MB per blocco
+
+if _NP_OK:
+    TICK_DTYPE = np.dtype([
+        ('event_ts',       '<f8'),
+        ('trade_id',       '<i8'),
+        ('price',          '<f8'),
+        ('qty',            '<f8'),
+        ('is_buyer_maker', 'u1'),
+        ('_pad',           'V7'),
+    ])
+else:
+    TICK_DTYPE = None
+
+
+def hour_key(event_ts: float) -> str:
+    return datetime.fromtimestamp(event_ts, tz=timezone.utc).strftime('%Y%m%d_%H')
+
+
+def journal_path(directory: str, event_ts: float) -> str:
+    return os.path.join(directory, f"ticks_{hour_key(event_ts)}.bin")
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# WRITER
+# ═══════════════════════════════════════════════════════════════════════
+
+class _HourFile:
+    """Un file orario mappato in memoria, aperto in append."""
+
+    def __init__(self, path: str):
+        self.path = path
+        nuovo = not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE
+        self._fd = open(path, 'r+b' if not nuovo else 'w+b')
+        if nuovo:
+            self._fd.write(_HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0).ljust(HEADER_SIZE, b'\0'))
+            self._fd.truncate(HEADER_SIZE + GROW_RECORDS * RECORD_SIZE)
+            self._fd.flush()
+        self._mm = mmap.mmap(self._fd.fileno(), 0)
+        magic, ver, rsize, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or rsize != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"journal non valido: {path}")
+        self.count = count
+
+    def _capacity(self) -> int:
+        return (len(self._mm) - HEADER_SIZE) // RECORD_SIZE
+
+    def append_many(self, rows):
+        need = self.count + len(rows)
+        if need > self._capacity():
+            nuovi = ((need // GROW_RECORDS) + 1) * GROW_RECORDS
+            self._mm.close()
+            self._fd.truncate(HEADER_SIZE + nuovi * RECORD_SIZE)
+            self._mm = mmap.mmap(self._fd.fileno(), 0)
+        off = HEADER_SIZE + self.count * RECORD_SIZE
+        for r in rows:
+            RECORD.pack_into(self._mm, off, *r)
+            off += RECORD_SIZE
+        self.count = need
+        # count per ultimo: il lettore non vede mai record a meta'
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD_SIZE, self.count)
+
+    def close(self):
+        try:
+            self._mm.flush()
+            self._mm.close()
+        except Exception:
+            pass
+        try:
+            # taglio la coda preallocata: su disco resta solo il pieno
+            self._fd.truncate(HEADER_SIZE + self.count * RECORD_SIZE)
+            self._fd.close()
+        except Exception:
+            pass
+
+
+class TickJournal:
+    """
+    Registro sempre acceso. append() e' O(1) e non tocca il disco:
+    il thread tick_journal scrive a blocchi fuori dal percorso caldo.
+    """
+
+    FLUSH_S = 0.25
+
+    def __init__(self, directory: str, keep_hours: int = 72):
+        self.directory  = directory
+        self.keep_hours = keep_hours
+        os.makedirs(directory, exist_ok=True)
+        self._pending   = deque()
+        self._file      = None
+        self._hour      = None
+        self._lock      = threading.Lock()   # serializza flush/close
+        self.written    = 0
+        self.errors     = 0
+        self.files_open = 0
+        self._stop      = False
+        self._thread    = threading.Thread(target=self._loop, daemon=True, name="tick_journal")
+        self._thread.start()
+
+    def append(self, event_ts: float, trade_id, price: float, qty: float, is_buyer_maker) -> None:
+        # deque.append e' atomica: nessun lock sul thread del tick
+        self._pending.append((float(event_ts), int(trade_id or 0), float(price),
+                              float(qty), 1 if is_buyer_maker else 0))
+
+    def _loop(self):
+        while not self._stop:
+            time.sleep(self.FLUSH_S)
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                log.error(f"[TICK_JOURNAL_ERR] {type(e).__name__}: {e}")
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            # raggruppa per ora: una rotazione puo' cadere in mezzo al batch
+            start = 0
+            for i in range(1, len(batch) + 1):
+                if i == len(batch) or int(batch[i][0] // 3600) != int(batch[start][0] // 3600):
+                    self._file_for(batch[start][0]).append_many(batch[start:i])
+                    self.written += i - start
+                    start = i
+
+    def _file_for(self, event_ts: float) -> _HourFile:
+        hk = hour_key(event_ts)
+        if hk != self._hour or self._file is None:
+            if self._file is not None:
+                self._file.close()
+            self._file = _HourFile(journal_path(self.directory, event_ts))
+            self._hour = hk
+            self.files_open += 1
+            self._prune()
+        return self._file
+
+    def _prune(self):
+        if self.keep_hours <= 0:
+            return
+        limite = time.time() - self.keep_hours * 3600
+        for p in glob.glob(os.path.join(self.directory, 'ticks_*.bin')):
+            try:
+                if os.path.getmtime(p) < limite:
+                    os.remove(p)
+            except Exception:
+                pass
+
+    def close(self):
+        self._stop = True
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            'dir':      self.directory,
+            'hour':     self._hour,
+            'written':  self.written,
+            'pending':  len(self._pending),
+            'errors':   self.errors,
+            'rotations': self.files_open,
+        }
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# READER
+# ═══════════════════════════════════════════════════════════════════════
+
+class JournalReader:
+    """Lettura zero-copy di un file orario (anche mentre viene scritto)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd  = open(path, 'rb')
+        self._mm  = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, ver, rsize, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or rsize != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"journal non valido: {path}")
+        # un file chiuso male puo' avere count > dati: tengo il minimo
+        self.count = min(count, (len(self._mm) - HEADER_SIZE) // RECORD_SIZE)
+
+    def memoryview(self) -> memoryview:
+        """Record grezzi (count * 40 byte) senza copia."""
+        return memoryview(self._mm)[HEADER_SIZE:HEADER_SIZE + self.count * RECORD_SIZE]
+
+    def array(self):
+        """ndarray strutturato TICK_DTYPE sopra il mmap (nessuna copia)."""
+        if not _NP_OK:
+            return self.memoryview()
+        return np.frombuffer(self._mm, dtype=TICK_DTYPE, count=self.count, offset=HEADER_SIZE)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for rec in RECORD.iter_unpack(self.memoryview()):
+            yield rec
+
+    def close(self):
+        try:
+            self._mm.close()
+        except (BufferError, Exception):
+            # ndarray/memoryview ancora vivi: il mmap si chiude con loro
+            pass
+        try:
+            self._fd.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        self.close()
+
+
+def journal_files(directory: str, t0: float = None, t1: float = None) -> list:
+    """File orari in ordine cronologico, filtrati sull'intervallo [t0, t1]."""
+    files = sorted(glob.glob(os.path.join(directory, 'ticks_*.bin')))
+    if t0 is not None:
+        files = [f for f in files if os.path.basename(f)[6:17] >= hour_key(t0)]
+    if t1 is not None:
+        files = [f for f in files if os.path.basename(f)[6:17] <= hour_key(t1)]
+    return files
+
+
+def iter_journal(directory: str, t0: float = None, t1: float = None):
+    """Tutti i tick (event_ts, trade_id, price, qty, is_buyer_maker) in ordine."""
+    for path in journal_files(directory, t0, t1):
+        r = JournalReader(path)
+        try:
+            for rec in r:
+                if t0 is not None and rec[0] < t0:
+                    continue
+                if t1 is not None and rec[0] > t1:
+                    return
+                yield rec
+        finally:
+            r.close()
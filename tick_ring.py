@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TICK RING — un solo anello prezzo/qty/ts condiviso da tutti gli organi
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  Lo stesso flusso di prezzi era copiato in una dozzina di deque
+  (ContestoAnalyzer, MomentumDecelerometer, CampoGravitazionale short/
+  long/volumi, _pt_storico, ...), ognuna alimentata in un punto diverso
+  di _process_tick_body e convertita in lista a ogni lettura. Un'
+  eccezione a meta' tick lasciava alcune deque indietro di un tick
+  rispetto ad altre: organi che guardavano finestre diverse.
+
+SOLUZIONE:
+  TickRing: tre array float64 preallocati (price, qty, ts) scritti UNA
+  volta per tick, in _ingest_tick, prima di qualunque organo.
+  Ogni valore e' scritto due volte (slot i e i+capacity): qualunque
+  finestra degli ultimi k <= capacity tick e' una fetta contigua, quindi
+  una vista NumPy senza copia.
+
+  RingWindow: la "deque" che l'organo vede — ultimi k valori di un
+  canale. Supporta len(), list(), iterazione, indici e bool come la
+  deque che sostituisce; tolist() e' calcolato una volta per tick.
+
+  Storia ripristinata dal DB (seed) entra nell'anello come prezzi
+  senza qty/ts: le finestre con storia=False non la vedono.
+
+  since/escursione/campiona + Escursione: i tracker "fra N secondi"
+  chiedono all'anello max/min e percorso dal loro ts, invece di
+  copiarsi ogni prezzo in una lista per segnale.
+
+Senza NumPy l'anello usa array('d'): stesse finestre, fette copiate.
+
+Memoria piatta su un flusso lungo (anello + finestre + tracker):
+test_tick_ring.py.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+    _NP_OK = True
+except ImportError:
+    np = None
+    _NP_OK = False
+
+CANALI = ('price', 'qty', 'ts')
+
+
+class TickRing:
+    """Anello a capacita' fissa, un produttore (il thread del tick)."""
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = max(2, int(capacity))
+        doppio = 2 * self.capacity
+        if _NP_OK:
+            self._buf = {c: np.zeros(doppio, dtype=np.float64) for c in CANALI}
+        else:
+            self._buf = {c: array('d', bytes(8 * doppio)) for c in CANALI}
+        self.n      = 0    # tick scritti in totale (seed compreso)
+        self.seeded = 0    # di cui ripristinati con seed()
+
+    def push(self, price: float, qty: float, ts: float):
+        C = self.capacity
+        i = self.n % C
+        b = self._buf
+        b['price'][i] = b['price'][i + C] = price
+        b['qty'][i]   = b['qty'][i + C]   = qty
+        b['ts'][i]    = b['ts'][i + C]    = ts
+        self.n += 1
+
+    def seed(self, prices):
+        """Storia prezzi da DB al boot (qty=0, ts=0), prima dei tick veri."""
+        for p in prices:
+            self.push(float(p), 0.0, 0.0)
+            self.seeded += 1
+
+    def __len__(self):
+        return min(self.n, self.capacity)
+
+    def last(self, canale: str = 'price'):
+        if self.n == 0:
+            return None
+        return float(self._buf[canale][(self.n - 1) % self.capacity])
+
+    def window(self, canale: str, k: int):
+        """
+        Ultimi k valori del canale, dal piu' vecchio al piu' nuovo.
+        ndarray senza copia (array('d') copiato senza NumPy).
+        """
+        C = self.capacity
+        m = min(int(k), self.n, C)
+        fine = (self.n - 1) % C + C + 1
+        return self._buf[canale][fine - m:fine]
+
+    def since(self, ts0: float, canale: str = 'price'):
+        """
+        Valori del canale dei tick con ts >= ts0, e se l'anello arriva
+        indietro fino a ts0 (False = i tick piu' vecchi sono gia' sovrascritti).
+        """
+        tsw = self.window('ts', self.capacity)
+        i = int(np.searchsorted(tsw, ts0, side='left')) if _NP_OK else bisect_left(tsw, ts0)
+        completo = i > 0 or self.n <= self.capacity
+        return self.window(canale, len(tsw) - i), completo
+
+    def escursione(self, ts0: float):
+        """(massimo, minimo, completo) dei prezzi da ts0; (None, None, ...) se nessun tick."""
+        w, completo = self.since(ts0)
+        if len(w) == 0:
+            return None, None, completo
+        if _NP_OK:
+            return float(w.max()), float(w.min()), completo
+        return max(w), min(w), completo
+
+    def campiona(self, ts0: float, passo: float, n: int) -> list:
+        """
+        Percorso a risoluzione fissa: prezzo dell'ultimo tick con
+        ts <= ts0 + k*passo, k = 1..n. None dove l'anello non arriva.
+        """
+        tsw = self.window('ts', self.capacity)
+        pw  = self.window('price', self.capacity)
+        out = []
+        for k in range(1, n + 1):
+            t = ts0 + k * passo
+            j = (int(np.searchsorted(tsw, t, side='right')) if _NP_OK
+                 else bisect_right(tsw, t)) - 1
+            out.append(round(float(pw[j]), 2) if j >= 0 else None)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'n':        self.n,
+            'seeded':   self.seeded,
+            'numpy':    _NP_OK,
+        }
+
+
+class RingWindow:
+    """
+    Vista "come una deque(maxlen=k)" su un canale dell'anello.
+    Sola lettura: a scrivere e' solo TickRing.push in _ingest_tick.
+    """
+
+    __slots__ = ('ring', 'k', 'canale', 'storia', '_cache_n', '_cache')
+
+    def __init__(self, ring: TickRing, k: int, canale: str = 'price', storia: bool = True):
+        if k > ring.capacity:
+            raise ValueError(f"finestra {k} > capacita' anello {ring.capacity}")
+        self.ring     = ring
+        self.k        = k
+        self.canale   = canale
+        self.storia   = storia     # False: ignora i valori del seed
+        self._cache_n = -1
+        self._cache   = []
+
+    @property
+    def maxlen(self) -> int:
+        return self.k
+
+    def __len__(self):
+        disponibili = self.ring.n if self.storia else self.ring.n - self.ring.seeded
+        return max(0, min(self.k, disponibili, self.ring.capacity))
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def array(self):
+        """Vista NumPy (senza copia) per chi calcola vettoriale."""
+        return self.ring.window(self.canale, len(self))
+
+    def tolist(self) -> list:
+        # una conversione per tick, poi riuso
+        if self._cache_n != self.ring.n:
+            self._cache   = self.array().tolist()
+            self._cache_n = self.ring.n
+        return self._cache
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __reversed__(self):
+        return reversed(self.tolist())
+
+    def __getitem__(self, i):
+        return self.tolist()[i]
+
+    def __repr__(self):
+        return f"RingWindow({self.canale}, k={self.k}, len={len(self)})"
+
+
+class Escursione:
+    """
+    Massimo e minimo del prezzo da un istante in poi, a memoria costante.
+    Con l'anello il tratto [t, now] si legge a ogni scadenza (fino_a);
+    senza, chi scorre i tick chiama tick(price) e il risultato e' lo stesso.
+    """
+
+    __slots__ = ('ring', 'hi', 'lo', 't', 'completo')
+
+    def __init__(self, ring, ts0: float, price: float, completo: bool = True):
+        self.ring     = ring
+        self.hi       = price
+        self.lo       = price
+        self.t        = ts0
+        self.completo = completo    # False: qualche tratto non e' stato visto
+
+    def tick(self, price: float):
+        if price > self.hi:
+            self.hi = price
+        elif price < self.lo:
+            self.lo = price
+
+    def fino_a(self, now: float, price: float):
+        """Porta l'escursione a now (prezzo di now compreso)."""
+        if self.ring is not None:
+            hi, lo, completo = self.ring.escursione(self.t)
+            if hi is not None:
+                self.tick(hi)
+                self.tick(lo)
+            self.completo = self.completo and completo
+        self.tick(price)
+        self.t = now
+
+    def mfe_mae(self, entry: float, direction: str):
+        """Movimento favorevole massimo e avverso massimo ($, mae <= 0)."""
+        if direction == 'LONG':
+            return round(self.hi - entry, 2), round(self.lo - entry, 2)
+        return round(entry - self.lo, 2), round(entry - self.hi, 2)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ TIMING WHEEL — "richiamami fra N secondi" sul tempo dei tick
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  PreTradeSignalTracker, VeritatisTracker, PredittoreContestuale,
+  OracoloDinamico (post-trade), LibroPesca e il campionatore dei primi
+  secondi scorrevano OGNI tick TUTTI gli elementi aperti solo per
+  scoprire se erano passati 30/60/120s. Costo per tick = elementi
+  aperti, da qui i tetti tipo MAX_OPEN = 20.
+
+SOLUZIONE:
+  Una ruota gerarchica (Varghese & Lauck) condivisa, sul tempo evento
+  (EventClock). Un organo registra una scadenza con schedule(); al
+  primo tick con now >= scadenza la ruota chiama cb(now, price, *args)
+  con il prezzo di quel tick. Costo per tick = scadenze dovute + una
+  fetta della ruota, non elementi aperti.
+
+  Livello 0: SLOTS fette da RES secondi (256 x 0.25s = 64s).
+  Livello k: fette larghe RES * SLOTS**k. Quando il livello 0 fa il
+  giro, la fetta corrispondente del livello 1 ricade verso il basso.
+  4 livelli x 8 bit = 2**32 fette: decenni, nessuna coda di overflow.
+
+  Esattezza: una fetta copre [t, t+RES). Gli elementi della fetta del
+  tick corrente non ancora dovuti aspettano in _pronti, controllati
+  uno per uno: si scatta a now >= scadenza, non a fetta raggiunta.
+  Stessa scadenza → ordine di registrazione.
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Timer:
+    """Una scadenza registrata. cancel() la spegne senza toglierla dalla ruota."""
+
+    __slots__ = ('deadline', 'cb', 'args', 'attivo')
+
+    def __init__(self, deadline, cb, args):
+        self.deadline = deadline
+        self.cb       = cb
+        self.args     = args
+        self.attivo   = True
+
+    def cancel(self):
+        self.attivo = False
+
+
+class TimingWheel:
+    """Ruota gerarchica a tempo evento. Un solo thread: quello del tick."""
+
+    def __init__(self, res: float = 0.25, bits: int = 8, livelli: int = 4):
+        self.res     = res
+        self.bits    = bits
+        self.slots   = 1 << bits
+        self.mask    = self.slots - 1
+        self.livelli = livelli
+        self._ruota  = [[[] for _ in range(self.slots)] for _ in range(livelli)]
+        self._pronti = []        # fetta gia' raggiunta: controllo per scadenza
+        self._t      = None      # ultima fetta di livello 0 elaborata
+        self.now     = None      # tempo evento dell'ultimo advance()
+        self.n       = 0         # timer in ruota (cancellati compresi)
+        self.fired   = 0
+        self.errors  = 0
+        self.last_err = None
+
+    def schedule(self, deadline: float, cb, *args) -> Timer:
+        """cb(now, price, *args) al primo tick con now >= deadline."""
+        tm = Timer(deadline, cb, args)
+        self._inserisci(tm)
+        self.n += 1
+        return tm
+
+    def _inserisci(self, tm: Timer):
+        d = int(tm.deadline // self.res)
+        if self._t is None or d <= self._t:
+            self._pronti.append(tm)
+            return
+        delta = d - self._t
+        for k in range(self.livelli):
+            if delta < (1 << (self.bits * (k + 1))) or k == self.livelli - 1:
+                self._ruota[k][(d >> (self.bits * k)) & self.mask].append(tm)
+                return
+
+    def _scatta(self, tm: Timer, now: float, price: float):
+        self.n -= 1
+        if not tm.attivo:
+            return
+        self.fired += 1
+        try:
+            tm.cb(now, price, *tm.args)
+        except Exception as e:
+            # un organo che sbaglia non ferma gli altri ne' il tick
+            self.errors += 1
+            self.last_err = f"{type(e).__name__}: {e}"
+            log.debug(f"[TIMING_WHEEL_ERR] {self.last_err}")
+
+    def advance(self, now: float, price: float):
+        """Porta la ruota a now e fa scattare tutto cio' che e' dovuto."""
+        self.now = now
+        target = int(now // self.res)
+        if self._t is None:
+            self._t = target
+        elif target > self._t:
+            if self.n == len(self._pronti):
+                # ruota vuota: salto diretto, niente giro a vuoto sulle fette
+                self._t = target
+            else:
+                while self._t < target:
+                    self._t += 1
+                    t = self._t
+                    if t & self.mask == 0:
+                        self._cascata(t)
+                    fetta = self._ruota[0][t & self.mask]
+                    if fetta:
+                        self._ruota[0][t & self.mask] = []
+                        self._pronti.extend(fetta)
+                    if len(self._pronti) > 0 and t < target:
+                        self._svuota_pronti(now, price)
+        if self._pronti:
+            self._svuota_pronti(now, price)
+
+    def _svuota_pronti(self, now: float, price: float):
+        pronti, attesa = self._pronti, []
+        self._pronti = attesa
+        for tm in pronti:
+            if tm.deadline <= now:
+                self._scatta(tm, now, price)
+            else:
+                attesa.append(tm)
+        # scadenze registrate dai cb e gia' dovute scattano al prossimo tick
+
+    def _cascata(self, t: int):
+        for k in range(1, self.livelli):
+            idx = (t >> (self.bits * k)) & self.mask
+            fetta = self._ruota[k][idx]
+            if fetta:
+                self._ruota[k][idx] = []
+                for tm in fetta:
+                    self._inserisci(tm)
+            if idx != 0:
+                break
+
+    def __len__(self):
+        return self.n
+
+    def stats(self) -> dict:
+        return {
+            'aperti':   self.n,
+            'pronti':   len(self._pronti),
+            'fired':    self.fired,
+            'errors':   self.errors,
+            'last_err': self.last_err,
+            'res_s':    self.res,
+            'now':      self.now,
+        }
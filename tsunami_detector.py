@@ -22,7 +22,7 @@ ARCHITETTURA:
   Una SCHIUMA appare solo alla scala più piccola.
 
 3 MODULI:
-  1. CandelaAggregator    — costruisce candele OHLCV virtuali
+  1. CandelaAggregator    — costruisce candele OHLCV virtuali (motore_candele)
   2. TsunamiDetector      — misura forza fisica su candele
   3. TsunamiGate          — concordanza multi-scala → verdetto
 
@@ -34,166 +34,87 @@ INTEGRAZIONE:
 ═══════════════════════════════════════════════════════════════════════════
 """
 
+import os
 import time
 import math
 import logging
-from collections import deque
 from dataclasses import dataclass, field
 from typing import Optional
 
+from motore_candele import Candela, MotoreCandele, parse_timeframe
+
 log = logging.getLogger(__name__)
 
 
 # ═══════════════════════════════════════════════════════════════════════════
 # MODULO 1: CandelaAggregator
 # ═══════════════════════════════════════════════════════════════════════════
+# Candela e il motore a colonne stanno in motore_candele.py (Candela
+# resta importabile da qui). Qui restano i timeframe di Tsunami e i nomi
+# che il resto del bot usa.
 
-@dataclass
-class Candela:
-    """Una candela OHLCV virtuale (aggregata da tick)."""
-    timestamp_start: float
-    open:   float
-    high:   float
-    low:    float
-    close:  float
-    volume: float
-    n_tick: int  # numero di tick aggregati
-    
-    def to_dict(self):
-        return {
-            'ts': self.timestamp_start,
-            'o':  round(self.open, 2),
-            'h':  round(self.high, 2),
-            'l':  round(self.low, 2),
-            'c':  round(self.close, 2),
-            'v':  round(self.volume, 4),
-            'n':  self.n_tick,
-        }
-    
-    @classmethod
-    def from_dict(cls, d):
-        return cls(
-            timestamp_start=d['ts'],
-            open=d['o'], high=d['h'], low=d['l'], close=d['c'],
-            volume=d['v'], n_tick=d['n'],
-        )
-
-
-class CandelaAggregator:
+class CandelaAggregator(MotoreCandele):
     """
-    Aggrega tick in candele virtuali su 3 timeframes.
+    Aggrega tick in candele virtuali: i 3 timeframe di Tsunami piu' l'1m.
     Ogni tick aggiorna la candela corrente; quando il tempo della candela
-    scade, la archivia e ne apre una nuova.
+    scade, la archivia e ne apre una nuova (e lo dice: su_chiusura).
+
+    Timeframe in piu' da env CANDELE_TF, es. "1s:120,5min:48,1h:24".
     """
     
-    # Configurazione 3 timeframes (in secondi)
+    # Configurazione timeframes (in secondi)
     TF_30S  = 30
     TF_2MIN = 120
     TF_10MIN = 600
+    # 1 minuto: stesse candele delle kline 1m Binance, per CAMPO_ESTERNO
+    # (prima le scaricava via HTTP sul thread del tick, fino a 3s)
+    TF_1MIN = 60
     
     # Quante candele storiche tenere per timeframe
     HIST_30S  = 30   # 15 minuti
     HIST_2MIN = 30   # 1 ora
     HIST_10MIN = 30  # 5 ore
+    HIST_1MIN = 60   # 1 ora: 6 della finestra + 30 di baseline volume (features_1m)
     
-    def __init__(self):
-        # Candele archiviate (storiche) per timeframe
-        self.candele_30s   = deque(maxlen=self.HIST_30S)
-        self.candele_2min  = deque(maxlen=self.HIST_2MIN)
-        self.candele_10min = deque(maxlen=self.HIST_10MIN)
-        
-        # Candele correnti (in costruzione)
-        self._current_30s:   Optional[Candela] = None
-        self._current_2min:  Optional[Candela] = None
-        self._current_10min: Optional[Candela] = None
+    def __init__(self, extra: Optional[dict] = None):
+        tf = {'30s': self.HIST_30S, '2min': self.HIST_2MIN,
+              '10min': self.HIST_10MIN, '1min': self.HIST_1MIN}
+        if extra is None:
+            extra = parse_timeframe(os.environ.get("CANDELE_TF", ""))
+        for nome, storia in extra.items():
+            tf[nome] = max(storia, tf.get(nome, 0))
+        super().__init__(tf)
     
-    def feed_tick(self, price: float, volume: float = 1.0, ts: Optional[float] = None):
-        """Aggiorna le 3 candele correnti con un nuovo tick."""
-        if ts is None:
-            ts = time.time()
-        
-        self._update_candela(price, volume, ts, self.TF_30S,   '_current_30s',   self.candele_30s)
-        self._update_candela(price, volume, ts, self.TF_2MIN,  '_current_2min',  self.candele_2min)
-        self._update_candela(price, volume, ts, self.TF_10MIN, '_current_10min', self.candele_10min)
+    # nomi storici: liste delle candele archiviate
+    @property
+    def candele_30s(self) -> list:
+        return self.get_candele('30s')
     
-    def _update_candela(self, price: float, volume: float, ts: float,
-                        tf_seconds: int, current_attr: str, archive: deque):
-        """Aggiorna o ruota la candela del timeframe specificato."""
-        current = getattr(self, current_attr)
-        
-        # Calcola l'inizio della candela teorica per questo tick
-        tf_start = (int(ts) // tf_seconds) * tf_seconds
-        
-        if current is None:
-            # Prima candela
-            setattr(self, current_attr, Candela(
-                timestamp_start=tf_start,
-                open=price, high=price, low=price, close=price,
-                volume=volume, n_tick=1,
-            ))
-            return
-        
-        if tf_start != current.timestamp_start:
-            # La candela corrente è scaduta → archivia e apri nuova
-            archive.append(current)
-            setattr(self, current_attr, Candela(
-                timestamp_start=tf_start,
-                open=price, high=price, low=price, close=price,
-                volume=volume, n_tick=1,
-            ))
-        else:
-            # Aggiorna la candela corrente
-            current.high = max(current.high, price)
-            current.low = min(current.low, price)
-            current.close = price
-            current.volume += volume
-            current.n_tick += 1
+    @property
+    def candele_2min(self) -> list:
+        return self.get_candele('2min')
     
-    def get_candele(self, timeframe: str) -> list:
-        """Restituisce le candele archiviate del timeframe richiesto."""
-        if timeframe == '30s':
-            return list(self.candele_30s)
-        elif timeframe == '2min':
-            return list(self.candele_2min)
-        elif timeframe == '10min':
-            return list(self.candele_10min)
-        else:
-            return []
+    @property
+    def candele_10min(self) -> list:
+        return self.get_candele('10min')
     
-    def status(self) -> dict:
-        """Stato attuale dei buffer per dashboard."""
-        return {
-            '30s':   {'archiviate': len(self.candele_30s),   'current': self._current_30s.to_dict()   if self._current_30s   else None},
-            '2min':  {'archiviate': len(self.candele_2min),  'current': self._current_2min.to_dict()  if self._current_2min  else None},
-            '10min': {'archiviate': len(self.candele_10min), 'current': self._current_10min.to_dict() if self._current_10min else None},
-        }
+    @property
+    def candele_1min(self) -> list:
+        return self.get_candele('1min')
     
-    # ── PERSISTENZA ─────────────────────────────────────────────────────
+    def closes_1m(self, n: int = 6) -> list:
+        """Ultime n chiusure 1m, candela in corso inclusa (come /api/v3/klines?limit=n)."""
+        return self.closes('1min', n)
     
-    def to_persist(self) -> dict:
-        """Serializza le candele per salvarle nel DB (fix #18 estensione)."""
-        return {
-            '30s':   [c.to_dict() for c in self.candele_30s],
-            '2min':  [c.to_dict() for c in self.candele_2min],
-            '10min': [c.to_dict() for c in self.candele_10min],
-        }
+    def features_1m(self, n: int = 6, baseline: int = 30):
+        """Metriche kline dei simula*.py sulle candele 1m locali (None se poca storia)."""
+        return self.features('1min', n, baseline)
     
-    def from_persist(self, data: dict):
-        """Ripristina le candele dal DB al boot."""
-        try:
-            if '30s' in data:
-                for d in data['30s']:
-                    self.candele_30s.append(Candela.from_dict(d))
-            if '2min' in data:
-                for d in data['2min']:
-                    self.candele_2min.append(Candela.from_dict(d))
-            if '10min' in data:
-                for d in data['10min']:
-                    self.candele_10min.append(Candela.from_dict(d))
-            log.info(f"[CANDELE_LOAD] Ripristinate: 30s={len(self.candele_30s)} "
-                    f"2min={len(self.candele_2min)} 10min={len(self.candele_10min)}")
-        except Exception as e:
-            log.error(f"[CANDELE_LOAD] Errore ripristino: {e}")
+    def status(self) -> dict:
+        """Stato attuale dei buffer per dashboard."""
+        return {nome: {'archiviate': len(s),
+                       'current': s.corrente().to_dict() if s.cur_ts is not None else None}
+                for nome, s in self.serie.items()}
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -249,7 +170,11 @@ class TsunamiDetector:
     
     def analyze(self, candele: list, timeframe: str) -> TsunamiVerdict:
         """Analizza una lista di candele e produce verdetto."""
-        n = len(candele)
+        return self.analyze_oc([c.open for c in candele], [c.close for c in candele], timeframe)
+    
+    def analyze_oc(self, opens: list, closes: list, timeframe: str) -> TsunamiVerdict:
+        """Come analyze(), su open e close gia' in colonna (MotoreCandele.colonne)."""
+        n = len(closes)
         
         # Default: dati insufficienti
         if n < self.MIN_CANDELE:
@@ -261,7 +186,6 @@ class TsunamiDetector:
             )
         
         # ── A) VELOCITÀ media (derivata prima sui close)
-        closes = [c.close for c in candele]
         delta_total = closes[-1] - closes[0]
         velocita = delta_total / (n - 1)  # $/candela media
         
@@ -278,16 +202,15 @@ class TsunamiDetector:
         # ── C) COERENZA DIREZIONALE
         # % di candele consecutive che si muovono nella stessa direzione della media
         direction = 'UP' if velocita > 0 else ('DOWN' if velocita < 0 else 'NONE')
+        movimenti = [c - o for o, c in zip(opens, closes)]  # movimento intra-candela
         candele_concordi = 0
-        for c in candele:
-            mov = c.close - c.open  # movimento intra-candela
+        for mov in movimenti:
             if (direction == 'UP' and mov > 0) or (direction == 'DOWN' and mov < 0):
                 candele_concordi += 1
         coerenza = candele_concordi / n if n > 0 else 0.0
         
         # ── D) VARIANZA IN CALO (acqua si compatta)
         # Std dei movimenti recenti vs passati
-        movimenti = [c.close - c.open for c in candele]
         if n >= 6:
             mov_recenti = movimenti[-3:]
             mov_passati = movimenti[:3]
@@ -394,22 +317,45 @@ class TsunamiGate:
       - 2/3 TSUNAMI nella stessa direzione → ENTRY ridotta (0.5x)
       - 0/3 o 1/3 → NO ENTRY (schiuma)
       - Direzioni discordi → NO ENTRY (rumore strutturale)
+
+    I verdetti guardano solo candele CHIUSE: un timeframe si rianalizza
+    quando la sua versione cambia (candela chiusa, ripristino, backfill),
+    altrimenti vale il verdetto in cache. Nessun timeframe cambiato →
+    stessa decisione di prima. TSUNAMI_CACHE_OFF=true → sempre da capo.
     """
     
+    TIMEFRAMES = ('30s', '2min', '10min')
+    
     def __init__(self, aggregator: CandelaAggregator, detector: TsunamiDetector):
         self.aggregator = aggregator
         self.detector = detector
+        self._cache_on = os.environ.get("TSUNAMI_CACHE_OFF", "false").lower() != "true"
+        self._verdetti = {}          # tf → (versione, TsunamiVerdict)
+        self._decisione = None
+        self.analisi = 0             # verdetti ricalcolati
+        self.riusi   = 0             # evaluate() risolti dalla cache
     
     def evaluate(self) -> TsunamiDecision:
         """Valuta i 3 timeframes e prende decisione."""
-        verdetti = {}
-        for tf, candele in [
-            ('30s',   self.aggregator.get_candele('30s')),
-            ('2min',  self.aggregator.get_candele('2min')),
-            ('10min', self.aggregator.get_candele('10min')),
-        ]:
-            verdetti[tf] = self.detector.analyze(candele, tf)
-        
+        agg = self.aggregator
+        cambiati = False
+        for tf in self.TIMEFRAMES:
+            ver = agg.versione(tf)
+            vecchio = self._verdetti.get(tf)
+            if self._cache_on and vecchio is not None and vecchio[0] == ver:
+                continue
+            c = agg.colonne(tf)
+            self._verdetti[tf] = (ver, self.detector.analyze_oc(c['o'].tolist(), c['c'].tolist(), tf))
+            self.analisi += 1
+            cambiati = True
+        if not cambiati and self._decisione is not None:
+            self.riusi += 1
+            return self._decisione
+        self._decisione = self.decidi({tf: self._verdetti[tf][1] for tf in self.TIMEFRAMES})
+        return self._decisione
+    
+    def decidi(self, verdetti: dict) -> TsunamiDecision:
+        """Concordanza dei verdetti per timeframe → decisione."""
         # Conta quanti TF sono in TSUNAMI e in quale direzione
         ts_up   = sum(1 for v in verdetti.values() if v.is_tsunami and v.direction == 'UP')
         ts_down = sum(1 for v in verdetti.values() if v.is_tsunami and v.direction == 'DOWN')
@@ -549,6 +495,8 @@ class TsunamiEngine:
             'aggregator': self.aggregator.status(),
             'last_decision': self.last_decision(),
             'last_decision_age': round(time.time() - self._last_decision_ts, 1) if self._last_decision_ts else None,
+            'verdetti_ricalcolati': self.gate.analisi,
+            'verdetti_da_cache':    self.gate.riusi,
         }
     
     # Persistenza
@@ -557,3 +505,7 @@ class TsunamiEngine:
     
     def from_persist(self, data: dict):
         self.aggregator.from_persist(data)
+    
+    def backfill(self, directory: str, t1: Optional[float] = None) -> int:
+        """Candele ricostruite dal tick journal (vedi MotoreCandele.backfill)."""
+        return self.aggregator.backfill(directory, t1)
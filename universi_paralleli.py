@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════
+ UNIVERSI PARALLELI — N tarature del Campo sugli stessi tick, in un colpo
+═══════════════════════════════════════════════════════════════════════
+
+PROBLEMA:
+  Dal vivo gira UNA taratura di CampoGravitazionale (pesi W, SOGLIA_BASE,
+  REGIME_FACTOR, SCORE_FLOOR). Le alternative si giudicano a posteriori
+  con i simula*.py sulle kline 1m: un'imitazione del bot, non il bot,
+  e mai sugli stessi istanti in cui il bot ha deciso.
+
+SOLUZIONE:
+  Una matrice di varianti (una riga = una taratura). A ogni tick le
+  feature del Campo (seed, fingerprint, momentum/trend/volatilita'/
+  regime, direzione) diventano UN vettore; score e soglia di tutte le
+  varianti sono un prodotto matrice-vettore e qualche maschera.
+
+  Ogni variante ha la sua posizione di carta: entra se score >= soglia
+  ed e' libera, esce con le stesse regole dei fantasmi (stop live,
+  DECEL 15s, SMORZ 10s, WIN 20s, TIMEOUT 60s: regole_uscita del
+  PhantomBook) sul PnL lordo, fee tolta una volta al close.
+  tabella() = PnL per variante.
+
+  Score e score_max come score_now/evaluate. Soglia come evaluate:
+  SOGLIA_BASE x context_ratio x REG_F[regime] x VOL_FACTOR, fra
+  max(24, SOGLIA_MIN x ctx) e SOGLIA_MAX, poi pavimento SCORE_FLOOR
+  (SOGLIA_PIATTA: soglia = SCORE_FLOOR). I fattori di stato del conto
+  (storico, pre-breakout, drift, loss streak) e il tetto dinamico sono
+  uguali per tutti gli universi: restano fuori (fattore comune = 1).
+
+  Riga 0 = taratura dal vivo. Le altre: griglia(n) attorno a quella,
+  o una lista esplicita (UNIVERSI_FILE, JSON). SOGLIA_BASE/SOGLIA_MIN
+  del vivo non sono costanti (CompartoEngine li riscrive a ogni tick),
+  e il pavimento dipende da SOGLIA_PIATTA: valuta() riceve base, min e
+  pavimento del Campo di quel tick e la riga 0 li segue (riga0_vivo).
+═══════════════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+
+from phantom_book import regole_uscita, _USCITE
+
+# ordine delle colonne dei pesi: chiavi del W di score_now
+PESI = ("seed", "fp", "mom", "trend", "vol", "regime", "rsi", "mac")
+REGIMI = ("TRENDING_BULL", "EXPLOSIVE", "RANGING", "TRENDING_BEAR")
+
+# taratura dal vivo (CampoGravitazionale)
+W_VIVO = {"seed": 25, "fp": 20, "mom": 12, "trend": 12, "vol": 8, "regime": 3, "rsi": 0, "mac": 0}
+REG_F_VIVO = {"TRENDING_BULL": 0.80, "EXPLOSIVE": 0.85, "RANGING": 1.00, "TRENDING_BEAR": 1.10}
+SOGLIA_BASE_VIVO = 40
+SCORE_FLOOR_VIVO = 48
+
+MOM_L = {"FORTE": 1.0, "MEDIO": 0.67, "DEBOLE": 0.20}
+MOM_S = {"FORTE": 0.20, "MEDIO": 0.67, "DEBOLE": 1.0}
+TRD_L = {"UP": 1.0, "SIDEWAYS": 0.47, "DOWN": 0.0}
+TRD_S = {"UP": 0.0, "SIDEWAYS": 0.47, "DOWN": 1.0}
+REG_L = {"TRENDING_BULL": 1.0, "EXPLOSIVE": 0.80, "RANGING": 0.20, "TRENDING_BEAR": 0.0}
+REG_S = {"TRENDING_BULL": 0.0, "EXPLOSIVE": 0.80, "RANGING": 0.20, "TRENDING_BEAR": 1.0}
+VOL_S = {"BASSA": 1.0, "MEDIA": 0.60, "ALTA": 0.20}
+VOL_F = {"BASSA": 0.90, "MEDIA": 1.0, "ALTA": 1.00}
+
+
+def variante_vivo(score_floor: float = SCORE_FLOOR_VIVO) -> dict:
+    return {"W": dict(W_VIVO), "SOGLIA_BASE": SOGLIA_BASE_VIVO,
+            "REG_F": dict(REG_F_VIVO), "SCORE_FLOOR": score_floor}
+
+
+def griglia(n: int, seme: int = 16, score_floor: float = SCORE_FLOOR_VIVO) -> list:
+    """Riga 0 = dal vivo; le altre perturbate attorno (pesi x0.5..2, soglie, REG_F +-20%)."""
+    rng = np.random.RandomState(seme)
+    out = [variante_vivo(score_floor)]
+    for _ in range(max(0, n - 1)):
+        W = {k: (round(v * float(np.exp(rng.uniform(-0.7, 0.7))), 2) if v else 0)
+             for k, v in W_VIVO.items()}
+        out.append({
+            "W":           W,
+            "SOGLIA_BASE": int(rng.randint(28, 61)),
+            "REG_F":       {r: round(f * float(rng.uniform(0.8, 1.2)), 3)
+                            for r, f in REG_F_VIVO.items()},
+            "SCORE_FLOOR": int(rng.randint(30, 61)),
+        })
+    return out
+
+
+class UniversiParalleli:
+    """Score, soglia e posizione di carta di N tarature, colonna per colonna."""
+
+    def __init__(self, varianti: list, exposure: float = 5000.0, fee: float = 2.0,
+                 stop_live: float = 7.0, pausa_s: float = 30.0,
+                 soglia_min: float = 34, soglia_max: float = 80,
+                 riga0_vivo: bool = True):
+        self.varianti = varianti
+        self.riga0_vivo = riga0_vivo and len(varianti) > 0
+        V = self.n = len(varianti)
+        self.W = np.array([[float(v["W"].get(k, 0)) for k in PESI] for v in varianti])
+        self.base = np.array([float(v["SOGLIA_BASE"]) for v in varianti])
+        # colonna extra = regime sconosciuto (fattore 1.0, come REG_F.get(r, 1.0))
+        self.reg_f = np.array([[float(v["REG_F"].get(r, 1.0)) for r in REGIMI] + [1.0]
+                               for v in varianti])
+        self.floor = np.array([float(v["SCORE_FLOOR"]) for v in varianti])
+        self.usa_ta = bool(self.W[:, 6:].any())    # servono RSI/MACD?
+
+        self.exposure   = exposure
+        self.fee        = fee
+        self.stop_live  = stop_live
+        self.pausa_s    = pausa_s
+        self.soglia_min = soglia_min
+        self.soglia_max = soglia_max
+
+        # posizioni di carta
+        self.aperto   = np.zeros(V, dtype=bool)
+        self.entry    = np.zeros(V)
+        self.segno    = np.zeros(V)
+        self.t0       = np.zeros(V)
+        self.libero   = np.zeros(V)                # ts da cui puo' rientrare
+        # contabilita'
+        self.trades   = np.zeros(V, dtype=np.int64)
+        self.vinti    = np.zeros(V, dtype=np.int64)
+        self.pnl      = np.zeros(V)
+        self.picco    = np.zeros(V)
+        self.max_dd   = np.zeros(V)
+        self.uscite   = np.zeros((V, len(_USCITE)), dtype=np.int64)
+        self.ultimo_score  = np.zeros(V)
+        self.ultima_soglia = np.zeros(V)
+        self.tick_n   = 0
+
+    def _colonne(self, seed_score, fp_wr, momentum, volatility, trend, regime,
+                 direction, rsi_s, macd_s):
+        """Feature del tick: vettore dello score e vettore dello score massimo."""
+        short = direction == "SHORT"
+        m = (MOM_S if short else MOM_L).get(momentum, 0.5)
+        t = (TRD_S if short else TRD_L).get(trend, 0.5)
+        r = (REG_S if short else REG_L).get(regime, 0.2)
+        v = VOL_S.get(volatility, 0.5)
+        f = np.array([min(1.0, max(0.0, (seed_score - 0.20) / 0.60)),
+                      min(1.0, max(0.0, (fp_wr - 0.30) / 0.50)),
+                      m, t, v, r, rsi_s, macd_s])
+        fmax = np.array([1.0, 1.0, m, t, v, r, 1.0, 1.0])
+        return f, fmax
+
+    def segui_vivo(self, base: float, soglia_min: float, floor: float):
+        """SOGLIA_BASE, SOGLIA_MIN e pavimento del Campo adesso: riga 0 e soglia_min li seguono."""
+        self.soglia_min = soglia_min
+        if not self.riga0_vivo or (self.base[0] == base and self.floor[0] == floor):
+            return
+        self.base[0], self.floor[0] = base, floor
+        self.varianti[0] = dict(self.varianti[0], SOGLIA_BASE=base, SCORE_FLOOR=floor)
+
+    def valuta(self, now: float, price: float, seed_score: float, fp_wr: float,
+               momentum: str, volatility: str, trend: str, regime: str,
+               direction: str = "LONG", rsi_s: float = 0.0, macd_s: float = 0.0,
+               soglia_piatta: bool = False, base: float = None,
+               soglia_min: float = None, floor: float = None) -> int:
+        """Score e soglia di tutte le varianti; apre chi e' libero e passa. Ritorna quante aprono.
+        base/soglia_min/floor: i valori del Campo in questo tick (None = restano gli ultimi)."""
+        self.tick_n += 1
+        if base is not None:
+            self.segui_vivo(base, self.soglia_min if soglia_min is None else soglia_min,
+                            self.floor[0] if floor is None else floor)
+        f, fmax = self._colonne(seed_score, fp_wr, momentum, volatility, trend,
+                                regime, direction, rsi_s, macd_s)
+        score = self.W @ f
+        ctx = (self.W @ fmax) / 100.0
+        if soglia_piatta:
+            soglia = self.floor
+        else:
+            j = REGIMI.index(regime) if regime in REGIMI else len(REGIMI)
+            raw = self.base * ctx * self.reg_f[:, j] * VOL_F.get(volatility, 1.0)
+            soglia = np.maximum(np.maximum(24.0, self.soglia_min * ctx),
+                                np.minimum(self.soglia_max, raw))
+            soglia = np.maximum(self.floor, soglia)
+        self.ultimo_score, self.ultima_soglia = score, soglia
+
+        entra = (score >= soglia) & ~self.aperto & (self.libero <= now)
+        k = int(entra.sum())
+        if k:
+            self.aperto[entra] = True
+            self.entry[entra]  = price
+            self.segno[entra]  = -1.0 if direction == "SHORT" else 1.0
+            self.t0[entra]     = now
+        return k
+
+    def step(self, price: float, now: float, momentum: str) -> int:
+        """Regole di uscita sulle posizioni aperte. Ritorna quante chiudono."""
+        if not self.aperto.any():
+            return 0
+        i = np.flatnonzero(self.aperto)
+        # regole sul PnL lordo come il bot reale, fee tolta una volta al close
+        codice, pnl = regole_uscita(self.segno[i], self.entry[i], now - self.t0[i], price,
+                                    momentum, self.stop_live, self.exposure)
+        esce = codice > 0
+        if not esce.any():
+            return 0
+        c, p, cod = i[esce], pnl[esce] - self.fee, codice[esce]
+        self.aperto[c] = False
+        self.libero[c] = now + self.pausa_s
+        self.trades[c] += 1
+        self.vinti[c]  += p > 0
+        self.pnl[c]    += p
+        np.maximum(self.picco, self.pnl, out=self.picco)
+        np.maximum(self.max_dd, self.picco - self.pnl, out=self.max_dd)
+        np.add.at(self.uscite, (c, cod - 1), 1)
+        return len(c)
+
+    def tabella(self, k: int = None, ordine: str = "pnl") -> list:
+        """Una riga per variante, le migliori per PnL (o 'id') in testa."""
+        idx = (np.argsort(-self.pnl, kind="stable") if ordine == "pnl"
+               else np.arange(self.n))
+        if k is not None:
+            idx = idx[:k]
+        out = []
+        for i in idx:
+            v = self.varianti[i]
+            n = int(self.trades[i])
+            out.append({
+                "id":          int(i),
+                "trades":      n,
+                "wr":          round(int(self.vinti[i]) / n, 3) if n else None,
+                "pnl":         round(float(self.pnl[i]), 2),
+                "pnl_medio":   round(float(self.pnl[i]) / n, 3) if n else None,
+                "max_dd":      round(float(self.max_dd[i]), 2),
+                "aperta":      bool(self.aperto[i]),
+                "uscite":      {u: int(c) for u, c in zip(_USCITE, self.uscite[i]) if c},
+                "W":           v["W"],
+                "SOGLIA_BASE": v["SOGLIA_BASE"],
+                "REG_F":       v["REG_F"],
+                "SCORE_FLOOR": v["SCORE_FLOOR"],
+            })
+        return out
+
+    def stats(self) -> dict:
+        vivo = self.tabella(ordine="id")[0] if self.n else {}
+        return {
+            "varianti":  self.n,
+            "tick":      self.tick_n,
+            "aperte":    int(self.aperto.sum()),
+            "trades":    int(self.trades.sum()),
+            "vivo":      {k: vivo.get(k) for k in ("trades", "wr", "pnl", "max_dd")},
+            "migliori":  [{k: r[k] for k in ("id", "trades", "wr", "pnl", "max_dd")}
+                          for r in self.tabella(5)],
+        }